@@ -28,8 +28,10 @@ import odatix.lib.printc as printc
 import odatix.lib.eda_tools as eda_tools
 import odatix.lib.hard_settings as hard_settings
 import odatix.lib.job_steps as job_steps
+import odatix.lib.fmax_search_state as fmax_search_state
 import odatix.lib.metrics as metrics_lib
 import odatix.lib.results_schema as results_schema
+import odatix.lib.parallel_job_handler.resource_usage as resource_usage
 from odatix.lib.utils import read_from_list, create_dir, KeyNotInListError, BadValueInListError
 from odatix.lib.get_from_dict import get_from_dict, Key, KeyNotInDictError, BadValueInDictError
 import odatix.lib.settings as settings
@@ -48,6 +50,11 @@ from odatix.components.export_common import (
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Metrics every job gets on top of the ones of its tool (see also
+# odatix.lib.parallel_job_handler.resource_usage.METRICS).
+STEP_TIME_METRIC = "Step_Time"
+FMAX_ITERATIONS_METRIC = "Fmax_Iterations"
+
 banned_metrics = []
 banned_arch = []
 
@@ -561,6 +568,7 @@ def process_configuration(input, target, architecture, configuration, frequency,
   # implemented but no bitstream): the steps this job actually completed are what
   # it has results for.
   completed_steps = job_steps.completed_step_names(cur_path)
+  step_seconds = job_steps.step_seconds(cur_path)
 
   if not flow:
     # A full re-export does not know which flow ran: read it back from the
@@ -635,9 +643,12 @@ def process_configuration(input, target, architecture, configuration, frequency,
     last_step = step is None or step == completed_steps[-1]
     # A step that measured nothing of its own gets no record: it would repeat
     # the metrics of the whole job under another step name. The last step always
-    # keeps its record, so how far the job went stays readable.
+    # keeps its record, so how far the job went stays readable. A step whose
+    # wall time is known keeps a record holding that alone.
     if not last_step and not measured:
-      continue
+      if step not in step_seconds:
+        continue
+      metrics, cur_units = {}, {}
 
     meta = dict(base_meta)
     if step is not None:
@@ -649,10 +660,27 @@ def process_configuration(input, target, architecture, configuration, frequency,
 
     results_schema.flatten_param_domains(param_domains, meta)
 
+    # How long each step took, one value per step record: charted by step, the
+    # breakdown of where the time of a flow goes (see job_steps.step_seconds).
+    if step in step_seconds:
+      metrics[STEP_TIME_METRIC] = step_seconds[step]
+      cur_units[STEP_TIME_METRIC] = "s"
+
     # Update units
     units.update(cur_units)
     records.append(results_schema.make_record(meta, metrics))
 
+  # What the job used and how long it took, as recorded by the job handler,
+  # belong to the job as a whole: they go with the last step it reached, as
+  # does the number of iterations of its fmax search.
+  usage_metrics, usage_units = resource_usage.usage_metrics(resource_usage.read_usage(cur_path))
+  search_runs = (fmax_search_state.read_state(cur_path) or {}).get("runs")
+  if isinstance(search_runs, int) and not isinstance(search_runs, bool) and search_runs > 0:
+    usage_metrics[FMAX_ITERATIONS_METRIC] = search_runs
+  if records and usage_metrics:
+    records[-1]["metrics"].update(usage_metrics)
+    units.update(usage_units)
+
   return records
 
 
@@ -933,6 +961,14 @@ def configure_synthesis_job_exports(
     if result_type in ("custom_freq_synthesis", "pnr") and frequency is None:
       continue
 
+    # A sweep synthesizes its configuration at several frequencies, each in the
+    # directory it would have had as a job of its own: its result is one record
+    # per frequency.
+    frequencies = None
+    sweep_dirs = getattr(job, "sweep_dirs", None)
+    if sweep_dirs:
+      frequencies = [os.path.basename(os.path.realpath(str(sweep_dir))) for sweep_dir in sweep_dirs]
+
     job.post_run_export = {
       "kind": "synthesis",
       "result_type": result_type,
@@ -945,6 +981,7 @@ def configure_synthesis_job_exports(
       "architecture": str(architecture),
       "configuration": str(configuration),
       "frequency": str(frequency) if frequency is not None else None,
+      "frequencies": frequencies,
       "use_benchmark": bool(use_benchmark),
       "benchmark_file": benchmark_file,
       "custom_metrics_file": custom_metrics_file,
@@ -1008,23 +1045,42 @@ def export_single_job_result(job, export_config=None):
   output_file = os.path.join(output_dir, "results_" + tool + ".yml")
   units, records = _load_existing_results(output_file)
 
-  job_records = process_configuration(
-    input=input_tool_path,
-    target=target,
-    architecture=architecture,
-    configuration=configuration,
-    frequency=frequency,
-    type=result_type,
-    result_key=result_type,
-    units=units,
-    metrics_data=metrics_data,
-    metrics_file=metrics_file,
-    use_benchmark=use_benchmark,
-    benchmark_file=benchmark_file,
-    tool=tool,
-    flow=flow,
-    source=config.get("source", None),
-  )
+  # A sweep has one result per frequency (see configure_synthesis_job_exports),
+  # each exported on its own: the frequencies that failed do not take the
+  # results of the others with them.
+  sweep_frequencies = config.get("frequencies") or None
+  frequencies = sweep_frequencies or [frequency]
+
+  job_records = []
+  failed_frequencies = []
+  for job_frequency in frequencies:
+    try:
+      frequency_records = process_configuration(
+        input=input_tool_path,
+        target=target,
+        architecture=architecture,
+        configuration=configuration,
+        frequency=str(job_frequency) if job_frequency is not None else None,
+        type=result_type,
+        result_key=result_type,
+        units=units,
+        metrics_data=metrics_data,
+        metrics_file=metrics_file,
+        use_benchmark=use_benchmark,
+        benchmark_file=benchmark_file,
+        tool=tool,
+        flow=flow,
+        source=config.get("source", None),
+      )
+    except Exception as e:
+      if sweep_frequencies is None:
+        raise
+      printc.error("Could not export the results at " + str(job_frequency) + ": " + str(e), script_name=script_name)
+      frequency_records = None
+    if frequency_records:
+      job_records.extend(frequency_records)
+    else:
+      failed_frequencies.append(job_frequency)
 
   if not job_records:
     printc.warning(
@@ -1044,6 +1100,13 @@ def export_single_job_result(job, export_config=None):
     return False
 
   printc.say('Results updated in "' + output_file + '"', script_name=script_name)
+  if failed_frequencies:
+    # The results of the other frequencies are kept, but the job failed.
+    printc.warning(
+      "No results for " + target + "/" + architecture + "/" + configuration + " at " + ", ".join(str(f) for f in failed_frequencies),
+      script_name=script_name,
+    )
+    return False
   return True
 
 
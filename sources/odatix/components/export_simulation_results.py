@@ -40,6 +40,7 @@ import odatix.lib.results_schema as results_schema
 import odatix.lib.param_domain as param_domain
 import odatix.workspace.sim_architectures as sim_architectures
 import odatix.lib.hard_settings as hard_settings
+import odatix.lib.parallel_job_handler.resource_usage as resource_usage
 from odatix.lib.settings import OdatixSettings
 from odatix.components.export_common import parse_yaml, load_existing_results_file
 from odatix.components.export_workflow_results import _load_metrics, _extract_run_records
@@ -184,12 +185,31 @@ def _extract_records_for_run(run_dir, work_root, sim_path):
     """
     Extract every record a single run directory yields.
 
+    What the run took (Run_Time, and what the daemon sampled of it) goes on its
+    last record, or on a record of its own when the simulation defines nothing
+    to extract.
+
     Returns:
         tuple: (records, units), both empty when the simulation defines nothing
-        to extract, or (None, None) when its metrics file cannot be read.
+        to extract and the run left no figures, or (None, None) when its metrics
+        file cannot be read.
     """
     identity = _run_identity(run_dir, work_root, sim_path)
+    records, units = _extract_declared_records(run_dir, identity)
+    if records is None:
+        return None, None
+
+    usage_metrics, usage_units = resource_usage.usage_metrics(resource_usage.read_usage(run_dir))
+    if usage_metrics:
+        if not records:
+            records = _build_simulation_records([({}, {})], identity, run_dir)
+        records[-1]["metrics"].update(usage_metrics)
+        units = dict(units, **usage_units)
+    return records, units
+
 
+def _extract_declared_records(run_dir, identity):
+    """The records of the metrics a simulation declares, as (records, units)."""
     declared_metrics_file = _declared_metrics_file(
         identity["simulation_definition_dir"], identity["architecture"]
     )
@@ -26,6 +26,7 @@ import argparse
 
 import odatix.lib.printc as printc
 import odatix.lib.results_schema as results_schema
+import odatix.lib.parallel_job_handler.resource_usage as resource_usage
 from odatix.lib.settings import OdatixSettings
 from odatix.components.export_common import (
     parse_regex,
@@ -289,6 +290,13 @@ def _extract_run_records(run_dir, metrics_def, metadata_def=None, error_prefix="
             (meta_extra if field_role == "meta" else metrics)[name] = value
         records.append((meta_extra, metrics))
 
+    # What the run used, as sampled by the daemon, is the same for every row.
+    usage_metrics, usage_units = resource_usage.usage_metrics(resource_usage.read_usage(run_dir))
+    if usage_metrics:
+        for _, metrics in records:
+            metrics.update(usage_metrics)
+        units.update(usage_units)
+
     return records, units
 
 
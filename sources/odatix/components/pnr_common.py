@@ -157,6 +157,11 @@ def build_prepare_pnr_job(
     _prepare_job(arch_instance, job_list) the shared preparation loop calls for
     every instance the handler produced.
     """
+    import odatix.lib.eda_tools as eda_tools
+
+    resources = eda_tools.get_flow_resources(tool, flow)
+    licenses = eda_tools.get_flow_licenses(tool, flow)
+    memory_limit_gb = eda_tools.get_flow_memory_limit(tool, flow)
 
     def _prepare_job(arch_instance, job_list):
         if check_cancel is not None:
@@ -223,6 +228,11 @@ def build_prepare_pnr_job(
             flow=flow,
             log_size_limit=log_size_limit,
             progress_mode=progress_mode,
+            resources=resources,
+            licenses=licenses,
+            job_type="pnr",
+            tool=tool,
+            memory_limit_gb=memory_limit_gb,
         )
 
         # Where this job's result belongs, so the per-job export does not have to
@@ -410,6 +410,12 @@ def replace_and_write_param_domains(
         yaml.dump(domain_dict, param_domains_file, default_flow_style=False, sort_keys=False)
 
 
+def _print_enqueue_progress(sent, total):
+    from odatix.lib import printc
+
+    printc.say("Enqueued {}/{} jobs".format(sent, total), end="\r" if sent < total else "\n")
+
+
 def start_parallel_jobs(
     parallel_jobs: ParallelJobHandler,
     use_api=True,
@@ -422,7 +428,7 @@ def start_parallel_jobs(
     The `use_api` and `start_headless_on_startup` arguments are kept for
     backward compatibility with older call sites.
     """
-    _state, _response = enqueue_parallel_jobs(parallel_jobs, session=session)
+    _state, _response = enqueue_parallel_jobs(parallel_jobs, session=session, progress=_print_enqueue_progress)
     if not detach:
         attach_monitor(
             host=_state.get("host", hard_settings.daemon_default_host),
@@ -23,7 +23,7 @@ import os
 import sys
 import argparse
 
-from odatix.components.synthesis_common import load_synthesis_context, build_prepare_synthesis_job, prepare_synthesis_jobs
+from odatix.components.synthesis_common import load_synthesis_context, build_prepare_synthesis_job, prepare_synthesis_jobs, group_custom_freq_sweeps
 from odatix.workspace.yaml_io import read_yaml
 from odatix.components.run_common import confirm_valid_jobs, settle_tool_checks, start_parallel_jobs as start_parallel_jobs_common
 import odatix.components.export_results as exp_res
@@ -72,6 +72,7 @@ def add_arguments(parser):
     parser.add_argument("--to", dest="to_freq", type=int, help="override range upper bound for custom frequency synthesis (in MHz)")
     parser.add_argument("--step", dest="step_freq", type=int, help="override range step bound for custom frequency synthesis (in MHz)")
     parser.add_argument("--at", dest="at_freq", action='append', type=int, help="override freqency at which custom frequency synthesis should be run (in MHz)")
+    parser.add_argument("--sweep", dest="sweep", action="store_true", default=None, help="synthesize each configuration at all its frequencies in a single tool session, when the tool declares how")
     parser.add_argument("-k", "--keep", action="store_true", help="store synthesis batch with a timestamp in the configuration name")
     parser.add_argument("--logsize", help="size of the log history per job in the monitor")
     parser.add_argument(
@@ -111,6 +112,22 @@ def _load_settings_custom_frequencies(run_config_settings_filename):
     custom_freq_list = list(dict.fromkeys(custom_freq_list))
     return custom_freq_list, override_arch_frequencies
 
+def _load_settings_custom_freq_sweep(run_config_settings_filename):
+    """
+    Read whether each configuration is synthesized at all its frequencies in a
+    single tool session, from the run settings file ("sweep" of its
+    "frequencies" block).
+    """
+    settings_payload = read_yaml(run_config_settings_filename, default={})
+    frequencies = settings_payload.get("frequencies", {})
+    if not isinstance(frequencies, dict):
+        return False
+
+    enabled = frequencies.get("sweep", False)
+    if isinstance(enabled, str):
+        enabled = enabled.strip().lower() in ("yes", "true", "1")
+    return bool(enabled)
+
 
 ######################################
 # Run Synthesis
@@ -141,6 +158,7 @@ def run_synthesis(
     cancel_event=None,
     detach=False,
     daemon_session=None,
+    sweep=None,
 ):
     # See run_fmax_synthesis.run_synthesis: every run goes through odatix.run.
     run_cli.execute(run_cli.command_run(
@@ -162,6 +180,7 @@ def run_synthesis(
         nb_jobs=nb_jobs,
         check_eda_tool=check_eda_tool,
         frequencies=custom_freq_list or [],
+        sweep=sweep,
         debug=debug,
         keep=keep,
         use_benchmark=use_benchmark,
@@ -191,6 +210,7 @@ def check_settings(
     keep=False,
     cancel_event=None,
     tool_check_sink=None,
+    sweep=None,
 ):
     _check_cancel(cancel_event)
 
@@ -212,6 +232,10 @@ def check_settings(
 
     fallback_custom_freq_list = settings_custom_freq_list if len(settings_custom_freq_list) > 0 else None
 
+    # Same priority for sweeps: --sweep, then the settings file.
+    if sweep is None:
+        sweep = _load_settings_custom_freq_sweep(run_config_settings_filename)
+
     context = load_synthesis_context(
         run_config_settings_filename=run_config_settings_filename,
         arch_path=arch_path,
@@ -249,6 +273,17 @@ def check_settings(
         printc.note("--until and --rerun-from only apply to a flow declaring steps in its tool.yml", script_name)
         raise SystemExit(-1)
 
+    # A sweep needs a session of the tool able to synthesize several times,
+    # which only the tool knows how to open.
+    sweep_command = None
+    if sweep:
+        sweep_command = eda_tools.get_custom_freq_sweep_command(tool, context["flow"])
+        if sweep_command is None:
+            printc.warning(
+                'Flow "' + str(context["flow"]) + '" of eda tool "' + tool + '" declares no sweep session: each frequency runs in a job of its own',
+                script_name,
+            )
+
     ParallelJob.set_patterns(hard_settings.synth_status_pattern, hard_settings.fmax_status_pattern)
 
     arch_handler = ArchitectureHandler(
@@ -316,7 +351,12 @@ def check_settings(
         progress_mode="synth",
         script_name=script_name,
         check_cancel=lambda: _check_cancel(cancel_event),
+        sweep_command=sweep_command,
+        job_type="custom_freq_synthesis",
     )
+    if sweep_command is not None:
+        # One job per configuration, synthesizing it at every frequency left.
+        architecture_instances = group_custom_freq_sweeps(architecture_instances)
     return (
         architecture_instances,
         prepare_job,
@@ -488,6 +528,7 @@ def main(args, settings=None):
         custom_metrics_file=None,
         detach=detach,
         daemon_session=daemon_session,
+        sweep=args.sweep,
     )
 
 
@@ -35,6 +35,7 @@ import odatix.run.cli as run_cli
 from odatix.lib.parallel_job_handler import ParallelJob
 from odatix.lib.settings import OdatixSettings
 from odatix.lib.architecture_handler import ArchitectureHandler
+from odatix.lib.fmax_warm_start import FmaxWarmStart
 from odatix.lib.utils import ask_to_continue, get_timestamp_string
 
 script_name = os.path.basename(__file__)
@@ -70,6 +71,9 @@ def add_arguments(parser):
     parser.add_argument("-D", "--debug", action="store_true", help="enable debug mode to help troubleshoot settings files")
     parser.add_argument("--from", dest="from_freq", type=int, help="override lower bound for fmax synthesis (in MHz)")
     parser.add_argument("--to", dest="to_freq", type=int, help="override upper bound for fmax synthesis (in MHz)")
+    parser.add_argument("--warm-start", dest="warm_start", action="store_true", default=None, help="start each search from bounds predicted from previous results")
+    parser.add_argument("--parallel-probes", dest="parallel_probes", action="store_true", default=None, help="probe several frequencies of a search at once when job slots are idle")
+    parser.add_argument("--bracketing", dest="bracketing", action="store_true", default=None, help="bracket each search with low-effort syntheses first, when the tool declares them")
     parser.add_argument("-k", "--keep", action="store_true", help="store synthesis batch with a timestamp in the configuration name")
     parser.add_argument("--logsize", help="size of the log history per job in the monitor")
     parser.add_argument(
@@ -118,6 +122,9 @@ def run_synthesis(
     cancel_event=None,
     detach=False,
     daemon_session=None,
+    warm_start=None,
+    parallel_probes=None,
+    bracketing=None,
 ):
     # Everything a run does, whatever starts it, goes through odatix.run: the
     # command line is one of its callers, the graphical interface and scripts
@@ -143,6 +150,9 @@ def run_synthesis(
         check_eda_tool=check_eda_tool,
         lower_bound=forced_fmax_lower_bound,
         upper_bound=forced_fmax_upper_bound,
+        warm_start=warm_start,
+        parallel_probes=parallel_probes,
+        bracketing=bracketing,
         debug=debug,
         keep=keep,
         use_benchmark=use_benchmark,
@@ -184,6 +194,61 @@ def _load_settings_fmax_bounds(run_config_settings_filename):
 
     return _to_int(fmax_settings.get("lower_bound")), _to_int(fmax_settings.get("upper_bound"))
 
+def _load_settings_fmax_warm_start(run_config_settings_filename):
+    """
+    Read whether the fmax searches start from predicted bounds, from the run
+    settings file ("warm_start" and "warm_start_margin" of its "fmax_synthesis"
+    block). Unlike the bounds, this does not depend on "override": it narrows
+    whatever bounds end up being used.
+    Returns (enabled, margin), margin being None when unset.
+    """
+    settings_payload = read_yaml(run_config_settings_filename, default={})
+    fmax_settings = settings_payload.get("fmax_synthesis", {})
+    if not isinstance(fmax_settings, dict):
+        return False, None
+
+    enabled = fmax_settings.get("warm_start", False)
+    if isinstance(enabled, str):
+        enabled = enabled.strip().lower() in ("yes", "true", "1")
+
+    margin = fmax_settings.get("warm_start_margin")
+    try:
+        margin = int(margin) if margin not in (None, "") else None
+    except (TypeError, ValueError):
+        margin = None
+    return bool(enabled), margin
+
+def _load_settings_fmax_parallel_probes(run_config_settings_filename):
+    """
+    Read whether the fmax searches may probe several frequencies at once, from
+    the run settings file ("parallel_probes" of its "fmax_synthesis" block).
+    """
+    settings_payload = read_yaml(run_config_settings_filename, default={})
+    fmax_settings = settings_payload.get("fmax_synthesis", {})
+    if not isinstance(fmax_settings, dict):
+        return False
+
+    enabled = fmax_settings.get("parallel_probes", False)
+    if isinstance(enabled, str):
+        enabled = enabled.strip().lower() in ("yes", "true", "1")
+    return bool(enabled)
+
+def _load_settings_fmax_bracketing(run_config_settings_filename):
+    """
+    Read whether the fmax searches are bracketed with low-effort syntheses
+    first, from the run settings file ("bracketing" of its "fmax_synthesis"
+    block).
+    """
+    settings_payload = read_yaml(run_config_settings_filename, default={})
+    fmax_settings = settings_payload.get("fmax_synthesis", {})
+    if not isinstance(fmax_settings, dict):
+        return False
+
+    enabled = fmax_settings.get("bracketing", False)
+    if isinstance(enabled, str):
+        enabled = enabled.strip().lower() in ("yes", "true", "1")
+    return bool(enabled)
+
 def check_settings(
     run_config_settings_filename,
     arch_path,
@@ -206,6 +271,10 @@ def check_settings(
     keep=False,
     cancel_event=None,
     tool_check_sink=None,
+    warm_start=None,
+    result_path=None,
+    parallel_probes=None,
+    bracketing=None,
 ):
     _check_cancel(cancel_event)
 
@@ -217,6 +286,15 @@ def check_settings(
     if forced_fmax_upper_bound is None:
         forced_fmax_upper_bound = settings_upper_bound
 
+    # Same priority for warm-started bounds: --warm-start, then the settings file.
+    settings_warm_start, warm_start_margin = _load_settings_fmax_warm_start(run_config_settings_filename)
+    if warm_start is None:
+        warm_start = settings_warm_start
+    if parallel_probes is None:
+        parallel_probes = _load_settings_fmax_parallel_probes(run_config_settings_filename)
+    if bracketing is None:
+        bracketing = _load_settings_fmax_bracketing(run_config_settings_filename)
+
     context = load_synthesis_context(
         run_config_settings_filename=run_config_settings_filename,
         arch_path=arch_path,
@@ -254,8 +332,48 @@ def check_settings(
         printc.note("--until and --rerun-from only apply to a flow declaring steps in its tool.yml", script_name)
         raise SystemExit(-1)
 
+    # A flow split into steps runs its search from one of them, a whole tool
+    # session the handler cannot split into probes.
+    if parallel_probes and steps:
+        printc.warning(
+            'Flow "' + str(context["flow"]) + '" of eda tool "' + tool + '" is split into steps: its searches are not probed in parallel',
+            script_name,
+        )
+        parallel_probes = False
+
+    # Bracketing needs a cheaper synthesis than the regular one, which only the
+    # tool knows how to run.
+    fmax_bracketing = None
+    if bracketing:
+        fmax_bracketing = eda_tools.fmax_bracketing_settings(tool, context["flow"])
+        if fmax_bracketing is None:
+            printc.warning(
+                'Flow "' + str(context["flow"]) + '" of eda tool "' + tool + '" declares no low-effort synthesis: its searches are not bracketed',
+                script_name,
+            )
+        elif parallel_probes:
+            # Probes are single syntheses at full effort, led from the handler:
+            # there would be nothing left to bracket.
+            printc.warning("Bracketed searches are not probed in parallel", script_name)
+            parallel_probes = False
+
     ParallelJob.set_patterns(hard_settings.synth_status_pattern, hard_settings.fmax_status_pattern)
 
+    # What previous results say about where each Fmax is. Without a results
+    # directory, there is nothing to predict from.
+    fmax_warm_start = None
+    if warm_start:
+        if result_path:
+            fmax_warm_start = FmaxWarmStart.from_result_path(
+                result_path, tool, margin=warm_start_margin, flow=context["flow"],
+            )
+            printc.note(
+                "Warm start: {} previous fmax result(s) found for eda tool \"{}\"".format(len(fmax_warm_start), tool),
+                script_name,
+            )
+        else:
+            printc.warning("Warm start needs a results directory to predict bounds from. Using the configured bounds.", script_name)
+
     arch_handler = ArchitectureHandler(
         work_path=context["work_path"],
         arch_path=arch_path,
@@ -283,6 +401,7 @@ def check_settings(
         rerun_step_index=rerun_index,
         continue_on_error=continue_on_error,
         force_single_thread=context["force_single_thread"],
+        fmax_warm_start=fmax_warm_start,
     )
 
     timestamp = get_timestamp_string()
@@ -321,6 +440,9 @@ def check_settings(
         progress_mode="fmax",
         script_name=script_name,
         check_cancel=lambda: _check_cancel(cancel_event),
+        fmax_probing=bool(parallel_probes),
+        fmax_bracketing=fmax_bracketing,
+        job_type="fmax_synthesis",
     )
     return (
         architecture_instances,
@@ -496,6 +618,9 @@ def main(args, settings=None):
         custom_metrics_file=None,
         detach=detach,
         daemon_session=daemon_session,
+        warm_start=args.warm_start,
+        parallel_probes=args.parallel_probes,
+        bracketing=args.bracketing,
     )
 
 
@@ -15,7 +15,7 @@ from odatix.lib.parallel_job_handler import ParallelJobHandler, ParallelJob
 from odatix.lib.read_tool_settings import read_tool_settings
 from odatix.lib.utils import read_from_list, copytree, create_dir, create_dir_if_missing, KeyNotInListError, BadValueInListError
 from odatix.lib.get_from_dict import get_from_dict
-from odatix.lib.prepare_work import edit_config_file
+from odatix.lib.prepare_work import edit_config_file, edit_bracketing_config_file, edit_sweep_config_file
 from odatix.lib.check_tool import start_tool_check
 from odatix.lib.run_settings import get_synth_settings
 from odatix.lib.variables import replace_variables, Variables
@@ -318,6 +318,7 @@ def build_job_variables(arch_instance, tool, **extra):
     """
     import odatix.lib.eda_tools as eda_tools
     from odatix.lib.settings import OdatixSettings
+    from odatix.lib.parallel_job_handler import cpu_pinning
 
     return Variables(
         work_path=os.path.realpath(arch_instance.tmp_dir),
@@ -336,6 +337,8 @@ def build_job_variables(arch_instance, tool, **extra):
         architecture=arch_instance.arch_display_name,
         target=arch_instance.target,
         tool=tool,
+        nb_threads=cpu_pinning.shell_variable(cpu_pinning.ENV_NB_THREADS),
+        cpu_set=cpu_pinning.shell_variable(cpu_pinning.ENV_CPU_SET),
         **extra,
     )
 
@@ -423,8 +426,22 @@ def build_parallel_job(
     flow,
     log_size_limit,
     progress_mode,
+    fmax_probing=False,
+    resources=None,
+    licenses=None,
+    job_type=None,
+    tool=None,
+    memory_limit_gb=None,
 ):
-    """Build the ParallelJob the handler runs for one job directory."""
+    """
+    Build the ParallelJob the handler runs for one job directory. `resources` is
+    what the job takes of the host (see eda_tools.get_flow_resources), and
+    `licenses` the license pools it takes a token of (see
+    eda_tools.get_flow_licenses). `memory_limit_gb` is the memory limit it runs
+    under (see eda_tools.get_flow_memory_limit). With a `job_type`, the runtime
+    of the job is predicted from the runtime history of the workspace, and
+    recorded there.
+    """
     fmax_status_file = os.path.join(arch_instance.tmp_dir, hard_settings.work_log_path, hard_settings.fmax_status_filename)
     synth_status_file = os.path.join(arch_instance.tmp_dir, hard_settings.work_log_path, hard_settings.synth_status_filename)
 
@@ -452,6 +469,30 @@ def build_parallel_job(
         job.step_names = [step["name"] for step in steps]
         job.resume_step_index = resume_index
         job.step_tracking = {"tmp_dir": os.path.realpath(arch_instance.tmp_dir), "flow": flow}
+    elif fmax_probing and progress_mode == "fmax":
+        # The handler may lead the search with parallel probes when it has slots
+        # to spare (see odatix.lib.parallel_job_handler.fmax_probing). A flow
+        # split into steps runs its search from one of them: it keeps its own.
+        job.fmax_probing = {"max_probes": int(hard_settings.fmax_max_probes)}
+
+    if resources:
+        job.resources = dict(resources)
+    if licenses:
+        job.licenses = dict(licenses)
+    if memory_limit_gb:
+        job.memory_limit_gb = memory_limit_gb
+
+    if job_type:
+        from odatix.lib.parallel_job_handler import runtime_history
+        from odatix.lib.parallel_job_handler.daemon_control import detect_workspace_root
+
+        job.runtime_history = {
+            "file": runtime_history.history_file(detect_workspace_root(arch_instance.tmp_dir)),
+            "key": runtime_history.make_key(job_type, tool, flow, arch_instance.target, arch_instance.arch_name),
+            # A job resuming after some of its steps, or in the middle of an fmax
+            # search, takes less than a whole run: it is predicted, not recorded.
+            "record": not resume_index and not getattr(arch_instance, "fmax_resume", False),
+        }
 
     return job
 
@@ -469,12 +510,34 @@ def build_prepare_synthesis_job(
     steps=None,
     rerun_index=None,
     check_cancel=None,
+    fmax_probing=False,
+    fmax_bracketing=None,
+    sweep_command=None,
+    job_type=None,
 ):
+    """
+    The function preparing the job of each architecture instance, and appending
+    it to a job list.
+
+    With a `sweep_command` (see eda_tools.get_custom_freq_sweep_command), it is
+    handed the instances of one configuration at all its frequencies instead (see
+    group_custom_freq_sweeps): each gets its directory as usual, and a single job
+    synthesizes them all.
+    """
     from odatix.lib.settings import OdatixSettings
     from odatix.lib.architecture_handler import Architecture
     from odatix.components.run_common import replace_and_write_param_domains
+    import odatix.lib.eda_tools as eda_tools
 
-    def _prepare_job(arch_instance, job_list):
+    resources = eda_tools.get_flow_resources(tool, flow)
+    licenses = eda_tools.get_flow_licenses(tool, flow)
+    memory_limit_gb = eda_tools.get_flow_memory_limit(tool, flow)
+
+    def _prepare_directory(arch_instance):
+        """
+        Write the work directory of a job. Returns the index of the step it
+        resumes at, or None when it could not be prepared.
+        """
         if check_cancel is not None:
             check_cancel()
 
@@ -490,7 +553,9 @@ def build_prepare_synthesis_job(
             resume_index = 0
         else:
             resume_index = job_steps.start_index(arch_instance.tmp_dir, steps, rerun_index) if steps else 0
-        resuming = resume_index > 0
+        # An interrupted fmax search needs what it left too: its state and the
+        # reports of the best frequency it met (see odatix.lib.fmax_search_state).
+        resuming = resume_index > 0 or bool(getattr(arch_instance, "fmax_resume", False))
 
         prepare_job_directory(arch_instance, resuming)
 
@@ -579,11 +644,19 @@ def build_prepare_synthesis_job(
 
         tcl_config_file = os.path.join(arch_instance.tmp_script_path, hard_settings.tcl_config_filename)
         edit_config_file(arch_instance, tcl_config_file)
+        if fmax_bracketing:
+            edit_bracketing_config_file(tcl_config_file, fmax_bracketing)
 
         yaml_config_file = os.path.join(arch_instance.tmp_dir, hard_settings.yaml_config_filename)
         Architecture.write_yaml(arch_instance, yaml_config_file)
 
         rewrite_tcl_source_paths(arch_instance, check_cancel)
+        return resume_index
+
+    def _prepare_job(arch_instance, job_list):
+        resume_index = _prepare_directory(arch_instance)
+        if resume_index is None:
+            return
 
         variables = build_job_variables(arch_instance, tool)
         command = build_job_command(arch_handler.command, steps, variables, start_index=resume_index)
@@ -596,11 +669,86 @@ def build_prepare_synthesis_job(
             flow=flow,
             log_size_limit=log_size_limit,
             progress_mode=progress_mode,
+            fmax_probing=fmax_probing,
+            resources=resources,
+            licenses=licenses,
+            job_type=job_type,
+            tool=tool,
+            memory_limit_gb=memory_limit_gb,
         )
 
         job_list.append(running_arch)
 
-    return _prepare_job
+    def _prepare_sweep(sweep, job_list):
+        # The tool analyzes the RTL once, into the library of the first
+        # frequency, and every frequency elaborates from it. A frequency that
+        # cannot join the sweep runs as a job of its own.
+        members = []
+        for arch_instance in sweep:
+            own_lib_name = arch_instance.lib_name
+            if members:
+                arch_instance.lib_name = members[0].lib_name
+            if _prepare_directory(arch_instance) is not None:
+                members.append(arch_instance)
+                continue
+            printc.warning(
+                "Could not prepare " + arch_instance.arch_display_name + " as part of a sweep, it runs on its own",
+                script_name=script_name,
+            )
+            arch_instance.lib_name = own_lib_name
+            _prepare_job(arch_instance, job_list)
+
+        if not members:
+            return
+        sweep = members
+        leader = sweep[0]
+
+        sweep_dirs = [arch_instance.tmp_dir for arch_instance in sweep]
+        edit_sweep_config_file(os.path.join(leader.tmp_script_path, hard_settings.tcl_config_filename), sweep_dirs)
+
+        variables = build_job_variables(leader, tool)
+        running_sweep = build_parallel_job(
+            leader,
+            command=build_job_command(sweep_command, None, variables),
+            steps=None,
+            resume_index=0,
+            flow=flow,
+            log_size_limit=log_size_limit,
+            progress_mode="fmax",
+            resources=resources,
+            licenses=licenses,
+            memory_limit_gb=memory_limit_gb,
+        )
+        # custom_freq_sweep.tcl reports which frequency it is at in the status
+        # file of the first one; the progress of each synthesis stays in its
+        # own directory.
+        running_sweep.progress_file = ""
+        running_sweep.display_name = sweep_display_name(sweep)
+        running_sweep.sweep_dirs = sweep_dirs
+
+        job_list.append(running_sweep)
+
+    return _prepare_sweep if sweep_command else _prepare_job
+
+
+def group_custom_freq_sweeps(architecture_instances):
+    """
+    Group the instances of a custom frequency synthesis by configuration, as
+    lists of the frequencies to run, in the order they were requested. A
+    frequency already done is not in the list, so a sweep only covers what is
+    left.
+    """
+    sweeps = {}
+    for arch_instance in architecture_instances:
+        configuration_dir = os.path.dirname(os.path.realpath(arch_instance.tmp_dir))
+        sweeps.setdefault(configuration_dir, []).append(arch_instance)
+    return list(sweeps.values())
+
+
+def sweep_display_name(sweep):
+    """How the monitor names the job of a sweep: "<architecture> @ 100, 200 MHz"."""
+    name = sweep[0].arch_display_name.rsplit(" @ ", 1)[0]
+    return name + " @ " + ", ".join(str(arch_instance.target_frequency) for arch_instance in sweep) + " MHz"
 
 
 def prepare_synthesis_jobs(
@@ -67,6 +67,8 @@ BUILTIN_VARIABLES = {
         ("lib_name", "Library name used by the flow."),
         ("source_work_path", "Place & route jobs only: work directory of the synthesis it starts from."),
         ("source_tool", "Place & route jobs only: tool the synthesis it starts from ran with."),
+        ("nb_threads", "Number of cores the job runs on: the threads its tool should start."),
+        ("cpu_set", "Cores the job runs on, as taskset lists them (\"0-3,8-11\")."),
         ("first_step", "Steps only: the first step this process runs."),
         ("last_step", "Steps only: the last step this process runs."),
         ("steps", "Steps only: every step this process runs, joined with \"-\"."),
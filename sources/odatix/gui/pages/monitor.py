@@ -25,6 +25,7 @@ from typing import Optional#, Literal
 import os
 import requests
 import socket
+import urllib.parse
 from dash.exceptions import PreventUpdate
 from dash import no_update
 
@@ -33,6 +34,9 @@ from odatix.gui.utils import get_key_from_url, ansi_to_html_spans
 import odatix.gui.ui_components as ui
 import odatix.lib.hard_settings as hard_settings
 from odatix.lib.parallel_job_handler import daemon_control
+from odatix.lib.parallel_job_handler import eta
+from odatix.lib.parallel_job_handler import local_socket
+from odatix.lib.parallel_job_handler.serialization import merge_snapshot, snapshot_since_query
 from odatix.lib.parallel_job_handler.job_output_formatter import JobOutputFormatter
 
 page_path = "/monitor"
@@ -57,7 +61,7 @@ DEFAULT_PORT = hard_settings.daemon_default_port
 RUNNING_STATUSES = ("running", "starting", "exporting")
 QUEUED_STATUSES = ("queued", "paused")
 DONE_STATUSES = ("success",)
-FAILED_STATUSES = ("failed", "killed", "canceled")
+FAILED_STATUSES = ("failed", "oom", "killed", "canceled")
 
 # Sort priority when sorting by status (most "active" first).
 _STATUS_SORT_PRIORITY = {
@@ -68,8 +72,9 @@ _STATUS_SORT_PRIORITY = {
     "queued": 4,
     "success": 5,
     "failed": 6,
-    "killed": 7,
-    "canceled": 8,
+    "oom": 7,
+    "killed": 8,
+    "canceled": 9,
 }
 
 
@@ -201,6 +206,8 @@ def _resolve_daemon_target(
         or ""
     )
 
+    # A daemon of this host is reached through its Unix domain socket.
+    socket_file = local_socket.state_socket(state)
     return {
         "query_key": key,
         "host": host,
@@ -208,7 +215,7 @@ def _resolve_daemon_target(
         "session": str(session),
         "session_name": str(state.get("session_name", "")),
         "session_id": str(state.get("session_id", "")),
-        "base_url": f"http://{host}:{port}",
+        "base_url": local_socket.base_url(socket_file) if socket_file else f"http://{host}:{port}",
     }
 
 
@@ -251,7 +258,7 @@ def _format_monitor_error(error, daemon_state: Optional[dict] = None):
             )
         return str(error)
 
-    if isinstance(error, requests.RequestException):
+    if isinstance(error, (requests.RequestException, OSError)):
         if isinstance(daemon_state, dict):
             host = daemon_state.get("host", DEFAULT_HOST)
             port = daemon_state.get("port", DEFAULT_PORT)
@@ -291,16 +298,23 @@ def _options_signature(options):
     )
 
 def _api_get(base_url: str, path: str):
+    if local_socket.socket_path(base_url) is not None:
+        return local_socket.request(base_url, "GET", path, timeout=0.4)
     r = requests.get(str(base_url).rstrip("/") + path, timeout=0.4)
     r.raise_for_status()
     return r.json()
 
 def _api_get_slow(base_url: str, path: str, timeout: float = 2.0):
+    if local_socket.socket_path(base_url) is not None:
+        return local_socket.request(base_url, "GET", path, timeout=float(timeout))
     r = requests.get(str(base_url).rstrip("/") + path, timeout=float(timeout))
     r.raise_for_status()
     return r.json()
 
 def _api_post(base_url: str, path: str, params: Optional[dict] = None):
+    if local_socket.socket_path(base_url) is not None:
+        query = "?" + urllib.parse.urlencode(params) if params else ""
+        return local_socket.request(base_url, "POST", path + query, timeout=0.6)
     r = requests.post(str(base_url).rstrip("/") + path, params=params or {}, timeout=0.6)
     r.raise_for_status()
     if r.headers.get("content-type", "").startswith("application/json"):
@@ -332,6 +346,19 @@ def _elapsed_seconds(job) -> int:
         return 0
 
 
+def _eta_text(job) -> str:
+    """Time a running job has left, as estimated by the daemon, or "" when unknown."""
+    if not isinstance(job, dict) or str(job.get("status") or "").lower().strip() not in RUNNING_STATUSES:
+        return ""
+    seconds = job.get("eta")
+    if seconds is None:
+        return ""
+    try:
+        return "~" + eta.format_duration(seconds)
+    except (TypeError, ValueError):
+        return ""
+
+
 def _job_matches_filter(status_norm: str, filter_value: str) -> bool:
     if filter_value in (None, "", "all"):
         return True
@@ -378,6 +405,7 @@ def monitor_task(
     progress: int,
     task_id: int = 0,
     selected: bool = False,
+    eta_text: str = "",
 ):
     status_norm = str(status).lower().strip()
 
@@ -420,6 +448,12 @@ def monitor_task(
                         id={"type": "task-runtime", "task_id": task_id},
                         className=f"monitor-task-runtime",
                     ),
+                    html.Div(
+                        eta_text,
+                        id={"type": "task-eta", "task_id": task_id},
+                        className="monitor-task-eta",
+                        title="Estimated time left",
+                    ),
                     html.Div(
                         f"{status}",
                         id={"type": "task-status", "task_id": task_id},
@@ -617,7 +651,11 @@ def _poll_status(_n, previous_snapshot, selected_job_id, logs_state, daemon_stat
         if job_id is not None and offset_i is not None:
             path = f"/status?logs_job_id={job_id}&logs_offset={offset_i}&logs_limit=500"
 
-        snap = _api_get(base_url, path)
+        # Only the jobs that changed since the previous snapshot, merged into it.
+        since = snapshot_since_query(previous_snapshot)
+        if since:
+            path += ("&" if "?" in path else "?") + since
+        snap = merge_snapshot(previous_snapshot, _api_get(base_url, path))
 
         # Merge returned deltas into the log store.
         new_logs_state = no_update
@@ -687,7 +725,8 @@ def _sync_job_list(snapshot, previous_job_ids, selected_job):
                 runtime=runtime,
                 progress=progress,
                 task_id=task_id,
-                selected=(task_id == selected_job)
+                selected=(task_id == selected_job),
+                eta_text=_eta_text(job),
             )
         )
 
@@ -755,6 +794,8 @@ def _apply_filter_sort(snapshot, filter_value, sort_value, sort_reverse, job_ids
     Output("kpi-failed", "children"),
     Output("monitor-overall-bar", "style"),
     Output("monitor-overall-text", "children"),
+    Output("kpi-eta", "children"),
+    Output("kpi-throughput", "children"),
     Input("monitor-snapshot", "data"),
 )
 def _update_kpis(snapshot):
@@ -779,6 +820,17 @@ def _update_kpis(snapshot):
         progress_sum += _job_progress(job)
 
     overall = int(round(progress_sum / total)) if total > 0 else 0
+
+    # Estimated by the daemon, from the runtime history and the running jobs.
+    handler = snapshot.get("handler") if isinstance(snapshot, dict) else None
+    handler = handler if isinstance(handler, dict) else {}
+    session_eta = handler.get("eta")
+    eta_text = "--" if session_eta is None or running + queued == 0 else eta.format_duration(session_eta)
+    try:
+        throughput_text = "{:.1f}".format(float(handler.get("throughput_per_hour") or 0.0))
+    except (TypeError, ValueError):
+        throughput_text = "--"
+
     return (
         str(total),
         str(running),
@@ -787,6 +839,8 @@ def _update_kpis(snapshot):
         str(failed),
         {"width": f"{overall}%"},
         f"{overall}%",
+        eta_text,
+        throughput_text,
     )
 
 
@@ -907,6 +961,7 @@ def _highlight_selected(selected_job, job_ids):
     Output({"type": "task-progress-bar", "task_id": ALL}, "style"),
     Output({"type": "task-progress-text", "task_id": ALL}, "children"),
     Output({"type": "task-runtime", "task_id": ALL}, "children"),
+    Output({"type": "task-eta", "task_id": ALL}, "children"),
     Output({"type": "task-status", "task_id": ALL}, "children"),
     Output({"type": "task-status", "task_id": ALL}, "className"),
     Output({"type": "task-start-wrap", "task_id": ALL}, "style"),
@@ -935,6 +990,7 @@ def _update_tasks(snapshot, job_ids):
     display_name_text = []
     progress_text = []
     runtime_text = []
+    eta_text = []
     status_text = []
     status_class = []
     start_style = []
@@ -956,6 +1012,7 @@ def _update_tasks(snapshot, job_ids):
         bar_style.append({"width": f"{progress}%"})
         progress_text.append(f"{progress} %")
         runtime_text.append(runtime)
+        eta_text.append(_eta_text(job))
         status_text.append(status)
         status_class.append(f"monitor-task-status {status}")
 
@@ -974,6 +1031,7 @@ def _update_tasks(snapshot, job_ids):
         bar_style,
         progress_text,
         runtime_text,
+        eta_text,
         status_text,
         status_class,
         start_style,
@@ -1570,6 +1628,8 @@ monitor_header = html.Div(
                         _stat("kpi-queued", "Queued", "queued"),
                         _stat("kpi-done", "Done", "done"),
                         _stat("kpi-failed", "Failed", "failed"),
+                        _stat("kpi-eta", "ETA", "eta"),
+                        _stat("kpi-throughput", "Jobs / h", "throughput"),
                     ],
                 ),
                 html.Div(
@@ -39,6 +39,7 @@ from odatix.lib.variables import replace_variables, Variables
 from odatix.lib.param_domain import ParamDomain
 import odatix.lib.virtual_param_domain as virtual_param_domain
 import odatix.lib.constraint_files as constraints_lib
+import odatix.lib.fmax_search_state as fmax_search_state
 from odatix.lib.constraint_files import ConstraintFileError
 import odatix.lib.overrides as overrides_lib
 from odatix.lib.overrides import OverrideError
@@ -59,7 +60,8 @@ class Architecture:
         fmax_lower_bound, fmax_upper_bound, range_list, target_frequency,
         param_target_filename, generate_rtl, generate_command, constraint_filename, install_path, 
         param_domains, continue_on_error=False, force_single_thread=False, virtual_param_domains=None,
-        constraint_files=None,
+        constraint_files=None, fmax_explore=False, fmax_explore_step=None, fmax_resume=False,
+        fmax_warm_start_bounds=None,
     ):
         self.arch_name = arch_name
         self.arch_display_name = arch_display_name
@@ -87,6 +89,20 @@ class Architecture:
         self.script_copy_source = script_copy_source
         self.fmax_lower_bound = fmax_lower_bound
         self.fmax_upper_bound = fmax_upper_bound
+        # Whether the fmax search may move its bounds when the answer is not
+        # between them, and by how much (in MHz, the default of settings.tcl
+        # when None). A warm-started search relies on it: its bounds are a
+        # prediction (see lib/fmax_warm_start.py).
+        self.fmax_explore = fmax_explore
+        self.fmax_explore_step = fmax_explore_step
+        # The configured bounds of a warm-started search, [lower, upper]: the
+        # bounds it may widen its narrowed ones to, never past. None when the
+        # search is not warm-started.
+        self.fmax_warm_start_bounds = fmax_warm_start_bounds
+        # Whether the job continues the fmax search its directory was left in
+        # the middle of (see lib/fmax_search_state.py). A decision of the run,
+        # not a setting of the architecture: it is not written to settings.yml.
+        self.fmax_resume = fmax_resume
         self.range_list = range_list
         self.target_frequency = target_frequency
         self.param_target_filename = param_target_filename
@@ -157,6 +173,9 @@ class Architecture:
             'script_copy_source': arch.script_copy_source,
             'fmax_lower_bound': arch.fmax_lower_bound,
             'fmax_upper_bound': arch.fmax_upper_bound,
+            'fmax_explore': arch.fmax_explore,
+            'fmax_explore_step': arch.fmax_explore_step,
+            'fmax_warm_start_bounds': arch.fmax_warm_start_bounds,
             'range_list': arch.range_list,
             'target_frequency': arch.target_frequency,
             'param_target_filename': arch.param_target_filename,
@@ -259,6 +278,11 @@ class Architecture:
                 virtual_param_domains    = get_from_dict("virtual_param_domains", yaml_data, config_file, default_value={}, silent=True, script_name=script_name)[0],
                 continue_on_error        = get_from_dict("continue_on_error", yaml_data, config_file, default_value=False, script_name=script_name)[0],
                 force_single_thread      = get_from_dict("force_single_thread", yaml_data, config_file, default_value=False, script_name=script_name)[0],
+                # Optional: job directories written before warm-started searches
+                # existed have no such keys.
+                fmax_explore             = get_from_dict("fmax_explore", yaml_data, config_file, default_value=False, silent=True, script_name=script_name)[0],
+                fmax_explore_step        = get_from_dict("fmax_explore_step", yaml_data, config_file, default_value=None, silent=True, script_name=script_name)[0],
+                fmax_warm_start_bounds   = get_from_dict("fmax_warm_start_bounds", yaml_data, config_file, default_value=None, silent=True, script_name=script_name)[0],
             )
         except (KeyNotInDictError, BadValueInDictError):
             return None
@@ -295,6 +319,7 @@ class ArchitectureHandler:
         force_single_thread=False,
         requested_steps=None,
         rerun_step_index=None,
+        fmax_warm_start=None,
     ):
         self.work_path = work_path
         self.arch_path = arch_path
@@ -321,6 +346,11 @@ class ArchitectureHandler:
         self.forced_custom_freq_list = forced_custom_freq_list
         self.fallback_custom_freq_list = fallback_custom_freq_list
 
+        # Predicts where the Fmax of a job is from previous results, to start
+        # its search from narrower bounds (see lib/fmax_warm_start.py). None
+        # when the run does not warm start.
+        self.fmax_warm_start = fmax_warm_start
+
         # Which jobs a rule of an architecture's "overrides" section selects is
         # answered with these: the tool running the jobs and the flow of it they
         # run. Empty for a run that has no tool (RTL analysis), which only
@@ -974,6 +1004,10 @@ class ArchitectureHandler:
         formatted_bound = ""
         fmax_lower_bound = 0
         fmax_upper_bound = 0
+        fmax_explore = False
+        fmax_explore_step = None
+        fmax_warm_start_bounds = None
+        fmax_resume = False
         range_list = []
 
         if synthesis:
@@ -1016,11 +1050,32 @@ class ArchitectureHandler:
                     self.plan.add(arch_display_name, Category.ERROR)
                     return None
 
+            # Start the search from narrower bounds when previous results say
+            # where its answer should be. The bounds checked above still hold:
+            # the narrowed ones never leave them.
+            if run_mode == "fmax" and self.fmax_warm_start is not None:
+                configured_bounds = [int(fmax_lower_bound), int(fmax_upper_bound)]
+                fmax_lower_bound, fmax_upper_bound, warm_start_prediction = self.fmax_warm_start.narrow(
+                    target=target,
+                    architecture=arch_param_dir_work,
+                    configuration=arch_config_dir_work,
+                    lower_bound=fmax_lower_bound,
+                    upper_bound=fmax_upper_bound,
+                )
+            else:
+                warm_start_prediction = None
+
+            if warm_start_prediction is not None:
+                fmax_explore = True
+                fmax_warm_start_bounds = configured_bounds
+                fmax_explore_step = int(fmax_upper_bound) - int(fmax_lower_bound)
+
             fmax_lower_bound = str(fmax_lower_bound)
             fmax_upper_bound = str(fmax_upper_bound)
 
             if run_mode == "fmax":
-                formatted_bound = " {}({} - {} MHz){}".format(printc.colors.GREY, fmax_lower_bound, fmax_upper_bound, printc.colors.ENDC)
+                warm_start_note = ", warm start" if warm_start_prediction is not None else ""
+                formatted_bound = " {}({} - {} MHz{}){}".format(printc.colors.GREY, fmax_lower_bound, fmax_upper_bound, warm_start_note, printc.colors.ENDC)
             else:
                 formatted_bound = ""
 
@@ -1061,6 +1116,16 @@ class ArchitectureHandler:
                         local_state = "incomplete"
                     sf.close()
 
+                # A search interrupted halfway continues from the state it left,
+                # as long as it was searching the same bounds. Overwriting, or
+                # re-running steps, starts it over.
+                rerun = self.planner.rerun_step_index is not None and self.planner.rerun_step_index < len(self.planner.requested_steps or [])
+                if not self.overwrite and not rerun:
+                    fmax_resume = fmax_search_state.is_resumable(tmp_dir, fmax_lower_bound, fmax_upper_bound)
+                    if fmax_resume:
+                        printc.note("The interrupted fmax search of \"" + arch + "\" with target \"" + target + "\" resumes where it stopped.", script_name)
+                        local_state = "resume"
+
                 daemon_decision, daemon_entry = self._get_daemon_job_decision(tmp_dir, steps_decision)
                 if daemon_decision == "skip":
                     daemon_status = str(daemon_entry.get("status", "unknown"))
@@ -1212,6 +1277,10 @@ class ArchitectureHandler:
             script_copy_source = script_copy_source,
             fmax_lower_bound=fmax_lower_bound,
             fmax_upper_bound=fmax_upper_bound,
+            fmax_explore=fmax_explore,
+            fmax_explore_step=fmax_explore_step,
+            fmax_warm_start_bounds=fmax_warm_start_bounds,
+            fmax_resume=fmax_resume,
             range_list=range_list,
             target_frequency=0,
             param_target_filename=param_target_filename,
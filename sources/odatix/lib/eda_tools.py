@@ -118,6 +118,52 @@ different binary needs to override it.
 
 Flows of the same tool are alternatives meant to be compared, so each one runs
 in its own work directory (see tool_work_dirname).
+
+A tool (or one of its flows) able to synthesize at a lower effort declares it
+with "fmax_bracketing": an fmax search asked to bracket first bisects with that
+cheap synthesis, and runs only its last few iterations at full effort (see
+fmax_bracketing_settings):
+
+    fmax_bracketing:
+      script: synth_script_fast.tcl   # optional, in the tool's tcl directory
+      full_effort_runs: 3
+
+A custom frequency synthesis runs one job per frequency, each analyzing the
+same RTL again. A flow whose tool can synthesize a design several times in one
+session declares how to open that session with
+"custom_freq_synthesis_sweep_command": a run asked to sweep then gives each
+configuration a single job, which analyzes the RTL once and synthesizes it at
+every frequency, each in the directory it would have had on its own (see
+get_custom_freq_sweep_command):
+
+    unix:
+      custom_freq_synthesis_sweep_command: [...]   # sources custom_freq_sweep.tcl
+
+What a job of a tool takes of the host is declared with "resources", at the top
+level of tool.yml and/or in a flow, which overrides it resource by resource: the
+handler admits a job only once what it costs fits in what the running jobs leave
+(see odatix.lib.parallel_job_handler.resources and get_flow_resources):
+
+    resources:
+      cores: 4
+      memory_gb: 16
+      scratch_gb: 50     # a resource of your own
+
+A tool limited by its number of licenses declares them with "licenses", as
+named token pools: each job takes one token of each pool, and a job whose
+tokens are all taken waits while the jobs of other tools go ahead (see
+get_flow_licenses):
+
+    licenses:
+      dc_shell: 4        # pool name: number of tokens
+
+A job may run under a memory limit, declared with "memory_limit_gb", at the top
+level of tool.yml and/or in a flow, which overrides it (0 or No for no limit): a
+job going over it is stopped and queued again with a higher limit, rather than
+pushing the whole host into swap (see odatix.lib.parallel_job_handler.memory_limits
+and get_flow_memory_limit):
+
+    memory_limit_gb: 24
 """
 
 import copy
@@ -125,6 +171,8 @@ import os
 import sys
 
 import odatix.lib.hard_settings as hard_settings
+from odatix.lib.parallel_job_handler.memory_limits import normalize_limit
+from odatix.lib.parallel_job_handler.resources import normalize_cost
 
 script_name = os.path.basename(__file__)
 
@@ -414,6 +462,10 @@ JOB_TYPE_COMMAND_KEYS = {
 # Deprecated alias, kept so external tool scripts importing it keep working.
 FLOW_COMMAND_KEYS = JOB_TYPE_COMMAND_KEYS
 
+# The tool.yml key declaring how a flow synthesizes a configuration at several
+# frequencies in a single session of the tool (see get_custom_freq_sweep_command).
+CUSTOM_FREQ_SWEEP_COMMAND_KEY = "custom_freq_synthesis_sweep_command"
+
 # Mapping from a job type to the tool.yml key that declares its ordered steps.
 # A flow declares either "<job_type>_command" (one shot) or "<job_type>_steps"
 # (an ordered list of steps that can be run partially and resumed).
@@ -640,7 +692,69 @@ def _inherit_execution(base_commands, base_steps, base_sessions, commands, steps
   return merged_commands, merged_steps, merged_sessions
 
 
-def _make_flow(name, label=None, description=None, icon=None, commands=None, steps=None, sessions=None, metrics_file=None, tool_test_command=None, is_default=False):
+def _flow_bracketing(value):
+  """
+  The low-effort synthesis a flow brackets fmax searches with, as a
+  {"script", "full_effort_runs"} dict, or None when it declares none.
+  """
+  if value is None or value is False:
+    return None
+  if value is True:
+    value = {}
+  if not isinstance(value, dict):
+    return None
+  script = value.get("script")
+  script = script.strip() if isinstance(script, str) and script.strip() else None
+  try:
+    full_effort_runs = int(value.get("full_effort_runs", hard_settings.default_fmax_full_effort_runs))
+  except (TypeError, ValueError):
+    full_effort_runs = hard_settings.default_fmax_full_effort_runs
+  return {"script": script, "full_effort_runs": max(1, full_effort_runs)}
+
+
+def _flow_sweep_command(section, inherited=None):
+  """
+  The command a flow sweeps custom frequencies with, or None when it has none.
+
+  A flow declaring its own custom frequency synthesis (a command or steps) runs
+  something else than the flow it inherits from, so it only sweeps if it says
+  how.
+  """
+  if not isinstance(section, dict):
+    return inherited
+  if CUSTOM_FREQ_SWEEP_COMMAND_KEY in section:
+    command = section.get(CUSTOM_FREQ_SWEEP_COMMAND_KEY)
+    return command if command not in (None, "", []) else None
+  if JOB_TYPE_COMMAND_KEYS["custom_freq_synthesis"] in section or JOB_TYPE_STEPS_KEYS["custom_freq_synthesis"] in section:
+    return None
+  return inherited
+
+
+def _flow_amounts(value, inherited=None):
+  """
+  A {name: amount} declaration of a flow ("resources", "licenses"): the
+  inherited one, overridden name by name. An amount of 0 (or No) says the flow
+  does not use something it inherited.
+  """
+  amounts = dict(inherited) if inherited else {}
+  if isinstance(value, dict):
+    for name in value:
+      amounts.pop(str(name), None)
+    amounts.update(normalize_cost(value))
+  return amounts
+
+
+def _flow_memory_limit(spec, inherited=None):
+  """
+  The memory limit of a flow in GB: its own "memory_limit_gb" if it declares
+  one (0 or No for no limit), the inherited one otherwise. None for no limit.
+  """
+  if not isinstance(spec, dict) or "memory_limit_gb" not in spec:
+    return inherited
+  return normalize_limit(spec.get("memory_limit_gb"))
+
+
+def _make_flow(name, label=None, description=None, icon=None, commands=None, steps=None, sessions=None, metrics_file=None, tool_test_command=None, is_default=False, fmax_bracketing=None, custom_freq_sweep_command=None, resources=None, licenses=None, memory_limit_gb=None):
   return {
     "name": name,
     "label": label if isinstance(label, str) and label.strip() else name,
@@ -654,6 +768,11 @@ def _make_flow(name, label=None, description=None, icon=None, commands=None, ste
     # running a different binary needs to override it.
     "tool_test_command": tool_test_command,
     "is_default": is_default,
+    "fmax_bracketing": fmax_bracketing,
+    "custom_freq_sweep_command": custom_freq_sweep_command,
+    "resources": resources if resources else {},
+    "licenses": licenses if licenses else {},
+    "memory_limit_gb": memory_limit_gb,
   }
 
 
@@ -661,7 +780,9 @@ def list_flows(tool, job_type=None, settings=None):
   """
   Discover the flows of a tool as an ordered dict {flow_name: flow}, the default
   flow first. A flow is a dict with the keys "name", "label", "description",
-  "icon", "commands" (command key -> command), "metrics_file" and "is_default".
+  "icon", "commands" (command key -> command), "metrics_file", "is_default",
+  "fmax_bracketing", "custom_freq_sweep_command", "resources", "licenses" and
+  "memory_limit_gb".
 
   Args:
       tool (str): tool name.
@@ -685,6 +806,11 @@ def list_flows(tool, job_type=None, settings=None):
   base_commands = _flow_commands(base_section)
   base_steps = _flow_steps(base_section)
   base_sessions = _flow_sessions(base_section)
+  base_bracketing = _flow_bracketing(data.get("fmax_bracketing"))
+  base_sweep_command = _flow_sweep_command(base_section)
+  base_resources = _flow_amounts(data.get("resources"))
+  base_licenses = _flow_amounts(data.get("licenses"))
+  base_memory_limit = _flow_memory_limit(data)
   if base_commands or base_steps:
     flows[default_name] = _make_flow(
       default_name,
@@ -694,6 +820,11 @@ def list_flows(tool, job_type=None, settings=None):
       metrics_file=data.get("default_metrics_file"),
       tool_test_command=base_test_command,
       is_default=True,
+      fmax_bracketing=base_bracketing,
+      custom_freq_sweep_command=base_sweep_command,
+      resources=base_resources,
+      licenses=base_licenses,
+      memory_limit_gb=base_memory_limit,
     )
 
   declared_flows = data.get("flows")
@@ -726,6 +857,12 @@ def list_flows(tool, job_type=None, settings=None):
           existing["tool_test_command"] = flow_section.get("tool_test_command")
         if isinstance(spec.get("metrics_file"), str) and spec.get("metrics_file").strip():
           existing["metrics_file"] = spec.get("metrics_file").strip()
+        if "fmax_bracketing" in spec:
+          existing["fmax_bracketing"] = _flow_bracketing(spec.get("fmax_bracketing"))
+        existing["custom_freq_sweep_command"] = _flow_sweep_command(flow_section, existing["custom_freq_sweep_command"])
+        existing["resources"] = _flow_amounts(spec.get("resources"), existing["resources"])
+        existing["licenses"] = _flow_amounts(spec.get("licenses"), existing["licenses"])
+        existing["memory_limit_gb"] = _flow_memory_limit(spec, existing["memory_limit_gb"])
       else:
         # A flow changes what the tool's default flow does: it starts from that
         # declaration and overrides only what it says.
@@ -743,6 +880,13 @@ def list_flows(tool, job_type=None, settings=None):
           metrics_file=spec.get("metrics_file") or data.get("default_metrics_file"),
           tool_test_command=test_command,
           is_default=(name == default_name),
+          # A flow synthesizing differently may not have a cheaper version of
+          # it: "fmax_bracketing: No" says so.
+          fmax_bracketing=_flow_bracketing(spec["fmax_bracketing"]) if "fmax_bracketing" in spec else base_bracketing,
+          custom_freq_sweep_command=_flow_sweep_command(flow_section, base_sweep_command),
+          resources=_flow_amounts(spec.get("resources"), base_resources),
+          licenses=_flow_amounts(spec.get("licenses"), base_licenses),
+          memory_limit_gb=_flow_memory_limit(spec, base_memory_limit),
         )
 
   if job_type is not None:
@@ -912,6 +1056,72 @@ def get_default_step(tool, flow=None, job_type="fmax_synthesis"):
   return default[-1] if default else None
 
 
+def fmax_bracketing_settings(tool, flow=None):
+  """
+  How a flow brackets an fmax search with a cheap, low-effort synthesis before
+  the full-effort one, as a {"script", "full_effort_runs"} dict, or None when
+  the flow declares no such synthesis.
+
+  "script" is the file name of the low-effort synthesis script in the tool's
+  tcl directory, or None when the regular one does both (find_fmax.tcl sets
+  "fmax_effort" to "low" or "full" before each synthesis). "full_effort_runs" is
+  how many bisections are left to full effort once the bracket is found.
+  """
+  resolved = get_flow(tool, flow=flow, job_type="fmax_synthesis")
+  if resolved is None:
+    return None
+  bracketing = resolved.get("fmax_bracketing")
+  return dict(bracketing) if bracketing else None
+
+
+def get_custom_freq_sweep_command(tool, flow=None):
+  """
+  The command synthesizing a configuration at several frequencies in a single
+  session of the tool, or None when the flow declares none.
+
+  Only a flow running custom frequency syntheses in one shot can sweep: a flow
+  split into steps resumes each frequency from its own steps.
+  """
+  resolved = get_flow(tool, flow=flow, job_type="custom_freq_synthesis")
+  if resolved is None or resolved["steps"].get(JOB_TYPE_STEPS_KEYS["custom_freq_synthesis"]):
+    return None
+  return resolved.get("custom_freq_sweep_command")
+
+
+def get_flow_resources(tool, flow=None, job_type=None):
+  """
+  What a job of a flow takes of the host, as a {resource: amount} dict (see
+  odatix.lib.parallel_job_handler.resources), {} when it declares nothing.
+  """
+  resolved = get_flow(tool, flow=flow, job_type=job_type)
+  if resolved is None:
+    return {}
+  return dict(resolved.get("resources") or {})
+
+
+def get_flow_licenses(tool, flow=None, job_type=None):
+  """
+  The license token pools a job of a flow takes one token of, as a
+  {pool: number of tokens} dict (see odatix.lib.parallel_job_handler.resources),
+  {} when it declares none.
+  """
+  resolved = get_flow(tool, flow=flow, job_type=job_type)
+  if resolved is None:
+    return {}
+  return dict(resolved.get("licenses") or {})
+
+
+def get_flow_memory_limit(tool, flow=None, job_type=None):
+  """
+  The memory limit of a job of a flow in GB (see
+  odatix.lib.parallel_job_handler.memory_limits), None when it declares none.
+  """
+  resolved = get_flow(tool, flow=flow, job_type=job_type)
+  if resolved is None:
+    return None
+  return resolved.get("memory_limit_gb")
+
+
 def flow_supports(tool, flow, job_type):
   """True if the given flow of the tool can run the job type."""
   return get_flow(tool, flow=flow, job_type=job_type) is not None
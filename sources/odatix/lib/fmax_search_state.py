@@ -0,0 +1,148 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Persisted state of an fmax search.
+
+A flow split into steps resumes after its completed steps (see
+odatix.lib.job_steps), but a search is a single step: one that dies after 6 of
+its 8 iterations (a reboot, a kill, a crashed license server) would start over
+from its original bounds, frequency_search.log only telling what happened as
+text. So find_fmax.tcl writes the state of its search to a small YAML file of
+the job's log directory after every iteration:
+
+    search: "pnr"              # which search of the flow ("" when it has one)
+    requested_lower_bound: 1   # the bounds the job was given...
+    requested_upper_bound: 1000
+    lower_bound: 375           # ...and where the search stands
+    upper_bound: 438
+    start_lower_bound: 1       # where it started (moved by fmax_explore)
+    start_upper_bound: 1000
+    got_met: 1
+    got_violated: 1
+    runs: 4
+    max_runs: 10
+    explore_step: 10
+    best_met: 375              # frequency the reports of report_MET are from
+    bracketed: 0               # whether a low-effort pass narrowed the bounds first
+    done: 0
+
+A job whose directory holds an unfinished search for the bounds it is given
+again keeps its directory and runs with "fmax_resume" set: find_fmax.tcl then
+continues from that state, and an interruption costs at most the iteration it
+interrupted. Other bounds, or --overwrite, start the search over.
+"""
+
+import os
+
+import yaml
+
+import odatix.lib.hard_settings as hard_settings
+
+# Keys of the state file, in the order they are written.
+STATE_KEYS = (
+  "search",
+  "requested_lower_bound",
+  "requested_upper_bound",
+  "lower_bound",
+  "upper_bound",
+  "start_lower_bound",
+  "start_upper_bound",
+  "got_met",
+  "got_violated",
+  "runs",
+  "max_runs",
+  "explore_step",
+  "best_met",
+  "bracketed",
+  "done",
+)
+
+
+def state_file(tmp_dir):
+  """Path of the fmax search state file of a job directory."""
+  return os.path.join(str(tmp_dir), hard_settings.work_log_path, hard_settings.fmax_search_state_filename)
+
+
+def read_state(tmp_dir):
+  """
+  Load the fmax search state of a job directory. Returns a dict, or None when
+  there is none or it is unreadable.
+  """
+  path = state_file(tmp_dir)
+  if not os.path.isfile(path):
+    return None
+  try:
+    with open(path, "r") as f:
+      data = yaml.load(f, Loader=yaml.loader.SafeLoader)
+  except Exception:
+    return None
+  if not isinstance(data, dict):
+    return None
+  return data
+
+
+def write_state(tmp_dir, state):
+  """
+  Write the fmax search state of a job directory, the way find_fmax.tcl does:
+  to a temporary file first, so an interruption never leaves half a state.
+  """
+  path = state_file(tmp_dir)
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path + ".tmp", "w") as f:
+    yaml.dump(
+      {key: state.get(key) for key in STATE_KEYS if key in state},
+      f,
+      default_flow_style=False,
+      sort_keys=False,
+    )
+  os.replace(path + ".tmp", path)
+
+
+def _as_int(value):
+  try:
+    return int(value)
+  except (TypeError, ValueError):
+    return None
+
+
+def is_resumable_state(state, lower_bound, upper_bound):
+  """
+  Whether a state is that of an unfinished search a job given these bounds can
+  continue.
+  """
+  if not isinstance(state, dict) or _as_int(state.get("done")) != 0:
+    return False
+  runs = _as_int(state.get("runs"))
+  return (
+    _as_int(state.get("requested_lower_bound")) == _as_int(lower_bound)
+    and _as_int(state.get("requested_upper_bound")) == _as_int(upper_bound)
+    and runs is not None
+    and runs > 0
+  )
+
+
+def is_resumable(tmp_dir, lower_bound, upper_bound):
+  """
+  Whether a job directory holds an unfinished search a job given these bounds
+  can continue.
+  """
+  return is_resumable_state(read_state(tmp_dir), lower_bound, upper_bound)
@@ -0,0 +1,283 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Warm-started fmax search bounds.
+
+An fmax search bisects the interval it is given, so every halving of that
+interval is one synthesis less. The default bounds are wide on purpose (they
+have to hold for any design), while the results directory often already knows
+roughly where the answer is:
+
+  * the same configuration was searched before (a re-run with --overwrite, or
+    another flow of the same tool),
+  * neighbouring configurations of the same architecture were searched
+    ("16bits" and "32bits" say a lot about "24bits"),
+  * the same configuration was searched on another target.
+
+What lives here reads those records back (through odatix.lib.results_schema)
+and narrows the initial interval of a job around the predicted Fmax, with a
+safety margin that grows as the evidence gets weaker. A prediction is never
+trusted blindly: a warm-started job searches with "fmax_explore" enabled, so a
+search that ends up against one of the narrowed bounds widens it, up to the
+configured bounds and never past them, instead of reporting no MET / no
+VIOLATED frequency.
+"""
+
+import math
+import os
+import re
+
+import odatix.lib.hard_settings as hard_settings
+import odatix.lib.results_schema as results_schema
+
+FMAX_METRIC = "Fmax"
+
+# What a prediction is based on, from the strongest evidence to the weakest.
+# Each one widens the safety margin by its factor.
+BASIS_CONFIGURATION = "configuration"
+BASIS_NEIGHBOURS = "neighbouring configurations"
+BASIS_TARGETS = "other targets"
+
+MARGIN_FACTORS = {
+  BASIS_CONFIGURATION: 1,
+  BASIS_NEIGHBOURS: 2,
+  BASIS_TARGETS: 3,
+}
+
+# How many neighbouring configurations a prediction is interpolated from.
+NEIGHBOUR_COUNT = 2
+
+_number_pattern = re.compile(r"[0-9]+(?:\.[0-9]+)?")
+
+
+class Prediction:
+  """A predicted Fmax, and what it is based on."""
+
+  def __init__(self, fmax, basis, sources=None):
+    self.fmax = fmax
+    self.basis = basis
+    self.sources = list(sources) if sources else []
+
+  def __repr__(self):
+    return "Prediction(fmax={}, basis={!r}, sources={!r})".format(self.fmax, self.basis, self.sources)
+
+
+def results_file(result_path, tool):
+  """Path of the results file an fmax search of `tool` exports into."""
+  return os.path.join(str(result_path), "results_" + str(tool) + ".yml")
+
+
+def configuration_shape(configuration):
+  """
+  What a configuration name looks like once its numbers are taken out, and the
+  numbers themselves: "24bits+depth/8" -> ("#bits+depth/#", (24.0, 8.0)).
+
+  Two configurations of the same shape differ by their parameter values only,
+  which is what makes one a neighbour of the other.
+  """
+  configuration = str(configuration)
+  numbers = tuple(float(value) for value in _number_pattern.findall(configuration))
+  return _number_pattern.sub("#", configuration), numbers
+
+
+def _distance(numbers_a, numbers_b):
+  """
+  Distance between two parameter value vectors, on a log scale: parameter
+  values of hardware configurations tend to go by powers of two, and 8 -> 16
+  changes a design about as much as 32 -> 64.
+  """
+  return math.sqrt(sum(
+    (math.log2(1.0 + abs(a)) - math.log2(1.0 + abs(b))) ** 2
+    for a, b in zip(numbers_a, numbers_b)
+  ))
+
+
+def _fmax_of(record):
+  value = record.get("metrics", {}).get(FMAX_METRIC)
+  if isinstance(value, bool):
+    return None
+  try:
+    value = float(value)
+  except (TypeError, ValueError):
+    return None
+  return value if value > 0 else None
+
+
+class FmaxWarmStart:
+  """
+  Predicts the Fmax of a job from the fmax records of previous runs, and
+  narrows the bounds of its search around it.
+
+  Args:
+      records (list): v2 records, of any type (only fmax searches are used).
+      margin (int | float): safety margin around the prediction, in percent of
+          it, for the strongest evidence. Weaker evidence multiplies it (see
+          MARGIN_FACTORS).
+      flow (str, optional): flow of the run. Records of another flow of the
+          same tool are used when nothing closer is known.
+      min_width (int): narrowest interval a job is given, in MHz.
+  """
+
+  def __init__(self, records, margin=None, flow=None, min_width=None):
+    self.margin = float(hard_settings.fmax_warm_start_margin if margin is None else margin)
+    self.flow = flow or None
+    self.min_width = int(hard_settings.fmax_warm_start_min_width if min_width is None else min_width)
+    self.known = self._index(records)
+
+  @classmethod
+  def from_result_path(cls, result_path, tool, margin=None, flow=None, min_width=None):
+    """
+    Warm start from the results file of a tool. A missing or unreadable file
+    gives a warm start that knows nothing, rather than an error: predicting
+    bounds is an optimization, never a reason for a run to fail.
+    """
+    records = []
+    path = results_file(result_path, tool) if result_path else None
+    if path is not None and os.path.isfile(path):
+      try:
+        records = results_schema.load_results_file(path).records
+      except Exception:
+        records = []
+    return cls(records, margin=margin, flow=flow, min_width=min_width)
+
+  def _index(self, records):
+    """
+    {(target, architecture, configuration): Fmax} of the fmax searches the
+    records hold.
+
+    A flow split into steps exports one record per step, each step being a
+    search of its own; the first one is what the initial bounds of a job
+    govern. Records of the run's own flow win over the ones of another flow.
+    """
+    best = {}
+    for record in records or []:
+      if not isinstance(record, dict):
+        continue
+      meta = record.get("meta")
+      if not isinstance(meta, dict) or meta.get(results_schema.META_TYPE) != results_schema.TYPE_FMAX:
+        continue
+      fmax = _fmax_of(record)
+      if fmax is None:
+        continue
+      key = (
+        str(meta.get(results_schema.META_TARGET, "")),
+        str(meta.get(results_schema.META_ARCHITECTURE, "")),
+        str(meta.get(results_schema.META_CONFIGURATION, "")),
+      )
+      record_flow = meta.get(results_schema.META_FLOW)
+      other_flow = self.flow is not None and record_flow is not None and str(record_flow) != self.flow
+      try:
+        step_index = int(meta.get(results_schema.META_STEP_INDEX, 0))
+      except (TypeError, ValueError):
+        step_index = 0
+      rank = (1 if other_flow else 0, step_index)
+      if key not in best or rank < best[key][0]:
+        best[key] = (rank, fmax)
+    return {key: fmax for key, (rank, fmax) in best.items()}
+
+  def __len__(self):
+    return len(self.known)
+
+  def predict(self, target, architecture, configuration):
+    """
+    Predicted Fmax of a job, or None when nothing close enough is known.
+    """
+    target = str(target)
+    architecture = str(architecture)
+    configuration = str(configuration)
+
+    fmax = self.known.get((target, architecture, configuration))
+    if fmax is not None:
+      return Prediction(fmax, BASIS_CONFIGURATION, [configuration])
+
+    prediction = self._predict_from_neighbours(target, architecture, configuration)
+    if prediction is not None:
+      return prediction
+
+    other_targets = [
+      (known_target, fmax)
+      for (known_target, known_architecture, known_configuration), fmax in sorted(self.known.items())
+      if known_architecture == architecture and known_configuration == configuration and known_target != target
+    ]
+    if other_targets:
+      fmax = sum(fmax for _, fmax in other_targets) / len(other_targets)
+      return Prediction(fmax, BASIS_TARGETS, [known_target for known_target, _ in other_targets])
+    return None
+
+  def _predict_from_neighbours(self, target, architecture, configuration):
+    """
+    Inverse-distance weighted Fmax of the nearest configurations of the same
+    shape, on the same target. Between two neighbours on each side of the job,
+    that is an interpolation; past the last known one, the nearest ones weigh
+    the most.
+    """
+    shape, numbers = configuration_shape(configuration)
+    if not numbers:
+      return None
+
+    candidates = []
+    for (known_target, known_architecture, known_configuration), fmax in self.known.items():
+      if known_target != target or known_architecture != architecture:
+        continue
+      known_shape, known_numbers = configuration_shape(known_configuration)
+      if known_shape != shape or len(known_numbers) != len(numbers):
+        continue
+      distance = _distance(numbers, known_numbers)
+      if distance > 0:
+        candidates.append((distance, known_configuration, fmax))
+    if not candidates:
+      return None
+
+    candidates.sort()
+    nearest = candidates[:NEIGHBOUR_COUNT]
+    weights = [1.0 / distance for distance, _, _ in nearest]
+    fmax = sum(weight * fmax for weight, (_, _, fmax) in zip(weights, nearest)) / sum(weights)
+    return Prediction(fmax, BASIS_NEIGHBOURS, [known_configuration for _, known_configuration, _ in nearest])
+
+  def margin_of(self, prediction):
+    """Safety margin around a prediction, in MHz."""
+    return prediction.fmax * self.margin / 100.0 * MARGIN_FACTORS.get(prediction.basis, 1)
+
+  def narrow(self, target, architecture, configuration, lower_bound, upper_bound):
+    """
+    Bounds of a job's search, narrowed around its predicted Fmax.
+
+    The narrowed interval always stays inside the given one: those bounds are
+    what the user (or the architecture) asked for. A prediction falling outside
+    of them is ignored for the same reason.
+
+    Returns:
+        tuple: (lower_bound, upper_bound, prediction), prediction being None
+        (and the bounds unchanged) when nothing narrower can be said.
+    """
+    lower_bound = int(lower_bound)
+    upper_bound = int(upper_bound)
+    prediction = self.predict(target, architecture, configuration)
+    if prediction is None or not lower_bound <= prediction.fmax <= upper_bound:
+      return lower_bound, upper_bound, None
+
+    margin = max(self.margin_of(prediction), self.min_width / 2.0)
+    new_lower = max(lower_bound, int(math.floor(prediction.fmax - margin)))
+    new_upper = min(upper_bound, int(math.ceil(prediction.fmax + margin)))
+    if new_upper <= new_lower or (new_lower == lower_bound and new_upper == upper_bound):
+      return lower_bound, upper_bound, None
+    return new_lower, new_upper, prediction
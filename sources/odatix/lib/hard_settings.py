@@ -49,8 +49,13 @@ fmax_status_filename = "status.log"
 sim_progress_filename = "progress.log"
 synth_status_filename = "synth_status.log"
 frequency_search_filename = "frequency_search.log"
+fmax_search_state_filename = "fmax_search.yml"
+fmax_bracketing_filename = "fmax_bracketing.log"
 param_domains_filename = "param_domains.yml"
 pnr_source_filename = "pnr.yml"
+# What the processes of a job used, sampled by the daemon (see
+# lib/parallel_job_handler/resource_usage.py), in its log directory.
+resource_usage_filename = "resource_usage.yml"
 
 # Where a simulation/workflow writes its progress, relative to the job's work
 # directory. Makefiles write it into the log directory they are handed, so the
@@ -86,6 +91,17 @@ default_fmax_lower_bound = 1  # in MHz
 default_fmax_upper_bound = 1000  # in MHz
 default_custom_freq_list = [50, 100]  # in MHz
 
+# Warm-started fmax search (see lib/fmax_warm_start.py)
+fmax_warm_start_margin = 15  # in percent of the predicted Fmax
+fmax_warm_start_min_width = 20  # in MHz
+
+# Parallel fmax probing (see lib/parallel_job_handler/fmax_probing.py)
+fmax_probe_path = "probes"
+fmax_max_probes = 4  # per job and per round
+
+# Low-effort bracketing of fmax searches (see "fmax_bracketing" in lib/eda_tools.py)
+default_fmax_full_effort_runs = 3
+
 # GUI
 max_preview_values = 500
 
@@ -103,6 +119,42 @@ daemon_state_suffix = ".json"
 daemon_log_prefix = "daemon."
 daemon_log_suffix = ".log"
 daemon_log_enabled_default = False
+# Journal of the jobs of a session, to recover them when it dies (see
+# lib/parallel_job_handler/job_journal.py).
+daemon_journal_file = "journal.sqlite"
+daemon_journal_prefix = "journal."
+daemon_journal_suffix = ".sqlite"
+daemon_socket_file = "api.sock"
+daemon_socket_prefix = "api."
+daemon_socket_suffix = ".sock"
+daemon_enqueue_chunk_size = 500
+# Retired jobs a daemon keeps whole; older ones are compacted, their logs moved
+# next to the state file (see ParallelJobHandler._compact_retired_jobs_unlocked).
+daemon_retired_jobs_kept = 200
+daemon_retired_logs_suffix = ".logs"
+# Registry of the job slots shared by the sessions of a host, in the temporary
+# directory of the host (see lib/parallel_job_handler/slot_broker.py).
+host_slots_dirname = "odatix_host_slots"
+# Registry of the daemons running on a host, in its temporary directory (see
+# lib/parallel_job_handler/daemon_registry.py).
+daemon_registry_dirname = "odatix_daemons"
+# How many times a job that ran out of memory is put back in the queue with a
+# higher limit (see lib/parallel_job_handler/memory_limits.py).
+oom_max_requeues = 2
+# Wall times of the jobs of a workspace, at its root (see
+# lib/parallel_job_handler/runtime_history.py). Not in the daemon state
+# directory: that one goes away with the last session.
+runtime_history_filename = ".odatix_runtime_history.json"
+# Decisions of the autoscaler of nb_jobs, at the root of the workspace too (see
+# lib/parallel_job_handler/autoscaler.py).
+autoscaler_log_filename = ".odatix_autoscaler.jsonl"
+# Traces of the jobs of the daemon sessions, one per session, at the root of the
+# workspace too: they are read after the session ended (see
+# lib/parallel_job_handler/job_trace.py).
+daemon_trace_dirname = ".odatix_traces"
+daemon_trace_file = "trace.json"
+daemon_trace_prefix = "trace."
+daemon_trace_suffix = ".json"
 
 # Tools are no longer hard-coded: the list of supported eda tools is discovered
 # at runtime by scanning the user tools directory and the built-in one (see
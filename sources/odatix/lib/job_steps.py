@@ -42,8 +42,13 @@ The state is a small YAML file in the job's log directory:
     completed:
       - name: synthesis
         timestamp: 2026-07-28_19-04-37
+        seconds: 812.0
       - name: pnr
         timestamp: 2026-07-28_19-31-02
+        seconds: 1585.0
+
+"seconds" is the wall time of the step, added by the job handler once the run
+is over (see record_step_seconds): the result exporters read it back.
 
 Only a *leading* run of completed steps counts as resumable: if the recorded
 steps no longer match the flow (the tool.yml changed), the job restarts from the
@@ -51,11 +56,16 @@ first mismatch, which is the safe reading.
 """
 
 import os
+import time
+from datetime import datetime
 
 import yaml
 
 import odatix.lib.hard_settings as hard_settings
 
+# Format of the timestamps of the state file (that of get_timestamp_string).
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
 
 def state_file(tmp_dir):
   """Path of the step state file of a job directory."""
@@ -65,8 +75,8 @@ def state_file(tmp_dir):
 def read_state(tmp_dir):
   """
   Load the step state of a job directory. Returns {"flow": str|None,
-  "completed": [{"name", "timestamp"}]}, empty when there is none or it is
-  unreadable.
+  "completed": [{"name", "timestamp", "seconds"}]}, empty when there is none or
+  it is unreadable. "seconds" is None when the wall time of a step is unknown.
   """
   path = state_file(tmp_dir)
   empty = {"flow": None, "completed": []}
@@ -83,9 +93,12 @@ def read_state(tmp_dir):
   completed = []
   for entry in data.get("completed") or []:
     if isinstance(entry, dict) and isinstance(entry.get("name"), str):
-      completed.append({"name": entry["name"], "timestamp": entry.get("timestamp")})
+      seconds = entry.get("seconds")
+      if isinstance(seconds, bool) or not isinstance(seconds, (int, float)):
+        seconds = None
+      completed.append({"name": entry["name"], "timestamp": entry.get("timestamp"), "seconds": seconds})
     elif isinstance(entry, str):
-      completed.append({"name": entry, "timestamp": None})
+      completed.append({"name": entry, "timestamp": None, "seconds": None})
   flow = data.get("flow")
   return {"flow": flow if isinstance(flow, str) else None, "completed": completed}
 
@@ -116,19 +129,70 @@ def record_completed_step(tmp_dir, step_name, flow=None, timestamp=None):
   if step_name in names:
     completed = state["completed"][: names.index(step_name)]
 
-  completed.append({"name": str(step_name), "timestamp": timestamp or get_timestamp_string()})
+  completed.append({"name": str(step_name), "timestamp": timestamp or get_timestamp_string(), "seconds": None})
+  _write_state(tmp_dir, flow if flow is not None else state["flow"], completed)
 
+
+def _write_state(tmp_dir, flow, completed):
   path = state_file(tmp_dir)
   os.makedirs(os.path.dirname(path), exist_ok=True)
   with open(path, "w") as f:
     yaml.dump(
-      {"flow": flow if flow is not None else state["flow"], "completed": completed},
+      {
+        "flow": flow,
+        # A step of unknown wall time has no "seconds" at all.
+        "completed": [{key: value for key, value in entry.items() if key != "seconds" or value is not None} for entry in completed],
+      },
       f,
       default_flow_style=False,
       sort_keys=False,
     )
 
 
+def record_step_seconds(tmp_dir, durations):
+  """
+  Add their wall time to the completed steps of a job directory, from
+  [(name, seconds)] (see step_durations). Steps the state does not hold are
+  ignored.
+  """
+  durations = dict(durations)
+  state = read_state(tmp_dir)
+  changed = False
+  for entry in state["completed"]:
+    if entry["name"] in durations:
+      entry["seconds"] = round(float(durations[entry["name"]]), 1)
+      changed = True
+  if changed:
+    _write_state(tmp_dir, state["flow"], state["completed"])
+
+
+def step_seconds(tmp_dir):
+  """Wall time of the completed steps of a job directory whose wall time is known, as {name: seconds}."""
+  return {entry["name"]: entry["seconds"] for entry in read_state(tmp_dir)["completed"] if entry["seconds"] is not None}
+
+
+def step_durations(tmp_dir, since):
+  """
+  Wall time of the steps a job directory completed since `since` (an epoch
+  time, when the run started), as [(name, seconds)] in order. Each step is
+  timed from the end of the one before it, the first one from `since`; steps of
+  an earlier run, and entries without a readable timestamp, are left out.
+  """
+  durations = []
+  previous = float(since)
+  for entry in read_state(tmp_dir)["completed"]:
+    try:
+      ended = time.mktime(datetime.strptime(str(entry["timestamp"]), TIMESTAMP_FORMAT).timetuple())
+    except (TypeError, ValueError, OverflowError):
+      continue
+    # The timestamps have a one-second resolution.
+    if ended < float(since) - 1:
+      continue
+    durations.append((entry["name"], max(0.0, ended - previous)))
+    previous = max(previous, ended)
+  return durations
+
+
 def resume_index(tmp_dir, step_names):
   """
   Number of leading steps of `step_names` a job directory has already completed,
@@ -29,16 +29,41 @@ Protocol overview
 REST endpoints expose command-style operations and snapshots.
 WebSocket /ws pushes periodic snapshots and accepts command messages.
 
+POST /jobs/enqueue takes its jobs as "jobs" (job payloads) or as "arrays" (job
+arrays, see job_array).
+
+Large batches of jobs are enqueued in chunks: POST /jobs/enqueue with
+"batch": {"id": <client-chosen id>, "offset": <index of its first job>,
+"total": <jobs in the batch>}. A chunk sent again only adds the jobs not
+received yet, and GET /jobs/enqueue/<id> tells how many were, to resume from.
+
+Snapshots carry a state version and its epoch (handler.state_version and
+handler.state_epoch). /status?since=<version>&epoch=<epoch> and /jobs (same
+query) return only the jobs that changed after that version, with "delta" set
+(see ParallelJobHandler.snapshot). After its first full snapshot, /ws pushes
+such deltas, each one since the previous push.
+
 WebSocket client->server messages (JSON):
 - {"type": "snapshot"}  -> server replies with a snapshot immediately
+- {"type": "snapshot", "since": 42, "epoch": "..."}  -> the same, as a delta
 - {"type": "command", "name": "select|pause|start|kill|open|theme_next|shutdown", "job_id": 0}
 - {"type": "logs", "name": "scroll|home|end", "job_id": 0, "delta": -3}
 - {"type": "set", "logs_height": 60}
+- {"type": "subscribe_logs", "job_id": 0, "from_seq": 0}  -> stream the log of a job
+- {"type": "unsubscribe_logs", "job_id": 0}
 
 Server->client messages (JSON):
-- {"type": "snapshot", "data": <handler.snapshot()>}
+- {"type": "snapshot", "data": <handler.snapshot()>}  (data["delta"] for a delta)
+- {"type": "logs", "job_id": 0, "from_seq": 0, "next_seq": 12, "lines": [...], "rewrites": [...]}
+  (see log_stream)
 - {"type": "error", "message": "..."}
 
+A client that only follows logs connects to /ws?snapshots=false: it gets no
+snapshot unless it asks for one.
+
+GET /metrics serves the health figures of the handler in the Prometheus text
+format (see metrics).
+
 """
 
 import asyncio
@@ -48,8 +73,13 @@ from typing import Any, Dict, Optional, Set
 
 from odatix.lib.parallel_job_handler.serialization import payload_to_job
 from odatix.lib.parallel_job_handler.job import ParallelJob
+from odatix.lib.parallel_job_handler.job_array import JobArray, array_size
+from odatix.lib.parallel_job_handler.log_stream import PUSH_INTERVAL, LogSubscription
 import odatix.lib.hard_settings as hard_settings
 
+# Version 0.0.4 of the text format of Prometheus.
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
 
 def _null_uvicorn_log_config() -> Dict[str, Any]:
     # Uvicorn config accepts standard logging.dictConfig dictionaries.
@@ -69,6 +99,13 @@ def _null_uvicorn_log_config() -> Dict[str, Any]:
     }
 
 
+def _optional_int(value):
+    try:
+        return None if value is None else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 def _require_fastapi():
     try:
         fastapi = importlib.import_module("fastapi")
@@ -109,12 +146,17 @@ def create_parallel_job_app(
             return False
 
     async def broadcaster():
+        last_version = None
         while True:
             await asyncio.sleep(float(ws_push_interval))
             if not connections:
+                last_version = None
                 continue
-            # Keep periodic broadcasts lightweight (no logs).
-            data = handler.snapshot(logs_job_id=-1)
+            # Keep periodic broadcasts lightweight (no logs, and only the jobs
+            # that changed since the last one). A client connecting in between
+            # got a full snapshot, taken after the last broadcast.
+            data = handler.snapshot(logs_job_id=-1, since=last_version)
+            last_version = data["handler"]["state_version"]
             payload = {"type": "snapshot", "data": data}
             dead: Set[Any] = set()
             for ws in list(connections):
@@ -142,20 +184,34 @@ def create_parallel_job_app(
         else:
             handler.terminate_all_jobs()
 
+    @app.get("/ping")
+    async def ping():
+        # Liveness probe of list_daemons: answered without the lock of the handler.
+        return {"ok": True}
+
+    @app.get("/metrics")
+    async def get_metrics():
+        responses = importlib.import_module("fastapi.responses")
+        return responses.PlainTextResponse(handler.metrics_text(), media_type=METRICS_MEDIA_TYPE)
+
     @app.get("/status")
     async def get_status(
         logs_job_id: Optional[int] = None,
         logs_offset: Optional[int] = None,
         logs_limit: Optional[int] = None,
+        since: Optional[int] = None,
+        epoch: Optional[str] = None,
     ):
         # Keep /status lightweight by default (no logs).
         if logs_job_id is None:
             logs_job_id = -1
-        return handler.snapshot(logs_job_id=logs_job_id, logs_offset=logs_offset, logs_limit=logs_limit)
+        return handler.snapshot(
+            logs_job_id=logs_job_id, logs_offset=logs_offset, logs_limit=logs_limit, since=since, epoch=epoch
+        )
 
     @app.get("/jobs")
-    async def list_jobs():
-        snap = handler.snapshot(logs_job_id=-1)  # keep logs null
+    async def list_jobs(since: Optional[int] = None, epoch: Optional[str] = None):
+        snap = handler.snapshot(logs_job_id=-1, since=since, epoch=epoch)  # keep logs null
         snap["logs"] = None
         return snap
 
@@ -188,8 +244,10 @@ def create_parallel_job_app(
         handler.enqueue_command("open", job_id=job_id)
         return _ok("open requested", job_id=job_id)
 
+    # Not a coroutine: FastAPI runs it in its thread pool, so that a chunk of
+    # jobs being added does not hold up the other requests and /ws pushes.
     @app.post("/jobs/enqueue")
-    async def enqueue_jobs(payload: Dict[str, Any]):
+    def enqueue_jobs(payload: Dict[str, Any]):
         if not isinstance(payload, dict):
             raise ValueError("payload must be a JSON object")
 
@@ -201,6 +259,8 @@ def create_parallel_job_app(
                 auto_exit=options.get("auto_exit"),
                 log_size_limit=options.get("log_size_limit"),
                 format_yaml=options.get("format_yaml"),
+                queue_policy=options.get("queue_policy"),
+                memory_limit_gb=options.get("memory_limit_gb"),
             )
 
             progress_pattern = options.get("progress_pattern")
@@ -214,19 +274,58 @@ def create_parallel_job_app(
                     # Keep daemon alive even if a malformed pattern is sent.
                     pass
 
-        jobs_data = payload.get("jobs")
-        if not isinstance(jobs_data, list):
-            raise ValueError("'jobs' must be a list")
+        log_size_limit = getattr(handler, "log_size_limit", 200)
+        arrays = payload.get("arrays")
+        if arrays is not None:
+            # Job arrays (see job_array): their jobs are built only when they
+            # are dispatched.
+            if not isinstance(arrays, list) or not all(isinstance(array, dict) and isinstance(array.get("template"), dict) for array in arrays):
+                raise ValueError("'arrays' must be a list of job arrays")
+            jobs_data = arrays
+            nb_jobs = sum(array_size(array) for array in arrays)
+
+            def make_job(array):
+                return JobArray(array, default_log_size_limit=log_size_limit)
+        else:
+            jobs_data = payload.get("jobs")
+            if not isinstance(jobs_data, list):
+                raise ValueError("'jobs' must be a list")
+
+            for item in jobs_data:
+                if not isinstance(item, dict):
+                    raise ValueError("each job entry must be a JSON object")
+
+            nb_jobs = len(jobs_data)
+
+            def make_job(item):
+                return payload_to_job(item, default_log_size_limit=log_size_limit)
+
+        batch = payload.get("batch")
+        if isinstance(batch, dict):
+            progress = handler.enqueue_chunk(
+                batch_id=str(batch.get("id")),
+                offset=int(batch.get("offset", 0)),
+                total=int(batch.get("total", nb_jobs)),
+                items=jobs_data,
+                make_job=make_job,
+            )
+            return _ok("jobs enqueued", **progress)
 
-        added = 0
         for item in jobs_data:
-            if not isinstance(item, dict):
-                raise ValueError("each job entry must be a JSON object")
-            job = payload_to_job(item, default_log_size_limit=getattr(handler, "log_size_limit", 200))
-            handler.add_job(job)
-            added += 1
+            job = make_job(item)
+            if isinstance(job, JobArray):
+                handler.add_job_array(job)
+            else:
+                handler.add_job(job)
+
+        return _ok("jobs enqueued", added=nb_jobs, total_jobs=len(handler.job_list))
 
-        return _ok("jobs enqueued", added=added, total_jobs=len(handler.job_list))
+    @app.get("/jobs/enqueue/{batch_id}")
+    async def get_enqueue_progress(batch_id: str):
+        progress = handler.enqueue_progress(batch_id)
+        if progress is None:
+            return JSONResponse(status_code=404, content={"ok": False, "error": "unknown batch: {}".format(batch_id)})
+        return _ok("enqueue progress", **progress)
 
     @app.post("/config")
     async def set_config(
@@ -234,19 +333,124 @@ def create_parallel_job_app(
         process_group: Optional[bool] = None,
         auto_exit: Optional[bool] = None,
         log_size_limit: Optional[int] = None,
+        queue_policy: Optional[str] = None,
+        memory_limit_gb: Optional[float] = None,
     ):
         """Update runtime scheduling options on the fly (e.g. max parallel jobs).
 
         Parameters are passed as query args; any omitted value is left unchanged.
-        Changing nb_jobs immediately fills or frees running slots.
+        Changing nb_jobs immediately fills or frees running slots. queue_policy
+        ("lpt", "spt" or "fifo") reorders the queue. memory_limit_gb is the
+        memory limit of the jobs that declare none (0 for no limit).
         """
         handler.configure_runtime(
             nb_jobs=nb_jobs,
             process_group=process_group,
             auto_exit=auto_exit,
             log_size_limit=log_size_limit,
+            queue_policy=queue_policy,
+            memory_limit_gb=memory_limit_gb,
         )
-        return _ok("config updated", nb_jobs=int(handler.nb_jobs))
+        return _ok(
+            "config updated",
+            nb_jobs=int(handler.nb_jobs),
+            queue_policy=handler.queue_policy,
+            memory_limit_gb=handler.memory_limit_gb,
+        )
+
+    @app.get("/config/resources")
+    async def get_resources():
+        """Resource budget jobs are admitted against: detected, limits set, total and used."""
+        return handler.resources_status()
+
+    @app.post("/config/resources")
+    async def set_resources(payload: Dict[str, Any]):
+        """Set the limits of some resources of the budget.
+
+        The body maps resource names to amounts, e.g. {"memory_gb": 64,
+        "scratch_gb": 200}. null goes back to the amount detected on the host (or
+        removes the limit of a resource of your own). Queued jobs that now fit
+        start immediately.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("payload must be a JSON object")
+        handler.configure_runtime(resources=payload)
+        return _ok("resources updated", resources=handler.resources_status())
+
+    @app.get("/config/licenses")
+    async def get_licenses():
+        """License token pools: size, tokens used and jobs waiting, per pool."""
+        return handler.licenses_status()
+
+    @app.post("/config/licenses")
+    async def set_licenses(payload: Dict[str, Any]):
+        """Set the size of some license pools, e.g. {"dc_shell": 2}.
+
+        null goes back to the size the jobs declare (see "licenses" in tool.yml).
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("payload must be a JSON object")
+        handler.configure_runtime(licenses=payload)
+        return _ok("licenses updated", licenses=handler.licenses_status())
+
+    @app.get("/config/autoscale")
+    async def get_autoscale():
+        """Autoscaler of nb_jobs: bounds and last decision, or null when disabled."""
+        return {"autoscaler": handler.autoscaler_status()}
+
+    @app.post("/config/autoscale")
+    async def set_autoscale(payload: Dict[str, Any]):
+        """Enable, update or disable the autoscaler of nb_jobs.
+
+        The body is {"min_jobs": 2, "max_jobs": 16} (an omitted bound keeps its
+        value, or the current nb_jobs), {"enabled": false} disables it. "interval"
+        sets how often the host is sampled, in seconds.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("payload must be a JSON object")
+        autoscaler = handler.configure_autoscaler(
+            min_jobs=payload.get("min_jobs"),
+            max_jobs=payload.get("max_jobs"),
+            enabled=payload.get("enabled", True) is not False,
+            interval=payload.get("interval"),
+        )
+        return _ok("autoscaler updated" if autoscaler is not None else "autoscaler disabled", autoscaler=autoscaler)
+
+    @app.get("/config/host_slots")
+    async def get_host_slots():
+        """Job slots shared by the sessions of the host: capacity, policy and sessions."""
+        broker = handler.slot_broker
+        status = broker.status() if broker is not None else None
+        return {"session": handler.host_slots_status(), "host": status}
+
+    @app.post("/config/host_slots")
+    async def set_host_slots(payload: Dict[str, Any]):
+        """Set the weight of this session in the host-wide slots, e.g. {"weight": 2}."""
+        if not isinstance(payload, dict):
+            raise ValueError("payload must be a JSON object")
+        session = handler.configure_host_slots(weight=payload.get("weight"))
+        return _ok("host slots updated", session=session)
+
+    @app.get("/config/cpu_pinning")
+    async def get_cpu_pinning():
+        """Cores of the session and how many running jobs hold, or null when pinning is off."""
+        return {"cpu_pinning": handler.cpu_pinning_status()}
+
+    @app.post("/config/cpu_pinning")
+    async def set_cpu_pinning(payload: Dict[str, Any]):
+        """Enable or disable the pinning of jobs to cores of their own.
+
+        The body is {"cpus": "0-15"} to pin jobs to some cores only (an omitted
+        "cpus" keeps the current ones, or takes all of them), {"enabled": false}
+        disables it. Running jobs keep their cores.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("payload must be a JSON object")
+        pinning = handler.configure_cpu_pinning(
+            enabled=payload.get("enabled", True) is not False,
+            cpus=payload.get("cpus"),
+        )
+        return _ok("cpu pinning updated" if pinning is not None else "cpu pinning disabled", cpu_pinning=pinning)
 
     @app.post("/shutdown")
     async def shutdown():
@@ -259,13 +463,34 @@ def create_parallel_job_app(
             shutdown_callback()
         return _ok("shutdown requested")
 
+    # FastAPI tells the WebSocket parameter by its annotation (with Any, it
+    # takes it for a query parameter and rejects every connection).
     @app.websocket("/ws")
-    async def ws_endpoint(ws: Any):
+    async def ws_endpoint(ws: WebSocket):
         await ws.accept()
-        connections.add(ws)
+        snapshots = str(ws.query_params.get("snapshots", "true")).lower() not in ("0", "false", "no")
+        if snapshots:
+            connections.add(ws)
+            # Send initial state
+            await ws.send_json({"type": "snapshot", "data": handler.snapshot(logs_job_id=-1)})
+
+        subscriptions: Dict[int, LogSubscription] = {}
+        log_pusher: Optional[asyncio.Task] = None
 
-        # Send initial state
-        await ws.send_json({"type": "snapshot", "data": handler.snapshot(logs_job_id=-1)})
+        async def push_logs(subscription: LogSubscription):
+            message = subscription.poll(handler)
+            if message is not None:
+                await ws.send_json(message)
+
+        async def log_pusher_loop():
+            try:
+                while True:
+                    await asyncio.sleep(PUSH_INTERVAL)
+                    for subscription in list(subscriptions.values()):
+                        await push_logs(subscription)
+            except Exception:
+                # The connection is gone: the receive loop ends it.
+                return
 
         try:
             while True:
@@ -276,7 +501,8 @@ def create_parallel_job_app(
                 msg_type = msg.get("type")
 
                 if msg_type == "snapshot":
-                    await ws.send_json({"type": "snapshot", "data": handler.snapshot(logs_job_id=-1)})
+                    data = handler.snapshot(logs_job_id=-1, since=_optional_int(msg.get("since")), epoch=msg.get("epoch"))
+                    await ws.send_json({"type": "snapshot", "data": data})
                     continue
 
                 if msg_type == "command":
@@ -294,6 +520,23 @@ def create_parallel_job_app(
                     await ws.send_json({"type": "snapshot", "data": handler.snapshot(logs_job_id=-1)})
                     continue
 
+                if msg_type == "subscribe_logs":
+                    job_id = _optional_int(msg.get("job_id"))
+                    if job_id is None or handler.log_since(job_id) is None:
+                        await ws.send_json({"type": "error", "message": "unknown job: {}".format(msg.get("job_id"))})
+                        continue
+                    subscription = LogSubscription(job_id, _optional_int(msg.get("from_seq")) or 0)
+                    subscriptions[job_id] = subscription
+                    # What the log already holds goes out right away.
+                    await push_logs(subscription)
+                    if log_pusher is None:
+                        log_pusher = asyncio.create_task(log_pusher_loop())
+                    continue
+
+                if msg_type == "unsubscribe_logs":
+                    subscriptions.pop(_optional_int(msg.get("job_id")), None)
+                    continue
+
         except WebSocketDisconnect:
             connections.discard(ws)
         except Exception as e:
@@ -302,6 +545,9 @@ def create_parallel_job_app(
                 await ws.close()
             except Exception:
                 pass
+        finally:
+            if log_pusher is not None:
+                log_pusher.cancel()
 
     # Basic exception wrapper for REST (keeps errors JSON)
     @app.exception_handler(Exception)
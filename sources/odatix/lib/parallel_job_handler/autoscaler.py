@@ -0,0 +1,262 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Host-load-aware autoscaling of the number of parallel jobs.
+
+`nb_jobs` is set once, when the session starts ("auto" only reads the number of
+CPUs). On a shared compute server, the right value moves during the night: other
+users start and stop their own work. A session may therefore scale its number
+of parallel jobs between bounds, from what it samples of the host every
+`interval` seconds:
+
+  * the load average over the last minute, per core,
+  * the memory available (MemAvailable of /proc/meminfo),
+  * the swap activity (pages swapped in and out, from /proc/vmstat).
+
+It lowers nb_jobs by one when the host swaps, runs short of memory or is
+overloaded, and raises it by one when the host has room to spare, jobs are
+waiting and every slot is taken. Running jobs are never killed: lowering nb_jobs
+only holds queued jobs back until enough running ones finish. The load average
+lags behind the jobs that start and stop, so decisions taken on the load wait
+`settle` seconds after the last change; swapping and memory shortage lower
+nb_jobs right away.
+
+Every decision that changes nb_jobs, and every change of reason to hold it, is
+appended to a JSON lines file at the root of the workspace
+(.odatix_autoscaler.jsonl), with the sample it was taken on, for later tuning.
+"""
+
+import json
+import os
+import sys
+import time
+
+import odatix.lib.hard_settings as hard_settings
+from odatix.lib.parallel_job_handler.resources import CORES, detect_host_budget
+
+# Load average per core above which the host is overloaded, and below which it
+# has room for one more job.
+HIGH_LOAD = 1.0
+LOW_LOAD = 0.75
+
+# Memory kept free for the rest of the host: a fraction of the total, at least
+# MIN_MEMORY_RESERVE_GB.
+MEMORY_RESERVE = 0.1
+MIN_MEMORY_RESERVE_GB = 1.0
+
+# Pages swapped in and out per second above which the host is swapping.
+SWAP_PAGES_PER_S = 50.0
+
+DEFAULT_INTERVAL = 30.0
+DEFAULT_SETTLE = 120.0
+
+ACTION_RAISE = "raise"
+ACTION_LOWER = "lower"
+ACTION_HOLD = "hold"
+
+
+def log_file(workspace_root):
+    """Path of the autoscaler log of a workspace."""
+    return os.path.join(str(workspace_root), hard_settings.autoscaler_log_filename)
+
+
+def _read_proc_values(path, names):
+    """Values of some entries of a /proc file of "name value" lines, as {name: int}."""
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                parts = line.replace(":", " ").split()
+                if len(parts) >= 2 and parts[0] in names:
+                    values[parts[0]] = int(parts[1])
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+class HostSample:
+    """What the autoscaler sampled of the host. Values it could not read are None."""
+
+    def __init__(self, load1, cores, memory_total_gb=None, memory_available_gb=None, swapped_pages=None, time_=None):
+        self.load1 = load1
+        self.cores = int(cores or 1)
+        self.memory_total_gb = memory_total_gb
+        self.memory_available_gb = memory_available_gb
+        self.swapped_pages = swapped_pages
+        self.time = time.time() if time_ is None else time_
+        # Set from the previous sample (see sample_host).
+        self.swap_pages_per_s = None
+
+    def to_dict(self):
+        return {
+            "load1": None if self.load1 is None else round(self.load1, 2),
+            "cores": self.cores,
+            "memory_total_gb": self.memory_total_gb,
+            "memory_available_gb": self.memory_available_gb,
+            "swap_pages_per_s": None if self.swap_pages_per_s is None else round(self.swap_pages_per_s, 1),
+        }
+
+
+def sample_host(previous=None, meminfo="/proc/meminfo", vmstat="/proc/vmstat"):
+    """Sample the host; the swap activity is measured since the `previous` sample."""
+    try:
+        load1 = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        load1 = None
+
+    memory = _read_proc_values(meminfo, ("MemTotal", "MemAvailable")) if sys.platform != "win32" else {}
+    swap = _read_proc_values(vmstat, ("pswpin", "pswpout")) if sys.platform != "win32" else {}
+
+    def gb(name):
+        return round(memory[name] / (1024.0 * 1024.0), 2) if name in memory else None
+
+    sample = HostSample(
+        load1=load1,
+        cores=detect_host_budget()[CORES],
+        memory_total_gb=gb("MemTotal"),
+        memory_available_gb=gb("MemAvailable"),
+        swapped_pages=sum(swap.values()) if len(swap) == 2 else None,
+    )
+    if previous is not None and previous.swapped_pages is not None and sample.swapped_pages is not None:
+        elapsed = sample.time - previous.time
+        if elapsed > 0:
+            sample.swap_pages_per_s = max(0, sample.swapped_pages - previous.swapped_pages) / elapsed
+    return sample
+
+
+class Autoscaler:
+    """
+    Scales the nb_jobs of a handler within [min_jobs, max_jobs] (see the module
+    docstring). `tick` is called by the handler on each of its ticks.
+    """
+
+    def __init__(self, min_jobs, max_jobs, interval=DEFAULT_INTERVAL, settle=DEFAULT_SETTLE, log_path=None, sampler=sample_host):
+        self.min_jobs = max(1, int(min_jobs))
+        self.max_jobs = max(self.min_jobs, int(max_jobs))
+        self.interval = max(1.0, float(interval))
+        self.settle = max(0.0, float(settle))
+        self.log_path = log_path
+        self.sampler = sampler
+        self.last_sample = None
+        self.last_decision = None
+        self._last_change = None
+        self._last_logged_reason = None
+
+    def memory_reserve_gb(self, sample):
+        if sample.memory_total_gb is None:
+            return MIN_MEMORY_RESERVE_GB
+        return max(MIN_MEMORY_RESERVE_GB, sample.memory_total_gb * MEMORY_RESERVE)
+
+    def decide(self, nb_jobs, sample, queued, slots_full, now):
+        """
+        The nb_jobs to run next, as (action, target, reason), from a sample of
+        the host, the number of queued jobs and whether every slot is taken.
+        """
+        if nb_jobs < self.min_jobs:
+            return ACTION_RAISE, self.min_jobs, "below the minimum"
+        if nb_jobs > self.max_jobs:
+            return ACTION_LOWER, self.max_jobs, "above the maximum"
+
+        reserve = self.memory_reserve_gb(sample)
+        settled = self._last_change is None or now - self._last_change >= self.settle
+
+        if sample.swap_pages_per_s is not None and sample.swap_pages_per_s > SWAP_PAGES_PER_S:
+            pressure = "swapping ({:.0f} pages/s)".format(sample.swap_pages_per_s)
+        elif sample.memory_available_gb is not None and sample.memory_available_gb < reserve:
+            pressure = "low memory ({:.1f} GB available)".format(sample.memory_available_gb)
+        elif sample.load1 is not None and sample.load1 > sample.cores * HIGH_LOAD and settled:
+            pressure = "overloaded (load {:.1f} on {} cores)".format(sample.load1, sample.cores)
+        else:
+            pressure = None
+        if pressure is not None:
+            if nb_jobs > self.min_jobs:
+                return ACTION_LOWER, nb_jobs - 1, pressure
+            return ACTION_HOLD, nb_jobs, pressure + ", at the minimum"
+
+        if sample.load1 is None:
+            return ACTION_HOLD, nb_jobs, "load average not available"
+        if nb_jobs >= self.max_jobs:
+            return ACTION_HOLD, nb_jobs, "at the maximum"
+        if not queued or not slots_full:
+            return ACTION_HOLD, nb_jobs, "no job waiting for a slot"
+        if not settled:
+            return ACTION_HOLD, nb_jobs, "settling after the last change"
+        if sample.load1 >= sample.cores * LOW_LOAD:
+            return ACTION_HOLD, nb_jobs, "busy (load {:.1f} on {} cores)".format(sample.load1, sample.cores)
+        if sample.memory_available_gb is not None and sample.memory_available_gb < 2 * reserve:
+            return ACTION_HOLD, nb_jobs, "memory tight ({:.1f} GB available)".format(sample.memory_available_gb)
+        return ACTION_RAISE, nb_jobs + 1, "room to spare (load {:.1f} on {} cores)".format(sample.load1, sample.cores)
+
+    def tick(self, handler, now=None):
+        """Sample the host and apply a decision, once every `interval` seconds."""
+        now = time.time() if now is None else now
+        if self.last_sample is not None and now - self.last_sample.time < self.interval:
+            return None
+        sample = self.sampler(self.last_sample)
+        sample.time = now
+        self.last_sample = sample
+
+        nb_jobs = int(handler.nb_jobs)
+        queued = int(handler._queued_count_unlocked())
+        slots_full = handler._running_units_unlocked() >= nb_jobs
+        action, target, reason = self.decide(nb_jobs, sample, queued, slots_full, now)
+        if target != nb_jobs:
+            handler.set_nb_jobs(target)
+            self._last_change = now
+
+        self.last_decision = {
+            "time": int(now),
+            "action": action,
+            "nb_jobs": nb_jobs,
+            "target": target,
+            "reason": reason,
+            "running": len(handler.running_job_list),
+            "queued": queued,
+            "sample": sample.to_dict(),
+        }
+        # Holding for the same reason again is not worth a line (the figures
+        # in parentheses change on every sample).
+        reason_kind = reason.split(" (")[0]
+        if action != ACTION_HOLD or reason_kind != self._last_logged_reason:
+            self._log(self.last_decision)
+            self._last_logged_reason = reason_kind
+        return self.last_decision
+
+    def _log(self, decision):
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(decision, sort_keys=True) + "\n")
+        except OSError:
+            # Tuning data, not worth stopping a session for.
+            pass
+
+    def to_dict(self):
+        return {
+            "min_jobs": self.min_jobs,
+            "max_jobs": self.max_jobs,
+            "interval": self.interval,
+            "settle": self.settle,
+            "log_file": self.log_path,
+            "last_decision": self.last_decision,
+        }
@@ -0,0 +1,175 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Disjoint sets of cores for the jobs of a session.
+
+EDA tools size their thread pools on the cores they see (Vivado maxThreads,
+Genus max_cpus_per_server...): nb_jobs jobs each starting a pool as large as the
+host fight over the same cores, and stall on each other's caches. With pinning
+on, each running unit (a job, or a probe of an fmax search) gets cores of its
+own: the "cores" of its cost when it declares some (see resources), its share of
+the cores (cores // nb_jobs) otherwise, in one contiguous block when there is
+one. Its processes are bound to them (sched_setaffinity, which their children
+inherit), and find them in their environment:
+
+    ODATIX_NB_THREADS   how many cores the job has
+    ODATIX_CPU_SET      which ones, as taskset -c lists them ("0-3,8-11")
+
+tool.yml commands get them as $nb_threads and $cpu_set, tcl scripts through
+odatix_nb_threads (see _common/settings.tcl). A unit starting once every core is
+taken (more parallel jobs than cores) runs unpinned, on all of them.
+
+Without pinning, the default outside of daemon sessions and the only choice
+where sched_setaffinity is not available, jobs still get ODATIX_NB_THREADS:
+their share of the cores, for the tool to size its pool on.
+"""
+
+import math
+import os
+import sys
+
+ENV_NB_THREADS = "ODATIX_NB_THREADS"
+ENV_CPU_SET = "ODATIX_CPU_SET"
+
+
+def supported():
+    return hasattr(os, "sched_setaffinity")
+
+
+def available_cpus():
+    """The cores this process may run on, sorted."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return list(range(os.cpu_count() or 1))
+
+
+def format_cpu_set(cpus):
+    """A set of cores as a list of ranges: [0, 1, 2, 3, 8] -> "0-3,8"."""
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(low) if low == high else "{}-{}".format(low, high) for low, high in ranges)
+
+
+def parse_cpu_set(text):
+    """The cores of a list of ranges ("0-3,8"), sorted. Raises ValueError."""
+    cpus = set()
+    for part in str(text).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        low, high = int(low), int(high or low)
+        if low < 0 or high < low:
+            raise ValueError("Invalid range of cores '{}'".format(part))
+        cpus.update(range(low, high + 1))
+    if not cpus:
+        raise ValueError("Empty set of cores '{}'".format(text))
+    return sorted(cpus)
+
+
+def shell_variable(name):
+    """How the shell running the commands of a job reads an environment variable."""
+    return "%{}%".format(name) if sys.platform == "win32" else "${" + name + "}"
+
+
+def environment(cpus, nb_threads, base=None):
+    """The environment of a process running on `cpus` (None: unpinned) with `nb_threads` threads."""
+    env = dict(os.environ if base is None else base)
+    env[ENV_NB_THREADS] = str(max(1, int(nb_threads)))
+    env[ENV_CPU_SET] = format_cpu_set(cpus if cpus else available_cpus())
+    return env
+
+
+def preexec(cpus, process_group):
+    """
+    The preexec_fn of a process: a process group of its own when
+    `process_group`, bound to `cpus` when they are set. None if neither.
+    """
+    if sys.platform == "win32" or (not process_group and not cpus):
+        return None
+
+    def _preexec():
+        if process_group:
+            os.setpgrp()
+        if cpus and supported():
+            os.sched_setaffinity(0, cpus)
+
+    return _preexec
+
+
+class CpuPinning:
+    """The cores of a session, and which of them running units hold."""
+
+    def __init__(self, cpus=None):
+        self.cpus = sorted(set(cpus)) if cpus else available_cpus()
+        self.taken = set()
+
+    def width(self, nb_jobs, cores=None):
+        """How many cores a unit gets: the cores it declares, or its share."""
+        if cores:
+            width = int(math.ceil(float(cores)))
+        else:
+            width = len(self.cpus) // max(1, int(nb_jobs))
+        return max(1, min(len(self.cpus), width))
+
+    def free(self):
+        return [cpu for cpu in self.cpus if cpu not in self.taken]
+
+    def acquire(self, width):
+        """
+        Take `width` free cores: the smallest contiguous block that is wide
+        enough, or the first free ones, or what is left if fewer are free.
+        Returns them sorted, or None when every core is taken.
+        """
+        free = self.free()
+        if not free:
+            return None
+        blocks = []
+        for cpu in free:
+            if blocks and cpu == blocks[-1][-1] + 1:
+                blocks[-1].append(cpu)
+            else:
+                blocks.append([cpu])
+        fitting = [block for block in blocks if len(block) >= width]
+        cpus = min(fitting, key=len)[:width] if fitting else free[:width]
+        self.taken.update(cpus)
+        return cpus
+
+    def take(self, cpus):
+        """Mark cores as held, by units started before this pinning."""
+        self.taken.update(cpu for cpu in cpus or [] if cpu in self.cpus)
+
+    def release(self, cpus):
+        self.taken.difference_update(cpus or [])
+
+    def to_dict(self):
+        return {
+            "cpus": format_cpu_set(self.cpus),
+            "total": len(self.cpus),
+            "taken": len(self.taken),
+        }
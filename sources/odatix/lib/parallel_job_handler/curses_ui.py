@@ -27,6 +27,7 @@ import sys
 
 from odatix.lib.parallel_job_handler.ansi_to_curses import AnsiToCursesConverter
 from odatix.lib.parallel_job_handler.utils import get_elapsed_time_str
+from odatix.lib.parallel_job_handler import eta
 from odatix.lib.utils import can_open_path_in_explorer, open_path_in_explorer
 import odatix.lib.printc as printc
 
@@ -114,7 +115,7 @@ def progress_bar(handler, window, id, progress, elapsed_time, title, title_size,
         pos = pos + len(border_left)
 
         if handler.theme.get('colored_bar'):
-            if status == "failed" or status == "killed" or status == "canceled":
+            if status in ("failed", "oom", "killed", "canceled"):
                 color = curses.color_pair(RED + offset)
             elif status == "running":
                 color = curses.color_pair(WHITE + offset)
@@ -151,7 +152,7 @@ def progress_bar(handler, window, id, progress, elapsed_time, title, title_size,
             window.addstr(id, pos, elapsed_time + spacer, attr | curses.color_pair(GREY + offset))
             pos = pos + len(elapsed_time) + len(spacer)
 
-        if status == "failed" or status == "killed" or status == "canceled":
+        if status in ("failed", "oom", "killed", "canceled"):
             window.addstr(id, pos, status, curses.color_pair(RED + offset) | attr)
         elif status == "running":
             window.addstr(id, pos, status, curses.color_pair(YELLOW + offset) | attr)
@@ -180,6 +181,14 @@ def progress_bar(handler, window, id, progress, elapsed_time, title, title_size,
 def update_header(handler, header_win, active_jobs_count, retired_jobs_count, total_jobs_count, width):
     nb_jobs = int(getattr(handler, "nb_jobs", 1))
     left_text = "v{}   parallel jobs: {}".format(handler.version, nb_jobs)
+    eta_seconds, throughput = handler.session_estimates()
+    if retired_jobs_count != total_jobs_count:
+        estimates = "   ETA: {}   {:.1f} jobs/h".format(
+            "--" if eta_seconds is None else eta.format_duration(eta_seconds), throughput
+        )
+        # Only when it leaves room for the title in the middle.
+        if len(left_text) + len(estimates) + 1 < (width - len(" Odatix ")) // 2:
+            left_text += estimates
     try:
         header_win.hline(0, 0, " ", width, curses.color_pair(NORMAL) | curses.A_REVERSE)
         header_win.addstr(0, 1, left_text, curses.color_pair(NORMAL) | curses.A_REVERSE)
@@ -720,10 +729,7 @@ def curses_main(handler, stdscr):
         selected_job.log_x_offset = 0
 
     for job in handler.job_list:
-        if len(handler.running_job_list) < handler.nb_jobs:
-            handler.start_job(job)
-        else:
-            handler.queue_job(job)
+        handler._schedule_new_job_unlocked(job)
 
     # Cap the UI loop to ~20 FPS and avoid a tight busy loop.
     stdscr.timeout(50)
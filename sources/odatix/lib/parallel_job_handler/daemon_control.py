@@ -21,6 +21,7 @@
 
 """Utilities to control the background ParallelJob daemon."""
 
+import concurrent.futures
 import json
 import os
 import re
@@ -28,11 +29,18 @@ import shutil
 import signal
 import subprocess
 import sys
+import threading
 import time
 import urllib.error
 import urllib.request
+import uuid
 
 from odatix.lib.parallel_job_handler.serialization import job_to_payload
+from odatix.lib.parallel_job_handler import daemon_registry
+from odatix.lib.parallel_job_handler import job_array
+from odatix.lib.parallel_job_handler import job_journal
+from odatix.lib.parallel_job_handler import local_socket
+from odatix.lib.parallel_job_handler.shared_files import pid_alive
 from odatix.lib.parallel_job_handler.job import ParallelJob
 from odatix.lib.parallel_job_handler.utils import get_elapsed_time_str
 import odatix.lib.hard_settings as hard_settings
@@ -48,6 +56,29 @@ DAEMON_STATE_PREFIX = hard_settings.daemon_state_prefix
 DAEMON_STATE_SUFFIX = hard_settings.daemon_state_suffix
 DAEMON_LOG_PREFIX = hard_settings.daemon_log_prefix
 DAEMON_LOG_SUFFIX = hard_settings.daemon_log_suffix
+DAEMON_JOURNAL_FILE = hard_settings.daemon_journal_file
+DAEMON_JOURNAL_PREFIX = hard_settings.daemon_journal_prefix
+DAEMON_JOURNAL_SUFFIX = hard_settings.daemon_journal_suffix
+DAEMON_SOCKET_FILE = hard_settings.daemon_socket_file
+DAEMON_SOCKET_PREFIX = hard_settings.daemon_socket_prefix
+DAEMON_SOCKET_SUFFIX = hard_settings.daemon_socket_suffix
+DAEMON_TRACE_DIR = hard_settings.daemon_trace_dirname
+DAEMON_TRACE_FILE = hard_settings.daemon_trace_file
+DAEMON_TRACE_PREFIX = hard_settings.daemon_trace_prefix
+DAEMON_TRACE_SUFFIX = hard_settings.daemon_trace_suffix
+
+# Batches of more jobs are enqueued in chunks of this many jobs.
+ENQUEUE_CHUNK_SIZE = hard_settings.daemon_enqueue_chunk_size
+ENQUEUE_CHUNK_TIMEOUT = 10.0
+ENQUEUE_CHUNK_RETRIES = 3
+
+# Daemons that answered a probe of list_daemons are not probed again for this
+# long: the GUI lists the sessions every few seconds, a run several times.
+PROBE_CACHE_TTL = 2.0
+PROBE_WORKERS = 16
+
+_probe_cache = {}
+_probe_cache_lock = threading.Lock()
 
 
 class DaemonControlError(RuntimeError):
@@ -131,10 +162,11 @@ def _generate_default_session_name(host=DEFAULT_HOST):
     return "{}.{}".format(tty_slug, host_slug)
 
 
-def _unique_default_session_name(host=DEFAULT_HOST, active_daemons=None):
+def _unique_default_session_name(host=DEFAULT_HOST, active_daemons=None, recoverable=None):
     """
     Default session name for a new session, made unique against the sessions
-    already running.
+    already running, and the sessions that died with jobs to recover (see
+    list_recoverable_sessions): a new session of the same name would run them.
 
     The default name is derived from the controlling tty, which distinguishes
     concurrent CLI runs. Callers without a tty (the GUI server, a service, a
@@ -143,6 +175,7 @@ def _unique_default_session_name(host=DEFAULT_HOST, active_daemons=None):
     """
     base_name = _generate_default_session_name(host=host)
     taken = {_session_name_from_state(state) for state in (active_daemons or [])}
+    taken.update(entry["session_name"] for entry in (recoverable or []))
     if base_name not in taken:
         return base_name
     suffix = 2
@@ -173,6 +206,34 @@ def _log_filename_for_session(session_name):
     return DAEMON_LOG_PREFIX + slug + DAEMON_LOG_SUFFIX
 
 
+def _journal_filename_for_session(session_name):
+    slug = _session_slug(session_name)
+    if slug is None:
+        return DAEMON_JOURNAL_FILE
+    return DAEMON_JOURNAL_PREFIX + slug + DAEMON_JOURNAL_SUFFIX
+
+
+def _socket_filename_for_session(session_name):
+    slug = _session_slug(session_name)
+    if slug is None:
+        return DAEMON_SOCKET_FILE
+    return DAEMON_SOCKET_PREFIX + slug + DAEMON_SOCKET_SUFFIX
+
+
+def _trace_filename_for_session(session_name):
+    slug = _session_slug(session_name)
+    if slug is None:
+        return DAEMON_TRACE_FILE
+    return DAEMON_TRACE_PREFIX + slug + DAEMON_TRACE_SUFFIX
+
+
+def _is_journal_filename(name):
+    for suffix in ("-wal", "-shm"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name == DAEMON_JOURNAL_FILE or (name.startswith(DAEMON_JOURNAL_PREFIX) and name.endswith(DAEMON_JOURNAL_SUFFIX))
+
+
 def get_daemon_paths(workspace_root=None, session_name=None):
     root = detect_workspace_root(workspace_root)
     state_dir = os.path.join(root, DAEMON_STATE_DIR)
@@ -181,6 +242,9 @@ def get_daemon_paths(workspace_root=None, session_name=None):
         "state_dir": state_dir,
         "state_file": os.path.join(state_dir, _state_filename_for_session(session_name)),
         "log_file": os.path.join(state_dir, _log_filename_for_session(session_name)),
+        "journal_file": os.path.join(state_dir, _journal_filename_for_session(session_name)),
+        "socket_file": os.path.join(state_dir, _socket_filename_for_session(session_name)),
+        "trace_file": os.path.join(root, DAEMON_TRACE_DIR, _trace_filename_for_session(session_name)),
     }
 
 
@@ -241,6 +305,9 @@ def _decorate_session_fields(state):
 
 
 def _api_request(base_url, method, path, payload=None, timeout=1.0):
+    if local_socket.socket_path(base_url) is not None:
+        return local_socket.request(base_url, method, path, payload=payload, timeout=timeout)
+
     data = None
     headers = {}
     if payload is not None:
@@ -264,6 +331,9 @@ def _api_request(base_url, method, path, payload=None, timeout=1.0):
 
 
 def _state_base_url(state):
+    socket_file = local_socket.state_socket(state)
+    if socket_file is not None:
+        return local_socket.base_url(socket_file)
     host = str(state.get("host", DEFAULT_HOST))
     port = int(state.get("port", DEFAULT_PORT))
     return "http://{}:{}".format(host, port)
@@ -273,12 +343,56 @@ def daemon_is_alive(state, timeout=0.6):
     if not isinstance(state, dict):
         return False
     try:
-        _api_request(_state_base_url(state), "GET", "/status?logs_job_id=-1", timeout=float(timeout))
+        _api_request(_state_base_url(state), "GET", "/ping", timeout=float(timeout))
+        return True
+    except urllib.error.HTTPError:
+        # It answered: a daemon older than /ping.
         return True
     except Exception:
         return False
 
 
+def _probe_key(state):
+    return _state_base_url(state), state.get("pid")
+
+
+def _probe_daemons(states, timeout=0.6):
+    """
+    Whether each of `states` is alive, as a list of booleans. The daemons are
+    probed concurrently, those that answered less than PROBE_CACHE_TTL seconds
+    ago are not probed again.
+    """
+    now = time.time()
+    alive = [None] * len(states)
+    to_probe = []
+    with _probe_cache_lock:
+        for index, state in enumerate(states):
+            answered_at = _probe_cache.get(_probe_key(state))
+            if answered_at is not None and now - answered_at < PROBE_CACHE_TTL:
+                alive[index] = True
+            else:
+                to_probe.append(index)
+    if len(to_probe) == 1:
+        alive[to_probe[0]] = daemon_is_alive(states[to_probe[0]], timeout=timeout)
+    elif to_probe:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(to_probe))) as pool:
+            answers = pool.map(lambda index: daemon_is_alive(states[index], timeout=timeout), to_probe)
+            for index, answer in zip(to_probe, answers):
+                alive[index] = answer
+    with _probe_cache_lock:
+        for index in to_probe:
+            if alive[index]:
+                _probe_cache[_probe_key(states[index])] = now
+            else:
+                _probe_cache.pop(_probe_key(states[index]), None)
+    return alive
+
+
+def _forget_probes():
+    with _probe_cache_lock:
+        _probe_cache.clear()
+
+
 def _delete_state_file(state_file):
     try:
         if os.path.isfile(state_file):
@@ -425,7 +539,13 @@ def _spawn_daemon(paths, host, port, jobs, logsize, session_name=None, daemon_lo
         str(max(1, int(jobs))),
         "--logsize",
         str(int(logsize)),
+        "--journal-file",
+        paths["journal_file"],
+        "--trace-file",
+        paths["trace_file"],
     ]
+    if local_socket.usable_path(paths.get("socket_file")):
+        command += ["--socket-file", paths["socket_file"]]
 
     env = os.environ.copy()
     sources_dir = os.path.join(paths["workspace_root"], "sources")
@@ -489,7 +609,11 @@ def ensure_daemon_running(
     else:
         # By default, launching jobs creates a fresh daemon session.
         # Existing sessions are reused only when an explicit selector is given.
-        session_name = _unique_default_session_name(host=host, active_daemons=active_daemons)
+        session_name = _unique_default_session_name(
+            host=host,
+            active_daemons=active_daemons,
+            recoverable=list_recoverable_sessions(workspace_root, active_daemons=active_daemons),
+        )
         paths = get_daemon_paths(workspace_root, session_name=session_name)
 
     _delete_state_file(paths["state_file"])
@@ -526,7 +650,13 @@ def ensure_daemon_running(
     raise DaemonControlError("Could not start Odatix daemon")
 
 
-def enqueue_parallel_jobs(parallel_jobs, workspace_root=None, session=None):
+def enqueue_parallel_jobs(parallel_jobs, workspace_root=None, session=None, progress=None):
+    """
+    Enqueue the jobs of a handler into a daemon session, started if needed.
+    Batches of more than ENQUEUE_CHUNK_SIZE jobs are sent in chunks, each one
+    retried from where the daemon got to if it fails, and `progress(sent, total)`
+    is called after each of them.
+    """
     job_list = list(getattr(parallel_jobs, "job_list", []) or [])
 
     format_yaml = getattr(parallel_jobs, "format_yaml", None)
@@ -542,28 +672,68 @@ def enqueue_parallel_jobs(parallel_jobs, workspace_root=None, session=None):
         daemon_log_enabled=getattr(parallel_jobs, "daemon_log_enabled", None),
     )
 
-    payload = {
-        "jobs": [job_to_payload(job) for job in job_list],
-        "options": {
-            "nb_jobs": int(getattr(parallel_jobs, "nb_jobs", 4)),
-            "process_group": bool(getattr(parallel_jobs, "process_group", True)),
-            "auto_exit": bool(getattr(parallel_jobs, "auto_exit", False)),
-            "log_size_limit": int(getattr(parallel_jobs, "log_size_limit", 200)),
-            "progress_pattern": getattr(getattr(ParallelJob, "progress_file_pattern", None), "pattern", None),
-            "status_pattern": getattr(getattr(ParallelJob, "status_file_pattern", None), "pattern", None),
-            # Empty string means "disable formatter" (None means "leave unchanged").
-            "format_yaml": str(format_yaml) if format_yaml not in (None, "") else "",
-        },
+    options = {
+        "nb_jobs": int(getattr(parallel_jobs, "nb_jobs", 4)),
+        "process_group": bool(getattr(parallel_jobs, "process_group", True)),
+        "auto_exit": bool(getattr(parallel_jobs, "auto_exit", False)),
+        "log_size_limit": int(getattr(parallel_jobs, "log_size_limit", 200)),
+        "progress_pattern": getattr(getattr(ParallelJob, "progress_file_pattern", None), "pattern", None),
+        "status_pattern": getattr(getattr(ParallelJob, "status_file_pattern", None), "pattern", None),
+        # Empty string means "disable formatter" (None means "leave unchanged").
+        "format_yaml": str(format_yaml) if format_yaml not in (None, "") else "",
     }
 
-    response = _api_request(
-        _state_base_url(state),
-        "POST",
-        "/jobs/enqueue",
-        payload=payload,
-        timeout=3.0,
-    )
-    return state, response
+    if len(job_list) <= ENQUEUE_CHUNK_SIZE:
+        response = _api_request(
+            _state_base_url(state),
+            "POST",
+            "/jobs/enqueue",
+            payload={"arrays": _job_arrays(job_list), "options": options},
+            timeout=3.0,
+        )
+        return state, response
+    return state, _enqueue_in_chunks(_state_base_url(state), job_list, options, progress)
+
+
+def _job_arrays(job_list):
+    # The jobs of a sweep differ in a few values: sent as job arrays, they
+    # take a fraction of the room of their payloads.
+    return job_array.pack_payloads(job_to_payload(job) for job in job_list)
+
+
+def _enqueue_in_chunks(base_url, job_list, options, progress=None):
+    batch_id = uuid.uuid4().hex
+    total = len(job_list)
+    offset = 0
+    response = {}
+    failures = 0
+    while offset < total:
+        chunk = job_list[offset:offset + ENQUEUE_CHUNK_SIZE]
+        payload = {
+            "arrays": _job_arrays(chunk),
+            "batch": {"id": batch_id, "offset": offset, "total": total},
+        }
+        if offset == 0:
+            payload["options"] = options
+        try:
+            response = _api_request(base_url, "POST", "/jobs/enqueue", payload=payload, timeout=ENQUEUE_CHUNK_TIMEOUT)
+        except Exception:
+            failures += 1
+            if failures > ENQUEUE_CHUNK_RETRIES:
+                raise
+            # The chunk may have been added all the same: go on from what the
+            # daemon received.
+            try:
+                response = _api_request(base_url, "GET", "/jobs/enqueue/{}".format(batch_id), timeout=ENQUEUE_CHUNK_TIMEOUT)
+            except Exception:
+                time.sleep(0.5 * failures)
+                continue
+        else:
+            failures = 0
+        offset = int(response.get("received", offset))
+        if callable(progress):
+            progress(offset, total)
+    return dict(response, added=offset, batch_id=batch_id)
 
 
 def _resolve_state_for_attach_or_stop(workspace_root=None, host=None, port=None, session=None):
@@ -617,9 +787,72 @@ def attach_monitor(workspace_root=None, host=None, port=None, session=None, auto
         host=state.get("host", DEFAULT_HOST),
         port=int(state.get("port", DEFAULT_PORT)),
         auto_exit=bool(auto_exit),
+        socket_file=local_socket.state_socket(state),
     )
 
 
+def configure_daemon_resources(resources=None, workspace_root=None, host=None, port=None, session=None):
+    """Read, and optionally update, the resource budget of a daemon session.
+
+    ``resources`` maps resource names to amounts (None restores the amount
+    detected on the host). Returns the budget as reported by the daemon:
+    ``detected``, ``limits``, ``total`` and ``used``.
+    """
+    state = _resolve_state_for_attach_or_stop(workspace_root=workspace_root, host=host, port=port, session=session)
+    if not daemon_is_alive(state):
+        raise DaemonControlError("Daemon is not running")
+
+    if resources:
+        response = _api_request(_state_base_url(state), "POST", "/config/resources", payload=dict(resources), timeout=1.0)
+        return response.get("resources", {})
+    return _api_request(_state_base_url(state), "GET", "/config/resources", timeout=1.0)
+
+
+def configure_daemon_autoscale(min_jobs=None, max_jobs=None, enabled=None, workspace_root=None, host=None, port=None, session=None):
+    """Read, and optionally update, the autoscaler of nb_jobs of a daemon session.
+
+    ``min_jobs`` / ``max_jobs`` enable it (or change its bounds), ``enabled=False``
+    disables it. Returns its state as reported by the daemon (bounds and last
+    decision), or None when it is disabled.
+    """
+    state = _resolve_state_for_attach_or_stop(workspace_root=workspace_root, host=host, port=port, session=session)
+    if not daemon_is_alive(state):
+        raise DaemonControlError("Daemon is not running")
+
+    if enabled is False or min_jobs is not None or max_jobs is not None:
+        payload = {"enabled": enabled is not False}
+        if min_jobs is not None:
+            payload["min_jobs"] = int(min_jobs)
+        if max_jobs is not None:
+            payload["max_jobs"] = int(max_jobs)
+        response = _api_request(_state_base_url(state), "POST", "/config/autoscale", payload=payload, timeout=1.0)
+        return response.get("autoscaler")
+    return _api_request(_state_base_url(state), "GET", "/config/autoscale", timeout=1.0).get("autoscaler")
+
+
+def configure_host_slots(capacity=None, policy=None, disable=False, weight=None, workspace_root=None, host=None, port=None, session=None):
+    """Read, and optionally update, the job slots shared by the sessions of the host.
+
+    ``capacity`` ("auto" for the number of cores) and ``policy`` ("fair" or
+    "greedy") apply to the whole host, ``disable`` removes the capacity. ``weight``
+    sets the share of one session under the "fair" policy. Returns the state of
+    the host: capacity, policy and sessions with what they run and reserve.
+    """
+    from odatix.lib.parallel_job_handler.slot_broker import HostSlotBroker
+
+    broker = HostSlotBroker(session_id="")
+    if disable or capacity is not None or policy is not None:
+        broker.configure(capacity=capacity, policy=policy, disable=disable)
+
+    if weight is not None:
+        state = _resolve_state_for_attach_or_stop(workspace_root=workspace_root, host=host, port=port, session=session)
+        if not daemon_is_alive(state):
+            raise DaemonControlError("Daemon is not running")
+        _api_request(_state_base_url(state), "POST", "/config/host_slots", payload={"weight": float(weight)}, timeout=1.0)
+
+    return broker.status()
+
+
 def _terminate_pid(pid):
     pid = int(pid)
     if sys.platform == "win32":
@@ -685,6 +918,14 @@ def _cleanup_workspace_daemon_dir_if_empty(workspace_root):
     if not state_dir or not os.path.isdir(state_dir):
         return
 
+    # The journals of sessions that died hold jobs to recover.
+    journals = [name for name in os.listdir(state_dir) if _is_journal_filename(name)]
+    if journals:
+        for name in os.listdir(state_dir):
+            if name not in journals and os.path.isfile(os.path.join(state_dir, name)):
+                _delete_state_file(os.path.join(state_dir, name))
+        return
+
     try:
         shutil.rmtree(state_dir)
     except Exception:
@@ -694,6 +935,7 @@ def _cleanup_workspace_daemon_dir_if_empty(workspace_root):
 def _stop_daemon_from_state(state, workspace_root):
     cleanup_workspace_root = state.get("workspace_root", workspace_root) if isinstance(state, dict) else workspace_root
     paths = get_daemon_paths(cleanup_workspace_root)
+    _forget_probes()
 
     try:
         _api_request(_state_base_url(state), "POST", "/shutdown", payload={}, timeout=1.0)
@@ -727,6 +969,63 @@ def _stop_daemon_from_state(state, workspace_root):
     return stopped
 
 
+def list_recoverable_sessions(workspace_root=None, active_daemons=None):
+    """
+    The sessions of the workspace that died with jobs left to run in their
+    journal (see odatix.lib.parallel_job_handler.job_journal), as a list of
+    {"session_name", "journal_file", "unfinished", "jobs", "logsize"}.
+    """
+    paths = get_daemon_paths(workspace_root)
+    state_dir = paths.get("state_dir")
+    if not state_dir or not os.path.isdir(state_dir):
+        return []
+    if active_daemons is None:
+        active_daemons, _ = _filter_by_workspace(list_daemons(workspace_root=workspace_root), workspace_root=workspace_root)
+    active = {_session_name_from_state(state) for state in active_daemons}
+
+    sessions = []
+    for name in sorted(os.listdir(state_dir)):
+        if not _is_journal_filename(name) or name.endswith(("-wal", "-shm")):
+            continue
+        journal_file = os.path.join(state_dir, name)
+        summary = job_journal.read_summary(journal_file)
+        if summary is None or summary["unfinished"] == 0:
+            continue
+        meta = summary["meta"]
+        session_name = str(meta.get("session_name") or "")
+        if session_name == "" or session_name in active:
+            continue
+        sessions.append({
+            "session_name": session_name,
+            "journal_file": journal_file,
+            "unfinished": summary["unfinished"],
+            "jobs": int(meta.get("nb_jobs") or 4),
+            "logsize": int(meta.get("logsize") or 200),
+        })
+    return sessions
+
+
+def resume_sessions(workspace_root=None, session=None):
+    """
+    Start again the sessions that died with jobs to recover (all of them, or the
+    ones whose name starts with `session`). Returns [(session, daemon state)].
+    """
+    workspace_root = detect_workspace_root(workspace_root)
+    selector = str(session or "").strip().lower()
+    resumed = []
+    for entry in list_recoverable_sessions(workspace_root):
+        if selector and not entry["session_name"].lower().startswith(selector):
+            continue
+        state = ensure_daemon_running(
+            workspace_root=workspace_root,
+            jobs=entry["jobs"],
+            logsize=entry["logsize"],
+            session=entry["session_name"],
+        )
+        resumed.append((entry, state))
+    return resumed
+
+
 def stop_daemon(workspace_root=None, host=None, port=None, session=None):
     workspace_root = detect_workspace_root(workspace_root)
     state = _resolve_state_for_attach_or_stop(
@@ -805,6 +1104,31 @@ def _workspace_root_from_state_file(state_file):
     return None
 
 
+def _iter_registered_daemon_candidates():
+    """
+    The daemons of the registry of the host (see daemon_registry), in the form
+    of _iter_system_daemon_candidates, or None where the host has no registry.
+    """
+    entries = daemon_registry.DaemonRegistry().entries()
+    if entries is None:
+        return None
+    candidates = []
+    for entry in entries:
+        try:
+            port = int(entry["port"]) if entry.get("port") is not None else None
+        except (TypeError, ValueError):
+            port = None
+        candidates.append({
+            "pid": int(entry["pid"]),
+            "host": entry.get("host"),
+            "port": port,
+            "session_name": entry.get("session_name"),
+            "state_file": entry.get("state_file"),
+            "workspace_root": entry.get("workspace_root") or _workspace_root_from_state_file(entry.get("state_file")),
+        })
+    return candidates
+
+
 def _iter_system_daemon_candidates():
     proc_dir = "/proc"
     if not os.path.isdir(proc_dir):
@@ -898,8 +1222,11 @@ def _filter_daemons_by_session_selector(daemons, session_selector):
 def list_daemons(workspace_root=None, host=None, port=None, session=None):
     """Return a list of active daemon descriptors.
 
-    By default, this inspects running daemon processes on the system.
-    If host and/or port are provided, it checks that explicit endpoint instead.
+    By default, this reads the registry of the daemons of the host (see
+    daemon_registry), or inspects running daemon processes on the system where
+    there is none, along with the state files of the workspace: a daemon that
+    could not register is still listed. If host and/or port are provided, it
+    checks that explicit endpoint instead. Daemons are probed concurrently.
     """
     daemons = []
 
@@ -917,7 +1244,12 @@ def list_daemons(workspace_root=None, host=None, port=None, session=None):
 
     seen = set()
 
-    for candidate in _iter_system_daemon_candidates() or []:
+    candidates = _iter_registered_daemon_candidates()
+    if candidates is None:
+        candidates = _iter_system_daemon_candidates() or []
+
+    states = []
+    for candidate in candidates:
         state = {}
         state_file = candidate.get("state_file")
         if state_file:
@@ -949,8 +1281,10 @@ def list_daemons(workspace_root=None, host=None, port=None, session=None):
 
         state["uptime_s"] = _daemon_uptime_str(state)
         _decorate_session_fields(state)
+        states.append(state)
 
-        if not daemon_is_alive(state):
+    for state, alive in zip(states, _probe_daemons(states)):
+        if not alive:
             continue
 
         # Deduplicate by logical daemon identity rather than candidate pid.
@@ -970,25 +1304,30 @@ def list_daemons(workspace_root=None, host=None, port=None, session=None):
         seen.add(key)
         daemons.append(state)
 
-    if len(daemons) > 0:
-        daemons = sorted(daemons, key=_daemon_sort_key)
-        return _filter_daemons_by_session_selector(daemons, session)
-
-    # Fallback for environments where system process scanning is unavailable.
+    # The daemons of the workspace the registry (or the scan) missed: of
+    # another user whose daemon could not register, or where processes cannot
+    # be scanned.
+    listed_state_files = {os.path.realpath(str(state["state_file"])) for state in daemons if state.get("state_file")}
+    listed_pids = {state.get("pid") for state in daemons}
     paths = get_daemon_paths(workspace_root)
+    states = []
     for state_file in _iter_state_files(paths):
-        state = _read_json_file(state_file)
-        if not isinstance(state, dict):
+        if os.path.realpath(state_file) in listed_state_files:
             continue
+        state = _read_json_file(state_file)
+        if isinstance(state, dict) and state.get("pid") not in listed_pids:
+            states.append((state_file, state))
 
-        if daemon_is_alive(state):
+    for (state_file, state), alive in zip(states, _probe_daemons([state for _, state in states])):
+        if alive:
             state = dict(state)
             state["workspace_root"] = paths["workspace_root"]
             state["state_file"] = state_file
             state["uptime_s"] = _daemon_uptime_str(state)
             _decorate_session_fields(state)
             daemons.append(state)
-        else:
+        elif not pid_alive(state.get("pid")):
+            # Not a daemon still starting: one that is gone.
             _delete_state_file(state_file)
 
     daemons = sorted(daemons, key=_daemon_sort_key)
@@ -30,12 +30,18 @@ import urllib.request
 import odatix.lib.printc as printc
 import odatix.lib.hard_settings as hard_settings
 from odatix.lib.parallel_job_handler import curses_ui
+from odatix.lib.parallel_job_handler import local_socket
 from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
 from odatix.lib.parallel_job_handler.job import ParallelJob
+from odatix.lib.parallel_job_handler.log_stream import LogStreamClient, apply_log_message
+from odatix.lib.parallel_job_handler.serialization import snapshot_since_query
 from odatix.lib.utils import open_path_in_explorer
 
 
 def _api_request(base_url, method, path, payload=None, timeout=1.0):
+    if local_socket.socket_path(base_url) is not None:
+        return local_socket.request(base_url, method, path, payload=payload, timeout=timeout)
+
     data = None
     headers = {}
     if payload is not None:
@@ -100,7 +106,7 @@ def _is_active_log_status(status):
 
 
 def _is_terminal_log_status(status):
-    return str(status) in ("success", "failed", "killed", "canceled")
+    return str(status) in ("success", "failed", "oom", "killed", "canceled")
 
 
 class _QueueCounter:
@@ -110,6 +116,9 @@ class _QueueCounter:
     def qsize(self):
         return max(0, int(self._count))
 
+    def empty(self):
+        return self.qsize() == 0
+
     def set(self, count):
         self._count = max(0, int(count))
 
@@ -123,10 +132,14 @@ class DaemonMonitorHandler(ParallelJobHandler):
         port=hard_settings.daemon_default_port,
         poll_interval=0.25,
         auto_exit=False,
+        socket_file=None,
     ):
         super().__init__(job_list=[], nb_jobs=1, process_group=True, auto_exit=bool(auto_exit), log_size_limit=200)
 
-        self._base_url = "http://{}:{}".format(str(host), int(port))
+        if socket_file is not None:
+            self._base_url = local_socket.base_url(socket_file)
+        else:
+            self._base_url = "http://{}:{}".format(str(host), int(port))
         self._poll_interval = max(0.05, float(poll_interval))
         self._last_poll = 0.0
         self._last_logs_poll = 0.0
@@ -134,14 +147,23 @@ class DaemonMonitorHandler(ParallelJobHandler):
         self._logs_poll_interval_active = max(0.10, self._poll_interval)
         self._logs_poll_interval_idle = max(0.75, self._poll_interval * 2.0)
         self._jobs_by_remote_id = {}
+        self._last_snapshot = None
         self._queue_counter = _QueueCounter()
         self.job_queue = self._queue_counter
 
+        # The log of the selected job is streamed over /ws when the daemon and
+        # websockets allow it, and polled through /status otherwise.
+        self._log_stream = LogStreamClient(host, port, socket_file=socket_file)
+        self._log_stream.start()
+        self._log_stream_job = None
+
         self._remote_running = 0
         self._remote_queued = 0
         self._remote_retired = 0
         self._remote_total_jobs = 0
         self._remote_format_yaml = None
+        self._remote_eta = None
+        self._remote_throughput = 0.0
 
         self._placeholder = self._new_local_job(
             remote_id=-1,
@@ -209,7 +231,7 @@ class DaemonMonitorHandler(ParallelJobHandler):
         elapsed_seconds = _parse_elapsed_seconds(remote_job.get("elapsed_time"))
         if elapsed_seconds > 0:
             job.start_time = now - float(elapsed_seconds)
-            if job.status in ("success", "failed", "killed", "canceled"):
+            if job.status in ("success", "failed", "oom", "killed", "canceled"):
                 job.stop_time = now
             else:
                 job.stop_time = None
@@ -218,7 +240,7 @@ class DaemonMonitorHandler(ParallelJobHandler):
                 if job.start_time is None:
                     job.start_time = now
                 job.stop_time = None
-            elif job.status in ("success", "failed", "killed", "canceled"):
+            elif job.status in ("success", "failed", "oom", "killed", "canceled"):
                 if job.start_time is None:
                     job.start_time = now
                 if job.stop_time is None:
@@ -232,22 +254,38 @@ class DaemonMonitorHandler(ParallelJobHandler):
         if not force and (now - self._last_poll) < self._poll_interval:
             return
 
+        # Only the jobs that changed since the last poll (see
+        # ParallelJobHandler.snapshot).
+        path = "/status?logs_job_id=-1"
+        since = snapshot_since_query(self._last_snapshot)
+        if since:
+            path += "&" + since
         try:
-            snapshot = _api_get(self._base_url, "/status?logs_job_id=-1", timeout=0.8)
+            snapshot = _api_get(self._base_url, path, timeout=0.8)
         except Exception as e:
             self._last_poll = now
             self._append_error(e)
             return
 
         self._last_poll = now
+        self._last_snapshot = snapshot
 
         handler_data = _extract_handler(snapshot)
         remote_jobs = _extract_jobs(snapshot)
+        delta = bool(snapshot.get("delta")) if isinstance(snapshot, dict) else False
 
+        # The jobs of the job arrays not dispatched yet are not in the jobs of
+        # the daemon, but wait all the same.
+        pending_in_arrays = int(handler_data.get("pending_in_arrays") or 0)
         self._remote_running = int(handler_data.get("running", 0))
-        self._remote_queued = int(handler_data.get("queued", 0))
+        self._remote_queued = int(handler_data.get("queued", 0)) + pending_in_arrays
         self._remote_retired = int(handler_data.get("retired", 0))
-        self._remote_total_jobs = int(handler_data.get("job_count", len(remote_jobs)))
+        self._remote_total_jobs = int(handler_data.get("job_count", len(remote_jobs))) + pending_in_arrays
+        self._remote_eta = handler_data.get("eta")
+        try:
+            self._remote_throughput = float(handler_data.get("throughput_per_hour") or 0.0)
+        except (TypeError, ValueError):
+            self._remote_throughput = 0.0
 
         # Keep the local nb_jobs mirror in sync with the daemon so the curses UI
         # displays the daemon's actual parallelism cap.
@@ -264,12 +302,14 @@ class DaemonMonitorHandler(ParallelJobHandler):
 
         self._queue_counter.set(self._remote_queued)
 
-        if remote_jobs:
-            new_job_list = []
-            seen = set()
+        if not delta:
+            stale_ids = set(self._jobs_by_remote_id) - {int(remote_job.get("id", -1)) for remote_job in remote_jobs}
+            for stale_id in stale_ids:
+                self._jobs_by_remote_id.pop(stale_id, None)
+
+        if remote_jobs or self._jobs_by_remote_id:
             for remote_job in remote_jobs:
                 remote_id = int(remote_job.get("id", -1))
-                seen.add(remote_id)
                 job = self._jobs_by_remote_id.get(remote_id)
                 if job is None:
                     job = self._new_local_job(
@@ -281,13 +321,8 @@ class DaemonMonitorHandler(ParallelJobHandler):
                     self._jobs_by_remote_id[remote_id] = job
 
                 self._sync_job_from_remote(job, remote_job, now)
-                new_job_list.append(job)
-
-            stale_ids = [job_id for job_id in self._jobs_by_remote_id.keys() if job_id not in seen]
-            for stale_id in stale_ids:
-                self._jobs_by_remote_id.pop(stale_id, None)
 
-            self.job_list = new_job_list
+            self.job_list = [self._jobs_by_remote_id[remote_id] for remote_id in sorted(self._jobs_by_remote_id)]
             self.job_count = len(self.job_list)
             self.max_title_length = max(len(job.display_name) for job in self.job_list)
             self.selected_job_index = max(0, min(int(self.selected_job_index), self.job_count - 1))
@@ -313,7 +348,7 @@ class DaemonMonitorHandler(ParallelJobHandler):
                 job for job in self.job_list if job.status in ("running", "starting", "paused", "exporting")
             ]
             self.retired_job_list = [
-                job for job in self.job_list if job.status in ("success", "failed", "killed", "canceled")
+                job for job in self.job_list if job.status in ("success", "failed", "oom", "killed", "canceled")
             ]
         else:
             self._jobs_by_remote_id.clear()
@@ -338,6 +373,11 @@ class DaemonMonitorHandler(ParallelJobHandler):
         if remote_id < 0:
             return
 
+        if self._log_stream.connected:
+            self._sync_streamed_logs(job, remote_id)
+            return
+        self._log_stream_job = None
+
         full_refresh = getattr(job, "_remote_log_total", None) is None
         selected_changed = remote_id != self._selected_remote_id
         if selected_changed:
@@ -526,6 +566,21 @@ class DaemonMonitorHandler(ParallelJobHandler):
         except Exception as e:
             self._append_error(e)
 
+    def _sync_streamed_logs(self, job, remote_id):
+        if self._log_stream_job != remote_id:
+            # The stream starts over with the first line the daemon kept.
+            self._log_stream.follow(remote_id)
+            self._log_stream_job = remote_id
+            self._selected_remote_id = remote_id
+            job.log_history = []
+            job.log_seq = 0
+            job.log_position = 0
+        limit = int(getattr(job, "log_size_limit", self.log_size_limit))
+        for message in self._log_stream.drain():
+            apply_log_message(job, message, limit)
+        # Polling, if the stream is lost, starts with a full refresh.
+        job._remote_log_total = None
+
     def _remote_id_from_index(self, job_id):
         idx = int(job_id)
         if idx < 0 or idx >= len(self.job_list):
@@ -559,6 +614,14 @@ class DaemonMonitorHandler(ParallelJobHandler):
         # Curses bootstrap phase is ignored in daemon-attach mode.
         return
 
+    def _schedule_new_job_unlocked(self, job):
+        # Curses bootstrap phase is ignored in daemon-attach mode.
+        return
+
+    def session_estimates(self):
+        # Estimated by the daemon, which has the history and the running jobs.
+        return self._remote_eta, self._remote_throughput
+
     def pause_job(self, job_id: int):
         remote_id = self._remote_id_from_index(job_id)
         if remote_id is None:
@@ -648,14 +711,19 @@ def run_monitor(
     port=hard_settings.daemon_default_port,
     poll_interval=0.25,
     auto_exit=False,
+    socket_file=None,
 ):
     handler = DaemonMonitorHandler(
         host=str(host),
         port=int(port),
         poll_interval=float(poll_interval),
         auto_exit=bool(auto_exit),
+        socket_file=socket_file,
     )
-    return curses_ui.run(handler)
+    try:
+        return curses_ui.run(handler)
+    finally:
+        handler._log_stream.close()
 
 
 def add_arguments(parser):
@@ -663,6 +731,7 @@ def add_arguments(parser):
     parser.add_argument("--port", type=int, default=hard_settings.daemon_default_port, help="Daemon API port")
     parser.add_argument("--poll", type=float, default=0.25, help="Polling interval in seconds")
     parser.add_argument("--auto-exit", action="store_true", help="Exit monitor when all jobs are completed")
+    parser.add_argument("--socket", dest="socket_file", default=None, help="Daemon API Unix domain socket, instead of --host and --port")
 
 
 def parse_arguments():
@@ -674,7 +743,7 @@ def parse_arguments():
 def main(args=None):
     if args is None:
         args = parse_arguments()
-    run_monitor(host=args.host, port=args.port, poll_interval=args.poll, auto_exit=args.auto_exit)
+    run_monitor(host=args.host, port=args.port, poll_interval=args.poll, auto_exit=args.auto_exit, socket_file=args.socket_file)
 
 
 if __name__ == "__main__":
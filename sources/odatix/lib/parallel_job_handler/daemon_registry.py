@@ -0,0 +1,193 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Registry of the daemons running on a host.
+
+Listing the sessions ("odatix ls", the session list of the GUI, every run
+looking for a daemon to reuse) used to walk the /proc/<pid>/cmdline of every
+process of the host. A daemon now registers itself in a directory every user
+can write to (<tmp>/odatix_daemons), one file per daemon:
+
+    <pid>.json      {"pid", "state_file", "workspace_root", "session_name",
+                     "host", "port", "heartbeat"}
+    registry.lock
+
+and beats (rewrites its file with the time) every HEARTBEAT_INTERVAL seconds.
+The directory is sticky, as are the host job slots (see shared_files): entries
+are writable by all, so that the entry a daemon of another user left behind
+under a pid that was reused since is rewritten in place.
+Entries of daemons that died, or did not beat for STALE_AFTER seconds, are
+dropped when the registry is read. Where file locks are not available,
+daemon_control falls back to scanning /proc; it also lists the daemons of the
+workspace from their state files, registered or not. A daemon that cannot
+register tells why in its log.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import odatix.lib.hard_settings as hard_settings
+import odatix.lib.printc as printc
+from odatix.lib.parallel_job_handler.shared_files import locked, make_shared_directory, pid_alive, supported, write_json
+
+HEARTBEAT_INTERVAL = 5.0
+STALE_AFTER = 30.0
+
+ENTRY_SUFFIX = ".json"
+LOCK_FILENAME = "registry.lock"
+
+script_name = os.path.basename(__file__)
+
+
+def default_directory():
+    """The directory of the registry of the host."""
+    return os.path.join(tempfile.gettempdir(), hard_settings.daemon_registry_dirname)
+
+
+class DaemonRegistry:
+    """The daemons of the host, each one a file of the registry directory."""
+
+    def __init__(self, directory=None):
+        self.directory = str(directory or default_directory())
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _entry_path(self, pid):
+        return self._path(str(int(pid)) + ENTRY_SUFFIX)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        make_shared_directory(self.directory)
+        with locked(self._path(LOCK_FILENAME)):
+            yield
+
+    def register(self, entry, now=None):
+        """Write the entry of a daemon ({"pid", ...}), its heartbeat set to `now`."""
+        if not supported():
+            return None
+        entry = dict(entry, heartbeat=time.time() if now is None else now)
+        path = self._entry_path(entry["pid"])
+        with self._locked():
+            # Writable by all: the stale entry of a daemon of another user,
+            # whose pid was reused, is rewritten in place.
+            write_json(path, entry)
+        return entry
+
+    def unregister(self, pid):
+        if not supported() or not os.path.isdir(self.directory):
+            return
+        try:
+            with self._locked():
+                os.remove(self._entry_path(pid))
+        except OSError:
+            pass
+
+    def entries(self, now=None):
+        """
+        The entries of the live daemons, None when the host has no registry.
+        Entries of dead daemons are removed on the way.
+        """
+        if not supported():
+            return None
+        now = time.time() if now is None else now
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        except OSError:
+            return None
+
+        entries = []
+        stale = []
+        for name in sorted(names):
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            try:
+                with open(self._path(name), "r") as f:
+                    entry = json.load(f)
+                pid = int(entry["pid"])
+                heartbeat = float(entry.get("heartbeat", 0))
+            except (OSError, ValueError, TypeError, KeyError):
+                continue
+            if now - heartbeat > STALE_AFTER or not pid_alive(pid):
+                stale.append(pid)
+                continue
+            entries.append(entry)
+
+        if stale:
+            try:
+                with self._locked():
+                    for pid in stale:
+                        try:
+                            os.remove(self._entry_path(pid))
+                        except OSError:
+                            # The entry of a daemon of another user.
+                            pass
+            except OSError:
+                pass
+        return entries
+
+
+class Heartbeat:
+    """Keeps the entry of a daemon in the registry, from a thread of its own."""
+
+    def __init__(self, registry, entry, interval=HEARTBEAT_INTERVAL):
+        self.registry = registry
+        self.entry = dict(entry)
+        self.interval = float(interval)
+        self._stop_event = threading.Event()
+        self._thread = None
+        # Why the last beat failed, or None.
+        self.error = None
+
+    def _beat(self):
+        try:
+            self.registry.register(self.entry)
+        except OSError as e:
+            # The daemon keeps running, and is still listed from its state file.
+            error = "could not register in " + self.registry.directory + ": " + str(e)
+            if error != self.error:
+                printc.warning(error, script_name)
+            self.error = error
+            return
+        self.error = None
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            self._beat()
+
+    def start(self):
+        self._beat()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.registry.unregister(self.entry["pid"])
@@ -24,24 +24,46 @@
 import argparse
 import json
 import os
+import shutil
+import socket
 import time
 
 from odatix.lib.parallel_job_handler.api import create_uvicorn_server
 from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+from odatix.lib.parallel_job_handler import autoscaler as autoscaling
+from odatix.lib.parallel_job_handler import cpu_pinning
+from odatix.lib.parallel_job_handler import daemon_registry
+from odatix.lib.parallel_job_handler import job_journal
+from odatix.lib.parallel_job_handler import job_trace
+from odatix.lib.parallel_job_handler import local_socket
+from odatix.lib.parallel_job_handler import runtime_history
+from odatix.lib.parallel_job_handler.slot_broker import HostSlotBroker
 from odatix.lib.utils import find_free_port
 import odatix.lib.hard_settings as hard_settings
 
 
-def _write_state_file(state_file, host, port, session_name):
-    session_name = str(session_name or host).strip() or str(host)
+def _session_name(host, session_name):
+    return str(session_name or host).strip() or str(host)
+
+
+def _session_id(host, session_name):
+    return "{}.{}".format(os.getpid(), _session_name(host, session_name))
+
+
+def _write_state_file(state_file, host, port, session_name, socket_file=None):
+    session_name = _session_name(host, session_name)
     state = {
         "pid": os.getpid(),
         "host": str(host),
         "port": int(port),
         "session_name": session_name,
-        "session_id": "{}.{}".format(os.getpid(), session_name),
+        "session_id": _session_id(host, session_name),
         "started_at": int(time.time()),
     }
+    if socket_file is not None:
+        # Only reachable from this host, even with the workspace on a shared disk.
+        state["socket"] = socket_file
+        state["socket_host"] = socket.gethostname()
     tmp_file = state_file + ".tmp"
     with open(tmp_file, "w") as f:
         json.dump(state, f, indent=2)
@@ -74,6 +96,51 @@ def add_arguments(parser):
     parser.add_argument("--session-name", default=None, help="Optional daemon session name")
     parser.add_argument("--jobs", type=int, default=4, help="Default maximum number of parallel jobs")
     parser.add_argument("--logsize", type=int, default=200, help="Default log history limit per job")
+    parser.add_argument(
+        "--journal-file",
+        default=None,
+        help="Path to the job journal of the session, to recover the jobs of a session that died",
+    )
+    parser.add_argument(
+        "--trace-file",
+        default=None,
+        help="Path of the trace of the jobs of the session to write, in the Chrome trace format",
+    )
+    parser.add_argument(
+        "--socket-file",
+        default=None,
+        help="Path of a Unix domain socket to serve the API on for the clients of this host, on top of TCP",
+    )
+    parser.add_argument(
+        "--queue-policy",
+        default=runtime_history.DEFAULT_POLICY,
+        choices=runtime_history.POLICIES,
+        help="Order queued jobs start in: longest expected first (lpt), shortest first (spt) or as queued (fifo)",
+    )
+    parser.add_argument(
+        "--autoscale",
+        default=None,
+        type=parse_autoscale_bounds,
+        metavar="MIN:MAX",
+        help="Scale the number of parallel jobs between MIN and MAX with the load of the host",
+    )
+    parser.add_argument(
+        "--no-pin-cpus",
+        dest="pin_cpus",
+        action="store_false",
+        help="Let jobs run on every core instead of cores of their own",
+    )
+
+
+def parse_autoscale_bounds(value):
+    """"MIN:MAX" as a (min, max) tuple of positive integers, MIN <= MAX."""
+    try:
+        low, high = (int(part) for part in str(value).split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected MIN:MAX, got '{}'".format(value))
+    if low < 1 or high < low:
+        raise argparse.ArgumentTypeError("expected 1 <= MIN <= MAX, got '{}'".format(value))
+    return low, high
 
 
 def parse_arguments():
@@ -89,6 +156,12 @@ def run_daemon(
     jobs=4,
     logsize=200,
     session_name=None,
+    queue_policy=runtime_history.DEFAULT_POLICY,
+    autoscale=None,
+    pin_cpus=True,
+    journal_file=None,
+    socket_file=None,
+    trace_file=None,
 ):
     state_file = os.path.realpath(os.path.expanduser(str(state_file)))
     state_dir = os.path.dirname(state_file)
@@ -106,11 +179,45 @@ def run_daemon(
         process_group=True,
         auto_exit=False,
         log_size_limit=logsize,
+        queue_policy=queue_policy,
     )
+    # The state directory is in the workspace (see daemon_control.get_daemon_paths).
+    handler.autoscaler_log_path = autoscaling.log_file(os.path.dirname(state_dir))
+    if autoscale is not None:
+        handler.configure_autoscaler(min_jobs=autoscale[0], max_jobs=autoscale[1])
+    # Takes part in the job slots of the host once it has a capacity (see
+    # "odatix slots").
+    handler.slot_broker = HostSlotBroker(session_id=_session_id(host, session_name))
+    if pin_cpus and cpu_pinning.supported():
+        handler.configure_cpu_pinning()
+    # Logs of the retired jobs compacted by the handler, gone with the session
+    # like the ones it holds in memory.
+    retired_log_dir = os.path.splitext(state_file)[0] + hard_settings.daemon_retired_logs_suffix
+    shutil.rmtree(retired_log_dir, ignore_errors=True)
+    handler.retired_log_dir = retired_log_dir
 
-    server_ref = {"server": None}
+    # Opened before the jobs of a journal are recovered: they are queued too.
+    if trace_file:
+        handler.trace = job_trace.JobTrace(os.path.realpath(os.path.expanduser(str(trace_file))))
+
+    journal = job_journal.open_journal(os.path.realpath(os.path.expanduser(str(journal_file)))) if journal_file else None
+    if journal is not None:
+        # A journal left behind is a session of the same name that died: its
+        # unfinished jobs are queued again before anything new.
+        job_journal.recover_jobs(journal, handler, log_size_limit=logsize)
+        journal.set_meta(
+            session_name=_session_name(host, session_name),
+            nb_jobs=jobs,
+            logsize=logsize,
+            pid=os.getpid(),
+            boot_id=job_journal.boot_id(),
+        )
+        handler.journal = journal
+
+    server_ref = {"server": None, "shutdown_requested": False}
 
     def _request_server_shutdown():
+        server_ref["shutdown_requested"] = True
         server = server_ref.get("server")
         if server is not None:
             server.should_exit = True
@@ -126,15 +233,55 @@ def run_daemon(
     )
     server_ref["server"] = server
 
-    _write_state_file(state_file=state_file, host=host, port=port, session_name=session_name)
+    sockets = None
+    unix_socket = None
+    if socket_file is not None:
+        socket_file = os.path.realpath(os.path.expanduser(str(socket_file)))
+        if local_socket.usable_path(socket_file):
+            try:
+                unix_socket = local_socket.bind(socket_file)
+            except OSError:
+                unix_socket = None
+        if unix_socket is not None:
+            # uvicorn serves the sockets it is given instead of binding its own.
+            sockets = [server.config.bind_socket(), unix_socket]
+        else:
+            socket_file = None
+
+    _write_state_file(state_file=state_file, host=host, port=port, session_name=session_name, socket_file=socket_file)
+    # Found by "odatix ls" and the GUI without scanning the processes of the host.
+    heartbeat = daemon_registry.Heartbeat(
+        daemon_registry.DaemonRegistry(),
+        {
+            "pid": os.getpid(),
+            "state_file": state_file,
+            "workspace_root": os.path.dirname(state_dir),
+            "session_name": _session_name(host, session_name),
+            "host": host,
+            "port": port,
+        },
+    )
+    heartbeat.start()
 
     try:
-        server.run()
+        server.run(sockets=sockets)
     finally:
+        heartbeat.stop()
+        if unix_socket is not None:
+            local_socket.remove(socket_file)
+        if journal is not None:
+            # Closed first, so the jobs terminated below stay unfinished in it.
+            # Only a session asked to stop discards its jobs: one stopped by a
+            # signal (a shutdown of the host) recovers them when restarted.
+            journal.close(discard=server_ref["shutdown_requested"])
         try:
             handler.stop_headless(terminate_jobs=True, timeout=2.0)
         except Exception:
             pass
+        if handler.trace is not None:
+            # After the jobs were terminated: their spans end with the session.
+            handler.trace.close()
+        shutil.rmtree(retired_log_dir, ignore_errors=True)
         _delete_state_file(state_file)
         _cleanup_state_dir_if_empty(state_file)
 
@@ -149,6 +296,12 @@ def main(args=None):
         session_name=args.session_name,
         jobs=args.jobs,
         logsize=args.logsize,
+        queue_policy=args.queue_policy,
+        autoscale=args.autoscale,
+        pin_cpus=args.pin_cpus,
+        journal_file=args.journal_file,
+        socket_file=args.socket_file,
+        trace_file=args.trace_file,
     )
 
 
@@ -0,0 +1,118 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Estimated time left of running jobs, and throughput of a session.
+
+The time a running job has left is estimated from, in this order:
+
+  * the expected runtime of the steps it has left to run, the one it is in
+    minus the time it has spent in it ("steps", jobs split into steps),
+  * its expected runtime minus the time it has been running ("history"),
+  * its progress, extrapolated from the time it has been running
+    ("progress"), once it is far enough into the job to say something.
+
+Expected runtimes come from the runtime history of the workspace (see
+odatix.lib.parallel_job_handler.runtime_history). A job running longer than
+expected falls back to the next source rather than being announced as done.
+
+The ETA of the session plays the queue on nb_jobs slots behind the running
+jobs, each queued job taking its expected runtime or, when the history knows
+nothing of it, the mean runtime of the jobs of the session that succeeded
+("session").
+
+The throughput is the number of jobs that finished over the last hour (or
+since the session started, when it is younger), in jobs per hour.
+"""
+
+# What the time left of a running job is estimated from.
+BASIS_STEPS = "steps"
+BASIS_HISTORY = "history"
+BASIS_PROGRESS = "progress"
+BASIS_SESSION = "session"
+
+# Below this progress (%), extrapolating it says little.
+MIN_PROGRESS = 5
+
+# Window the throughput is measured over, in seconds.
+THROUGHPUT_WINDOW = 3600.0
+
+
+def remaining_from_steps(step_names, current_index, step_elapsed, step_expected):
+    """
+    Time left to a job running the step `current_index` of `step_names` since
+    `step_elapsed` seconds, given the expected runtime of its steps ({name:
+    seconds}). None when one of the steps left is unknown, or when the job
+    already ran longer than all of them.
+    """
+    if current_index is None or step_elapsed is None:
+        return None
+    left = list(step_names or [])[int(current_index):]
+    if not left or any(step_expected.get(name) is None for name in left):
+        return None
+    remaining = sum(step_expected[name] for name in left) - float(step_elapsed)
+    return remaining if remaining > 0 else None
+
+
+def remaining_from_history(elapsed, expected):
+    """Time left to a job running since `elapsed` seconds and expected to take `expected`, or None."""
+    if expected is None or elapsed is None:
+        return None
+    remaining = float(expected) - float(elapsed)
+    return remaining if remaining > 0 else None
+
+
+def remaining_from_progress(elapsed, progress):
+    """Time left to a job running since `elapsed` seconds and `progress` % done, or None."""
+    try:
+        progress = float(progress)
+    except (TypeError, ValueError):
+        return None
+    if elapsed is None or progress < MIN_PROGRESS or progress >= 100:
+        return None
+    return float(elapsed) * (100.0 - progress) / progress
+
+
+def throughput_per_hour(finish_times, session_start, now, window=THROUGHPUT_WINDOW):
+    """
+    Jobs per hour, from the epoch times jobs finished at. The window is the last
+    `window` seconds, or the time since `session_start` when shorter. 0.0 when
+    nothing can be said yet.
+    """
+    if session_start is None:
+        return 0.0
+    span = min(float(window), float(now) - float(session_start))
+    if span <= 0:
+        return 0.0
+    finished = sum(1 for finish in finish_times if finish is not None and finish >= now - span)
+    return finished * 3600.0 / span
+
+
+def format_duration(seconds):
+    """A short duration for the monitors: "45s", "12m30s", "3h05m", "2d04h"."""
+    seconds = max(0, int(round(float(seconds))))
+    if seconds < 60:
+        return "{}s".format(seconds)
+    if seconds < 3600:
+        return "{}m{:02d}s".format(seconds // 60, seconds % 60)
+    if seconds < 86400:
+        return "{}h{:02d}m".format(seconds // 3600, (seconds % 3600) // 60)
+    return "{}d{:02d}h".format(seconds // 86400, (seconds % 86400) // 3600)
@@ -0,0 +1,462 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Parallel k-ary probing of an fmax search.
+
+find_fmax.tcl bisects: one synthesis at a time, each one halving the interval.
+At the tail of a sweep, that leaves the handler with idle slots while the last
+few searches crawl along. A job that opted in ("fmax_probing") is searched from
+the handler instead: each round splits the current interval into k+1 parts and
+synthesizes its k inner frequencies side by side, which divides the interval by
+k+1 per round instead of 2. k is one plus the number of slots nobody is waiting
+for, so a probing job never takes a slot from a queued job, and every probe
+counts as a running unit of its own against `nb_jobs`.
+
+Each probe is a separate tool process, run in its own copy of the job directory
+(<tmp_dir>/probes/<frequency>MHz) with find_fmax.tcl in probe mode
+("fmax_probe_frequency" in settings.tcl): it synthesizes at that frequency
+only, and writes its verdict in its frequency_search.log, in the same format as
+a search iteration. Once the search is over, the reports, results and
+constraints of the highest probe meeting timing are copied back to the job
+directory, and its frequency_search.log and status.log are written as
+find_fmax.tcl would have: exporting the result does not know the difference.
+
+The price of a probe is that of a tool session: unlike the iterations of
+find_fmax.tcl, probes do not share an elaborated design. This is why probing is
+opt-in, and only offered to flows that are not split into steps.
+
+After each round, the search is saved in the same state file as find_fmax.tcl's
+(see odatix.lib.fmax_search_state): an interrupted probing job resumes like any
+other, whichever of the two led the search before.
+"""
+
+import math
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+
+import odatix.lib.fmax_search_state as fmax_search_state
+import odatix.lib.hard_settings as hard_settings
+
+# Verdicts of a probe, as written by find_fmax.tcl.
+MET = "MET"
+VIOLATED = "VIOLATED"
+FAILED = "FAILED"
+INFINITE = "INFINITE"
+
+PROBE_LOG_FILENAME = "probe.log"
+
+_verdict_pattern = re.compile(r"([0-9]+) MHz: (" + "|".join((MET, VIOLATED, FAILED, INFINITE)) + r")\s*$", re.MULTILINE)
+_set_pattern = re.compile(r"^\s*set\s+(\w+)\s+(\S+)\s*$", re.MULTILINE)
+
+# Work products of a job directory a probe does not need a copy of.
+_probe_copy_ignore = (
+    hard_settings.fmax_probe_path,
+    hard_settings.work_log_path,
+    hard_settings.work_report_path,
+    hard_settings.work_report_path + "_MET",
+    hard_settings.work_report_path + "_VIOLATED",
+    hard_settings.work_result_path,
+)
+
+
+def _read_int_settings(config_file):
+    values = {}
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            content = f.read()
+    except OSError:
+        content = ""
+    for name, value in _set_pattern.findall(content):
+        try:
+            values[name] = int(value)
+        except ValueError:
+            pass
+    return values
+
+
+def read_search_settings(config_file):
+    """
+    The search settings of a job, read from its tcl config file
+    (scripts/settings.tcl), with find_fmax.tcl's own defaults for what is not a
+    plain number there.
+    """
+    values = _read_int_settings(config_file)
+    safezone = values.get("fmax_safezone", 5)
+    return {
+        "lower_bound": values.get("fmax_lower_bound", hard_settings.default_fmax_lower_bound),
+        "upper_bound": values.get("fmax_upper_bound", hard_settings.default_fmax_upper_bound),
+        "mindiff": values.get("fmax_mindiff", 1),
+        "explore": bool(values.get("fmax_explore", 0)),
+        "explore_step": values.get("fmax_explore_step", 2 * safezone),
+        "safezone": safezone,
+        "configured_bounds": (
+            (values.get("fmax_configured_lower_bound", 0), values.get("fmax_configured_upper_bound", 0))
+            if values.get("fmax_warm_start", 0) else None
+        ),
+    }
+
+
+def resume_requested(config_file):
+    """Whether the tcl config file of a job asks to resume its search ("fmax_resume")."""
+    return bool(_read_int_settings(config_file).get("fmax_resume", 0))
+
+
+class FmaxProbeSearch:
+    """
+    The state of a search led by probes: the bounds, what was probed and what
+    each probe said. Follows the rules of find_fmax.tcl, verdicts included
+    ("FAILED" counts as violated, "INFINITE" ends the search).
+
+    Probes of a round finish in any order. A verdict on a frequency the
+    interval has already left (a probe meeting timing above one that violated
+    it) is stale: it is recorded in the history, but moves no bound.
+    """
+
+    def __init__(self, lower_bound, upper_bound, mindiff=1, explore=False, explore_step=10, safezone=5, configured_bounds=None):
+        self.lower_bound = int(lower_bound)
+        self.upper_bound = int(upper_bound)
+        self.start_lower_bound = self.lower_bound
+        self.start_upper_bound = self.upper_bound
+        self.initial_bounds = (self.lower_bound, self.upper_bound)
+        self.mindiff = max(1, int(mindiff))
+        self.explore = bool(explore)
+        self.explore_step = max(1, int(explore_step))
+        self.safezone = int(safezone)
+        # Those of a warm-started search (see find_fmax.tcl): widening never
+        # leaves them, and doubles the explore step.
+        self.configured_bounds = tuple(int(bound) for bound in configured_bounds) if configured_bounds else None
+
+        self.got_met = False
+        self.got_violated = False
+        self.infinite = False
+        self.rounds = 0
+        self.history = []
+        self.resumed_runs = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(**settings)
+
+    @property
+    def runs(self):
+        """Syntheses the search has had, before a resume included."""
+        return self.resumed_runs + len(self.history)
+
+    def state(self, done=False):
+        """The search as a state of odatix.lib.fmax_search_state."""
+        return {
+            "search": "",
+            "requested_lower_bound": self.initial_bounds[0],
+            "requested_upper_bound": self.initial_bounds[1],
+            "lower_bound": self.lower_bound,
+            "upper_bound": self.upper_bound,
+            "start_lower_bound": self.start_lower_bound,
+            "start_upper_bound": self.start_upper_bound,
+            "got_met": int(self.got_met),
+            "got_violated": int(self.got_violated),
+            "runs": self.runs,
+            "max_runs": self.max_rounds(),
+            "explore_step": self.explore_step,
+            "best_met": self.lower_bound if self.got_met else 0,
+            "bracketed": 0,
+            "done": int(bool(done)),
+        }
+
+    def resume(self, state):
+        """
+        Continue from a saved state, if it is an unfinished search of the same
+        requested bounds. Returns whether it was.
+        """
+        if state is None or state.get("search", "") not in ("", None):
+            return False
+        lower_bound, upper_bound = self.initial_bounds
+        if not fmax_search_state.is_resumable_state(state, lower_bound, upper_bound):
+            return False
+        try:
+            self.lower_bound = int(state["lower_bound"])
+            self.upper_bound = int(state["upper_bound"])
+            self.start_lower_bound = int(state.get("start_lower_bound", self.lower_bound))
+            self.start_upper_bound = int(state.get("start_upper_bound", self.upper_bound))
+            self.got_met = bool(int(state.get("got_met", 0)))
+            self.got_violated = bool(int(state.get("got_violated", 0)))
+            self.explore_step = max(1, int(state.get("explore_step", self.explore_step)))
+            self.resumed_runs = int(state["runs"])
+        except (KeyError, TypeError, ValueError):
+            self.__init__(
+                lower_bound, upper_bound, self.mindiff, self.explore, self.explore_step, self.safezone, self.configured_bounds
+            )
+            return False
+        return True
+
+    @property
+    def width(self):
+        return self.upper_bound - self.lower_bound
+
+    @property
+    def done(self):
+        return self.infinite or abs(self.width) < self.mindiff + 1
+
+    def max_rounds(self, k=1):
+        """How many rounds of k probes the current interval takes, at most."""
+        width = max(1.0, float(self.start_upper_bound - self.start_lower_bound) / self.mindiff)
+        return max(1, int(math.ceil(math.log(width) / math.log(k + 1))))
+
+    def next_frequencies(self, k):
+        """
+        The k frequencies of the next round: the interval split into k+1 equal
+        parts. With k = 1, that is the frequency find_fmax.tcl would try next.
+        """
+        if self.done:
+            return []
+        k = max(1, min(int(k), self.width - 1))
+        self.rounds += 1
+        frequencies = sorted({self.lower_bound + (self.width * index) // (k + 1) for index in range(1, k + 1)})
+        return [frequency for frequency in frequencies if self.lower_bound < frequency < self.upper_bound]
+
+    def is_stale(self, frequency):
+        """Whether a verdict on `frequency` can no longer move a bound."""
+        return not self.lower_bound < int(frequency) < self.upper_bound
+
+    def record(self, frequency, verdict):
+        frequency = int(frequency)
+        self.history.append((frequency, verdict))
+        if verdict == INFINITE:
+            self.infinite = True
+            return
+        if self.is_stale(frequency):
+            return
+        if verdict == MET:
+            self.lower_bound = frequency
+            self.got_met = True
+        else:
+            self.upper_bound = frequency
+            self.got_violated = True
+
+    def end_round(self):
+        """
+        Widen the interval when every frequency so far met (or violated)
+        timing and exploring is allowed, as find_fmax.tcl does.
+        """
+        if not self.explore or self.infinite or self.width >= self.safezone or self.runs <= 2:
+            return
+        if not self.got_violated:
+            self.upper_bound += self.explore_step
+            if self.configured_bounds is not None:
+                self.upper_bound = min(self.upper_bound, self.configured_bounds[1])
+            self.start_upper_bound = self.upper_bound
+        if not self.got_met:
+            self.lower_bound = max(1, self.lower_bound - self.explore_step)
+            if self.configured_bounds is not None:
+                self.lower_bound = max(self.lower_bound, self.configured_bounds[0])
+            self.start_lower_bound = self.lower_bound
+        if self.configured_bounds is not None and self.width >= self.safezone:
+            self.explore_step *= 2
+
+    def outcome(self):
+        """
+        (success, message) of the search once done, the message being what
+        find_fmax.tcl writes at the end of frequency_search.log.
+        """
+        if self.got_met and self.got_violated and not self.infinite:
+            return True, hard_settings.valid_frequency_search + ": " + str(self.lower_bound) + " MHz"
+        if self.infinite or not (self.got_met or self.got_violated):
+            return False, (
+                "Path is unconstrained. Make sure there are registers at input and output of design. "
+                "Both the rtl description and the tool's synthesis choices could be at fault"
+            )
+        if not self.got_violated:
+            return False, "No timing violated! Try raising the upper bound (" + str(self.upper_bound) + " MHz)"
+        return False, "No timing met! Try lowering the lower bound (" + str(self.lower_bound) + " MHz)"
+
+
+######################################
+# Probe directories
+######################################
+
+def probe_directory(tmp_dir, frequency):
+    return os.path.join(str(tmp_dir), hard_settings.fmax_probe_path, str(int(frequency)) + "MHz")
+
+
+def clear_probe_directories(tmp_dir):
+    shutil.rmtree(os.path.join(str(tmp_dir), hard_settings.fmax_probe_path), ignore_errors=True)
+
+
+def prepare_probe_directory(tmp_dir, frequency):
+    """Copy a job directory into the directory of one of its probes."""
+    from odatix.lib.prepare_work import edit_probe_config_file
+
+    probe_dir = probe_directory(tmp_dir, frequency)
+    shutil.rmtree(probe_dir, ignore_errors=True)
+    shutil.copytree(str(tmp_dir), probe_dir, symlinks=True, ignore=lambda src, names: [
+        name for name in names if os.path.realpath(src) == os.path.realpath(str(tmp_dir)) and name in _probe_copy_ignore
+    ])
+    os.makedirs(os.path.join(probe_dir, hard_settings.work_log_path), exist_ok=True)
+    edit_probe_config_file(
+        os.path.join(probe_dir, hard_settings.work_script_path, hard_settings.tcl_config_filename), probe_dir, frequency
+    )
+    return probe_dir
+
+
+def probe_command(command, tmp_dir, probe_dir):
+    """The command of a job, pointed at one of its probe directories."""
+    return str(command).replace(os.path.realpath(str(tmp_dir)), os.path.realpath(probe_dir))
+
+
+def read_probe_verdict(probe_dir):
+    """The verdict a probe wrote in its frequency_search.log, or None."""
+    path = os.path.join(probe_dir, hard_settings.work_log_path, hard_settings.frequency_search_filename)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            matches = _verdict_pattern.findall(f.read())
+    except OSError:
+        return None
+    return matches[-1][1] if matches else None
+
+
+class FmaxProbe:
+    """One probe of a search: a tool process synthesizing at one frequency."""
+
+    def __init__(self, frequency, directory):
+        self.frequency = int(frequency)
+        self.directory = directory
+        self.process = None
+        self._log = None
+
+    def start(self, command, cwd, process_group=True, preexec_fn=None, env=None):
+        """Start the probe. `preexec_fn`, when given, replaces the process group of `process_group`."""
+        if preexec_fn is None and sys.platform != "win32" and process_group:
+            preexec_fn = os.setpgrp
+        # A probe's output goes to a file of its own: the job log only gets a
+        # line per verdict, several probes writing to it at once being unreadable.
+        self._log = open(os.path.join(self.directory, PROBE_LOG_FILENAME), "wb")
+        self.process = subprocess.Popen(
+            command,
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+            shell=True,
+            preexec_fn=preexec_fn,
+            env=env,
+        )
+        return self
+
+    def poll(self):
+        """None while running, then the verdict ("FAILED" when there is none)."""
+        if self.process is None or self.process.poll() is None:
+            return None
+        self._close_log()
+        verdict = read_probe_verdict(self.directory)
+        if verdict is None or (self.process.returncode != 0 and verdict == MET):
+            return FAILED
+        return verdict
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            try:
+                if sys.platform == "win32":
+                    self.process.send_signal(signal.CTRL_BREAK_EVENT)
+                else:
+                    os.killpg(os.getpgid(self.process.pid), signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self._close_log()
+
+    def wait(self):
+        if self.process is not None:
+            self.process.wait()
+        self._close_log()
+
+    def _close_log(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+######################################
+# Job directory
+######################################
+
+def write_search_status(tmp_dir, search, k=1):
+    """Progress of a search, in the job's status.log, as find_fmax.tcl writes it."""
+    max_rounds = max(search.rounds, search.max_rounds(k))
+    path = os.path.join(str(tmp_dir), hard_settings.work_log_path, hard_settings.fmax_status_filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        if search.done:
+            f.write(hard_settings.valid_status + " ({}/{})\n".format(search.rounds, search.rounds))
+        else:
+            progress = int(round(100 * max(0, search.rounds - 1) / max_rounds))
+            f.write("In progress: {}% ({}/{})\n".format(progress, search.rounds, max_rounds))
+
+
+def finish_search(tmp_dir, search):
+    """
+    Leave the job directory as find_fmax.tcl would have: the work products of
+    the highest probe meeting timing, and the search log ending with the
+    verdict. Returns (success, message).
+    """
+    tmp_dir = str(tmp_dir)
+    success, message = search.outcome()
+
+    best_dir = probe_directory(tmp_dir, search.lower_bound)
+    if success and not os.path.isdir(best_dir):
+        # Met before a resume, by find_fmax.tcl or an earlier probing run: its
+        # reports were kept in report_MET.
+        met_dir = os.path.join(tmp_dir, hard_settings.work_report_path + "_MET")
+        if os.path.isdir(met_dir):
+            report_dir = os.path.join(tmp_dir, hard_settings.work_report_path)
+            shutil.rmtree(report_dir, ignore_errors=True)
+            shutil.copytree(met_dir, report_dir)
+    elif success:
+        for name in os.listdir(best_dir):
+            source = os.path.join(best_dir, name)
+            destination = os.path.join(tmp_dir, name)
+            if name in (hard_settings.work_report_path, hard_settings.work_result_path):
+                shutil.rmtree(destination, ignore_errors=True)
+                shutil.copytree(source, destination, symlinks=True)
+            elif os.path.isfile(source) and name != PROBE_LOG_FILENAME:
+                # frequency.txt, the constraints file: what the tool was run with
+                shutil.copy2(source, destination)
+        best_reports = os.path.join(best_dir, hard_settings.work_report_path)
+        if os.path.isdir(best_reports):
+            met_dir = os.path.join(tmp_dir, hard_settings.work_report_path + "_MET")
+            shutil.rmtree(met_dir, ignore_errors=True)
+            shutil.copytree(best_reports, met_dir)
+
+    log_dir = os.path.join(tmp_dir, hard_settings.work_log_path)
+    os.makedirs(log_dir, exist_ok=True)
+    with open(os.path.join(log_dir, hard_settings.frequency_search_filename), "w", encoding="utf-8") as f:
+        f.write(
+            "Parallel probing for interval [{}:{}] MHz\n\n".format(*search.initial_bounds)
+        )
+        if search.resumed_runs:
+            f.write("Resumed after {} runs\n".format(search.resumed_runs))
+        for frequency, verdict in search.history:
+            f.write("{} MHz: {}\n".format(frequency, verdict))
+        f.write("\n" + message + "\n")
+    write_search_status(tmp_dir, search)
+    fmax_search_state.write_state(tmp_dir, search.state(done=True))
+    return success, message
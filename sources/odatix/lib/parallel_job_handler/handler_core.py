@@ -33,6 +33,8 @@ import locale
 import io
 import contextlib
 import threading
+import collections
+import heapq
 
 if sys.platform == "win32":
     import msvcrt
@@ -51,13 +53,36 @@ from odatix.lib.parallel_job_handler.job_output_formatter import JobOutputFormat
 from odatix.lib.utils import open_path_in_explorer, find_free_port
 from odatix.lib.parallel_job_handler.theme import Theme
 from odatix.lib.parallel_job_handler.job import ParallelJob
-from odatix.lib.parallel_job_handler.utils import get_elapsed_time_str, read_pipe_windows
+from odatix.lib.parallel_job_handler.job_array import JobArray
+from odatix.lib.parallel_job_handler.utils import chain_preexec, get_elapsed_time_str, read_pipe_windows
 from odatix.lib.parallel_job_handler import curses_ui
+from odatix.lib.parallel_job_handler.autoscaler import Autoscaler
+from odatix.lib.parallel_job_handler import cpu_pinning
+from odatix.lib.parallel_job_handler import eta
+from odatix.lib.parallel_job_handler import fmax_probing
+from odatix.lib.parallel_job_handler import job_journal
+from odatix.lib.parallel_job_handler import memory_limits
+from odatix.lib.parallel_job_handler import metrics
+from odatix.lib.parallel_job_handler import resource_usage
+from odatix.lib.parallel_job_handler import runtime_history
+from odatix.lib.parallel_job_handler import slot_broker
+from odatix.lib.parallel_job_handler.resources import CORES, MEMORY_GB, LicensePools, ResourceBudget, add_costs, normalize_cost, scale_cost
 import odatix.lib.hard_settings as hard_settings
+import odatix.lib.fmax_search_state as fmax_search_state
 import odatix.lib.printc as printc
 
 ENCODING = locale.getpreferredencoding()
 
+# Batches enqueued in chunks whose progress is kept, once done, for a client
+# retrying its last chunk.
+ENQUEUE_BATCHES_KEPT = 32
+
+# How long the expected finishes of the queued jobs, and which of them wait for
+# a license, are kept by the snapshots when nothing is queued, started or ended.
+QUEUE_VIEW_SECONDS = 10.0
+# The changes of a job that move its expected finish or its license wait.
+QUEUE_VIEW_FIELDS = frozenset(("status", "resources", "licenses", "_runtime_prediction"))
+
 # Handle BUTTON5_PRESSED missing in some curses versions
 if not hasattr(curses, "BUTTON5_PRESSED"):
     curses.BUTTON5_PRESSED = 2097152
@@ -99,19 +124,95 @@ class _JobLogWriter(io.TextIOBase):
 ######################################
 
 class ParallelJobHandler:
-    def __init__(self, job_list, nb_jobs=4, process_group=True, auto_exit=False, format_yaml=None, log_size_limit=200):
+    def __init__(self, job_list, nb_jobs=4, process_group=True, auto_exit=False, format_yaml=None, log_size_limit=200, queue_policy=runtime_history.DEFAULT_POLICY):
         self.job_list = list(job_list) if job_list is not None else []
         self.nb_jobs = int(nb_jobs)
         self.process_group = bool(process_group)
         self.auto_exit = bool(auto_exit)
         self.log_size_limit = int(log_size_limit)
 
+        # What the host offers the jobs declaring a cost (see
+        # odatix.lib.parallel_job_handler.resources).
+        self.resource_budget = ResourceBudget()
+        self.license_pools = LicensePools()
+        for job in self.job_list:
+            self.license_pools.declare(getattr(job, "licenses", None))
+
+        # The order queued jobs start in, from how long they are expected to
+        # take (see odatix.lib.parallel_job_handler.runtime_history).
+        self.queue_policy = runtime_history.normalize_policy(queue_policy) or runtime_history.DEFAULT_POLICY
+        self._runtime_histories = {}
+
+        # Scales nb_jobs with the load of the host, when enabled (see
+        # odatix.lib.parallel_job_handler.autoscaler and configure_autoscaler).
+        self.autoscaler = None
+        self.autoscaler_log_path = None
+
+        # Job slots shared with the other sessions of the host, when the daemon
+        # joins them (see odatix.lib.parallel_job_handler.slot_broker).
+        self.slot_broker = None
+        self._slot_broker_synced = 0.0
+        self._slot_broker_demand = 0
+
+        # Cores of their own for the running jobs, when pinning is on (see
+        # odatix.lib.parallel_job_handler.cpu_pinning).
+        self.cpu_pinning = None
+
+        # Memory limit of the jobs that declare none, in GB (see
+        # odatix.lib.parallel_job_handler.memory_limits), and where their cgroups
+        # go, detected on first use.
+        self.memory_limit_gb = None
+        self._cgroup_parent = None
+        self._cgroup_parent_detected = False
+
+        # Samples what the processes of the running jobs use, in daemon
+        # sessions (see odatix.lib.parallel_job_handler.resource_usage).
+        self.resource_sampler = resource_usage.ResourceSampler() if resource_usage.supported() else None
+
+        # Version of the state of the jobs, bumped on each change of a job,
+        # for clients to fetch only what changed (see snapshot). The epoch
+        # tells the versions of two runs of a daemon apart. The jobs that
+        # changed are kept by index, the last one changed last.
+        self.state_version = 0
+        self.state_epoch = "{:x}".format(int(time.time() * 1000))
+        self._changed_jobs = collections.OrderedDict()
+        self._queue_view = None
+        for index, job in enumerate(self.job_list):
+            self._watch_job_unlocked(index, job)
+
+        # Write-ahead journal of the jobs, in daemon sessions (see
+        # odatix.lib.parallel_job_handler.job_journal).
+        self.journal = None
+
+        # Trace of the phases the jobs go through, in daemon sessions (see
+        # odatix.lib.parallel_job_handler.job_trace).
+        self.trace = None
+
+        # Batches of jobs enqueued in chunks, by batch id (see enqueue_chunk).
+        self.enqueue_batches = collections.OrderedDict()
+
+        # Job arrays received (see add_job_array), and those with jobs not
+        # dispatched yet, in the order they came.
+        self.job_arrays = []
+        self._pending_arrays = collections.deque()
+
         self.version = read_version()
 
         self.running_job_list = []
         self.retired_job_list = []
         self.job_queue = queue.Queue()
 
+        # Output of the running jobs not cut into lines yet, by job and stream.
+        self._log_stream_states = {}
+
+        # Retired jobs are compacted to a summary, their logs moved to files of
+        # retired_log_dir, once retired_jobs_kept jobs have retired after them
+        # (daemon sessions, see _compact_retired_jobs_unlocked).
+        self.retired_log_dir = None
+        self.retired_jobs_kept = hard_settings.daemon_retired_jobs_kept
+        self._retired_to_compact = collections.deque()
+        self._compacted_count = 0
+
         # Work to run once, when nothing is running and nothing is queued
         # anymore. Per-job exports (post_run_export) cannot cover everything a
         # batch produces: a derived metric reads records of other jobs, which
@@ -152,8 +253,11 @@ class ParallelJobHandler:
         except Exception:
             self.theme = Theme('ASCII_Highlight')
 
+        # Health figures of the handler, served by /metrics (see metrics)
+        self.metrics = metrics.DaemonMetrics()
+
         # Headless / API control state (thread-safe)
-        self._lock = threading.RLock()
+        self._lock = metrics.TimedLock(threading.RLock(), self.metrics.lock_wait_seconds)
         self._command_queue = queue.Queue()
         self._stop_event = threading.Event()
         self._headless_thread = None
@@ -196,17 +300,50 @@ class ParallelJobHandler:
     # Headless control / snapshot API
     ######################################
 
-    def snapshot(self, logs_job_id=None, logs_offset=None, logs_limit=None):
+    def snapshot(self, logs_job_id=None, logs_offset=None, logs_limit=None, since=None, epoch=None):
         """Return a JSON-serializable snapshot of handler + job state.
 
         If logs_job_id is None, returns logs for the selected job.
+
+        Each job has a version, taken from the state version of the handler
+        when the job last changed. With `since` (a state version this handler
+        returned, of the same `epoch`), only the jobs that changed after it are
+        returned, and "delta" is True; otherwise every job is. A delta costs
+        what changed, not what the handler holds: jobs tell their changes as
+        they happen (see ParallelJob.__setattr__), the running ones are looked
+        at for what moves with the clock, and the expected finishes of the
+        queued ones are worked out again when the queue changes, or every
+        QUEUE_VIEW_SECONDS.
         """
         with self._lock:
+            now = time.time()
+            expected_finishes, expected_completion, waiting_for_license = self._queue_view_unlocked(now)
+            self._update_running_versions_unlocked(now)
+            delta = (
+                since is not None
+                and (epoch is None or str(epoch) == self.state_epoch)
+                and 0 <= int(since) <= self.state_version
+            )
+            if delta:
+                indexes = []
+                for index, version in reversed(self._changed_jobs.items()):
+                    if version <= int(since):
+                        break
+                    indexes.append(index)
+                indexes.sort()
+            else:
+                indexes = range(len(self.job_list))
             jobs = []
-            for idx, job in enumerate(self.job_list):
+            for idx in indexes:
+                job = self.job_list[idx]
+                if getattr(job, "_snapshot_listener", None) is None:
+                    # Put in job_list directly rather than through add_job.
+                    self._watch_job_unlocked(idx, job)
+                expected_finish = expected_finishes.get(id(job))
                 jobs.append(
                     {
                         "id": idx,
+                        "version": job.state_version,
                         "display_name": job.display_name,
                         "status": job.status,
                         "progress": getattr(job, "progress", 0),
@@ -215,6 +352,18 @@ class ParallelJobHandler:
                         "target": job.target,
                         "arch": job.arch,
                         "elapsed_time": get_elapsed_time_str(job.start_time, job.stop_time),
+                        "probes": [probe.frequency for probe in getattr(job, "_fmax_probes", None) or []],
+                        "sweep_dirs": list(getattr(job, "sweep_dirs", None) or []),
+                        "resources": self._job_cost(job),
+                        "licenses": sorted(self._job_licenses(job)),
+                        "waiting_for_license": id(job) in waiting_for_license,
+                        "expected_runtime": self._expected_runtime(job),
+                        "expected_runtime_basis": getattr(getattr(job, "_runtime_prediction", None), "basis", None),
+                        "expected_finish": expected_finish,
+                        "eta": self._eta_seconds(expected_finish, now),
+                        "eta_basis": self._eta_basis(job, now),
+                        "memory_limit_gb": self._memory_limit_gb(job),
+                        "resource_usage": job.resource_usage.to_dict() if getattr(job, "resource_usage", None) else None,
                     }
                 )
 
@@ -257,8 +406,12 @@ class ParallelJobHandler:
                 }
 
             return {
+                "delta": bool(delta),
                 "handler": {
                     "version": str(self.version),
+                    "state_version": self.state_version,
+                    "state_epoch": self.state_epoch,
+                    "time": round(now, 3),
                     "nb_jobs": int(self.nb_jobs),
                     "process_group": bool(self.process_group),
                     "auto_exit": bool(self.auto_exit),
@@ -267,13 +420,198 @@ class ParallelJobHandler:
                     "job_count": int(self.job_count),
                     "running": len(self.running_job_list),
                     "queued": int(self.job_queue.qsize()),
+                    "pending_in_arrays": self._pending_in_arrays_unlocked(),
                     "retired": len(self.retired_job_list),
                     "theme": getattr(self.theme, "theme", None),
+                    "resources": self._resources_unlocked(),
+                    "licenses": self._licenses_unlocked(waiting_for_license),
+                    "queued_on_license": len(waiting_for_license),
+                    "queue_policy": self.queue_policy,
+                    "expected_completion": expected_completion,
+                    "eta": self._eta_seconds(expected_completion, now),
+                    "throughput_per_hour": round(self._throughput_unlocked(now), 2),
+                    "autoscaler": self._autoscaler_unlocked(),
+                    "host_slots": self._host_slots_unlocked(),
+                    "cpu_pinning": self._cpu_pinning_unlocked(),
+                    "memory_limit_gb": self.memory_limit_gb,
+                    "journal": self._journal_unlocked(),
+                    "trace": self.trace.to_dict() if self.trace is not None else None,
+                    "enqueuing": self._enqueue_batches_unlocked(),
+                    "job_arrays": self._job_arrays_unlocked(),
                 },
                 "jobs": jobs,
                 "logs": logs,
             }
 
+    def log_since(self, job_id, from_seq=0):
+        """
+        The lines of the log of a job from line number `from_seq` on. Lines are
+        numbered from the start of the job: lines dropped past log_size_limit
+        keep their numbers, so "from_seq" may come back higher than asked.
+        Returns None for an unknown job.
+        """
+        with self._lock:
+            if not 0 <= int(job_id) < len(self.job_list):
+                return None
+            job = self.job_list[int(job_id)]
+            first_seq = int(getattr(job, "log_dropped", 0))
+            from_seq = max(first_seq, int(from_seq))
+            lines = list(job.log_history[from_seq - first_seq:])
+            return {
+                "job_id": int(job_id),
+                "from_seq": from_seq,
+                "next_seq": from_seq + len(lines),
+                "lines": lines,
+            }
+
+    def _watch_job_unlocked(self, index, job):
+        """Have a job of job_list tell its changes to the handler (see snapshot)."""
+        job._snapshot_listener = lambda changed_job, name: self._job_changed_unlocked(index, changed_job, name)
+        self._job_changed_unlocked(index, job)
+
+    def _job_changed_unlocked(self, index, job, name=None):
+        self.state_version += 1
+        job.state_version = self.state_version
+        self._changed_jobs[index] = self.state_version
+        self._changed_jobs.move_to_end(index)
+        if name in QUEUE_VIEW_FIELDS:
+            self._queue_view = None
+
+    def _all_jobs_changed_unlocked(self):
+        """For the settings that change the entry of every job."""
+        self._queue_view = None
+        for index, job in enumerate(self.job_list):
+            self._job_changed_unlocked(index, job)
+
+    def _update_running_versions_unlocked(self, now):
+        """
+        Bump the versions of the running jobs for what moves without being set:
+        their elapsed time, in seconds, their probes and their resource usage.
+        """
+        for job in self.running_job_list:
+            usage = getattr(job, "resource_usage", None)
+            state = (
+                int(now - job.start_time) if job.start_time is not None and job.stop_time is None else None,
+                tuple(probe.frequency for probe in getattr(job, "_fmax_probes", None) or []),
+                usage.samples if usage is not None else None,
+            )
+            if state != getattr(job, "_snapshot_running", None):
+                job._snapshot_running = state
+                listener = getattr(job, "_snapshot_listener", None)
+                if listener is not None:
+                    listener(job, None)
+
+    def _queue_view_unlocked(self, now):
+        """
+        The expected finish of each job, when everything is expected to be done,
+        and the ids of the queued jobs waiting for a license (see snapshot).
+        What the queued jobs get is kept until the queue changes, the expected
+        finish of a running job moves by a 10 s step, or for QUEUE_VIEW_SECONDS:
+        working it out goes through the whole queue. The versions of the jobs
+        whose expected finish (in 10 s steps) or license wait changed are
+        bumped.
+        """
+        running_finishes = {}
+        for job in self.running_job_list:
+            remaining = self._remaining_runtime(job, now)
+            if remaining is not None:
+                running_finishes[id(job)] = now + remaining[0]
+        key = (self.nb_jobs, tuple(sorted(
+            (id(job), int(running_finishes[id(job)] // 10) if id(job) in running_finishes else None)
+            for job in self.running_job_list
+        )))
+        view = self._queue_view
+        if view is not None and view[0] == key and now - view[1] < QUEUE_VIEW_SECONDS:
+            expected_finishes = dict(view[2])
+            expected_finishes.update(running_finishes)
+            return (expected_finishes,) + view[3:]
+        expected_finishes = self._expected_finishes_unlocked(now)
+        waiting_for_license = self._waiting_for_license_unlocked()
+        for job in self.running_job_list + list(getattr(self.job_queue, "queue", ())):
+            expected_finish = expected_finishes.get(id(job))
+            state = (None if expected_finish is None else int(expected_finish // 10), id(job) in waiting_for_license)
+            if state != getattr(job, "_snapshot_queued", None):
+                job._snapshot_queued = state
+                listener = getattr(job, "_snapshot_listener", None)
+                if listener is not None:
+                    listener(job, None)
+        self._queue_view = (key, now, expected_finishes, self._expected_completion(expected_finishes), waiting_for_license)
+        return self._queue_view[2:]
+
+    def session_estimates(self):
+        """
+        Time left to the session in seconds (None when it cannot be estimated)
+        and its throughput in jobs per hour, as shown by the monitors.
+        """
+        with self._lock:
+            now = time.time()
+            completion = self._expected_completion(self._expected_finishes_unlocked(now))
+            return self._eta_seconds(completion, now), self._throughput_unlocked(now)
+
+    # The parts of the snapshot the /config endpoints return, without building
+    # the rest of it.
+
+    def resources_status(self):
+        with self._lock:
+            return self._resources_unlocked()
+
+    def licenses_status(self):
+        with self._lock:
+            return self._licenses_unlocked()
+
+    def autoscaler_status(self):
+        with self._lock:
+            return self._autoscaler_unlocked()
+
+    def host_slots_status(self):
+        with self._lock:
+            return self._host_slots_unlocked()
+
+    def cpu_pinning_status(self):
+        with self._lock:
+            return self._cpu_pinning_unlocked()
+
+    def _resources_unlocked(self):
+        return self.resource_budget.to_dict(self._running_cost_unlocked())
+
+    def _licenses_unlocked(self, waiting_for_license=None):
+        held = self._held_licenses_unlocked()
+        if waiting_for_license is None:
+            waiting_for_license = self._waiting_for_license_unlocked(held)
+        license_waits = {}
+        for job in getattr(self.job_queue, "queue", ()):
+            if id(job) in waiting_for_license:
+                for pool in self._job_licenses(job):
+                    license_waits[pool] = license_waits.get(pool, 0) + 1
+        return self.license_pools.to_dict(held, license_waits)
+
+    def _autoscaler_unlocked(self):
+        return self.autoscaler.to_dict() if self.autoscaler is not None else None
+
+    def _cpu_pinning_unlocked(self):
+        return self.cpu_pinning.to_dict() if self.cpu_pinning is not None else None
+
+    def metrics_text(self):
+        """The health figures of the handler, in the Prometheus text format (see metrics)."""
+        with self._lock:
+            jobs_by_status = collections.Counter(str(job.status) for job in self.job_list)
+            return self.metrics.render(jobs_by_status, metrics.resident_memory_bytes())
+
+    @staticmethod
+    def _eta_seconds(finish, now):
+        return None if finish is None else int(round(max(0.0, finish - now)))
+
+    def _eta_basis(self, job, now):
+        """What the time left of a job is estimated from, or None."""
+        if job in self.running_job_list:
+            remaining = self._remaining_runtime(job, now)
+            return remaining[1] if remaining is not None else None
+        if job.status == "queued":
+            if self._expected_runtime(job) is not None:
+                return eta.BASIS_HISTORY
+            return eta.BASIS_SESSION if self._session_mean_runtime_unlocked() is not None else None
+        return None
+
     def select_job(self, job_id: int):
         with self._lock:
             job_id = int(job_id)
@@ -310,10 +648,15 @@ class ParallelJobHandler:
         with self._lock:
             self._headless_logs_height = max(1, int(height))
 
-    def configure_runtime(self, nb_jobs=None, process_group=None, auto_exit=None, log_size_limit=None, format_yaml=None):
+    def configure_runtime(self, nb_jobs=None, process_group=None, auto_exit=None, log_size_limit=None, format_yaml=None, resources=None, licenses=None, queue_policy=None, memory_limit_gb=None):
         """Update runtime scheduling options (daemon mode).
 
-        Any argument set to None keeps the current value.
+        Any argument set to None keeps the current value. `resources` sets the
+        limits of some resources of the budget (see ResourceBudget.configure),
+        `licenses` the size of some license pools (see LicensePools.configure),
+        `queue_policy` the order queued jobs start in ("lpt", "spt" or "fifo"),
+        `memory_limit_gb` the memory limit of the jobs that declare none (0 for
+        no limit).
         """
         with self._lock:
             if nb_jobs is not None:
@@ -326,9 +669,202 @@ class ParallelJobHandler:
                 self.log_size_limit = int(log_size_limit)
             if format_yaml is not None:
                 self._set_formatter(format_yaml)
+            if resources is not None:
+                self.resource_budget.configure(resources)
+            if licenses is not None:
+                self.license_pools.configure(licenses)
+            if queue_policy is not None:
+                policy = runtime_history.normalize_policy(queue_policy)
+                if policy is None:
+                    raise ValueError("Unknown queue policy '{}' (expected one of: {})".format(queue_policy, ", ".join(runtime_history.POLICIES)))
+                self.queue_policy = policy
+                self._sort_queue_unlocked()
+            if memory_limit_gb is not None:
+                self.memory_limit_gb = memory_limits.normalize_limit(memory_limit_gb)
+            if resources is not None or memory_limit_gb is not None:
+                self._all_jobs_changed_unlocked()
+            self._queue_view = None
 
             self._fill_running_slots_from_queue_unlocked()
 
+    def configure_autoscaler(self, min_jobs=None, max_jobs=None, enabled=True, interval=None):
+        """Enable, update or disable the autoscaler of nb_jobs (daemon mode).
+
+        Bounds left to None keep their current value, or default to the current
+        nb_jobs when the autoscaler is enabled. Returns its state, or None when
+        it is disabled.
+        """
+        with self._lock:
+            if not enabled:
+                self.autoscaler = None
+                return None
+            current = self.autoscaler
+            min_jobs = int(min_jobs) if min_jobs is not None else (current.min_jobs if current else self.nb_jobs)
+            max_jobs = int(max_jobs) if max_jobs is not None else (current.max_jobs if current else self.nb_jobs)
+            if min_jobs < 1 or max_jobs < min_jobs:
+                raise ValueError("Invalid autoscaling bounds [{}, {}]".format(min_jobs, max_jobs))
+            if current is None:
+                self.autoscaler = Autoscaler(min_jobs, max_jobs, log_path=self.autoscaler_log_path)
+            else:
+                current.min_jobs, current.max_jobs = min_jobs, max_jobs
+            if interval is not None:
+                self.autoscaler.interval = max(1.0, float(interval))
+            return self.autoscaler.to_dict()
+
+    def configure_cpu_pinning(self, enabled=True, cpus=None):
+        """Enable or disable the pinning of jobs to cores of their own (daemon mode).
+
+        `cpus` restricts the session to some cores, as a list or as taskset lists
+        them ("0-15"); None keeps the current ones, or all those available.
+        Running jobs keep their cores. Returns the state of the pinning, or None
+        when it is disabled.
+        """
+        with self._lock:
+            if not enabled:
+                self.cpu_pinning = None
+                return None
+            if not cpu_pinning.supported():
+                raise ValueError("CPU pinning needs sched_setaffinity, not available on this platform")
+            if isinstance(cpus, str):
+                cpus = cpu_pinning.parse_cpu_set(cpus)
+            if cpus is None and self.cpu_pinning is not None:
+                cpus = self.cpu_pinning.cpus
+            self.cpu_pinning = cpu_pinning.CpuPinning(cpus)
+            for owner in self._pinned_units_unlocked():
+                self.cpu_pinning.take(owner._cpu_set)
+            return self.cpu_pinning.to_dict()
+
+    def _pinned_units_unlocked(self):
+        """The running jobs and probes holding cores."""
+        units = []
+        for job in self.running_job_list:
+            units += [job] + list(getattr(job, "_fmax_probes", None) or [])
+        return [unit for unit in units if getattr(unit, "_cpu_set", None)]
+
+    def _nb_threads_unlocked(self, job):
+        """How many threads a unit of a job should run: the cores it holds, or its share."""
+        cores = self._job_cost(job).get(CORES)
+        if self.cpu_pinning is not None:
+            return self.cpu_pinning.width(self.nb_jobs, cores)
+        return cpu_pinning.CpuPinning().width(self.nb_jobs, cores)
+
+    def _pin_unlocked(self, unit, job):
+        """Give a unit (a job, or a probe of it) cores of its own, when pinning is on."""
+        if self.cpu_pinning is None or getattr(unit, "_cpu_set", None):
+            return
+        unit._cpu_set = self.cpu_pinning.acquire(self._nb_threads_unlocked(job))
+
+    def _unpin_unlocked(self, unit):
+        cpus = getattr(unit, "_cpu_set", None)
+        if cpus and self.cpu_pinning is not None:
+            self.cpu_pinning.release(cpus)
+        unit._cpu_set = None
+
+    def _memory_limit_gb(self, job):
+        """The memory limit of a job: its own, or the one of the session. None for no limit."""
+        return memory_limits.normalize_limit(getattr(job, "memory_limit_gb", None)) or self.memory_limit_gb
+
+    def _limit_memory_unlocked(self, unit, job):
+        """Put a unit (a job, or a probe of it) under the memory limit of the job, if it has one."""
+        limit_gb = self._memory_limit_gb(job)
+        if limit_gb is None or getattr(unit, "_memory_limit", None) is not None or sys.platform == "win32":
+            return
+        if not self._cgroup_parent_detected:
+            self._cgroup_parent = memory_limits.cgroup_parent()
+            self._cgroup_parent_detected = True
+        unit._memory_limit = memory_limits.MemoryLimit(
+            limit_gb, parent=self._cgroup_parent, log_start=job.log_dropped + len(job.log_history)
+        )
+
+    def _release_unit_unlocked(self, unit):
+        """Give back what a unit that is done held: its cores and its memory cgroup."""
+        self._unpin_unlocked(unit)
+        limit = getattr(unit, "_memory_limit", None)
+        if limit is not None:
+            limit.release()
+            unit._memory_limit = None
+
+    def _launch_options(self, unit, job, process_group):
+        """preexec_fn and env of a process of a unit: its process group, its cores, its memory limit, its threads."""
+        cpus = getattr(unit, "_cpu_set", None)
+        nb_threads = len(cpus) if cpus else self._nb_threads_unlocked(job)
+        limit = getattr(unit, "_memory_limit", None)
+        preexec_fn = chain_preexec(cpu_pinning.preexec(cpus, process_group), limit.preexec() if limit is not None else None)
+        return preexec_fn, cpu_pinning.environment(cpus, nb_threads)
+
+    def _requeue_after_oom_unlocked(self, job):
+        """
+        Put a job that hit its memory limit back in the queue with a higher
+        limit, and a memory cost to match, unless it cannot grow any more.
+        """
+        limit_gb = self._memory_limit_gb(job)
+        requeues = int(getattr(job, "_oom_requeues", 0))
+        raised = memory_limits.raised_limit(limit_gb, self.resource_budget.total.get(MEMORY_GB)) if limit_gb else None
+        if raised is None or requeues >= hard_settings.oom_max_requeues:
+            job.log_history.append(printc.colors.CYAN + "note: raise the memory limit of the job to run it" + printc.colors.ENDC)
+            return
+        job._oom_requeues = requeues + 1
+        job.memory_limit_gb = raised
+        cost = dict(getattr(job, "resources", None) or {})
+        cost[MEMORY_GB] = max(float(cost.get(MEMORY_GB, 0)), raised)
+        job.resources = cost
+        self.retired_job_list.remove(job)
+        job.process = None
+        job.start_time = None
+        job.stop_time = None
+        job.progress = 0
+        job.log_history.append(
+            printc.colors.CYAN + "note: requeued with a memory limit of {:g} GB".format(raised) + printc.colors.ENDC
+        )
+        self.queue_job(job)
+
+    def configure_host_slots(self, weight=None):
+        """Set the weight of the session in the host-wide slots. Returns their state, or None."""
+        with self._lock:
+            if self.slot_broker is None:
+                return None
+            if weight is not None:
+                self.slot_broker.weight = max(0.01, float(weight))
+                self._sync_host_slots_unlocked(force=True)
+                self._fill_running_slots_from_queue_unlocked()
+            return self._host_slots_unlocked()
+
+    def _host_slots_unlocked(self):
+        if self.slot_broker is None:
+            return None
+        return {
+            "session": self.slot_broker.session_id,
+            "weight": self.slot_broker.weight,
+            "reserved": self.slot_broker.reserved,
+            "error": self.slot_broker.error,
+        }
+
+    def _sync_host_slots_unlocked(self, force=False, waiting=0):
+        """
+        Sync with the host-wide slots (see HostSlotBroker.sync): about once a
+        second, or right away when the session wants more than it last told.
+        `waiting` counts jobs about to be admitted that are not queued yet.
+        """
+        if self.slot_broker is None:
+            return
+        now = time.time()
+        running = self._running_units_unlocked()
+        demand = min(self.nb_jobs, running + self._queued_count_unlocked() + waiting)
+        if not force and demand <= self._slot_broker_demand and now - self._slot_broker_synced < slot_broker.SYNC_INTERVAL:
+            return
+        self._slot_broker_synced = now
+        self._slot_broker_demand = demand
+        error = self.slot_broker.error
+        self.slot_broker.sync(running, demand, now)
+        if self.slot_broker.error is not None and self.slot_broker.error != error:
+            printc.warning("Host-wide job slots: " + self.slot_broker.error, script_name)
+
+    def _slot_limit_unlocked(self, waiting=0):
+        """How many units may run: nb_jobs, or fewer when the host-wide slots say so."""
+        self._sync_host_slots_unlocked(waiting=waiting)
+        reserved = self.slot_broker.reserved if self.slot_broker is not None else None
+        return self.nb_jobs if reserved is None else min(self.nb_jobs, reserved)
+
     def set_nb_jobs(self, nb_jobs):
         """Change the max number of jobs allowed to run in parallel, at runtime.
 
@@ -337,12 +873,120 @@ class ParallelJobHandler:
         """
         self.configure_runtime(nb_jobs=max(1, int(nb_jobs)))
 
+    @staticmethod
+    def _job_units(job):
+        """Slots a running job takes: one, or one per probe of an fmax search led by probes."""
+        probes = getattr(job, "_fmax_probes", None)
+        return max(1, len(probes)) if probes else 1
+
+    def _running_units_unlocked(self):
+        return sum(self._job_units(job) for job in self.running_job_list)
+
+    @staticmethod
+    def _job_cost(job):
+        """What one unit of a job takes of the resource budget: {} when it declares nothing."""
+        return normalize_cost(getattr(job, "resources", None))
+
+    def _running_cost_unlocked(self):
+        return add_costs(scale_cost(self._job_cost(job), self._job_units(job)) for job in self.running_job_list)
+
+    @staticmethod
+    def _job_licenses(job):
+        """The license pools a job takes one token of per running unit."""
+        return normalize_cost(getattr(job, "licenses", None))
+
+    def _held_licenses_unlocked(self):
+        held = {}
+        for job in self.running_job_list:
+            units = self._job_units(job)
+            for pool in self._job_licenses(job):
+                held[pool] = held.get(pool, 0) + units
+        return held
+
+    def _licenses_available_unlocked(self, job, held=None):
+        """
+        Whether the license tokens of a job are free. `held` is what
+        _held_licenses_unlocked returns, for the callers that check several jobs
+        against the same running ones.
+        """
+        if held is None:
+            held = self._held_licenses_unlocked()
+        return self.license_pools.available(held, self._job_licenses(job))
+
+    def _waiting_for_license_unlocked(self, held=None):
+        """The ids of the queued jobs whose license tokens are not free."""
+        if held is None:
+            held = self._held_licenses_unlocked()
+        return {
+            id(job)
+            for job in getattr(self.job_queue, "queue", ())
+            if not self._licenses_available_unlocked(job, held)
+        }
+
+    def _fits_budget_unlocked(self, job):
+        return self.resource_budget.fits(
+            self._running_cost_unlocked(),
+            self._job_cost(job),
+            alone=not self.running_job_list,
+        )
+
+    def _admits_unlocked(self, job):
+        """Whether a job can start now: a free slot, its license tokens, and room in the resource budget."""
+        if self._running_units_unlocked() >= self._slot_limit_unlocked(waiting=1):
+            return False
+        return self._licenses_available_unlocked(job) and self._fits_budget_unlocked(job)
+
     def _fill_running_slots_from_queue_unlocked(self):
-        while len(self.running_job_list) < self.nb_jobs and not self.job_queue.empty():
-            self.start_job(self.job_queue.get())
+        held = self._held_licenses_unlocked()
+        for job in list(self.job_queue.queue):
+            if self._running_units_unlocked() >= self._slot_limit_unlocked():
+                break
+            # A job waiting for license tokens leaves its turn to the jobs of
+            # other tools: their licenses are not the ones missing.
+            if not self._licenses_available_unlocked(job, held):
+                continue
+            # Otherwise first in, first out: a job waiting for resources holds
+            # the jobs queued behind it, or a stream of small jobs would keep a
+            # big one waiting forever.
+            if not self._fits_budget_unlocked(job):
+                break
+            self.job_queue.queue.remove(job)
+            self.start_job(job)
+            held = self._held_licenses_unlocked()
+        self._dispatch_array_jobs_unlocked()
+
+    def _dispatch_array_jobs_unlocked(self):
+        """
+        Turn the next rows of the pending job arrays into jobs while slots are
+        free. An array with a job queued already (waiting for resources or
+        licenses) waits for it: its next jobs would wait as well.
+        """
+        if not self._headless_initialized:
+            return
+        for job_array in list(self._pending_arrays):
+            while job_array.pending > 0 and job_array.statuses["queued"] == 0:
+                if self._running_units_unlocked() >= self._slot_limit_unlocked(waiting=1):
+                    return
+                job = job_array.expand_next()
+                self.add_job(job)
+                job_array.observe_expected_runtime(self._expected_runtime(job))
+            if job_array.pending == 0:
+                self._pending_arrays.remove(job_array)
+
+    def _pending_in_arrays_unlocked(self):
+        """How many jobs of the job arrays are not dispatched yet."""
+        return sum(job_array.pending for job_array in self._pending_arrays)
+
+    def _queued_count_unlocked(self):
+        """How many jobs wait to run: those queued, and those of the job arrays not dispatched yet."""
+        return self.job_queue.qsize() + self._pending_in_arrays_unlocked()
 
     def _schedule_new_job_unlocked(self, job):
-        if len(self.running_job_list) < self.nb_jobs:
+        self.license_pools.declare(getattr(job, "licenses", None))
+        self._predict_runtime(job)
+        held = self._held_licenses_unlocked()
+        holding = any(self._licenses_available_unlocked(queued, held) for queued in self.job_queue.queue)
+        if not holding and self._admits_unlocked(job):
             self.start_job(job)
         else:
             self.queue_job(job)
@@ -352,9 +996,13 @@ class ParallelJobHandler:
         with self._lock:
             self.job_list.append(job)
             self.job_count = len(self.job_list)
+            self._watch_job_unlocked(len(self.job_list) - 1, job)
             # A new job means a new batch to close: derive again once it drains.
             self._post_batch_done = False
             self.max_title_length = max(self.max_title_length, len(job.display_name))
+            # Recovered jobs are in the journal already.
+            if self.journal is not None and getattr(job, "journal_id", None) is None:
+                self.journal.record_enqueue(job)
 
             if self.job_count == 1:
                 self.selected_job_index = 0
@@ -368,15 +1016,100 @@ class ParallelJobHandler:
             if self._headless_initialized:
                 self._schedule_new_job_unlocked(job)
 
+    def add_job_array(self, job_array):
+        """
+        Add a job array (see job_array): its jobs are added to the handler one
+        by one, as slots free up for them.
+        """
+        with self._lock:
+            self.job_arrays.append(job_array)
+            if job_array.pending <= 0:
+                return
+            self._pending_arrays.append(job_array)
+            self._post_batch_done = False
+            self._queue_view = None
+            if self.journal is not None and job_array.journal_id is None:
+                self.journal.record_array(job_array)
+            self._dispatch_array_jobs_unlocked()
+
     def add_jobs(self, jobs):
-        for job in jobs:
-            self.add_job(job)
+        # Held for the whole batch: a probing job sizes its rounds on the slots
+        # nobody is waiting for, which a half-enqueued batch would overstate.
+        with self._lock:
+            for job in jobs:
+                self.add_job(job)
+
+    def enqueue_chunk(self, batch_id, offset, total, items, make_job):
+        """
+        Add a chunk of the jobs of a batch enqueued in chunks: `items`, the
+        payloads of the jobs `offset` to `offset + len(items)` of a batch of
+        `total` jobs, turned into jobs by `make_job`. An item `make_job` turns
+        into a JobArray counts as the jobs of the array. A chunk sent again (a
+        client that retries after a timeout) only adds the jobs not received
+        yet. A chunk past the jobs received is refused: the client resumes
+        from "received". Returns the progress of the batch.
+        """
+        with self._lock:
+            batch = self.enqueue_batches.get(str(batch_id))
+            if batch is None:
+                batch = {"batch_id": str(batch_id), "received": 0, "total": int(total), "started_at": round(time.time(), 3)}
+                self.enqueue_batches[str(batch_id)] = batch
+                while len(self.enqueue_batches) > ENQUEUE_BATCHES_KEPT:
+                    self.enqueue_batches.popitem(last=False)
+            offset = int(offset)
+            if offset > batch["received"]:
+                raise ValueError(
+                    "chunk at job {} of batch {}, which received {} jobs".format(offset, batch_id, batch["received"])
+                )
+            received = batch["received"] - offset
+            added = 0
+            # Held for the whole chunk, like add_jobs.
+            for item in items:
+                job = make_job(item)
+                size = job.size if isinstance(job, JobArray) else 1
+                if received >= size:
+                    received -= size
+                    continue
+                if isinstance(job, JobArray):
+                    job.skip(received)
+                    self.add_job_array(job)
+                else:
+                    self.add_job(job)
+                added += size - received
+                received = 0
+            batch["received"] += added
+            batch["total"] = max(batch["received"], int(total))
+            batch["updated_at"] = round(time.time(), 3)
+            return dict(batch, added=added, total_jobs=len(self.job_list))
+
+    def enqueue_progress(self, batch_id):
+        """The progress of a batch enqueued in chunks, or None for a batch unknown."""
+        with self._lock:
+            batch = self.enqueue_batches.get(str(batch_id))
+            return dict(batch) if batch is not None else None
+
+    def _job_arrays_unlocked(self):
+        """The jobs of each job array (see job_array): not dispatched yet, and by status."""
+        arrays = collections.OrderedDict()
+        for job_array in self.job_arrays:
+            # The chunks of a batch each bring an array of their own.
+            summary = arrays.setdefault(job_array.name, {"name": job_array.name, "size": 0, "pending": 0, "statuses": {}})
+            array_summary = job_array.summary()
+            summary["size"] += array_summary["size"]
+            summary["pending"] += array_summary["pending"]
+            for status, count in array_summary["statuses"].items():
+                summary["statuses"][status] = summary["statuses"].get(status, 0) + count
+        return list(arrays.values())
+
+    def _enqueue_batches_unlocked(self):
+        return [dict(batch) for batch in self.enqueue_batches.values() if batch["received"] < batch["total"]]
 
     def pause_job(self, job_id: int):
         with self._lock:
             job = self.job_list[int(job_id)]
             if job.status == "running":
                 job.pause()
+                self._trace_unlocked(job)
 
     def start_or_resume_job(self, job_id: int):
         with self._lock:
@@ -390,11 +1123,17 @@ class ParallelJobHandler:
                 self.start_job(job)
             elif job.status == "paused":
                 job.resume()
+                self._trace_unlocked(job)
 
     def kill_or_cancel_job(self, job_id: int):
         with self._lock:
             job = self.job_list[int(job_id)]
-            if job.status == "running" and job.process is not None:
+            if job.status == "running" and hasattr(job, "_fmax_probes"):
+                self._stop_probes(job)
+                job.status = "killed"
+                self.retire_job(job, getattr(job, "progress", 0))
+                job.log_history.append(printc.colors.RED + "Job killed by user" + printc.colors.ENDC)
+            elif job.status == "running" and job.process is not None:
                 try:
                     if sys.platform == "win32":
                         job.process.send_signal(signal.CTRL_BREAK_EVENT)
@@ -409,6 +1148,7 @@ class ParallelJobHandler:
                 try:
                     self.job_queue.queue.remove(job)
                     job.status = "canceled"
+                    self._trace_unlocked(job)
                     job.log_history.append(printc.colors.RED + "Job canceled by user" + printc.colors.ENDC)
                 except ValueError:
                     pass
@@ -482,6 +1222,7 @@ class ParallelJobHandler:
             self._schedule_new_job_unlocked(job)
 
         self._headless_initialized = True
+        self._dispatch_array_jobs_unlocked()
 
     def _append_job_log(self, job, line, stream_key="default"):
         if not line:
@@ -497,10 +1238,10 @@ class ParallelJobHandler:
 
         text = text.replace("\r\n", "\n")
 
-        stream_states = getattr(job, "_log_stream_states", None)
+        stream_states = self._log_stream_states.get(job)
         if stream_states is None:
             stream_states = {}
-            job._log_stream_states = stream_states
+            self._log_stream_states[job] = stream_states
 
         state = stream_states.get(stream_key)
         if state is None:
@@ -545,10 +1286,8 @@ class ParallelJobHandler:
         state["overwrite"] = overwrite
         state["line_index"] = line_index
 
-        limit = getattr(job, "log_size_limit", self.log_size_limit)
-        if limit != -1 and len(job.log_history) > limit:
-            dropped = len(job.log_history) - limit
-            job.log_history = job.log_history[-limit:]
+        dropped = job.trim_log(getattr(job, "log_size_limit", self.log_size_limit))
+        if dropped:
             for st in stream_states.values():
                 idx = st.get("line_index", None)
                 if idx is None:
@@ -558,7 +1297,7 @@ class ParallelJobHandler:
         job.log_changed = True
 
     def _flush_job_log_buffer(self, job):
-        stream_states = getattr(job, "_log_stream_states", None)
+        stream_states = self._log_stream_states.get(job)
         if not stream_states:
             return
 
@@ -580,9 +1319,7 @@ class ParallelJobHandler:
             st["line_index"] = None
 
         if changed:
-            limit = getattr(job, "log_size_limit", self.log_size_limit)
-            if limit != -1 and len(job.log_history) > limit:
-                job.log_history = job.log_history[-limit:]
+            job.trim_log(getattr(job, "log_size_limit", self.log_size_limit))
             job.log_changed = True
 
     def _drain_process_pipes(self, job):
@@ -612,6 +1349,7 @@ class ParallelJobHandler:
             if not chunk:
                 break
 
+            self.metrics.pipe_bytes_read += len(chunk)
             self._append_job_log(job, chunk, stream_key=stream_key)
 
     def _run_post_success_export(self, job):
@@ -623,13 +1361,21 @@ class ParallelJobHandler:
         if export_kind == "":
             return True
 
+        # The exporters add what the job used, and how long it and its steps
+        # took, to its metrics.
+        self._save_run_figures(job)
         job.status = "exporting"
+        self._trace_unlocked(job)
         self._append_job_log(
             job,
             printc.colors.CYAN + "Export job results..." + printc.colors.ENDC + "\n",
             stream_key="export",
         )
 
+        with self.metrics.timed(self.metrics.export_seconds):
+            return self._export_job_results(job, export_kind, export_config)
+
+    def _export_job_results(self, job, export_kind, export_config):
         try:
             if export_kind == "synthesis":
                 from odatix.components.export_results import export_single_job_result
@@ -718,7 +1464,7 @@ class ParallelJobHandler:
         """Run the batch-wide action when no job is running or waiting anymore."""
         if self._post_batch_done or not isinstance(self.post_batch_action, dict):
             return
-        if len(self.running_job_list) > 0 or not self.job_queue.empty():
+        if len(self.running_job_list) > 0 or self._queued_count_unlocked() > 0:
             return
         self._post_batch_done = True
         self._run_post_batch_action()
@@ -727,6 +1473,13 @@ class ParallelJobHandler:
         for job in self.job_list:
             if job in self.retired_job_list:
                 job.progress = getattr(job, "progress", 0)
+            elif job in self.running_job_list and hasattr(job, "_fmax_probes"):
+                job.progress = job.get_progress()
+                if self._update_probing_job(job):
+                    if job.status == "success":
+                        if not self._run_post_success_export(job):
+                            job.status = "failed"
+                    self._retire_finished_job(job, selected_job, on_selected_retired)
             elif job not in self.running_job_list or job.process is None:
                 job.progress = 0
             else:
@@ -755,7 +1508,13 @@ class ParallelJobHandler:
                                 job.status = "failed"
                     else:
                         job.status = "failed"
-                        if hasattr(job, "_current_task_name"):
+                        limit = getattr(job, "_memory_limit", None)
+                        if limit is not None and limit.hit(job.process.returncode, job.log_history, job.log_dropped):
+                            job.status = memory_limits.STATUS_OOM
+                            job.log_history.append(
+                                printc.colors.RED + memory_limits.OOM_MESSAGE.format(limit.limit_gb) + printc.colors.ENDC
+                            )
+                        elif hasattr(job, "_current_task_name"):
                             job.log_history.append(
                                 printc.colors.RED + "error: task '" + str(job._current_task_name) + "' failed" + printc.colors.ENDC
                             )
@@ -766,23 +1525,50 @@ class ParallelJobHandler:
                         if job.progress is None:
                             job.progress = 0
 
-                    self.retire_job(job, job.progress)
-                    if not self.job_queue.empty():
-                        self.start_job(self.job_queue.get())
-                    self._run_post_batch_action_if_drained()
+                    self._retire_finished_job(job, selected_job, on_selected_retired)
+
+    def _retire_finished_job(self, job, selected_job=None, on_selected_retired=None):
+        self.retire_job(job, job.progress)
+        if job.status == "success":
+            self._record_runtime(job)
+        elif job.status == memory_limits.STATUS_OOM:
+            self._requeue_after_oom_unlocked(job)
+        self._fill_running_slots_from_queue_unlocked()
+        self._run_post_batch_action_if_drained()
 
-                    if selected_job is not None and job == selected_job:
-                        selected_job.log_changed = True
-                        if callable(on_selected_retired):
-                            on_selected_retired()
+        if selected_job is not None and job == selected_job:
+            selected_job.log_changed = True
+            if callable(on_selected_retired):
+                on_selected_retired()
 
     def _tick(self):
         """One scheduling + IO tick (headless, no curses)."""
-        with self._lock:
-            self._update_jobs_state()
+        with self._lock, self.metrics.timed(self.metrics.tick_seconds):
+            with self.metrics.phase("update_jobs"):
+                self._update_jobs_state()
+
+            if self.resource_sampler is not None:
+                self.resource_sampler.tick(self._running_pids_unlocked())
+
+            if self.autoscaler is not None:
+                self.autoscaler.tick(self)
+
+            if self.slot_broker is not None:
+                reserved = self.slot_broker.reserved
+                self._sync_host_slots_unlocked()
+                if self.slot_broker.reserved != reserved:
+                    self._fill_running_slots_from_queue_unlocked()
 
             # Collect stdout and stderr pipes
-            self.read_process_output()
+            with self.metrics.phase("read_output"):
+                self.read_process_output()
+
+            if self.journal is not None:
+                with self.metrics.phase("journal"):
+                    self.journal.sync(self.job_list, self._running_pids_unlocked())
+
+            if self.retired_log_dir is not None:
+                self._compact_retired_jobs_unlocked()
 
             # Autoscroll selected job (keep behavior similar to curses)
             if 0 <= self.selected_job_index < len(self.job_list):
@@ -835,6 +1621,8 @@ class ParallelJobHandler:
         if terminate_jobs:
             with self._lock:
                 self.terminate_all_jobs()
+        if self.slot_broker is not None:
+            self.slot_broker.release()
 
     def run_api(self, host: str = "0.0.0.0", port: int = hard_settings.daemon_default_port, log_level: str = "info"):
         """Run a FastAPI+Uvicorn server exposing REST + WebSocket controls.
@@ -904,6 +1692,13 @@ class ParallelJobHandler:
                 pass
 
     def start_job(self, job):
+        if not hasattr(job, "_runtime_prediction"):
+            self._predict_runtime(job)
+        self._pin_unlocked(job, job)
+        self._limit_memory_unlocked(job, job)
+        job.resource_usage = None
+        self.metrics.job_started()
+
         # Run generate command
         if not job.generate_rtl:
             self.run_job(job)
@@ -914,6 +1709,7 @@ class ParallelJobHandler:
             job.log_history.append(printc.colors.CYAN + "Run generate command for " + job.display_name + printc.colors.ENDC)
             job.log_history.append(printc.colors.BOLD + " > " + job.generate_command + printc.colors.ENDC)
 
+            preexec_fn, env = self._launch_options(job, job, process_group=False)
             process = subprocess.Popen(
                 job.generate_command,
                 stdout=subprocess.PIPE,
@@ -921,6 +1717,8 @@ class ParallelJobHandler:
                 cwd=job.tmp_dir,
                 shell=True,
                 bufsize=0,
+                preexec_fn=preexec_fn,
+                env=env,
             )
 
             self.set_nonblocking(process.stdout)
@@ -930,6 +1728,7 @@ class ParallelJobHandler:
             job.status = "starting"
             job.start_time = time.time()
             self.running_job_list.append(job)
+            self._trace_unlocked(job)
         except subprocess.CalledProcessError:
             job.status = "failed"
             self.retire_job(job, progress=0)
@@ -1081,10 +1880,7 @@ class ParallelJobHandler:
         job.log_history.append(printc.colors.CYAN + "Run job task '" + taskname + "'" + printc.colors.ENDC)
         job.log_history.append(printc.colors.BOLD + " > " + full_command + printc.colors.ENDC)
 
-        preexec_fn = None
-        if sys.platform != "win32" and self.process_group:
-            preexec_fn = os.setpgrp
-
+        preexec_fn, env = self._launch_options(job, job, self.process_group)
         process = subprocess.Popen(
             STD_BUF + full_command,
             stdout=subprocess.PIPE,
@@ -1093,6 +1889,7 @@ class ParallelJobHandler:
             shell=True,
             bufsize=0,
             preexec_fn=preexec_fn,
+            env=env,
         )
 
         if job.start_time is None:
@@ -1115,17 +1912,17 @@ class ParallelJobHandler:
             self.set_nonblocking(process.stdout)
             self.set_nonblocking(process.stderr)
 
+        self._trace_unlocked(job)
         return True
 
     def run_job(self, job):
-        if isinstance(job.command, str):
+        if self._can_probe(job):
+            self._start_probing(job)
+        elif isinstance(job.command, str):
             job.log_history.append(printc.colors.CYAN + "Run job command" + printc.colors.ENDC)
             job.log_history.append(printc.colors.BOLD + " > " + job.command + printc.colors.ENDC)
 
-            preexec_fn = None
-            if sys.platform != "win32" and self.process_group:
-                preexec_fn = os.setpgrp
-
+            preexec_fn, env = self._launch_options(job, job, self.process_group)
             process = subprocess.Popen(
                 STD_BUF + job.command,
                 stdout=subprocess.PIPE,
@@ -1134,6 +1931,7 @@ class ParallelJobHandler:
                 shell=True,
                 bufsize=0,
                 preexec_fn=preexec_fn,
+                env=env,
             )
 
             if job.start_time is None:
@@ -1172,20 +1970,472 @@ class ParallelJobHandler:
             if not self._start_next_task(job):
                 self._clear_task_pipeline(job)
                 job.status = "success"
+        self._trace_unlocked(job)
+
+    ######################################
+    # Parallel fmax probing
+    ######################################
+
+    @staticmethod
+    def _can_probe(job):
+        """
+        Whether a job is an fmax search the handler leads with probes (see
+        odatix.lib.parallel_job_handler.fmax_probing): one that opted in, running
+        a single command. Probes are stopped through their process group, which
+        Windows does not have.
+        """
+        return (
+            isinstance(getattr(job, "fmax_probing", None), dict)
+            and isinstance(job.command, str)
+            and sys.platform != "win32"
+        )
+
+    def _start_probing(self, job):
+        config_file = os.path.join(job.tmp_dir, hard_settings.work_script_path, hard_settings.tcl_config_filename)
+        job._fmax_search = fmax_probing.FmaxProbeSearch.from_settings(fmax_probing.read_search_settings(config_file))
+        # Each probe gets cores and a memory limit of its own: the job has no
+        # process to hold them.
+        self._release_unit_unlocked(job)
+        # The first round starts on the next update: by then, the jobs enqueued
+        # along with this one are queued too, and the spare slots are known.
+        job._fmax_probes = []
+        resumed = fmax_probing.resume_requested(config_file) and job._fmax_search.resume(
+            fmax_search_state.read_state(job.tmp_dir)
+        )
+        if not resumed:
+            fmax_probing.clear_probe_directories(job.tmp_dir)
+
+        if job.start_time is None:
+            job.start_time = time.time()
+        job.process = None
+        job.status = "running"
+
+        lower_bound, upper_bound = job._fmax_search.initial_bounds
+        job.log_history.append(
+            printc.colors.CYAN
+            + "Search fmax with parallel probes in [" + str(lower_bound) + ":" + str(upper_bound) + "] MHz"
+            + printc.colors.ENDC
+        )
+        if resumed:
+            job.log_history.append(
+                printc.colors.CYAN
+                + "Resuming after " + str(job._fmax_search.runs) + " runs in ["
+                + str(job._fmax_search.lower_bound) + ":" + str(job._fmax_search.upper_bound) + "] MHz"
+                + printc.colors.ENDC
+            )
+        job.log_history.append(printc.colors.BOLD + " > " + job.command + printc.colors.ENDC)
+
+    def _probe_count(self, job):
+        """
+        How many probes the next round of a job runs: one for its own slot, plus
+        the slots nobody is waiting for.
+        """
+        max_probes = int(job.fmax_probing.get("max_probes") or hard_settings.fmax_max_probes)
+        spare = 0
+        if self._queued_count_unlocked() == 0:
+            running_units = self._running_units_unlocked()
+            if job not in self.running_job_list:
+                running_units += 1
+            spare = self._slot_limit_unlocked() - running_units
+            # Each probe costs what the job does: the extra ones also have to
+            # fit in what is left of the resource budget.
+            cost = self._job_cost(job)
+            if cost and spare > 0:
+                used = self._running_cost_unlocked()
+                if job not in self.running_job_list:
+                    used = add_costs([used, cost])
+                spare = self.resource_budget.copies_that_fit(used, cost, spare)
+            # ...and so does each of its license tokens.
+            held = self._held_licenses_unlocked()
+            for pool in self._job_licenses(job):
+                free = self.license_pools.free(held, pool)
+                if job not in self.running_job_list:
+                    free -= 1
+                spare = min(spare, free)
+        return max(1, min(max_probes, 1 + spare))
+
+    def _start_probe_round(self, job):
+        search = job._fmax_search
+        probe_count = self._probe_count(job)
+        frequencies = search.next_frequencies(probe_count)
+        fmax_probing.write_search_status(job.tmp_dir, search, probe_count)
+        job.log_history.append(
+            printc.colors.CYAN
+            + "Probe round " + str(search.rounds) + ": " + ", ".join(str(frequency) for frequency in frequencies) + " MHz"
+            + printc.colors.ENDC
+        )
+
+        for frequency in frequencies:
+            try:
+                probe_dir = fmax_probing.prepare_probe_directory(job.tmp_dir, frequency)
+                command = fmax_probing.probe_command(job.command, job.tmp_dir, probe_dir)
+                probe = fmax_probing.FmaxProbe(frequency, probe_dir)
+                self._pin_unlocked(probe, job)
+                self._limit_memory_unlocked(probe, job)
+                preexec_fn, env = self._launch_options(probe, job, self.process_group)
+                job._fmax_probes.append(probe.start(
+                    STD_BUF + command, cwd=job.directory, process_group=self.process_group, preexec_fn=preexec_fn, env=env
+                ))
+            except Exception as e:
+                job.log_history.append(
+                    printc.colors.RED + "error: could not start the probe at " + str(frequency) + " MHz: " + str(e) + printc.colors.ENDC
+                )
+                self._stop_probes(job)
+                return False
+        return True
+
+    def _update_probing_job(self, job):
+        """
+        Collect the verdicts of a probing job, cancel the probes the interval has
+        left behind, and start the next round once the current one is over.
+        Returns True once the job is over, its status telling how it went.
+        """
+        search = job._fmax_search
+        for probe in list(job._fmax_probes):
+            verdict = probe.poll()
+            if verdict is None:
+                continue
+            job._fmax_probes.remove(probe)
+            self._release_unit_unlocked(probe)
+            stale = search.is_stale(probe.frequency)
+            search.record(probe.frequency, verdict)
+            color = printc.colors.GREEN if verdict == fmax_probing.MET else printc.colors.RED
+            job.log_history.append(
+                "  " + str(probe.frequency) + " MHz: " + color + verdict + printc.colors.ENDC
+                + (" (stale)" if stale else "")
+                + printc.colors.GREY + "  " + os.path.join(probe.directory, fmax_probing.PROBE_LOG_FILENAME) + printc.colors.ENDC
+            )
+
+        for probe in list(job._fmax_probes):
+            if search.done or search.is_stale(probe.frequency):
+                probe.kill()
+                job._fmax_probes.remove(probe)
+                self._release_unit_unlocked(probe)
+                job.log_history.append("  " + str(probe.frequency) + " MHz: canceled (outside of the interval)")
+
+        if job._fmax_probes:
+            return False
+
+        if search.rounds > 0:
+            search.end_round()
+            try:
+                fmax_search_state.write_state(job.tmp_dir, search.state())
+            except OSError:
+                pass
+        if not search.done:
+            if self._start_probe_round(job):
+                return False
+            job.status = "failed"
+            self._clear_probing(job)
+            return True
+
+        try:
+            success, message = fmax_probing.finish_search(job.tmp_dir, search)
+        except OSError as e:
+            success, message = False, "error: could not write the search results: " + str(e)
+        job.log_history.append((printc.colors.GREEN if success else printc.colors.RED) + message + printc.colors.ENDC)
+        job.status = "success" if success else "failed"
+        self._clear_probing(job)
+        return True
+
+    def _stop_probes(self, job):
+        for probe in getattr(job, "_fmax_probes", None) or []:
+            probe.kill()
+            self._release_unit_unlocked(probe)
+        self._clear_probing(job)
+
+    @staticmethod
+    def _clear_probing(job):
+        for attr in ("_fmax_probes", "_fmax_search"):
+            if hasattr(job, attr):
+                delattr(job, attr)
 
     def queue_job(self, job):
         job.status = "queued"
-        self.job_queue.put(job)
+        if not hasattr(job, "_runtime_prediction"):
+            self._predict_runtime(job)
+        # The queue stays in the order of the policy: the job goes in behind the
+        # ones it does not start before.
+        self.job_queue.queue.insert(self._queue_position_unlocked(job), job)
+        self._trace_unlocked(job)
+
+    ######################################
+    # Runtime history
+    ######################################
+
+    def _runtime_history(self, job):
+        """The runtime history a job is predicted from and recorded in, or None."""
+        tracking = getattr(job, "runtime_history", None)
+        if not isinstance(tracking, dict) or not tracking.get("file") or not isinstance(tracking.get("key"), dict):
+            return None
+        path = str(tracking["file"])
+        if path not in self._runtime_histories:
+            self._runtime_histories[path] = runtime_history.RuntimeHistory(path)
+        return self._runtime_histories[path]
+
+    def _predict_runtime(self, job):
+        history = self._runtime_history(job)
+        job._runtime_prediction = history.predict(job.runtime_history["key"]) if history is not None else None
+
+    @staticmethod
+    def _expected_runtime(job):
+        """Expected runtime of a job in seconds, or None when unknown."""
+        prediction = getattr(job, "_runtime_prediction", None)
+        return prediction.seconds if prediction is not None else None
+
+    def _queue_sort_key(self, job):
+        return runtime_history.sort_key(self.queue_policy, self._expected_runtime(job))
+
+    def _sort_queue_unlocked(self):
+        # Sorting is stable: under "fifo", or between jobs expected to take
+        # as long, the queue keeps the order jobs were queued in.
+        if self.queue_policy == runtime_history.POLICY_FIFO:
+            return
+        ordered = sorted(self.job_queue.queue, key=self._queue_sort_key)
+        self.job_queue.queue.clear()
+        self.job_queue.queue.extend(ordered)
+
+    def _queue_position_unlocked(self, job):
+        """
+        Where a job goes in the queue, kept sorted by _sort_queue_unlocked: after
+        every job of the same key, so jobs of equal keys keep the order they
+        were queued in.
+        """
+        queued = self.job_queue.queue
+        if self.queue_policy == runtime_history.POLICY_FIFO:
+            return len(queued)
+        key = self._queue_sort_key(job)
+        low, high = 0, len(queued)
+        while low < high:
+            middle = (low + high) // 2
+            if key < self._queue_sort_key(queued[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _record_runtime(self, job):
+        history = self._runtime_history(job)
+        if history is None or job.start_time is None:
+            return
+        # A job resuming after some of its steps (or in the middle of a search)
+        # takes less than a whole run, and is not one to learn from; the steps
+        # it ran still are.
+        seconds = (job.stop_time or time.time()) - job.start_time if job.runtime_history.get("record", True) else None
+        steps = self._step_durations(job)
+        if seconds is None and not steps:
+            return
+        try:
+            history.record(job.runtime_history["key"], seconds, steps=steps)
+        except (OSError, ValueError) as e:
+            job.log_history.append(printc.colors.YELLOW + "warning: could not record the runtime of the job: " + str(e) + printc.colors.ENDC)
+
+    @staticmethod
+    def _step_durations(job):
+        """Wall time of the steps the job ran, as [(name, seconds)], from its step state file."""
+        tracking = getattr(job, "step_tracking", None)
+        tmp_dir = tracking.get("tmp_dir") if isinstance(tracking, dict) else None
+        if not tmp_dir or not getattr(job, "step_names", None):
+            return []
+        try:
+            import odatix.lib.job_steps as job_steps
+
+            return [(name, seconds) for name, seconds in job_steps.step_durations(tmp_dir, job.start_time) if name in job.step_names]
+        except Exception:
+            return []
+
+    def _step_predictions(self, job):
+        """Expected runtime of each step of a job, as {name: seconds or None}, predicted once."""
+        if not hasattr(job, "_step_predictions"):
+            history = self._runtime_history(job)
+            predictions = {}
+            for name in getattr(job, "step_names", None) or []:
+                prediction = history.predict(job.runtime_history["key"], step=name) if history is not None else None
+                predictions[name] = prediction.seconds if prediction is not None else None
+            job._step_predictions = predictions
+        return job._step_predictions
+
+    def _remaining_runtime(self, job, now):
+        """
+        Time a running job has left, as (seconds, basis), or None when it cannot
+        be estimated (see odatix.lib.parallel_job_handler.eta).
+        """
+        if job.start_time is None:
+            return None
+        elapsed = now - job.start_time
+        step_names = getattr(job, "step_names", None) or []
+        step_started_at = getattr(job, "current_step_started_at", None)
+        if len(step_names) > 1 and step_started_at is not None:
+            remaining = eta.remaining_from_steps(
+                step_names, getattr(job, "current_step_index", None), now - step_started_at, self._step_predictions(job)
+            )
+            if remaining is not None:
+                return remaining, eta.BASIS_STEPS
+        remaining = eta.remaining_from_history(elapsed, self._expected_runtime(job))
+        if remaining is not None:
+            return remaining, eta.BASIS_HISTORY
+        remaining = eta.remaining_from_progress(elapsed, getattr(job, "progress", 0))
+        if remaining is not None:
+            return remaining, eta.BASIS_PROGRESS
+        return None
+
+    def _session_mean_runtime_unlocked(self):
+        """Mean wall time of the jobs of the session that succeeded, or None."""
+        durations = [
+            job.stop_time - job.start_time
+            for job in self.retired_job_list
+            if job.status == "success" and job.start_time is not None and job.stop_time is not None
+        ]
+        return sum(durations) / len(durations) if durations else None
+
+    def _expected_finishes_unlocked(self, now=None):
+        """
+        When each running and queued job is expected to finish, as {id(job): epoch
+        time}, jobs that cannot be estimated left out. Running jobs finish when
+        their time left is up; queued jobs are played on nb_jobs slots in their
+        order, for their expected runtime or, when the history knows nothing of
+        them, the mean runtime of the jobs of the session that succeeded. The
+        jobs of the job arrays not dispatched yet are played after them, for
+        the mean expected runtime of the jobs of their array dispatched so far;
+        the last one gives the finish of the array, as id(job_array).
+        Resources and licenses are not taken into account.
+        """
+        now = time.time() if now is None else now
+        finishes = {}
+        slots = []
+        for job in self.running_job_list:
+            remaining = self._remaining_runtime(job, now)
+            if remaining is None:
+                slots.append(now)
+                continue
+            finishes[id(job)] = now + remaining[0]
+            slots.append(finishes[id(job)])
+        slots.extend([now] * max(0, self.nb_jobs - len(slots)))
+        if not slots:
+            return finishes
+        heapq.heapify(slots)
+        session_mean = self._session_mean_runtime_unlocked()
+        for job in list(getattr(self.job_queue, "queue", ())):
+            expected = self._expected_runtime(job)
+            if expected is None:
+                expected = session_mean
+            end = heapq.heappop(slots) + (expected or 0.0)
+            if expected is not None:
+                finishes[id(job)] = end
+            heapq.heappush(slots, end)
+        for job_array in self._pending_arrays:
+            expected = job_array.expected_runtime
+            if expected is None:
+                expected = session_mean
+            end = None
+            for _ in range(job_array.pending):
+                end = heapq.heappop(slots) + (expected or 0.0)
+                heapq.heappush(slots, end)
+            if expected is not None and end is not None:
+                finishes[id(job_array)] = end
+        return finishes
+
+    def _expected_completion(self, expected_finishes):
+        """When everything running and queued is expected to be done, or None when a runtime is unknown."""
+        pending = list(self.running_job_list) + list(getattr(self.job_queue, "queue", ())) + list(self._pending_arrays)
+        if not pending or any(id(job) not in expected_finishes for job in pending):
+            return None
+        return max(expected_finishes[id(job)] for job in pending)
+
+    def _throughput_unlocked(self, now):
+        """Jobs finished per hour (see odatix.lib.parallel_job_handler.eta)."""
+        start_times = [job.start_time for job in self.running_job_list + self.retired_job_list if job.start_time is not None]
+        return eta.throughput_per_hour(
+            [job.stop_time for job in self.retired_job_list], min(start_times) if start_times else None, now
+        )
+
+    def _running_pids_unlocked(self):
+        """The processes each running job started itself, as {job: [pid]}."""
+        pids = {}
+        for job in self.running_job_list:
+            units = [job] + list(getattr(job, "_fmax_probes", None) or [])
+            job_pids = [unit.process.pid for unit in units if getattr(unit, "process", None) is not None]
+            if job_pids:
+                pids[job] = job_pids
+        return pids
+
+    def _trace_unlocked(self, job):
+        if self.trace is not None:
+            self.trace.observe(job)
+
+    def _journal_unlocked(self):
+        if self.journal is None:
+            return None
+        return {"file": self.journal.path, "error": self.journal.error}
+
+    def _save_run_figures(self, job):
+        """
+        Write what a job used and its wall time, and the wall time of its steps,
+        to its work directory; those of a sweep to the directory of each of its
+        frequencies, as the totals of the sweep.
+        """
+        if job.start_time is None:
+            return
+        sweep_dirs = getattr(job, "sweep_dirs", None)
+        for tmp_dir in sweep_dirs or [job.tmp_dir]:
+            resource_usage.write_usage(
+                tmp_dir,
+                getattr(job, "resource_usage", None),
+                (job.stop_time or time.time()) - job.start_time,
+                sweep_size=len(sweep_dirs) if sweep_dirs else None,
+            )
+        steps = self._step_durations(job)
+        if steps:
+            import odatix.lib.job_steps as job_steps
+
+            try:
+                job_steps.record_step_seconds(job.step_tracking["tmp_dir"], steps)
+            except OSError:
+                pass
 
     def retire_job(self, job, progress=100):
         job.stop_time = time.time()
+        if job.process is not None:
+            job.exit_code = job.process.returncode
+        self._log_stream_states.pop(job, None)
+        self._save_run_figures(job)
+        for probe in getattr(job, "_fmax_probes", None) or []:
+            self._release_unit_unlocked(probe)
+        self._release_unit_unlocked(job)
         self.running_job_list.remove(job)
         job.progress = progress
         self.retired_job_list.append(job)
+        self.metrics.job_finished(job)
+        self._trace_unlocked(job)
+        if self.retired_log_dir is not None:
+            self._retired_to_compact.append(job)
+
+    def _compact_retired_jobs_unlocked(self):
+        """
+        Compact the retired jobs but the last retired_jobs_kept (see
+        ParallelJob.compact), their logs written to retired_log_dir: a daemon
+        running for a week does not hold the logs and commands of every job it
+        ran. A job whose log cannot be written is kept whole.
+        """
+        while len(self._retired_to_compact) > self.retired_jobs_kept:
+            job = self._retired_to_compact.popleft()
+            # Put back in the queue since (see _requeue_after_oom_unlocked), or
+            # retired twice.
+            if job.status not in job_journal.FINISHED_STATUSES or job.log_file is not None:
+                continue
+            log_file = os.path.join(self.retired_log_dir, "{}.jsonl".format(self._compacted_count))
+            try:
+                os.makedirs(self.retired_log_dir, exist_ok=True)
+                job.compact(log_file)
+            except OSError:
+                continue
+            self._compacted_count += 1
 
     def terminate_all_jobs(self):
         for job in self.running_job_list:
-            if job.process:
+            if hasattr(job, "_fmax_probes"):
+                self._stop_probes(job)
+            elif job.process:
                 try:  # Try to terminate the process group
                     if sys.platform == "win32":
                         job.process.send_signal(signal.CTRL_BREAK_EVENT)
@@ -22,15 +22,160 @@
 import os
 import sys
 import re
+import json
 import time
 import signal
 
 import odatix.lib.printc as printc
 
+# What a job needs to run, and not once it is over: dropped when a retired job
+# is compacted (see ParallelJob.compact).
+RUN_STATE = (
+    "step_tracking",
+    "post_run_export",
+    "export_coordinates",
+    "_memory_limit",
+    "_fmax_search",
+    "_fmax_probes",
+    "_step_predictions",
+    "_task_pipeline",
+    "_task_index",
+    "_current_task_name",
+    "_current_task_steps",
+    "_task_steps_recorded_before",
+    "current_step_index",
+    "current_step_started_at",
+)
+
+# What the snapshot of a job shows and changes by setting it: the handler is
+# told (see ParallelJobHandler.snapshot) through _snapshot_listener.
+SNAPSHOT_FIELDS = frozenset((
+    "status",
+    "progress",
+    "display_name",
+    "directory",
+    "tmp_dir",
+    "target",
+    "arch",
+    "start_time",
+    "stop_time",
+    "sweep_dirs",
+    "resources",
+    "licenses",
+    "memory_limit_gb",
+    "resource_usage",
+    "_runtime_prediction",
+))
+
+_UNSET = object()
+
+
+class RetiredLog:
+    """
+    The log of a compacted job, in a file of JSON lines read back when asked
+    for. It stands for the list of lines of the job (len, indexes, slices,
+    iteration and append), without holding them in memory.
+    """
+
+    __slots__ = ("path", "count")
+
+    def __init__(self, path, count):
+        self.path = path
+        self.count = int(count)
+
+    @classmethod
+    def write(cls, path, lines):
+        lines = list(lines)
+        with open(path, "w") as f:
+            for line in lines:
+                f.write(json.dumps(str(line)) + "\n")
+        return cls(path, len(lines))
+
+    def _lines(self):
+        try:
+            with open(self.path, "r") as f:
+                return [json.loads(line) for line in f]
+        except (OSError, ValueError):
+            return []
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self._lines())
+
+    def __getitem__(self, index):
+        return self._lines()[index]
+
+    def append(self, line):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(str(line)) + "\n")
+        self.count += 1
+
+
 class ParallelJob:
     status_file_pattern = re.compile(r"(.*)")
     progress_file_pattern = re.compile(r"(.*)")
 
+    # A daemon keeps every job it ran: no __dict__ per job. Attributes set by
+    # the components and the handler on some jobs only are slots too, left
+    # unset (getattr with a default, hasattr) until then.
+    __slots__ = (
+        # The record of the job
+        "process",
+        "command",
+        "directory",
+        "generate_rtl",
+        "generate_command",
+        "target",
+        "arch",
+        "display_name",
+        "status_file",
+        "progress_file",
+        "tmp_dir",
+        "log_size_limit",
+        "progress_mode",
+        "status",
+        "progress",
+        "start_time",
+        "stop_time",
+        "exit_code",
+        "log_file",
+        # Its log, and where the monitors are in it
+        "log_history",
+        "log_dropped",
+        "log_position",
+        "log_changed",
+        "log_seq",
+        "log_x_offset",
+        "autoscroll",
+        "_max_visible_log_len",
+        "_max_visible_log_len_cache_size",
+        # Set by the components
+        "step_names",
+        "resume_step_index",
+        "sweep_dirs",
+        "fmax_probing",
+        "runtime_history",
+        "resources",
+        "licenses",
+        "memory_limit_gb",
+        # Set by the handler
+        "journal_id",
+        "state_version",
+        "resource_usage",
+        "_snapshot_listener",
+        "_snapshot_running",
+        "_snapshot_queued",
+        "_runtime_prediction",
+        "_oom_requeues",
+        "_cpu_set",
+        # Set by the monitors, on their copies of the jobs of a daemon
+        "_remote_id",
+        "_remote_log_total",
+        "_remote_terminal_sync_done",
+    ) + RUN_STATE
+
     def __init__(
         self,
         process,
@@ -64,12 +209,54 @@ class ParallelJob:
         self.status = status
 
         self.log_history = []
+        # Lines dropped from the front of log_history, so that a line keeps
+        # the same number (log_dropped + its index) while the log is trimmed.
+        self.log_dropped = 0
         self.log_position = 0
         self.log_changed = False
         self.autoscroll = True
 
         self.start_time = None
         self.stop_time = None
+        # Kept once the job is compacted (see compact).
+        self.exit_code = None
+        self.log_file = None
+
+    def __setattr__(self, name, value):
+        if name not in SNAPSHOT_FIELDS:
+            object.__setattr__(self, name, value)
+            return
+        previous = getattr(self, name, _UNSET)
+        object.__setattr__(self, name, value)
+        if previous is not value and previous != value:
+            listener = getattr(self, "_snapshot_listener", None)
+            if listener is not None:
+                listener(self, name)
+
+    def compact(self, log_file):
+        """
+        Reduce a retired job to its summary (status, times, exit code), its log
+        written to `log_file` and read back from there when asked for. What it
+        took to run the job (its command, process and run state) is dropped.
+        """
+        self.log_history = RetiredLog.write(log_file, self.log_history)
+        self.log_file = log_file
+        self.process = None
+        self.command = None
+        self.generate_command = None
+        for name in RUN_STATE:
+            if hasattr(self, name):
+                delattr(self, name)
+
+    def trim_log(self, limit):
+        """Drop the oldest lines of log_history beyond `limit` (-1: no limit). Returns how many."""
+        limit = int(limit)
+        if limit == -1 or len(self.log_history) <= limit:
+            return 0
+        dropped = len(self.log_history) - limit
+        self.log_history = self.log_history[-limit:] if limit > 0 else []
+        self.log_dropped += dropped
+        return dropped
 
     @staticmethod
     def set_patterns(progress_file_pattern, status_file_pattern=None):
@@ -0,0 +1,252 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Job arrays: jobs of a sweep sent to, and kept by, the daemon as one template.
+
+The jobs of a sweep differ in a few fields (tmp_dir, arch, display_name, ...)
+that their commands and paths are made of. A job array is the payload of the
+first job (see serialization.job_to_payload) with these values replaced by
+placeholders ("{{tmp_dir}}"), and a row of values per job:
+
+    {"template": {...}, "variables": ["tmp_dir", "arch", ...],
+     "rows": [["work/xc7/Counter/04bits", "Counter/04bits", ...], ...],
+     "overrides": {"12": {"generate_command": "..."}}}
+
+A job whose payload the template does not give back exactly gets the fields it
+differs in as overrides, so packing never changes a job. The daemon keeps the
+jobs of an array it has not dispatched yet as rows (see JobArray), and turns a
+row into a job only when a slot is free for it: a sweep of thousands of jobs
+is not thousands of jobs in its queue, its job list or /jobs.
+"""
+
+import collections
+import os
+import re
+
+from odatix.lib.parallel_job_handler.job import ParallelJob
+from odatix.lib.parallel_job_handler.serialization import payload_to_job
+
+# Fields of a job payload whose values are replaced by placeholders.
+VARIABLES = ("tmp_dir", "directory", "arch", "display_name", "target", "status_file", "progress_file")
+
+# Shorter values are too likely to appear by chance in the rest of a payload.
+MIN_VARIABLE_LENGTH = 3
+
+_PLACEHOLDER = re.compile(r"\{\{(" + "|".join(VARIABLES) + r")\}\}")
+
+
+def _placeholder(name):
+    return "{{" + name + "}}"
+
+
+def _map_strings(value, function):
+    if isinstance(value, str):
+        return function(value)
+    if isinstance(value, list):
+        return [_map_strings(item, function) for item in value]
+    if isinstance(value, dict):
+        return {key: _map_strings(item, function) for key, item in value.items()}
+    return value
+
+
+def _abstract(value, values):
+    """`value` with the `values` ({name: value}) it holds replaced by their placeholders."""
+    literals = sorted(((value_, name) for name, value_ in values.items()), key=lambda item: -len(item[0]))
+    if not literals:
+        return value
+    names = dict(literals)
+    pattern = re.compile("|".join(re.escape(literal) for literal, _ in literals))
+    return _map_strings(value, lambda text: pattern.sub(lambda match: _placeholder(names[match.group(0)]), text))
+
+
+def expand(value, values):
+    """`value` with its placeholders replaced by `values` ({name: value})."""
+    return _map_strings(
+        value,
+        lambda text: _PLACEHOLDER.sub(lambda match: values.get(match.group(1), match.group(0)), text) if "{{" in text else text,
+    )
+
+
+def _shape(payload):
+    """What jobs must share to be in the same array: their fields and the structure of their command."""
+    command = payload.get("command") or {}
+    stages = tuple(
+        (stage.get("stage"), tuple(task.get("name") for task in stage.get("tasks") or []))
+        for stage in command.get("stages") or []
+    )
+    return tuple(sorted(payload)), command.get("type"), stages
+
+
+def pack(payloads):
+    """One job array of job payloads of the same shape."""
+    payloads = list(payloads)
+    first = payloads[0]
+    variables = [
+        name for name in VARIABLES
+        if isinstance(first.get(name), str)
+        and len(set(payload.get(name) for payload in payloads)) > 1
+        and all(isinstance(payload.get(name), str) and len(payload[name]) >= MIN_VARIABLE_LENGTH for payload in payloads)
+    ]
+    template = _abstract(first, {name: first[name] for name in variables})
+    rows = []
+    overrides = {}
+    for index, payload in enumerate(payloads):
+        row = [payload[name] for name in variables]
+        expanded = expand(template, dict(zip(variables, row)))
+        differences = {key: value for key, value in payload.items() if expanded.get(key) != value}
+        if differences:
+            overrides[str(index)] = differences
+        rows.append(row)
+    name = os.path.commonprefix([str(payload.get("display_name") or "") for payload in payloads]).rstrip(" /_-(")
+    return {
+        "name": name or str(first.get("display_name") or "jobs"),
+        "template": template,
+        "variables": variables,
+        "rows": rows,
+        "overrides": overrides,
+    }
+
+
+def pack_payloads(payloads):
+    """Job arrays of job payloads, in order, each one of a run of payloads of the same shape."""
+    arrays = []
+    run = []
+    for payload in payloads:
+        if run and _shape(payload) != _shape(run[0]):
+            arrays.append(pack(run))
+            run = []
+        run.append(payload)
+    if run:
+        arrays.append(pack(run))
+    return arrays
+
+
+def array_size(array):
+    return len(array.get("rows") or [])
+
+
+def unpack(array):
+    """The job payloads of a job array."""
+    template = array["template"]
+    variables = list(array.get("variables") or [])
+    overrides = array.get("overrides") or {}
+    for index, row in enumerate(array.get("rows") or []):
+        payload = expand(template, dict(zip(variables, row)))
+        payload.update(overrides.get(str(index)) or {})
+        yield payload
+
+
+class JobArray:
+    """
+    A job array in a daemon: the rows not dispatched yet, from `next_row` on,
+    and how many of the jobs dispatched have each status.
+    """
+
+    def __init__(self, array, default_log_size_limit=200, next_row=0):
+        self.name = str(array.get("name") or "jobs")
+        self.template = array["template"]
+        self.variables = list(array.get("variables") or [])
+        self.rows = list(array.get("rows") or [])
+        self.overrides = dict(array.get("overrides") or {})
+        self.size = len(self.rows)
+        self.default_log_size_limit = int(default_log_size_limit)
+        self.next_row = 0
+        self.statuses = collections.Counter()
+        # The row of the array in the journal (see job_journal.record_array).
+        self.journal_id = None
+        # Sum and count of the runtimes the jobs dispatched are expected to
+        # take, for the time left of the rows.
+        self._expected_total = 0.0
+        self._expected_count = 0
+        self.skip(next_row)
+
+    @property
+    def pending(self):
+        """How many jobs are not dispatched yet."""
+        return self.size - self.next_row
+
+    def skip(self, count):
+        """Drop the next `count` rows, dispatched already (a chunk sent again, a journal)."""
+        for _ in range(min(int(count), self.pending)):
+            self._drop_row()
+
+    def _drop_row(self):
+        index = self.next_row
+        self.rows[index] = None
+        self.overrides.pop(str(index), None)
+        self.next_row += 1
+        return index
+
+    def to_payload(self):
+        """The array as sent, the rows dispatched already left empty."""
+        return {
+            "name": self.name,
+            "template": self.template,
+            "variables": self.variables,
+            "rows": self.rows,
+            "overrides": self.overrides,
+        }
+
+    def expand_next(self):
+        """The job of the next row, which is dropped from the array."""
+        row = self.rows[self.next_row]
+        overrides = self.overrides.get(str(self.next_row)) or {}
+        self._drop_row()
+        payload = expand(self.template, dict(zip(self.variables, row)))
+        payload.update(overrides)
+        job = payload_to_job(payload, default_log_size_limit=self.default_log_size_limit, job_class=ArrayJob)
+        job.job_array = self
+        self.statuses[job.status] += 1
+        return job
+
+    def observe_expected_runtime(self, seconds):
+        if seconds is not None:
+            self._expected_total += seconds
+            self._expected_count += 1
+
+    @property
+    def expected_runtime(self):
+        """Mean expected runtime of the jobs dispatched, in seconds, or None."""
+        return self._expected_total / self._expected_count if self._expected_count else None
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "size": self.size,
+            "pending": self.pending,
+            "statuses": {status: count for status, count in self.statuses.items() if count > 0},
+        }
+
+
+class ArrayJob(ParallelJob):
+    """A job dispatched from a job array, which counts the statuses of its jobs."""
+
+    __slots__ = ("job_array",)
+
+    def __setattr__(self, name, value):
+        if name == "status":
+            job_array = getattr(self, "job_array", None)
+            if job_array is not None:
+                job_array.statuses[self.status] -= 1
+                job_array.statuses[value] += 1
+        super().__setattr__(name, value)
@@ -0,0 +1,454 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Write-ahead journal of the jobs of a daemon session.
+
+Everything a daemon knows of its jobs lives in its memory: a daemon that dies,
+or a host that reboots in the middle of a two-day sweep, loses every job it had
+queued. A daemon session therefore records its jobs in a SQLite database in WAL
+mode, next to its state file in the daemon directory of the workspace
+(.odatix_sessions/journal.<session>.sqlite):
+
+    meta     the session: name, nb_jobs, log size, pid of the daemon, boot id
+    jobs     one row per job: its payload (see serialization.job_to_payload),
+             its last status and the processes it runs, as [pid, start time]
+    events   every change of status, appended
+    arrays   one row per job array (see job_array): the array as sent, and the
+             first of its rows not dispatched yet
+
+A job is journaled when it is enqueued (the job of an array when it is
+dispatched, with the next row of its array in the same transaction), and its changes of status are written
+once per tick of the handler, in one transaction. A session that stops
+gracefully ("odatix stop", or /shutdown) discards its journal; a journal left
+behind is a session that died with jobs to run.
+
+When a daemon starts with a journal left behind (see recover_jobs), it puts the
+jobs that did not finish back in its queue, and the rows of the arrays not
+dispatched back in its arrays. A job still running when the daemon
+died cannot be adopted again: its output went to the pipes of the dead daemon.
+Its process groups are terminated (those whose leader still has the start time
+recorded: a pid may have been given to another process since), and the job runs
+again, from the first step
+left to do for a job split into steps (see odatix.lib.job_steps).
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+
+try:
+    import sqlite3
+except ImportError:  # Python built without SQLite
+    sqlite3 = None
+
+from odatix.lib.parallel_job_handler.job_array import JobArray
+from odatix.lib.parallel_job_handler.serialization import job_to_payload, payload_to_job
+
+# Statuses a job does not leave by itself: it is not run again on recovery.
+FINISHED_STATUSES = ("success", "failed", "killed", "canceled", "cancelled", "oom")
+
+BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+PROC_STAT_FILE = "/proc/{}/stat"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    pids TEXT,
+    enqueued_at REAL,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL,
+    time REAL NOT NULL,
+    status TEXT NOT NULL,
+    pids TEXT
+);
+CREATE TABLE IF NOT EXISTS arrays (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    next_row INTEGER NOT NULL,
+    enqueued_at REAL
+);
+"""
+
+
+def supported():
+    return sqlite3 is not None
+
+
+def boot_id():
+    """Identifier of the current boot of the host, None where it is not known."""
+    try:
+        with open(BOOT_ID_FILE, "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def process_start_time(pid):
+    """
+    When a process started, in clock ticks since boot (field 22 of
+    /proc/<pid>/stat), None where it is not known.
+    """
+    try:
+        with open(PROC_STAT_FILE.format(int(pid)), "r") as f:
+            stat = f.read()
+        # The name of the process, in parentheses, may hold spaces.
+        return int(stat[stat.rindex(")") + 1:].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
+
+
+class JobJournal:
+    """
+    The journal of one session. Writes that fail (a full disk, a locked file)
+    are reported in `error` and do not stop the session.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.error = None
+        self._lock = threading.Lock()
+        # Last (status, pids) written for each job id.
+        self._written = {}
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # A transaction survives the daemon once written to the WAL; NORMAL
+        # only risks the last ones on a power loss, never the consistency.
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    @property
+    def closed(self):
+        return self._connection is None
+
+    def _write(self, statements):
+        """Run (sql, parameters) statements in one transaction; returns their cursors, or None."""
+        with self._lock:
+            if self._connection is None:
+                return None
+            cursors = []
+            try:
+                self._connection.execute("BEGIN")
+                for sql, parameters in statements:
+                    cursors.append(self._connection.execute(sql, parameters))
+                self._connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                self.error = str(e)
+                try:
+                    self._connection.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                return None
+            return cursors
+
+    def _read(self, sql, parameters=()):
+        with self._lock:
+            if self._connection is None:
+                return []
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def set_meta(self, **values):
+        self._write([
+            ("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+            for key, value in values.items()
+        ])
+
+    def meta(self):
+        values = {}
+        for key, value in self._read("SELECT key, value FROM meta"):
+            try:
+                values[key] = json.loads(value)
+            except ValueError:
+                pass
+        return values
+
+    def record_enqueue(self, job, status="queued", now=None):
+        """
+        Journal a new job; it is given the id of its row (`journal_id`). The
+        job of a job array moves the next row of its array.
+        """
+        now = time.time() if now is None else now
+        statements = [
+            (
+                "INSERT INTO jobs (payload, status, pids, enqueued_at, updated_at) VALUES (?, ?, NULL, ?, ?)",
+                (json.dumps(job_to_payload(job)), status, now, now),
+            ),
+            ("INSERT INTO events (job_id, time, status, pids) VALUES (last_insert_rowid(), ?, ?, NULL)", (now, status)),
+        ]
+        job_array = getattr(job, "job_array", None)
+        if job_array is not None and job_array.journal_id is not None:
+            statements.append(("UPDATE arrays SET next_row = ? WHERE id = ?", (job_array.next_row, job_array.journal_id)))
+        cursors = self._write(statements)
+        if cursors is None:
+            return None
+        job.journal_id = cursors[0].lastrowid
+        # A job not scheduled yet is as good as queued.
+        self._written[job.journal_id] = (str(job.status), [])
+        return job.journal_id
+
+    def record_array(self, job_array, now=None):
+        """Journal a new job array; it is given the id of its row (`journal_id`)."""
+        now = time.time() if now is None else now
+        cursors = self._write([(
+            "INSERT INTO arrays (payload, size, next_row, enqueued_at) VALUES (?, ?, ?, ?)",
+            (json.dumps(job_array.to_payload()), job_array.size, job_array.next_row, now),
+        )])
+        if cursors is None:
+            return None
+        job_array.journal_id = cursors[0].lastrowid
+        return job_array.journal_id
+
+    def sync(self, jobs, running_pids, now=None):
+        """
+        Write the changes of status and of processes of `jobs` since the last
+        sync, in one transaction. `running_pids` is {job: [pid]} for the jobs
+        that run processes. Returns the number of jobs written.
+        """
+        now = time.time() if now is None else now
+        changes = []
+        for job in jobs:
+            job_id = getattr(job, "journal_id", None)
+            if job_id is None:
+                continue
+            state = (str(job.status), sorted(running_pids.get(job, [])))
+            if self._written.get(job_id) != state:
+                changes.append((job_id, state))
+        if not changes:
+            return 0
+        statements = []
+        for job_id, (status, pids) in changes:
+            pids_text = json.dumps([[pid, process_start_time(pid)] for pid in pids]) if pids else None
+            statements.append(("UPDATE jobs SET status = ?, pids = ?, updated_at = ? WHERE id = ?", (status, pids_text, now, job_id)))
+            statements.append(("INSERT INTO events (job_id, time, status, pids) VALUES (?, ?, ?, ?)", (job_id, now, status, pids_text)))
+        if self._write(statements) is None:
+            return 0
+        self._written.update(changes)
+        return len(changes)
+
+    def unfinished(self):
+        """The jobs that did not finish, in the order they were enqueued, as dicts."""
+        rows = self._read(
+            "SELECT id, payload, status, pids FROM jobs WHERE status NOT IN ({}) ORDER BY id".format(
+                ", ".join("?" * len(FINISHED_STATUSES))
+            ),
+            FINISHED_STATUSES,
+        )
+        entries = []
+        for job_id, payload, status, pids in rows:
+            try:
+                processes = [process if isinstance(process, list) else [process, None] for process in json.loads(pids or "[]")]
+                entries.append({
+                    "id": job_id,
+                    "payload": json.loads(payload),
+                    "status": status,
+                    "pids": [pid for pid, _ in processes],
+                    "start_times": {pid: start_time for pid, start_time in processes},
+                })
+            except (ValueError, TypeError):
+                continue
+        return entries
+
+    def unfinished_arrays(self):
+        """The job arrays with rows not dispatched, in the order they were enqueued, as dicts."""
+        entries = []
+        for array_id, payload, next_row in self._read("SELECT id, payload, next_row FROM arrays WHERE next_row < size ORDER BY id"):
+            try:
+                entries.append({"id": array_id, "payload": json.loads(payload), "next_row": int(next_row)})
+            except (ValueError, TypeError):
+                continue
+        return entries
+
+    def events(self, job_id):
+        """The changes of status of a job, as [(time, status)]."""
+        return [tuple(row) for row in self._read("SELECT time, status FROM events WHERE job_id = ? ORDER BY id", (job_id,))]
+
+    def forget_finished(self):
+        """Drop the jobs that finished, and their events, and the job arrays all dispatched."""
+        marks = ", ".join("?" * len(FINISHED_STATUSES))
+        self._write([
+            ("DELETE FROM events WHERE job_id IN (SELECT id FROM jobs WHERE status IN ({}))".format(marks), FINISHED_STATUSES),
+            ("DELETE FROM jobs WHERE status IN ({})".format(marks), FINISHED_STATUSES),
+            ("DELETE FROM arrays WHERE next_row >= size", ()),
+        ])
+
+    def close(self, discard=False):
+        """Close the journal; `discard` removes it, for a session that stopped gracefully."""
+        with self._lock:
+            if self._connection is None:
+                return
+            try:
+                self._connection.close()
+            except sqlite3.Error:
+                pass
+            self._connection = None
+        if discard:
+            _remove_database(self.path)
+
+
+def open_journal(path):
+    """The journal at `path`, None where SQLite is not available or the file cannot be opened."""
+    if not supported():
+        return None
+    try:
+        return JobJournal(path)
+    except sqlite3.Error:
+        return None
+
+
+def read_summary(path):
+    """
+    What a journal left behind holds, without changing it: {"meta": {...},
+    "unfinished": n}, the rows of its job arrays not dispatched counted, or
+    None when there is no readable journal at `path`.
+    """
+    if not supported() or not os.path.isfile(path):
+        return None
+    try:
+        connection = sqlite3.connect("file:{}?mode=ro".format(path), uri=True)
+        try:
+            meta = {}
+            for key, value in connection.execute("SELECT key, value FROM meta"):
+                meta[key] = json.loads(value)
+            unfinished = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status NOT IN ({})".format(", ".join("?" * len(FINISHED_STATUSES))),
+                FINISHED_STATUSES,
+            ).fetchone()[0]
+            unfinished += connection.execute("SELECT COALESCE(SUM(size - next_row), 0) FROM arrays WHERE next_row < size").fetchone()[0]
+        finally:
+            connection.close()
+    except (sqlite3.Error, ValueError):
+        return None
+    return {"meta": meta, "unfinished": int(unfinished)}
+
+
+def _terminate_group(pid, start_time, timeout=5.0):
+    """
+    Terminate the process group `pid` leads, if it still runs: SIGTERM, then
+    SIGKILL after `timeout` seconds. Returns whether there was one to terminate.
+    The leader must have started at `start_time` (see process_start_time): a
+    process of the same pid that did not is not one of ours.
+    """
+    if start_time is None or process_start_time(pid) != start_time:
+        return False
+    try:
+        # Only a group leader is one of ours: the daemon starts each job in a
+        # group of its own.
+        if os.getpgid(int(pid)) != int(pid):
+            return False
+        os.killpg(int(pid), signal.SIGTERM)
+    except (OSError, ValueError):
+        return False
+    deadline = time.time() + float(timeout)
+    while time.time() < deadline:
+        try:
+            os.killpg(int(pid), 0)
+        except OSError:
+            return True
+        time.sleep(0.1)
+    if process_start_time(pid) != start_time:
+        return True
+    try:
+        os.killpg(int(pid), signal.SIGKILL)
+    except OSError:
+        pass
+    return True
+
+
+def _resume_steps(job):
+    """
+    Drop from the pipeline of a job split into steps the tasks whose steps were
+    completed in its work directory since it was enqueued.
+    """
+    import odatix.lib.job_steps as job_steps
+
+    tracking = getattr(job, "step_tracking", None)
+    step_names = getattr(job, "step_names", None) or []
+    if not isinstance(tracking, dict) or not tracking.get("tmp_dir") or not isinstance(job.command, dict):
+        return
+    resume_index = int(getattr(job, "resume_step_index", 0) or 0)
+    completed = job_steps.resume_index(tracking["tmp_dir"], step_names)
+    for stage in sorted(job.command, key=lambda key: (0, key) if isinstance(key, int) else (1, str(key))):
+        covered = sum(len(task.get("steps") or [task.get("name")]) for task in job.command[stage])
+        if resume_index + covered > completed:
+            break
+        del job.command[stage]
+        resume_index += covered
+    job.resume_step_index = resume_index
+
+
+def recover_jobs(journal, handler, log_size_limit=200, same_boot=None):
+    """
+    Put the jobs a dead session left unfinished in its journal back in the queue
+    of `handler` (see the module docstring), and the job arrays it had not
+    dispatched all of back in its arrays; forget the ones that finished.
+    Returns the jobs recovered.
+
+    `same_boot` tells whether the host did not reboot since the journal was
+    written: the processes of the dead session can only still run then. By
+    default, it is read from the boot id in the journal.
+    """
+    if same_boot is None:
+        recorded = journal.meta().get("boot_id")
+        same_boot = recorded is not None and recorded == boot_id()
+    journal.forget_finished()
+    recovered = []
+    for entry in journal.unfinished():
+        try:
+            job = payload_to_job(entry["payload"], default_log_size_limit=log_size_limit)
+        except (ValueError, TypeError):
+            continue
+        if same_boot and hasattr(os, "killpg"):
+            for pid in entry["pids"]:
+                _terminate_group(pid, entry["start_times"].get(pid))
+        _resume_steps(job)
+        job.journal_id = entry["id"]
+        recovered.append(job)
+    for job in recovered:
+        handler.add_job(job)
+    for entry in journal.unfinished_arrays():
+        try:
+            job_array = JobArray(entry["payload"], default_log_size_limit=log_size_limit, next_row=entry["next_row"])
+        except (KeyError, ValueError, TypeError, AttributeError):
+            continue
+        job_array.journal_id = entry["id"]
+        handler.add_job_array(job_array)
+    return recovered
@@ -0,0 +1,226 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Trace of the lifecycle of the jobs of a session, in the Chrome trace format.
+
+The time a sweep takes goes to the tools, but also to slots left empty, exports
+that stall and a few jobs running long after the others. A daemon session
+writes what each of its jobs went through to a trace file, that chrome://tracing
+or https://ui.perfetto.dev loads:
+
+  * "Slots": one row per job slot, with a span for each phase of the job that
+    holds it (generate, each task of its flow, running, exporting, paused) and a
+    mark when it retires, with its status. Gaps on a row are a slot left empty.
+  * "Queue": the time each job spent queued.
+
+Spans carry the tool, target and architecture of their job, and the cores it
+was pinned to. A span is written when it ends, so the file only grows by a line
+per phase of a job and a session that dies leaves a trace that still loads (both
+viewers accept a JSON array that is not closed).
+
+The handler tells the trace of each change of status of a job (see
+ParallelJobHandler._trace_unlocked); `observe` works out the phase of the job
+and closes the span of its previous one.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import time
+
+from odatix.lib.parallel_job_handler import cpu_pinning
+from odatix.lib.parallel_job_handler.job_journal import FINISHED_STATUSES
+from odatix.lib.parallel_job_handler.metrics import job_tool
+
+SLOTS_PID = 1
+QUEUE_PID = 2
+
+PHASE_QUEUED = "queued"
+PHASE_GENERATE = "generate"
+PHASE_RUNNING = "running"
+PHASE_EXPORTING = "exporting"
+PHASE_PAUSED = "paused"
+PHASE_RETIRED = "retired"
+
+PHASES_BY_STATUS = {
+    "queued": PHASE_QUEUED,
+    "starting": PHASE_GENERATE,
+    "running": PHASE_RUNNING,
+    "exporting": PHASE_EXPORTING,
+    "paused": PHASE_PAUSED,
+}
+
+
+def job_phase(job):
+    """The phase of a job, the name of its task standing for "running" in a flow of tasks."""
+    status = str(job.status)
+    if status in FINISHED_STATUSES:
+        return PHASE_RETIRED
+    phase = PHASES_BY_STATUS.get(status)
+    if phase == PHASE_RUNNING and getattr(job, "_current_task_name", None):
+        return str(job._current_task_name)
+    return phase
+
+
+class JobTrace:
+    def __init__(self, path, now=None):
+        self.path = str(path)
+        self.started_at = time.time() if now is None else now
+        self.error = None
+        # {job: (id, phase, start, lane or None)}
+        self._spans = {}
+        self._ids = {}
+        self._next_id = itertools.count()
+        self._lanes = {}
+        self._free_lanes = []
+        self._lane_count = 0
+        self._file = None
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "w")
+            self._file.write("[")
+        except OSError as e:
+            self.error = str(e)
+            self._file = None
+        self._separator = "\n"
+        self._emit({"name": "process_name", "ph": "M", "pid": SLOTS_PID, "args": {"name": "Slots"}})
+        self._emit({"name": "process_name", "ph": "M", "pid": QUEUE_PID, "args": {"name": "Queue"}})
+        self._emit({
+            "name": "session", "ph": "i", "s": "g", "pid": SLOTS_PID, "tid": 0, "ts": 0,
+            "args": {"started_at": self.started_at},
+        })
+
+    def _ts(self, now):
+        return int(round((now - self.started_at) * 1e6))
+
+    def _emit(self, event):
+        if self._file is None:
+            return
+        try:
+            self._file.write(self._separator + json.dumps(event, sort_keys=True))
+            self._separator = ",\n"
+            self._file.flush()
+        except (OSError, ValueError) as e:
+            # A trace is not worth stopping a session for.
+            self.error = str(e)
+            self._file = None
+
+    def _take_lane(self, job):
+        if job not in self._lanes:
+            if self._free_lanes:
+                lane = heapq.heappop(self._free_lanes)
+            else:
+                self._lane_count += 1
+                lane = self._lane_count
+                self._emit({"name": "thread_name", "ph": "M", "pid": SLOTS_PID, "tid": lane, "args": {"name": "slot {}".format(lane)}})
+            self._lanes[job] = lane
+        return self._lanes[job]
+
+    def _release_lane(self, job):
+        lane = self._lanes.pop(job, None)
+        if lane is not None:
+            heapq.heappush(self._free_lanes, lane)
+
+    @staticmethod
+    def _args(job):
+        args = {
+            "job": str(getattr(job, "display_name", "")),
+            "tool": job_tool(job),
+            "target": str(getattr(job, "target", "")),
+            "arch": str(getattr(job, "arch", "")),
+        }
+        cpus = getattr(job, "_cpu_set", None)
+        if cpus:
+            args["cpus"] = cpu_pinning.format_cpu_set(cpus)
+        return args
+
+    def _end_span(self, job, now):
+        span = self._spans.pop(job, None)
+        if span is None:
+            return
+        job_id, phase, start, lane, args = span
+        if phase == PHASE_QUEUED:
+            for ph, ts in (("b", start), ("e", now)):
+                self._emit({
+                    "name": phase, "cat": "queue", "ph": ph, "id": job_id, "pid": QUEUE_PID, "tid": 0,
+                    "ts": self._ts(ts), "args": args if ph == "b" else {},
+                })
+        else:
+            self._emit({
+                "name": phase, "cat": "job", "ph": "X", "pid": SLOTS_PID, "tid": lane,
+                "ts": self._ts(start), "dur": max(0, self._ts(now) - self._ts(start)), "args": args,
+            })
+
+    def observe(self, job, now=None):
+        """Record the phase `job` is in, if it changed since the last time it was observed."""
+        phase = job_phase(job)
+        span = self._spans.get(job)
+        if span is not None and span[1] == phase:
+            return
+        if span is None and phase is None:
+            return
+        now = time.time() if now is None else now
+        self._end_span(job, now)
+        if job not in self._ids:
+            # Never reused: a viewer pairs the end of a span with its start by id.
+            self._ids[job] = next(self._next_id)
+        job_id = self._ids[job]
+        if phase == PHASE_RETIRED:
+            lane = self._lanes.get(job)
+            if lane is not None:
+                self._emit({
+                    "name": str(job.status), "cat": "retired", "ph": "i", "s": "t", "pid": SLOTS_PID, "tid": lane,
+                    "ts": self._ts(now), "args": self._args(job),
+                })
+            self._release_lane(job)
+            self._ids.pop(job, None)
+            return
+        if phase in (None, PHASE_QUEUED):
+            # Back in the queue (see ParallelJobHandler._requeue_after_oom_unlocked).
+            self._release_lane(job)
+            lane = None
+        else:
+            lane = self._take_lane(job)
+        if phase is not None:
+            self._spans[job] = (job_id, phase, now, lane, self._args(job))
+
+    def close(self, now=None):
+        """End the spans still open (jobs stopped with the session) and close the file."""
+        now = time.time() if now is None else now
+        for job in list(self._spans):
+            self._end_span(job, now)
+        self._spans.clear()
+        self._lanes.clear()
+        if self._file is not None:
+            try:
+                self._file.write("\n]\n")
+                self._file.close()
+            except (OSError, ValueError):
+                pass
+            self._file = None
+
+    def to_dict(self):
+        return {"file": self.path, "error": self.error, "slots": self._lane_count}
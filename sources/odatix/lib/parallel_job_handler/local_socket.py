@@ -0,0 +1,186 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Unix domain socket transport of the daemon API, for the clients of the host.
+
+On top of its TCP port, a daemon listens on a socket in the session directory of
+its workspace (.odatix_sessions/<session>.sock), readable by its user only. The
+state file of the session gives its path, along with the host it was made on.
+Clients of that host (the command line, the terminal monitor and the GUI monitor)
+reach the daemon through it, with base URLs of the form "http+unix://<quoted
+path>". Clients keep one connection per socket and per thread open between
+requests. Clients on other hosts, and daemons whose socket could not be made,
+use TCP.
+"""
+
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import urllib.error
+import urllib.parse
+
+SCHEME = "http+unix://"
+
+# sun_path holds 108 bytes on Linux and 104 on macOS, terminating NUL included.
+MAX_PATH_LENGTH = 103
+
+# A connection kept open may have been closed by the server in the meantime.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError, ConnectionResetError)
+
+_pool = threading.local()
+
+
+def supported():
+    return hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+
+
+def usable_path(path):
+    """Whether a socket can be made at `path`."""
+    return supported() and path is not None and len(os.fsencode(str(path))) <= MAX_PATH_LENGTH
+
+
+def base_url(path):
+    return SCHEME + urllib.parse.quote(str(path), safe="")
+
+
+def socket_path(url):
+    """The path of the socket of an "http+unix://" base URL, or None."""
+    url = str(url)
+    if not url.startswith(SCHEME):
+        return None
+    return urllib.parse.unquote(url[len(SCHEME):].rstrip("/"))
+
+
+def state_socket(state):
+    """The socket of the daemon of a state file, when this host can reach it."""
+    path = state.get("socket") if isinstance(state, dict) else None
+    if not path or state.get("socket_host") != socket.gethostname() or not usable_path(path):
+        return None
+    return str(path) if os.path.exists(str(path)) else None
+
+
+def bind(path):
+    """A socket listening at `path`, replacing what a daemon that died left there."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # Created with no permission for the group and the others.
+        previous_umask = os.umask(0o177)
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(previous_umask)
+        sock.listen(128)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """An HTTP connection to a Unix domain socket."""
+
+    def __init__(self, path, timeout=1.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def _connection(path, timeout):
+    connections = getattr(_pool, "connections", None)
+    if connections is None:
+        connections = _pool.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        connection = connections[path] = UnixHTTPConnection(path, timeout=timeout)
+    connection.timeout = timeout
+    if connection.sock is not None:
+        connection.sock.settimeout(timeout)
+    return connection
+
+
+def _drop_connection(path):
+    connection = getattr(_pool, "connections", {}).pop(path, None)
+    if connection is not None:
+        connection.close()
+
+
+def request(url, method, path, payload=None, timeout=1.0):
+    """
+    Send a request to the daemon at the "http+unix://" base URL `url`, and
+    return its decoded JSON response. HTTP errors raise urllib.error.HTTPError,
+    like the TCP clients.
+    """
+    sock_path = socket_path(url)
+    body = None
+    headers = {}
+    if payload is not None:
+        body = json.dumps(payload).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+
+    for attempt in (0, 1):
+        connection = _connection(sock_path, float(timeout))
+        reused = connection.sock is not None
+        try:
+            connection.request(str(method).upper(), path, body=body, headers=headers)
+            response = connection.getresponse()
+            raw = response.read()
+        except _STALE_CONNECTION_ERRORS:
+            _drop_connection(sock_path)
+            if reused and attempt == 0:
+                continue
+            raise
+        except Exception:
+            _drop_connection(sock_path)
+            raise
+        if response.will_close:
+            _drop_connection(sock_path)
+        break
+
+    if response.status >= 400:
+        raise urllib.error.HTTPError(url + path, response.status, response.reason, response.headers, None)
+    if not raw:
+        return {}
+    return json.loads(raw.decode("utf-8"))
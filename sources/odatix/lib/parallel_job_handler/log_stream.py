@@ -0,0 +1,217 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Log streaming of daemon jobs over the WebSocket API.
+
+A client of /ws subscribes to the log of a job with
+{"type": "subscribe_logs", "job_id": 3, "from_seq": 0}, and the daemon pushes it
+what the job prints, as it prints it:
+
+    {"type": "logs", "job_id": 3, "from_seq": 120, "next_seq": 124,
+     "lines": [<lines 120 to 123>], "rewrites": [{"seq": 119, "line": "..."}]}
+
+Lines are numbered from the start of the job (see ParallelJobHandler.log_since):
+a number keeps naming the same line while older ones are dropped from the log.
+"rewrites" are lines the client already has that changed since, such as a
+progress bar rewritten in place with '\\r'. A "from_seq" higher than asked means
+the lines in between were dropped before they could be sent.
+{"type": "unsubscribe_logs", "job_id": 3} stops the stream.
+
+LogStreamClient is the client side, for the terminal monitor.
+"""
+
+import collections
+import json
+import threading
+
+try:
+    from websockets.sync.client import connect as _ws_connect
+    from websockets.sync.client import unix_connect as _ws_unix_connect
+except ImportError:  # websockets < 11, or not installed
+    _ws_connect = None
+    _ws_unix_connect = None
+
+# Interval between two pushes of the log of a job, in seconds.
+PUSH_INTERVAL = 0.1
+
+# How many of the last lines sent are watched for rewrites.
+REWRITE_WINDOW = 32
+
+
+class LogSubscription:
+    """What a client subscribed to the log of a job was sent, and what it is sent next."""
+
+    def __init__(self, job_id, from_seq=0):
+        self.job_id = int(job_id)
+        self.next_seq = max(0, int(from_seq or 0))
+        # The last lines sent, {seq: line}, to tell rewrites.
+        self._recent = collections.OrderedDict()
+
+    def poll(self, handler):
+        """The "logs" message of what changed since the last one, or None."""
+        asked = self.next_seq
+        log = handler.log_since(self.job_id, min(self._recent) if self._recent else asked)
+        if log is None:
+            return None
+        rewrites = []
+        lines = []
+        for offset, line in enumerate(log["lines"]):
+            seq = log["from_seq"] + offset
+            if seq >= asked:
+                lines.append(line)
+            elif seq in self._recent and self._recent[seq] != line:
+                rewrites.append({"seq": seq, "line": line})
+                self._recent[seq] = line
+        from_seq = max(asked, log["from_seq"])
+        for offset, line in enumerate(lines):
+            self._recent[from_seq + offset] = line
+        while len(self._recent) > REWRITE_WINDOW:
+            self._recent.popitem(last=False)
+        self.next_seq = from_seq + len(lines)
+        if not lines and not rewrites:
+            return None
+        return {
+            "type": "logs",
+            "job_id": self.job_id,
+            "from_seq": from_seq,
+            "next_seq": self.next_seq,
+            "lines": lines,
+            "rewrites": rewrites,
+        }
+
+
+def apply_log_message(job, message, limit=-1):
+    """
+    Bring the copy of a log a client keeps in `job.log_history` up to date with
+    a "logs" message. `job.log_seq` is the number of its first line.
+    """
+    base = int(getattr(job, "log_seq", 0) or 0)
+    from_seq = int(message.get("from_seq", 0))
+    position = from_seq - base
+    if position < 0 or position > len(job.log_history):
+        # Lines were dropped in between: start over from what came.
+        job.log_history = []
+        job.log_position = 0
+        base = from_seq
+        position = 0
+    del job.log_history[position:]
+    job.log_history.extend(str(line) for line in message.get("lines") or [])
+    for rewrite in message.get("rewrites") or []:
+        index = int(rewrite.get("seq", -1)) - base
+        if 0 <= index < len(job.log_history):
+            job.log_history[index] = str(rewrite.get("line", ""))
+    limit = int(limit)
+    if limit != -1 and len(job.log_history) > limit:
+        dropped = len(job.log_history) - limit
+        job.log_history = job.log_history[-limit:]
+        job.log_position = max(0, int(job.log_position) - dropped)
+        base += dropped
+    job.log_seq = base
+    job.log_changed = True
+
+
+def supported():
+    return _ws_connect is not None
+
+
+class LogStreamClient:
+    """
+    Follows the log of one job of a daemon through /ws, in a thread of its own.
+    `connected` is False until the connection is up, and again once it is lost:
+    the caller then falls back to polling.
+    """
+
+    def __init__(self, host, port, retries=3, socket_file=None):
+        self.url = "ws://{}:{}/ws?snapshots=false".format(host, int(port))
+        self.socket_file = socket_file
+        self.connected = False
+        self._retries = int(retries)
+        self._lock = threading.Lock()
+        self._messages = collections.deque()
+        self._wanted = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not supported() or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def follow(self, job_id):
+        """Stream the log of `job_id` from its first line kept, instead of the one followed so far."""
+        with self._lock:
+            if self._wanted != int(job_id):
+                self._wanted = int(job_id)
+                self._messages.clear()
+
+    @property
+    def following(self):
+        return self._wanted
+
+    def drain(self):
+        """The messages received for the job followed since the last call."""
+        with self._lock:
+            messages = [message for message in self._messages if message.get("job_id") == self._wanted]
+            self._messages.clear()
+        return messages
+
+    def close(self):
+        self._stop.set()
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set() and failures < self._retries:
+            try:
+                if self.socket_file is not None:
+                    connection = _ws_unix_connect(self.socket_file, "ws://localhost/ws?snapshots=false", open_timeout=2.0)
+                else:
+                    connection = _ws_connect(self.url, open_timeout=2.0)
+                with connection:
+                    failures = 0
+                    self.connected = True
+                    self._serve(connection)
+            except Exception:
+                failures += 1
+            finally:
+                self.connected = False
+            self._stop.wait(1.0)
+
+    def _serve(self, connection):
+        subscribed = None
+        while not self._stop.is_set():
+            wanted = self._wanted
+            if wanted != subscribed:
+                if subscribed is not None:
+                    connection.send(json.dumps({"type": "unsubscribe_logs", "job_id": subscribed}))
+                if wanted is not None:
+                    connection.send(json.dumps({"type": "subscribe_logs", "job_id": wanted, "from_seq": 0}))
+                subscribed = wanted
+            try:
+                raw = connection.recv(timeout=0.2)
+            except TimeoutError:
+                continue
+            message = json.loads(raw)
+            if isinstance(message, dict) and message.get("type") == "logs":
+                with self._lock:
+                    self._messages.append(message)
@@ -0,0 +1,315 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Per-job memory limits.
+
+One place & route job running away with memory pushes the whole host into swap,
+and every other job slows down with it. A job may therefore run under a memory
+limit, declared by its tool or flow ("memory_limit_gb" in tool.yml), or set for
+the whole session (see ParallelJobHandler.configure_runtime).
+
+The limit is enforced on every process of the job:
+
+  * with a cgroup v2 of its own, holding its processes and their children,
+    whose memory.max is the limit (and memory.swap.max 0: a job over its limit
+    is killed rather than swapped out). Job cgroups are created under
+    $ODATIX_CGROUP, which must enable the memory controller for its children,
+    or under the cgroup of the session when it is delegated to the user (see
+    cgroup_parent);
+  * otherwise with RLIMIT_AS, inherited by the children of each process. It
+    limits the address space of each process rather than what the job really
+    uses: tools reserving much more than they touch need a higher limit.
+
+A job that hits its limit ends as "oom" rather than "failed": the kernel killed
+one of its processes in its cgroup, or, under RLIMIT_AS, it failed to allocate
+memory (as told by its last lines of log), or it was killed while the OOM
+killer of the kernel was killing processes (the oom_kill count of /proc/vmstat
+went up). It is put back in the
+queue with a limit raised by OOM_LIMIT_GROWTH, up to the memory of the host, at
+most hard_settings.oom_max_requeues times. Its memory_gb cost is raised along
+with it: it only starts again once the host has that much memory to spare.
+"""
+
+import itertools
+import math
+import os
+import re
+import signal
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STATUS_OOM = "oom"
+
+ENV_CGROUP = "ODATIX_CGROUP"
+CGROUP_ROOT = "/sys/fs/cgroup"
+# Where the processes of the session go when it enables the memory controller
+# of its own cgroup: a cgroup with processes cannot have controlled children.
+SESSION_CGROUP = "odatix-sessions"
+VMSTAT = "/proc/vmstat"
+
+# How much a limit grows when a job hits it.
+OOM_LIMIT_GROWTH = 1.5
+
+# Last lines of log searched for an allocation failure under RLIMIT_AS.
+OOM_LOG_LINES = 50
+OOM_PATTERN = re.compile(
+    r"out of memory|cannot allocate memory|std::bad_alloc|MemoryError|OutOfMemoryError|memory allocation failed",
+    re.IGNORECASE,
+)
+# What the handler writes in the log of a job that hit its limit: never taken
+# for what the tool printed.
+OOM_MESSAGE = "error: out of memory (limit of {:g} GB)"
+OOM_MESSAGE_PATTERN = re.compile(r"error: out of memory \(limit of [0-9.]+ GB\)")
+
+MODE_CGROUP = "cgroup"
+MODE_RLIMIT = "rlimit"
+
+_cgroup_names = itertools.count(1)
+
+
+def normalize_limit(value):
+    """A limit in GB as a positive float, or None for no limit."""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def supported():
+    return resource is not None
+
+
+def _controllers(path, filename):
+    try:
+        with open(os.path.join(path, filename), "r") as f:
+            return f.read().split()
+    except OSError:
+        return []
+
+
+def cgroup_parent(environ=None, proc_cgroup="/proc/self/cgroup", root=CGROUP_ROOT):
+    """
+    The cgroup v2 job cgroups are created under, or None (RLIMIT_AS then):
+
+      * $ODATIX_CGROUP, when it enables the memory controller for its children
+        and is writable;
+      * otherwise the cgroup of this process, when it is writable and offers the
+        memory controller (a cgroup delegated to the user, e.g. by "systemd-run
+        --user --scope -p Delegate=yes"). A cgroup holding processes cannot
+        enable it for its children: the processes of the cgroup are moved to a
+        leaf of it, SESSION_CGROUP, first. That fails, and RLIMIT_AS is used,
+        when the cgroup holds processes of other sessions the user may not move.
+    """
+    environ = os.environ if environ is None else environ
+    path = environ.get(ENV_CGROUP)
+    if path:
+        if "memory" not in _controllers(path, "cgroup.subtree_control") or not os.access(path, os.W_OK):
+            return None
+        return path
+    try:
+        with open(proc_cgroup, "r") as f:
+            for line in f:
+                # cgroup v2: "0::/user.slice/..."
+                if line.startswith("0::"):
+                    path = os.path.join(root, line.strip()[3:].lstrip("/"))
+    except OSError:
+        return None
+    if not path or not os.access(path, os.W_OK):
+        return None
+    if "memory" in _controllers(path, "cgroup.subtree_control"):
+        return path
+    if "memory" not in _controllers(path, "cgroup.controllers"):
+        return None
+    return path if _enable_memory_controller(path) else None
+
+
+def _enable_memory_controller(path):
+    """Move the processes of a cgroup to a leaf of it, and enable the memory controller for its children."""
+    leaf = os.path.join(path, SESSION_CGROUP)
+    try:
+        if not os.path.isdir(leaf):
+            os.mkdir(leaf)
+        with open(os.path.join(path, "cgroup.procs"), "r") as f:
+            pids = [line.strip() for line in f if line.strip()]
+        for pid in pids:
+            try:
+                with open(os.path.join(leaf, "cgroup.procs"), "w") as f:
+                    f.write(pid)
+            except ProcessLookupError:
+                # Gone in the meantime.
+                pass
+        with open(os.path.join(path, "cgroup.subtree_control"), "w") as f:
+            f.write("+memory")
+    except OSError:
+        return False
+    return True
+
+
+def host_oom_kills(vmstat=VMSTAT):
+    """How many processes the OOM killer of the kernel killed since boot, or None when unknown."""
+    try:
+        with open(vmstat, "r") as f:
+            for line in f:
+                name, _, value = line.partition(" ")
+                if name == "oom_kill":
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def raised_limit(limit_gb, ceiling_gb=None):
+    """The limit to requeue a job with after it hit `limit_gb`, or None when it cannot grow."""
+    raised = math.ceil(limit_gb * OOM_LIMIT_GROWTH * 2) / 2.0
+    if ceiling_gb is not None:
+        if limit_gb >= ceiling_gb:
+            return None
+        raised = min(raised, float(ceiling_gb))
+    return raised
+
+
+def looks_like_oom(returncode, log_lines, kernel_oom_kills=0):
+    """
+    Whether a process under RLIMIT_AS ended because it ran out of memory.
+    `kernel_oom_kills` is how many processes the OOM killer of the kernel killed
+    while it ran: a SIGKILL only counts when it did. `log_lines` are the lines
+    the process printed.
+    """
+    if returncode in (-signal.SIGKILL, 128 + signal.SIGKILL) and kernel_oom_kills:
+        # The OOM killer of the kernel: the handler sends SIGTERM.
+        return True
+    return any(
+        OOM_PATTERN.search(str(line)) and not OOM_MESSAGE_PATTERN.search(str(line))
+        for line in list(log_lines)[-OOM_LOG_LINES:]
+    )
+
+
+class MemoryLimit:
+    """The memory limit of the processes of one job (or probe)."""
+
+    def __init__(self, limit_gb, parent=None, vmstat=VMSTAT, log_start=0):
+        self.limit_gb = float(limit_gb)
+        self.cgroup = None
+        # Number of the first line of the log of the job printed under the
+        # limit (lines keep their number while the log is trimmed).
+        self.log_start = int(log_start)
+        self._vmstat = vmstat
+        # Under RLIMIT_AS, kills of the OOM killer are counted for the host.
+        self._host_oom_kills = host_oom_kills(vmstat)
+        if parent:
+            path = os.path.join(parent, "odatix-{}-{}".format(os.getpid(), next(_cgroup_names)))
+            try:
+                os.mkdir(path)
+                self._write(path, "memory.max", str(self.limit_bytes))
+                self.cgroup = path
+            except OSError:
+                self._remove(path)
+            if self.cgroup is not None:
+                try:
+                    self._write(path, "memory.swap.max", "0")
+                except OSError:
+                    # No swap accounting: the limit holds anyway.
+                    pass
+
+    @property
+    def limit_bytes(self):
+        return int(self.limit_gb * 1024 ** 3)
+
+    @property
+    def mode(self):
+        return MODE_CGROUP if self.cgroup is not None else MODE_RLIMIT
+
+    @staticmethod
+    def _write(path, filename, value):
+        with open(os.path.join(path, filename), "w") as f:
+            f.write(value)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+    def preexec(self):
+        """What a new process of the job runs before the tool: joining the cgroup, or setting its rlimit."""
+        cgroup, limit = self.cgroup, self.limit_bytes
+
+        def _preexec():
+            if cgroup is not None:
+                try:
+                    with open(os.path.join(cgroup, "cgroup.procs"), "w") as f:
+                        # "0": the process writing it.
+                        f.write("0")
+                    return
+                except OSError:
+                    pass
+            if resource is not None:
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+        return _preexec
+
+    def oom_kills(self):
+        """
+        How many processes of the cgroup the kernel killed for memory so far.
+        Without a cgroup, how many processes of the host it killed since the
+        limit was set.
+        """
+        if self.cgroup is None:
+            now, then = host_oom_kills(self._vmstat), self._host_oom_kills
+            return now - then if now is not None and then is not None else 0
+        try:
+            with open(os.path.join(self.cgroup, "memory.events"), "r") as f:
+                for line in f:
+                    name, _, value = line.partition(" ")
+                    if name == "oom_kill":
+                        return int(value)
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    def hit(self, returncode, log_lines, log_dropped=0):
+        """
+        Whether a process of the job that failed with `returncode` hit the limit.
+        Only the lines of `log_lines` printed under the limit are searched, not
+        those of the runs before; `log_dropped` is how many lines were trimmed
+        from its front.
+        """
+        if self.cgroup is not None:
+            return self.oom_kills() > 0
+        return looks_like_oom(returncode, list(log_lines)[max(0, self.log_start - int(log_dropped)):], self.oom_kills())
+
+    def release(self):
+        """Remove the cgroup, once its processes are gone."""
+        if self.cgroup is not None:
+            self._remove(self.cgroup)
+            self.cgroup = None
+
+    def to_dict(self):
+        return {"limit_gb": self.limit_gb, "mode": self.mode}
@@ -0,0 +1,218 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Health figures of a daemon, served by /metrics in the Prometheus text format.
+
+A daemon runs for days: its figures tell how much its scheduler costs next to
+the tools it runs. The handler feeds:
+
+  * the jobs started, and finished by status (counters: a scraper takes their
+    rate per second),
+  * the wall time of the jobs, per tool, and the time their exports took,
+  * the time a tick of the handler takes, and each of its phases,
+  * the bytes read from the pipes of the jobs,
+  * the time spent waiting for the lock of the handler (see TimedLock);
+
+and /metrics adds the jobs by status and the resident memory of the daemon at
+the time of the scrape. The text format is written here: no client library is
+needed.
+"""
+
+import bisect
+import collections
+import contextlib
+import os
+import time
+
+PREFIX = "odatix_"
+
+# Upper bounds of the buckets of the histograms, in seconds.
+JOB_BUCKETS = (10, 60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400)
+EXPORT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+TICK_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5)
+LOCK_BUCKETS = (0.0001, 0.001, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(float(bound) for bound in buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        value = float(value)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self, name, labels=None):
+        """The lines of the histogram, as [(name, labels, value)]."""
+        labels = dict(labels or {})
+        cumulative = 0
+        samples = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts + [self.count]):
+            cumulative = count if bound == float("inf") else cumulative + count
+            samples.append((name + "_bucket", dict(labels, le=_format_value(bound)), cumulative))
+        samples.append((name + "_sum", labels, round(self.sum, 6)))
+        samples.append((name + "_count", labels, self.count))
+        return samples
+
+
+class TimedLock:
+    """A lock (a threading.RLock) that records how long acquiring it took."""
+
+    def __init__(self, lock, histogram):
+        self._lock = lock
+        self._histogram = histogram
+
+    def acquire(self, blocking=True, timeout=-1):
+        started = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            # Recorded holding the lock: no other thread records at the same time.
+            self._histogram.observe(time.perf_counter() - started)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+        return False
+
+
+def job_tool(job):
+    """The tool a job runs, from its key in the runtime history (see runtime_history)."""
+    history = getattr(job, "runtime_history", None)
+    key = history.get("key") if isinstance(history, dict) else None
+    tool = key.get("tool") if isinstance(key, dict) else None
+    return str(tool) if tool else "unknown"
+
+
+def resident_memory_bytes():
+    """The resident memory of the process, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class DaemonMetrics:
+    """What the handler records of itself (see the module docstring)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.jobs_started = 0
+        self.jobs_finished = collections.Counter()
+        self.job_seconds = {}
+        self.export_seconds = Histogram(EXPORT_BUCKETS)
+        self.tick_seconds = Histogram(TICK_BUCKETS)
+        self.phase_seconds = {}
+        self.pipe_bytes_read = 0
+        self.lock_wait_seconds = Histogram(LOCK_BUCKETS)
+
+    def job_started(self):
+        self.jobs_started += 1
+
+    def job_finished(self, job):
+        self.jobs_finished[str(job.status)] += 1
+        if job.start_time is not None and job.stop_time is not None:
+            tool = job_tool(job)
+            if tool not in self.job_seconds:
+                self.job_seconds[tool] = Histogram(JOB_BUCKETS)
+            self.job_seconds[tool].observe(max(0.0, job.stop_time - job.start_time))
+
+    @contextlib.contextmanager
+    def timed(self, histogram):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    def phase(self, name):
+        """Time a phase of a tick of the handler."""
+        if name not in self.phase_seconds:
+            self.phase_seconds[name] = Histogram(TICK_BUCKETS)
+        return self.timed(self.phase_seconds[name])
+
+    def render(self, jobs_by_status, resident_memory=None, now=None):
+        """The figures in the Prometheus text format, `jobs_by_status` being {status: count}."""
+        now = time.time() if now is None else now
+        families = [
+            ("uptime_seconds", "gauge", "Time since the daemon started.", [((), round(now - self.started_at, 3))]),
+            ("jobs", "gauge", "Jobs of the daemon, by status.",
+             [({"status": status}, count) for status, count in sorted(jobs_by_status.items())]),
+            ("jobs_started_total", "counter", "Jobs started.", [((), self.jobs_started)]),
+            ("jobs_finished_total", "counter", "Jobs finished, by status.",
+             [({"status": status}, count) for status, count in sorted(self.jobs_finished.items())]),
+            ("job_wall_seconds", "histogram", "Wall time of the jobs that finished, by tool.",
+             [({"tool": tool}, histogram) for tool, histogram in sorted(self.job_seconds.items())]),
+            ("export_seconds", "histogram", "Time the exports of the results of the jobs took.",
+             [((), self.export_seconds)]),
+            ("tick_seconds", "histogram", "Time a tick of the handler took.", [((), self.tick_seconds)]),
+            ("tick_phase_seconds", "histogram", "Time the phases of a tick of the handler took.",
+             [({"phase": phase}, histogram) for phase, histogram in sorted(self.phase_seconds.items())]),
+            ("pipe_bytes_read_total", "counter", "Bytes read from the output of the jobs.", [((), self.pipe_bytes_read)]),
+            ("lock_wait_seconds", "histogram", "Time spent waiting for the lock of the handler.",
+             [((), self.lock_wait_seconds)]),
+        ]
+        if resident_memory is not None:
+            families.append(("resident_memory_bytes", "gauge", "Resident memory of the daemon.", [((), resident_memory)]))
+
+        lines = []
+        for name, kind, help_text, series in families:
+            name = PREFIX + name
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, kind))
+            for labels, value in series:
+                samples = value.samples(name, dict(labels)) if isinstance(value, Histogram) else [(name, dict(labels), value)]
+                for sample_name, sample_labels, sample_value in samples:
+                    lines.append("{}{} {}".format(sample_name, _labels(sample_labels), _format_value(sample_value)))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,278 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+What the jobs of a session really use: memory, CPU time and disk I/O.
+
+A daemon session samples the processes of each running job every
+SAMPLE_INTERVAL seconds through /proc: the process the job started and all of
+its descendants (and those of its fmax probes). It keeps, per job:
+
+  * the peak resident memory of the whole tree (sum of the RSS of its processes),
+  * the CPU time used (user + system, including the children already reaped),
+  * the bytes read from and written to disk.
+
+A job run as a pipeline of steps starts a new process per step: what the
+previous ones used is carried over when the process changes. Sampling misses
+what happens between two samples, so the peak memory is a lower bound.
+
+When a job ends, its figures are written to its log directory
+(log/resource_usage.yml), with its wall time, where the result exporters find
+them and add them to the metrics of its last record (see METRICS). Sampling
+needs /proc: elsewhere, a job only has its wall time.
+
+The frequencies of a sweep (see synthesis_common) are synthesized in one tool
+session, whose figures cannot be told apart: they are written to the directory
+of every frequency, as the totals of the session, with the number of
+frequencies that shared it (Sweep_Size).
+"""
+
+import os
+import time
+
+import yaml
+
+import odatix.lib.hard_settings as hard_settings
+
+SAMPLE_INTERVAL = 5.0
+
+PROC_ROOT = "/proc"
+
+# Metrics added to the exported records: name -> (key of the figures, unit).
+METRICS = {
+    "Run_Time": ("wall_seconds", "s"),
+    "Peak_Memory": ("peak_rss_mb", "MB"),
+    "CPU_Time": ("cpu_seconds", "s"),
+    "Disk_Read": ("read_mb", "MB"),
+    "Disk_Write": ("write_mb", "MB"),
+    "Sweep_Size": ("sweep_size", None),
+}
+
+_MB = 1024.0 * 1024.0
+
+try:
+    _CLOCK_TICKS = float(os.sysconf("SC_CLK_TCK"))
+    _PAGE_SIZE = int(os.sysconf("SC_PAGE_SIZE"))
+except (AttributeError, ValueError, OSError):  # Windows
+    _CLOCK_TICKS = 100.0
+    _PAGE_SIZE = 4096
+
+
+def supported(proc_root=PROC_ROOT):
+    return os.path.isdir(os.path.join(proc_root, "self"))
+
+
+def usage_file(tmp_dir):
+    """Where the figures of a job are written, in its work directory."""
+    return os.path.join(str(tmp_dir), hard_settings.work_log_path, hard_settings.resource_usage_filename)
+
+
+class ProcessSample:
+    """What one process uses, as read from /proc/<pid>."""
+
+    def __init__(self, pid, ppid, rss_bytes=0, cpu_seconds=0.0, read_bytes=0, write_bytes=0):
+        self.pid = pid
+        self.ppid = ppid
+        self.rss_bytes = rss_bytes
+        self.cpu_seconds = cpu_seconds
+        self.read_bytes = read_bytes
+        self.write_bytes = write_bytes
+
+
+def _read_process(pid, proc_root):
+    try:
+        with open(os.path.join(proc_root, str(pid), "stat"), "r") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may hold spaces and parentheses: the fields start after
+    # the last ")".
+    fields = stat[stat.rfind(")") + 2:].split()
+    try:
+        ppid = int(fields[1])
+        # utime, stime, cutime, cstime
+        ticks = sum(int(value) for value in fields[11:15])
+        rss_pages = int(fields[21])
+    except (IndexError, ValueError):
+        return None
+    sample = ProcessSample(pid, ppid, rss_bytes=max(0, rss_pages) * _PAGE_SIZE, cpu_seconds=ticks / _CLOCK_TICKS)
+    try:
+        with open(os.path.join(proc_root, str(pid), "io"), "r") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name == "read_bytes":
+                    sample.read_bytes = int(value)
+                elif name == "write_bytes":
+                    sample.write_bytes = int(value)
+    except (OSError, ValueError):
+        # Not readable for processes of other users (setuid tools).
+        pass
+    return sample
+
+
+def read_processes(proc_root=PROC_ROOT):
+    """Every process of the host, as {pid: ProcessSample}."""
+    processes = {}
+    try:
+        entries = os.listdir(proc_root)
+    except OSError:
+        return processes
+    for entry in entries:
+        if entry.isdigit():
+            sample = _read_process(int(entry), proc_root)
+            if sample is not None:
+                processes[sample.pid] = sample
+    return processes
+
+
+def process_tree(processes, root_pid):
+    """The processes of the tree rooted at `root_pid`, itself included."""
+    if root_pid not in processes:
+        return []
+    children = {}
+    for sample in processes.values():
+        children.setdefault(sample.ppid, []).append(sample)
+    tree = [processes[root_pid]]
+    index = 0
+    while index < len(tree):
+        tree += children.get(tree[index].pid, [])
+        index += 1
+    return tree
+
+
+class ResourceUsage:
+    """What the processes of one job used so far (see the module docstring)."""
+
+    def __init__(self):
+        self.peak_rss_bytes = 0
+        self.samples = 0
+        # Totals of the processes the job is done with, and the latest totals
+        # of each process it is running: {root pid: (cpu, read, write)}.
+        self._done = (0.0, 0, 0)
+        self._current = {}
+
+    def add_sample(self, trees):
+        """Account for the process trees of the job, as {root pid: [ProcessSample]}."""
+        for pid in list(self._current):
+            if pid not in trees:
+                self._done = tuple(done + current for done, current in zip(self._done, self._current.pop(pid)))
+        rss = 0
+        for pid, tree in trees.items():
+            rss += sum(sample.rss_bytes for sample in tree)
+            totals = (
+                sum(sample.cpu_seconds for sample in tree),
+                sum(sample.read_bytes for sample in tree),
+                sum(sample.write_bytes for sample in tree),
+            )
+            # A child reaped between two samples moves from its own figures to
+            # the cumulative ones of its parent: never go backwards.
+            previous = self._current.get(pid, (0.0, 0, 0))
+            self._current[pid] = tuple(max(old, new) for old, new in zip(previous, totals))
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        self.samples += 1
+
+    def totals(self):
+        totals = self._done
+        for current in self._current.values():
+            totals = tuple(total + value for total, value in zip(totals, current))
+        return totals
+
+    def to_dict(self):
+        cpu_seconds, read_bytes, write_bytes = self.totals()
+        return {
+            "peak_rss_mb": round(self.peak_rss_bytes / _MB, 1),
+            "cpu_seconds": round(cpu_seconds, 1),
+            "read_mb": round(read_bytes / _MB, 1),
+            "write_mb": round(write_bytes / _MB, 1),
+            "samples": self.samples,
+        }
+
+
+class ResourceSampler:
+    """Samples the running jobs of a handler, once every `interval` seconds."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, proc_root=PROC_ROOT):
+        self.interval = float(interval)
+        self.proc_root = proc_root
+        self._last_sample = None
+
+    def tick(self, jobs, now=None):
+        """Sample `jobs`, as {job: [root pids]}, if the interval has elapsed."""
+        now = time.time() if now is None else now
+        if self._last_sample is not None and now - self._last_sample < self.interval:
+            return False
+        self._last_sample = now
+        if not jobs:
+            return False
+        processes = read_processes(self.proc_root)
+        for job, pids in jobs.items():
+            usage = getattr(job, "resource_usage", None)
+            if usage is None:
+                usage = job.resource_usage = ResourceUsage()
+            usage.add_sample({pid: process_tree(processes, pid) for pid in pids if pid in processes})
+        return True
+
+
+def write_usage(tmp_dir, usage=None, wall_seconds=None, sweep_size=None):
+    """
+    Write the figures of a job (its ResourceUsage, if it was sampled, and its
+    wall time) to the log directory of its work directory, if it has one.
+    `sweep_size` is the number of frequencies of a sweep the figures are the
+    totals of.
+    """
+    path = usage_file(tmp_dir)
+    if not os.path.isdir(os.path.dirname(path)):
+        return
+    figures = usage.to_dict() if usage is not None and usage.samples else {}
+    if wall_seconds is not None:
+        figures["wall_seconds"] = round(max(0.0, float(wall_seconds)), 1)
+    if figures and sweep_size is not None:
+        figures["sweep_size"] = int(sweep_size)
+    if not figures:
+        return
+    try:
+        with open(path, "w") as f:
+            yaml.safe_dump(figures, f, default_flow_style=False)
+    except OSError:
+        pass
+
+
+def read_usage(tmp_dir):
+    """The figures of a job, as written by write_usage, or None."""
+    try:
+        with open(usage_file(tmp_dir), "r") as f:
+            data = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def usage_metrics(data):
+    """The metrics and units of the figures of a job, as ({metric: value}, {metric: unit})."""
+    metrics, units = {}, {}
+    for metric, (key, unit) in METRICS.items():
+        value = (data or {}).get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[metric] = value
+            if unit is not None:
+                units[metric] = unit
+    return metrics, units
@@ -0,0 +1,235 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Resource-weighted admission of jobs.
+
+`nb_jobs` counts jobs, whatever they cost: four place & route jobs taking 16 GB
+each fit in four slots as well as four small syntheses do, and a host with 32 GB
+swaps. A job may therefore declare what it takes (its "cost"), as a dict of
+resource name -> amount:
+
+    {"cores": 4, "memory_gb": 16, "scratch_gb": 50}
+
+"cores" and "memory_gb" are those of the host; any other name is a resource of
+your own (a scratch disk, a share of a NFS server...). The handler admits a job only
+when, on top of having a free slot, what it costs fits in what the running jobs
+leave of the host budget. The budget of "cores" and "memory_gb" is detected from
+the host; other resources have no limit until one is set (see
+ParallelJobHandler.configure_runtime and the /config/resources endpoint).
+
+A job declaring nothing costs nothing, and is admitted on slots alone, as
+before. A job costing more than the whole budget still runs, alone: refusing it
+would leave it queued forever.
+
+Licenses are different: a job of a tool limited by its number of licenses
+declares the token pools it takes one token of, with the size of each pool
+("licenses", e.g. {"dc_shell": 4}; see LicensePools). A job whose tokens are all
+taken does not hold the queue: it waits there while the jobs of other tools go
+ahead, instead of failing or spinning in a license-wait loop on a slot.
+"""
+
+import os
+import sys
+
+# Resources of the host, detected by detect_host_budget.
+CORES = "cores"
+MEMORY_GB = "memory_gb"
+HOST_RESOURCES = (CORES, MEMORY_GB)
+
+
+def _detect_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def _detect_memory_gb(meminfo="/proc/meminfo"):
+    """Total memory of the host in GB, or None when it cannot be read."""
+    if sys.platform == "win32":
+        return None
+    try:
+        with open(meminfo, "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    # "MemTotal:       32768000 kB"
+                    return round(int(line.split()[1]) / (1024.0 * 1024.0), 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def detect_host_budget():
+    """The resources of the host, as a {name: amount} dict."""
+    budget = {CORES: _detect_cores()}
+    memory_gb = _detect_memory_gb()
+    if memory_gb is not None:
+        budget[MEMORY_GB] = memory_gb
+    return budget
+
+
+def normalize_cost(cost):
+    """
+    A cost (or budget) as a {name: amount} dict of positive numbers. Entries that
+    are not numbers, or not positive, are dropped. Returns {} for anything that
+    is not a dict.
+    """
+    if not isinstance(cost, dict):
+        return {}
+    normalized = {}
+    for name, amount in cost.items():
+        if isinstance(amount, bool):
+            continue
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            continue
+        if amount > 0:
+            normalized[str(name)] = int(amount) if amount.is_integer() else amount
+    return normalized
+
+
+def add_costs(costs):
+    """Sum of several costs."""
+    total = {}
+    for cost in costs:
+        for name, amount in cost.items():
+            total[name] = total.get(name, 0) + amount
+    return total
+
+
+def scale_cost(cost, factor):
+    return {name: amount * factor for name, amount in cost.items()}
+
+
+class ResourceBudget:
+    """
+    What the host offers: the detected resources, overridden or completed by
+    the limits set at runtime. A resource without a limit is not counted.
+    """
+
+    def __init__(self, detected=None, limits=None):
+        self.detected = normalize_cost(detect_host_budget() if detected is None else detected)
+        self.limits = {}
+        self.configure(limits)
+
+    def configure(self, limits):
+        """
+        Set the limits of some resources: an amount replaces the detected one
+        (or adds a resource), None goes back to the detected one (or removes the
+        limit of a resource of your own).
+        """
+        if not isinstance(limits, dict):
+            return
+        for name, amount in limits.items():
+            name = str(name)
+            if amount is None:
+                self.limits.pop(name, None)
+                continue
+            normalized = normalize_cost({name: amount})
+            if name in normalized:
+                self.limits[name] = normalized[name]
+
+    @property
+    def total(self):
+        total = dict(self.detected)
+        total.update(self.limits)
+        return total
+
+    def fits(self, used, cost, alone=False):
+        """
+        Whether a job of this cost fits next to what is used. A job running
+        `alone` always fits, even if it costs more than the whole budget.
+        """
+        if alone or not cost:
+            return True
+        total = self.total
+        for name, amount in cost.items():
+            if name in total and used.get(name, 0) + amount > total[name]:
+                return False
+        return True
+
+    def copies_that_fit(self, used, cost, limit):
+        """How many more copies of a cost fit next to what is used, up to limit."""
+        count = 0
+        while count < limit and self.fits(used, scale_cost(cost, count + 1)):
+            count += 1
+        return count
+
+    def to_dict(self, used=None):
+        return {
+            "detected": dict(self.detected),
+            "limits": dict(self.limits),
+            "total": self.total,
+            "used": dict(used or {}),
+        }
+
+
+class LicensePools:
+    """
+    Named license token pools. Their size is the one the jobs declare (the last
+    declaration wins, tool.yml may have changed between two runs), unless set
+    at runtime. Every running unit of a job (each probe of an fmax search led by
+    probes is a tool session) takes one token of each of its pools.
+    """
+
+    def __init__(self):
+        self.declared = {}
+        self.limits = {}
+
+    def declare(self, licenses):
+        self.declared.update(normalize_cost(licenses))
+
+    def configure(self, limits):
+        """Set the size of some pools; None goes back to the declared size."""
+        if not isinstance(limits, dict):
+            return
+        for name, amount in limits.items():
+            name = str(name)
+            if amount is None:
+                self.limits.pop(name, None)
+                continue
+            try:
+                self.limits[name] = max(0, int(amount))
+            except (TypeError, ValueError):
+                continue
+
+    @property
+    def total(self):
+        total = dict(self.declared)
+        total.update(self.limits)
+        return total
+
+    def free(self, held, pool):
+        return max(0, int(self.total.get(pool, 0) - held.get(pool, 0)))
+
+    def available(self, held, pools, units=1):
+        """Whether `units` tokens of each of the pools are free."""
+        return all(self.free(held, pool) >= units for pool in pools)
+
+    def to_dict(self, held=None, waiting=None):
+        held = held or {}
+        waiting = waiting or {}
+        return {
+            pool: {"total": int(total), "used": int(held.get(pool, 0)), "waiting": int(waiting.get(pool, 0))}
+            for pool, total in sorted(self.total.items())
+        }
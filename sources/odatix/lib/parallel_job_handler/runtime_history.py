@@ -0,0 +1,302 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Runtime history of jobs, and the order of the queue it predicts.
+
+Run first in, first out, a sweep mixing 2-minute and 3-hour configurations
+often starts its last long jobs at the very end, and ends long after every other
+slot went idle. Knowing how long each job is going to take, the handler can
+start the longest ones first (longest processing time first, "lpt"), which
+packs the batch into the slots much more tightly.
+
+The wall time of every job that succeeded is recorded in a file at the root of
+the workspace (.odatix_runtime_history.json), keyed by what the job runs:
+
+    {"job_type": "fmax_synthesis", "tool": "vivado", "flow": "default",
+     "target": "xc7a100t", "architecture": "Counter", "configuration": "32bits"}
+
+The sessions of the workspace share it, rewriting it under a file lock (see
+shared_files). A history that cannot be parsed is left as it is, not replaced.
+
+A job is predicted from, in this order:
+
+  * the previous runs of the same key,
+  * the configurations of the same architecture whose numbers are the closest
+    ("16bits" and "32bits" say a lot about "24bits"),
+  * the other configurations of the same architecture,
+  * the other jobs of the same tool and flow.
+
+Jobs the history knows nothing about are started first under "lpt" (they may
+be the long ones, and they start filling the history), last under "spt".
+
+Jobs split into steps also record the wall time of each step (from the
+timestamps of odatix.lib.job_steps), which is what the ETA of a running job is
+refined with (see odatix.lib.parallel_job_handler.eta). Those are recorded even
+for a job that resumed after some of its steps: the steps it ran took as long
+as they would have in a whole run.
+"""
+
+import json
+import math
+import os
+import re
+import time
+
+import odatix.lib.hard_settings as hard_settings
+from odatix.lib.parallel_job_handler.shared_files import locked, write_json
+
+# Queue policies: the order queued jobs start in.
+POLICY_LPT = "lpt"  # longest expected runtime first
+POLICY_SPT = "spt"  # shortest expected runtime first
+POLICY_FIFO = "fifo"  # in the order they were queued
+POLICIES = (POLICY_LPT, POLICY_SPT, POLICY_FIFO)
+DEFAULT_POLICY = POLICY_LPT
+
+# What a prediction is based on, from the strongest evidence to the weakest.
+BASIS_KEY = "same job"
+BASIS_NEIGHBOURS = "neighbouring configurations"
+BASIS_ARCHITECTURE = "same architecture"
+BASIS_FLOW = "same tool and flow"
+
+KEY_FIELDS = ("job_type", "tool", "flow", "target", "architecture", "configuration")
+ARCHITECTURE_FIELDS = KEY_FIELDS[:5]
+FLOW_FIELDS = ("job_type", "tool", "flow")
+
+# How many wall times are kept per key, and how many neighbouring
+# configurations a prediction is interpolated from.
+KEPT_DURATIONS = 5
+NEIGHBOUR_COUNT = 2
+
+_number_pattern = re.compile(r"[0-9]+(?:\.[0-9]+)?")
+
+
+def history_file(workspace_root):
+    """Path of the runtime history of a workspace."""
+    return os.path.join(str(workspace_root), hard_settings.runtime_history_filename)
+
+
+def make_key(job_type, tool, flow, target, arch_name):
+    """
+    The key of a job in the history. `arch_name` is "<architecture>/<configuration>"
+    (or a bare architecture name).
+    """
+    arch_name = str(arch_name or "")
+    architecture, _, configuration = arch_name.partition("/")
+    return {
+        "job_type": str(job_type or ""),
+        "tool": str(tool or ""),
+        "flow": str(flow or ""),
+        "target": str(target or ""),
+        "architecture": architecture,
+        "configuration": configuration,
+    }
+
+
+def _key_string(key):
+    return "|".join(str(key.get(field, "")) for field in KEY_FIELDS)
+
+
+def _fields(key, fields):
+    return tuple(str(key.get(field, "")) for field in fields)
+
+
+def _features(configuration):
+    return [float(number) for number in _number_pattern.findall(str(configuration))]
+
+
+def _mean(values):
+    values = list(values)
+    return sum(values) / len(values) if values else None
+
+
+class Prediction:
+    """An expected runtime in seconds, and what it is based on."""
+
+    def __init__(self, seconds, basis):
+        self.seconds = float(seconds)
+        self.basis = basis
+
+    def __repr__(self):
+        return "Prediction(seconds={:.0f}, basis={!r})".format(self.seconds, self.basis)
+
+
+class RuntimeHistory:
+    """
+    The runtime history of a workspace, read again whenever the file changes,
+    and indexed by key and by architecture when it is.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        # False when the file exists but cannot be parsed: it is then never
+        # written back, not to lose what it holds.
+        self.readable = True
+        self._signature = None
+        self._index({})
+
+    def _index(self, records):
+        self._records = records
+        self._valid = []
+        self._by_key = {}
+        self._by_architecture = {}
+        self._by_flow = {}
+        self._flow_means = {}
+        for record in records.values():
+            if not isinstance(record, dict) or not isinstance(record.get("key"), dict):
+                continue
+            if not (record.get("durations") or record.get("steps")):
+                continue
+            key = record["key"]
+            self._valid.append(record)
+            self._by_key[_key_string(key)] = record
+            self._by_architecture.setdefault(_fields(key, ARCHITECTURE_FIELDS), []).append(record)
+            self._by_flow.setdefault(_fields(key, FLOW_FIELDS), []).append(record)
+
+    def _load(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            if self._records or not self.readable:
+                self.readable, self._signature = True, None
+                self._index({})
+            return self._records
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return self._records
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            records = data.get("records") if isinstance(data, dict) else None
+        except (OSError, ValueError):
+            records = None
+        self.readable = isinstance(records, dict)
+        self._signature = signature
+        self._index(records if self.readable else {})
+        return self._records
+
+    def records(self):
+        """The entries of the history: {"key": {...}, "durations": [...], "steps": {...}} dicts."""
+        self._load()
+        return list(self._valid)
+
+    def record(self, key, seconds, steps=None):
+        """
+        Add the wall time of a job (None when only its steps are worth keeping),
+        and that of its steps, as [(name, seconds)]. Several sessions of a
+        workspace share the file: it is read again and rewritten under a lock.
+        Raises ValueError when the file cannot be parsed, rather than replace it.
+        """
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with locked(self.path + ".lock"):
+            self._signature = None
+            records = dict(self._load())
+            if not self.readable:
+                raise ValueError("the runtime history " + self.path + " cannot be parsed, and is left as it is")
+            entry = records.get(_key_string(key))
+            entry = entry if isinstance(entry, dict) else {}
+            durations = list(entry.get("durations") or [])
+            if seconds is not None:
+                durations.append(round(float(seconds), 1))
+            step_durations = dict(entry.get("steps") or {})
+            for name, step_seconds in steps or []:
+                kept = list(step_durations.get(name) or [])
+                kept.append(round(float(step_seconds), 1))
+                step_durations[str(name)] = kept[-KEPT_DURATIONS:]
+            records[_key_string(key)] = {
+                "key": {field: str(key.get(field, "")) for field in KEY_FIELDS},
+                "durations": durations[-KEPT_DURATIONS:],
+                "steps": step_durations,
+                "updated": int(time.time()),
+            }
+            write_json(self.path, {"records": records}, mode=0o644)
+            stat = os.stat(self.path)
+            self._signature = (stat.st_mtime_ns, stat.st_size)
+            self._index(records)
+
+    def predict(self, key, step=None):
+        """
+        The expected runtime of a job, or of one of its steps, as a Prediction,
+        or None when nothing is known.
+        """
+
+        def runtime(record):
+            if step is None:
+                return _mean(record.get("durations") or [])
+            steps = record.get("steps")
+            return _mean((steps.get(step) if isinstance(steps, dict) else None) or [])
+
+        self._load()
+        exact = self._by_key.get(_key_string(key))
+        if exact is not None and runtime(exact) is not None:
+            return Prediction(runtime(exact), BASIS_KEY)
+
+        architecture = [
+            (record, runtime(record))
+            for record in self._by_architecture.get(_fields(key, ARCHITECTURE_FIELDS), [])
+        ]
+        architecture = [(record, seconds) for record, seconds in architecture if seconds is not None]
+        features = _features(key.get("configuration"))
+        if architecture and features:
+            neighbours = []
+            for record, seconds in architecture:
+                other = _features(record["key"].get("configuration"))
+                if len(other) == len(features):
+                    neighbours.append((_distance(features, other), seconds))
+            if neighbours:
+                neighbours.sort(key=lambda item: item[0])
+                return Prediction(_mean(seconds for _, seconds in neighbours[:NEIGHBOUR_COUNT]), BASIS_NEIGHBOURS)
+        if architecture:
+            return Prediction(_mean(seconds for _, seconds in architecture), BASIS_ARCHITECTURE)
+
+        # Jobs of an architecture the history does not know all fall back on
+        # the whole flow: its mean is computed once.
+        flow = _fields(key, FLOW_FIELDS)
+        if (flow, step) not in self._flow_means:
+            self._flow_means[(flow, step)] = _mean(
+                seconds for seconds in (runtime(record) for record in self._by_flow.get(flow, [])) if seconds is not None
+            )
+        seconds = self._flow_means[(flow, step)]
+        return Prediction(seconds, BASIS_FLOW) if seconds is not None else None
+
+
+def _distance(a, b):
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+
+def normalize_policy(policy):
+    """A queue policy name, or None when it is not one."""
+    policy = str(policy or "").strip().lower()
+    return policy if policy in POLICIES else None
+
+
+def sort_key(policy, expected):
+    """
+    Sort key of a queued job under a policy, given its expected runtime in
+    seconds (None when unknown). Sorting is stable: jobs of equal keys keep the
+    order they were queued in.
+    """
+    if policy == POLICY_LPT:
+        return (0, 0.0) if expected is None else (1, -expected)
+    if policy == POLICY_SPT:
+        return (1, 0.0) if expected is None else (0, expected)
+    return (0, 0.0)
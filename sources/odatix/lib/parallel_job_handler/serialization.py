@@ -22,6 +22,8 @@
 """Serialization helpers for transporting ParallelJob objects over JSON."""
 
 from odatix.lib.parallel_job_handler.job import ParallelJob
+from odatix.lib.parallel_job_handler.memory_limits import normalize_limit
+from odatix.lib.parallel_job_handler.resources import normalize_cost
 
 
 def _task_name(task):
@@ -145,6 +147,14 @@ def job_to_payload(job):
     if not isinstance(step_tracking, dict):
         step_tracking = None
 
+    fmax_probing = getattr(job, "fmax_probing", None)
+    if not isinstance(fmax_probing, dict):
+        fmax_probing = None
+
+    runtime_history = getattr(job, "runtime_history", None)
+    if not isinstance(runtime_history, dict):
+        runtime_history = None
+
     return {
         "command": serialize_command(job.command),
         "directory": str(job.directory),
@@ -164,10 +174,28 @@ def job_to_payload(job):
         "step_tracking": step_tracking,
         "step_names": [str(name) for name in (getattr(job, "step_names", None) or [])],
         "resume_step_index": int(getattr(job, "resume_step_index", 0) or 0),
+        # Fmax searches the daemon may lead with parallel probes (see
+        # odatix.lib.parallel_job_handler.fmax_probing); absent otherwise.
+        "fmax_probing": fmax_probing,
+        # Directories a custom frequency sweep synthesizes in (see
+        # odatix.components.synthesis_common.group_custom_freq_sweeps); absent
+        # otherwise.
+        "sweep_dirs": [str(path) for path in (getattr(job, "sweep_dirs", None) or [])],
+        # What the job takes of the resource budget of the daemon (see
+        # odatix.lib.parallel_job_handler.resources); empty when undeclared.
+        "resources": normalize_cost(getattr(job, "resources", None)),
+        # License token pools the job takes one token of, with their size.
+        "licenses": normalize_cost(getattr(job, "licenses", None)),
+        # Memory limit the job runs under, in GB (see
+        # odatix.lib.parallel_job_handler.memory_limits); None for no limit.
+        "memory_limit_gb": normalize_limit(getattr(job, "memory_limit_gb", None)),
+        # Where the runtime of the job is predicted from and recorded (see
+        # odatix.lib.parallel_job_handler.runtime_history); absent otherwise.
+        "runtime_history": runtime_history,
     }
 
 
-def payload_to_job(payload, default_log_size_limit=200):
+def payload_to_job(payload, default_log_size_limit=200, job_class=ParallelJob):
     if not isinstance(payload, dict):
         raise ValueError("job payload must be an object")
 
@@ -176,7 +204,7 @@ def payload_to_job(payload, default_log_size_limit=200):
 
     log_size_limit = payload.get("log_size_limit", default_log_size_limit)
 
-    job = ParallelJob(
+    job = job_class(
         process=None,
         command=command,
         directory=str(payload.get("directory", ".")),
@@ -206,4 +234,63 @@ def payload_to_job(payload, default_log_size_limit=200):
         except (TypeError, ValueError):
             job.resume_step_index = 0
 
+    fmax_probing = payload.get("fmax_probing")
+    if isinstance(fmax_probing, dict):
+        job.fmax_probing = fmax_probing
+
+    sweep_dirs = payload.get("sweep_dirs")
+    if isinstance(sweep_dirs, list) and sweep_dirs:
+        job.sweep_dirs = [str(path) for path in sweep_dirs]
+
+    resources = normalize_cost(payload.get("resources"))
+    if resources:
+        job.resources = resources
+
+    licenses = normalize_cost(payload.get("licenses"))
+    if licenses:
+        job.licenses = licenses
+
+    memory_limit_gb = normalize_limit(payload.get("memory_limit_gb"))
+    if memory_limit_gb:
+        job.memory_limit_gb = memory_limit_gb
+
+    runtime_history = payload.get("runtime_history")
+    if isinstance(runtime_history, dict):
+        job.runtime_history = runtime_history
+
     return job
+
+
+def snapshot_since_query(snapshot):
+    """
+    The "since=<version>&epoch=<epoch>" query asking a handler for what changed
+    after `snapshot`, or "" when it has no version (see
+    ParallelJobHandler.snapshot).
+    """
+    handler = snapshot.get("handler") if isinstance(snapshot, dict) else None
+    if not isinstance(handler, dict) or handler.get("state_version") is None:
+        return ""
+    return "since={}&epoch={}".format(int(handler["state_version"]), handler.get("state_epoch") or "")
+
+
+def merge_snapshot(previous, snapshot):
+    """
+    The full snapshot `snapshot` brings `previous` to: `snapshot` itself, or the
+    jobs of `previous` with the ones of `snapshot` in place of theirs when it is
+    a delta. The time left of the jobs that did not change is counted again from
+    their expected finish.
+    """
+    if not isinstance(snapshot, dict) or not snapshot.get("delta") or not isinstance(previous, dict):
+        return snapshot
+    jobs = {job.get("id"): dict(job) for job in previous.get("jobs") or [] if isinstance(job, dict)}
+    now = (snapshot.get("handler") or {}).get("time")
+    if now is not None:
+        for job in jobs.values():
+            if job.get("expected_finish") is not None:
+                job["eta"] = int(round(max(0.0, job["expected_finish"] - now)))
+    for job in snapshot.get("jobs") or []:
+        jobs[job.get("id")] = job
+    merged = dict(snapshot)
+    merged["delta"] = False
+    merged["jobs"] = [jobs[job_id] for job_id in sorted(jobs, key=lambda job_id: int(job_id))]
+    return merged
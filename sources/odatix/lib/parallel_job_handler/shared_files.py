@@ -0,0 +1,152 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Files shared between the sessions of a host, and between its users.
+
+The host job slots (slot_broker), the daemon registry (daemon_registry) and the
+runtime history of a workspace (runtime_history) are JSON files that several
+processes read and rewrite. They are rewritten under a file lock, through a
+temporary file of their own moved over the old one, so that a reader never sees
+a half-written file.
+
+Host-wide directories are sticky, like /tmp itself: a user cannot replace the
+files of another. Files are made writable by all there, and rewritten in place
+when they cannot be replaced.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def supported():
+    """Whether file locks are available."""
+    return fcntl is not None
+
+
+def pid_alive(pid):
+    """Whether a process exists, of any user."""
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # A process of another user.
+        return True
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
+
+
+def make_shared_directory(*directories):
+    """Create directories every user of the host can write to, sticky like /tmp."""
+    for directory in directories:
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+            try:
+                os.chmod(directory, 0o1777)
+            except OSError:
+                pass
+
+
+def open_shared_lock(path):
+    """
+    Open a lock file shared by all the users of the host, creating it readable
+    and writable by all whatever the umask. Returns a file descriptor to flock.
+    """
+    try:
+        return os.open(path, os.O_RDWR)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        # A lock file of another user, not writable (made under a umask):
+        # flock only needs it open.
+        return os.open(path, os.O_RDONLY)
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o666)
+    except FileExistsError:
+        return open_shared_lock(path)
+    try:
+        os.fchmod(fd, 0o666)
+    except OSError:
+        pass
+    return fd
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold an exclusive lock on the lock file `path`. Without file locks, does nothing."""
+    if not supported():
+        yield
+        return
+    fd = open_shared_lock(path)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def read_json(path):
+    """The dict of a JSON file, {} when it is missing or cannot be read."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def write_json(path, data, mode=0o666):
+    """
+    Write a JSON file through a temporary file of its own in the same directory,
+    made `mode` whatever the umask. A file of another user in a sticky directory
+    cannot be replaced: it is rewritten in place instead (it is writable by all).
+    """
+    content = json.dumps(data, indent=1, sort_keys=True)
+    directory = os.path.dirname(path) or "."
+    fd, temporary = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        try:
+            os.chmod(temporary, mode)
+        except OSError:
+            pass
+        os.replace(temporary, path)
+    except PermissionError:
+        with contextlib.suppress(OSError):
+            os.remove(temporary)
+        with open(path, "r+") as f:
+            f.write(content)
+            f.truncate()
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary)
+        raise
@@ -0,0 +1,308 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Job slots shared by all the sessions of a host.
+
+Each session has its own nb_jobs: three users each starting 32 jobs on the same
+32-core server run 96 of them. Once the host has a capacity (see `configure`,
+or "odatix slots --capacity"), every session of the host reserves its slots from
+a registry shared through a file lock, in a directory every user can write to
+(<tmp>/odatix_host_slots):
+
+    config.json              {"capacity": 32, "policy": "fair"}
+    sessions/<session>.json  a session: its running jobs, demand, weight and reservation
+    registry.lock
+
+The directories are sticky, like /tmp itself: a user cannot replace the files of
+another. So each session only ever writes its own entry, and reads the others,
+all under the lock; config.json is rewritten in place when another user made it.
+
+A session syncs with the registry about once a second: it tells how many units
+it runs and how many it could run (its "demand", at most its nb_jobs), and gets
+back how many it may run (its "reservation"). It never starts more, on top of
+its own nb_jobs and resource budget. The reservation of a session never drops
+below what it runs: running jobs are never stopped, a session over its share
+just does not start new ones until it is back under it.
+
+Policies:
+
+  * "fair": the capacity is shared between the sessions that want slots, in
+    proportion of their weight (1 by default), and what a session does not
+    want goes to the others;
+  * "greedy": first come, first served.
+
+Entries of sessions that died, or did not sync for STALE_AFTER seconds, are
+ignored (and removed, when they are of the same user), and their slots go back
+to the others. Without a capacity (the default), or where file locks are not
+available, sessions do not coordinate. A session that cannot reach the registry
+keeps its last reservation and tells why in `error`.
+"""
+
+import contextlib
+import getpass
+import math
+import os
+import tempfile
+import time
+
+import odatix.lib.hard_settings as hard_settings
+from odatix.lib.parallel_job_handler.resources import CORES, detect_host_budget
+from odatix.lib.parallel_job_handler.shared_files import (
+    locked,
+    make_shared_directory,
+    pid_alive,
+    read_json,
+    supported,
+    write_json,
+)
+
+POLICY_FAIR = "fair"
+POLICY_GREEDY = "greedy"
+POLICIES = (POLICY_FAIR, POLICY_GREEDY)
+DEFAULT_POLICY = POLICY_FAIR
+
+# How often a session syncs, and after how long without a sync it is dropped.
+SYNC_INTERVAL = 1.0
+STALE_AFTER = 30.0
+
+CONFIG_FILENAME = "config.json"
+SESSIONS_DIRNAME = "sessions"
+LOCK_FILENAME = "registry.lock"
+
+
+def default_directory():
+    """The directory of the registry of the host."""
+    return os.path.join(tempfile.gettempdir(), hard_settings.host_slots_dirname)
+
+
+def fair_shares(capacity, demands, weights):
+    """
+    Share a capacity between sessions in proportion of their weights, a session
+    never getting more than its demand and what it leaves going to the others.
+    Returns {session: share}, shares being floats.
+    """
+    shares = {session: 0.0 for session in demands}
+    active = {session for session, demand in demands.items() if demand > 0}
+    remaining = float(capacity)
+    while active and remaining > 1e-9:
+        total_weight = sum(weights.get(session, 1.0) for session in active)
+        unit = remaining / total_weight
+        satisfied = {
+            session for session in active
+            if demands[session] - shares[session] <= unit * weights.get(session, 1.0)
+        }
+        if not satisfied:
+            for session in active:
+                shares[session] += unit * weights.get(session, 1.0)
+            break
+        for session in satisfied:
+            remaining -= demands[session] - shares[session]
+            shares[session] = float(demands[session])
+        active -= satisfied
+    return shares
+
+
+def reservation(capacity, policy, entries, session):
+    """
+    The slots `session` may run, given the entries of the registry ({session:
+    {"running", "demand", "weight", "reserved"}}, its own included).
+    """
+    mine = entries[session]
+    others_reserved = sum(int(entry.get("reserved", 0)) for other, entry in entries.items() if other != session)
+    available = int(capacity) - others_reserved
+    demand = int(mine.get("demand", 0))
+    if policy == POLICY_GREEDY:
+        target = demand
+    else:
+        shares = fair_shares(
+            capacity,
+            {other: int(entry.get("demand", 0)) for other, entry in entries.items()},
+            {other: float(entry.get("weight", 1.0)) for other, entry in entries.items()},
+        )
+        target = int(math.ceil(shares[session] - 1e-9))
+    return max(int(mine.get("running", 0)), min(demand, target, available))
+
+
+class HostSlotBroker:
+    """The registry of the host, as seen by one session."""
+
+    def __init__(self, session_id, directory=None, pid=None, weight=1.0):
+        self.directory = str(directory or default_directory())
+        self.session_id = str(session_id)
+        self.pid = os.getpid() if pid is None else int(pid)
+        self.weight = max(0.01, float(weight))
+        self.reserved = None
+        # Why the last sync failed, or None.
+        self.error = None
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _entry_path(self, session):
+        filename = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(session))
+        return os.path.join(self.directory, SESSIONS_DIRNAME, filename + ".json")
+
+    @contextlib.contextmanager
+    def _locked(self):
+        make_shared_directory(self.directory, self._path(SESSIONS_DIRNAME))
+        with locked(self._path(LOCK_FILENAME)):
+            yield
+
+    def config(self):
+        """{"capacity": int, "policy": str}, or None when the host has no capacity."""
+        data = read_json(self._path(CONFIG_FILENAME))
+        try:
+            capacity = int(data.get("capacity"))
+        except (TypeError, ValueError):
+            return None
+        if capacity < 1:
+            return None
+        policy = data.get("policy") if data.get("policy") in POLICIES else DEFAULT_POLICY
+        return {"capacity": capacity, "policy": policy}
+
+    def configure(self, capacity=None, policy=None, disable=False):
+        """
+        Set the capacity of the host ("auto" for its number of cores) and its
+        policy; `disable` removes the capacity. Returns the configuration.
+        """
+        if not supported():
+            raise RuntimeError("Host-wide job slots need file locks, not available on this platform")
+        with self._locked():
+            if disable:
+                try:
+                    os.remove(self._path(CONFIG_FILENAME))
+                except OSError:
+                    pass
+                return None
+            current = self.config() or {"capacity": None, "policy": DEFAULT_POLICY}
+            if capacity is not None:
+                current["capacity"] = detect_host_budget()[CORES] if str(capacity).strip().lower() == "auto" else int(capacity)
+            if policy is not None:
+                if policy not in POLICIES:
+                    raise ValueError("Unknown policy '{}' (expected one of: {})".format(policy, ", ".join(POLICIES)))
+                current["policy"] = policy
+            if current["capacity"] is None or int(current["capacity"]) < 1:
+                raise ValueError("The capacity of the host must be set, and positive")
+            write_json(self._path(CONFIG_FILENAME), current)
+            return self.config()
+
+    def _live_entries(self, now, prune=False):
+        """
+        The entries of the sessions of the registry, by session. With `prune`
+        (under the lock), the files of the sessions that are gone are removed,
+        where the user may.
+        """
+        try:
+            filenames = sorted(os.listdir(self._path(SESSIONS_DIRNAME)))
+        except OSError:
+            return {}
+        entries = {}
+        for filename in filenames:
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self._path(SESSIONS_DIRNAME), filename)
+            entry = read_json(path)
+            session = entry.get("session")
+            if session is None:
+                continue
+            try:
+                stale = now - float(entry.get("updated", 0)) > STALE_AFTER or not pid_alive(entry.get("pid"))
+            except (TypeError, ValueError):
+                stale = True
+            if stale:
+                if prune:
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+                continue
+            entries[str(session)] = entry
+        return entries
+
+    def sync(self, running, demand, now=None):
+        """
+        Tell the registry what the session runs and wants, and get back how many
+        units it may run. None when the host has no capacity: no limit.
+        """
+        if not supported():
+            return None
+        now = time.time() if now is None else now
+        try:
+            with self._locked():
+                config = self.config()
+                if config is None:
+                    self.reserved = None
+                    self.error = None
+                    return None
+                entries = self._live_entries(now, prune=True)
+                entries[self.session_id] = {
+                    "session": self.session_id,
+                    "pid": self.pid,
+                    "user": _user(),
+                    "running": int(running),
+                    "demand": max(int(running), int(demand)),
+                    "weight": self.weight,
+                    "reserved": int((entries.get(self.session_id) or {}).get("reserved", 0)),
+                    "updated": now,
+                }
+                self.reserved = reservation(config["capacity"], config["policy"], entries, self.session_id)
+                entries[self.session_id]["reserved"] = self.reserved
+                write_json(self._entry_path(self.session_id), entries[self.session_id])
+        except OSError as e:
+            # Keep the last reservation: a session must not stop on a shared
+            # directory it cannot write to for a moment.
+            self.error = "could not sync with the job slots of the host in " + self.directory + ": " + str(e)
+            return self.reserved
+        self.error = None
+        return self.reserved
+
+    def release(self):
+        """Leave the registry: the slots of the session go back to the others."""
+        self.reserved = None
+        if not supported() or not os.path.isdir(self.directory):
+            return
+        try:
+            with self._locked():
+                os.remove(self._entry_path(self.session_id))
+        except OSError:
+            pass
+
+    def status(self, now=None):
+        """The configuration of the host and the sessions of its registry."""
+        now = time.time() if now is None else now
+        config = self.config() if os.path.isdir(self.directory) else None
+        entries = self._live_entries(now) if config is not None else {}
+        return {
+            "directory": self.directory,
+            "capacity": config["capacity"] if config else None,
+            "policy": config["policy"] if config else None,
+            "reserved": sum(int(entry.get("reserved", 0)) for entry in entries.values()),
+            "sessions": [
+                dict({key: entry.get(key) for key in ("user", "running", "demand", "weight", "reserved")}, session=session)
+                for session, entry in sorted(entries.items())
+            ],
+        }
+
+
+def _user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return None
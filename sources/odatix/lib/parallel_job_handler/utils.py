@@ -31,8 +31,7 @@ def read_pipe_windows(pipe, job, append_callback=None):
                 append_callback(job, data)
             else:
                 job.log_history.append(data)
-                if job.log_size_limit != -1 and len(job.log_history) > job.log_size_limit:
-                    job.log_history = job.log_history[-job.log_size_limit:]
+                job.trim_log(job.log_size_limit)
                 job.log_changed = True
         except OSError:
             break
@@ -55,3 +54,17 @@ def get_elapsed_time_str(job_start_time, job_stop_time):
     else:
         elapsed_time = "00:00:00"
     return elapsed_time
+
+def chain_preexec(*functions):
+    """One preexec_fn running each of the given ones (None ones are skipped), or None."""
+    functions = [function for function in functions if function is not None]
+    if not functions:
+        return None
+    if len(functions) == 1:
+        return functions[0]
+
+    def _preexec():
+        for function in functions:
+            function()
+
+    return _preexec
@@ -87,11 +87,23 @@ def edit_config_file(arch, config_file):
     r"(set target_frequency\s+).*":   lambda m: f"{m.group(1)}{arch.target_frequency}",
     r"(set fmax_lower_bound\s+).*":   lambda m: f"{m.group(1)}{arch.fmax_lower_bound}",
     r"(set fmax_upper_bound\s+).*":   lambda m: f"{m.group(1)}{arch.fmax_upper_bound}",
+    r"(set fmax_explore\s+).*":       lambda m: f"{m.group(1)}" + ("1" if getattr(arch, "fmax_explore", False) else "0"),
+    r"(set fmax_resume\s+).*":        lambda m: f"{m.group(1)}" + ("1" if getattr(arch, "fmax_resume", False) else "0"),
     r"(set lib_name\s+).*":           lambda m: f"{m.group(1)}{safe_replace(arch.lib_name)}",
     r"(set continue_on_error\s+).*":  lambda m: f"{m.group(1)}" + ("1" if arch.continue_on_error else "0"),
     r"(set single_thread\s+).*":      lambda m: f"{m.group(1)}" + ("1" if arch.force_single_thread else "0"),
   }
 
+  # Left to what settings.tcl says unless the job sets it.
+  explore_step = getattr(arch, "fmax_explore_step", None)
+  if explore_step:
+    replacements[r"(set fmax_explore_step\s+).*"] = lambda m: f"{m.group(1)}{int(explore_step)}"
+  warm_start_bounds = getattr(arch, "fmax_warm_start_bounds", None)
+  if warm_start_bounds:
+    replacements[r"(set fmax_warm_start\s+).*"] = lambda m: f"{m.group(1)}1"
+    replacements[r"(set fmax_configured_lower_bound\s+).*"] = lambda m: f"{m.group(1)}{int(warm_start_bounds[0])}"
+    replacements[r"(set fmax_configured_upper_bound\s+).*"] = lambda m: f"{m.group(1)}{int(warm_start_bounds[1])}"
+
   _apply_replacements(config_file, replacements)
 
 
@@ -125,3 +137,48 @@ def edit_pnr_config_file(arch, source, config_file):
   }
 
   _apply_replacements(config_file, replacements)
+
+
+def edit_probe_config_file(config_file, tmp_dir, frequency):
+  """
+  Turn the tcl config file of a copy of a job directory into the one of a probe
+  of its fmax search: the copy works in its own directory, and find_fmax.tcl
+  runs a single synthesis at `frequency` (see
+  odatix.lib.parallel_job_handler.fmax_probing).
+  """
+  replacements = {
+    r"(set tmp_path\s+).*":             lambda m: f"{m.group(1)}{_normalize_path(tmp_dir)}",
+    r"(set fmax_probe_frequency\s+).*": lambda m: f"{m.group(1)}{int(frequency)}",
+  }
+
+  _apply_replacements(config_file, replacements)
+
+
+def edit_bracketing_config_file(config_file, bracketing):
+  """
+  Have find_fmax.tcl bracket the fmax search of a job with a cheap, low-effort
+  synthesis first (see "fmax_bracketing" in odatix.lib.eda_tools). `bracketing`
+  is what eda_tools.fmax_bracketing_settings returns for the job's flow.
+  """
+  replacements = {
+    r"(set fmax_bracketing\s+).*":       lambda m: f"{m.group(1)}1",
+    r"(set fmax_full_effort_runs\s+).*": lambda m: f"{m.group(1)}{int(bracketing['full_effort_runs'])}",
+  }
+  if bracketing.get("script"):
+    replacements[r"(set fmax_bracketing_script\s+).*"] = lambda m: f"{m.group(1)}$script_path/{bracketing['script']}"
+
+  _apply_replacements(config_file, replacements)
+
+
+def edit_sweep_config_file(config_file, sweep_dirs):
+  """
+  Have custom_freq_sweep.tcl synthesize a configuration at every frequency of a
+  sweep, one job directory after the other. `sweep_dirs` are the (already
+  prepared) directories of those frequencies, the one the session runs in
+  first.
+  """
+  sweep_paths = " ".join("{" + _normalize_path(path) + "}" for path in sweep_dirs)
+  replacements = {
+    r"(set sweep_paths\s+).*": lambda m: f"{m.group(1)}[list {sweep_paths}]",
+  }
+  _apply_replacements(config_file, replacements)
@@ -45,6 +45,8 @@ class Variables:
     tool = None,
     source_work_path = None,
     source_tool = None,
+    nb_threads = None,
+    cpu_set = None,
   ):
     self.odatix_path = odatix_path
     self.odatix_eda_tools_path = odatix_eda_tools_path
@@ -66,6 +68,10 @@ class Variables:
     # $work_path is already taken and means *this* job's directory.
     self.source_work_path = source_work_path
     self.source_tool = source_tool
+    # Known once the job starts, from the cores it runs on: references to the
+    # environment of the job, expanded by the shell running its commands.
+    self.nb_threads = nb_threads
+    self.cpu_set = cpu_set
 
 def replace_variables(command, variables):
   if variables is None:
@@ -91,6 +97,8 @@ def replace_variables(command, variables):
       "$tool": variables.tool,
       "$source_work_path": variables.source_work_path,
       "$source_tool": variables.source_tool,
+      "$nb_threads": variables.nb_threads,
+      "$cpu_set": variables.cpu_set,
     }
     # Longest name first: a plain replace of "$tool" would otherwise eat the
     # beginning of "$tool_path" and "$tool_install_path".
@@ -155,6 +155,30 @@ class ArgParser:
     ArgParser.ls_parser.add_argument('--host', default=None, help='daemon API host (optional explicit endpoint)')
     ArgParser.ls_parser.add_argument('--port', type=int, default=None, help='daemon API port (optional explicit endpoint)')
 
+    # Define parser for the 'resume' command
+    ArgParser.resume_parser = subparsers.add_parser("resume", help="restart the sessions that died with jobs left to run", formatter_class=formatter)
+    ArgParser.resume_parser.add_argument('-S', '--session', default=None, help='only the sessions whose name starts with this (default: all of them)')
+
+    # Define parser for the 'autoscale' command
+    ArgParser.autoscale_parser = subparsers.add_parser("autoscale", help="scale the parallel jobs of a session with the host load", formatter_class=formatter)
+    ArgParser.autoscale_parser.add_argument('-S', '--session', default=None, help='daemon session name or selector')
+    ArgParser.autoscale_parser.add_argument('--min', type=int, default=None, dest='min_jobs', help='lowest number of parallel jobs (default: the current one)')
+    ArgParser.autoscale_parser.add_argument('--max', type=int, default=None, dest='max_jobs', help='highest number of parallel jobs (default: the current one)')
+    ArgParser.autoscale_parser.add_argument('--off', action='store_true', help='stop autoscaling (the current number of parallel jobs stays)')
+    ArgParser.autoscale_parser.add_argument('--host', default=None, help='daemon API host (default: current workspace daemon host)')
+    ArgParser.autoscale_parser.add_argument('--port', type=int, default=None, help='daemon API port (default: current workspace daemon port)')
+
+    # Define parser for the 'slots' command
+    ArgParser.slots_parser = subparsers.add_parser("slots", help="share job slots between the sessions of this host", formatter_class=formatter)
+    slots_capacity_group = ArgParser.slots_parser.add_mutually_exclusive_group()
+    slots_capacity_group.add_argument('--capacity', default=None, help="jobs all the sessions of this host may run at once, or 'auto' for its number of cores")
+    slots_capacity_group.add_argument('--off', action='store_true', help='let every session run its own number of parallel jobs again')
+    ArgParser.slots_parser.add_argument('--policy', choices=['fair', 'greedy'], default=None, help='how sessions share the slots (default: fair)')
+    ArgParser.slots_parser.add_argument('-S', '--session', default=None, help='daemon session the --weight applies to')
+    ArgParser.slots_parser.add_argument('--weight', type=float, default=None, help='share of the session under the fair policy (default: 1)')
+    ArgParser.slots_parser.add_argument('--host', default=None, help='daemon API host (default: current workspace daemon host)')
+    ArgParser.slots_parser.add_argument('--port', type=int, default=None, help='daemon API port (default: current workspace daemon port)')
+
     # Define parser for the 'results' command
     ArgParser.res_parser = subparsers.add_parser("results", help="export benchmark results", formatter_class=formatter)
     ArgParser.res_parser.add_argument("-t", "--tool", default="all", help="eda tool in use, or 'all'")
@@ -481,8 +505,87 @@ def list_daemons(args):
     daemons = daemon_control.list_daemons(host=args.host, port=args.port, session=args.session)
     if len(daemons) == 0:
       printc.note("No active session found", script_name)
+    else:
+      print(daemon_control.format_daemons_table(daemons))
+    for entry in daemon_control.list_recoverable_sessions():
+      printc.note("Session '{}' died with {} job(s) left to run (see 'odatix resume')".format(entry["session_name"], entry["unfinished"]), script_name)
+  except Exception as e:
+    printc.error(str(e), script_name)
+    success = False
+  return success
+
+def resume_daemons(args):
+  success = True
+  try:
+    resumed = daemon_control.resume_sessions(session=args.session)
+    if len(resumed) == 0:
+      printc.note("No session to resume", script_name)
       return success
-    print(daemon_control.format_daemons_table(daemons))
+    for entry, state in resumed:
+      printc.cyan("Resumed session '{}' with {} job(s) left to run".format(entry["session_name"], entry["unfinished"]), script_name)
+    print(daemon_control.format_daemons_table([state for _, state in resumed]))
+  except Exception as e:
+    printc.error(str(e), script_name)
+    success = False
+  return success
+
+def autoscale_daemon(args):
+  success = True
+  try:
+    autoscaler = daemon_control.configure_daemon_autoscale(
+      min_jobs=args.min_jobs,
+      max_jobs=args.max_jobs,
+      enabled=False if args.off else None,
+      host=args.host,
+      port=args.port,
+      session=args.session,
+    )
+    if autoscaler is None:
+      printc.note("Autoscaling is disabled", script_name)
+      return success
+    printc.cyan("Autoscaling between {} and {} parallel jobs".format(autoscaler["min_jobs"], autoscaler["max_jobs"]), script_name)
+    decision = autoscaler.get("last_decision")
+    if isinstance(decision, dict):
+      print("last decision: {} {} -> {} ({})".format(decision["action"], decision["nb_jobs"], decision["target"], decision["reason"]))
+    if autoscaler.get("log_file"):
+      print("decisions are logged in " + str(autoscaler["log_file"]))
+  except daemon_control.MultipleDaemonsError as e:
+    printc.warning("Multiple sessions found:", script_name)
+    if isinstance(e.daemons, list) and len(e.daemons) > 0:
+      print(daemon_control.format_daemons_table(e.daemons))
+    printc.note("Use the -S/--session option to specify a session", script_name)
+    success = False
+  except Exception as e:
+    printc.error(str(e), script_name)
+    success = False
+  return success
+
+def host_slots(args):
+  success = True
+  try:
+    status = daemon_control.configure_host_slots(
+      capacity=args.capacity,
+      policy=args.policy,
+      disable=args.off,
+      weight=args.weight,
+      host=args.host,
+      port=args.port,
+      session=args.session,
+    )
+    if status["capacity"] is None:
+      printc.note("Job slots are not shared: each session runs its own number of parallel jobs", script_name)
+      return success
+    printc.cyan("{} job slots shared by the sessions of this host ({} policy)".format(status["capacity"], status["policy"]), script_name)
+    for entry in status["sessions"]:
+      print("  {:<32} {:<12} running: {:<4} wants: {:<4} reserved: {:<4} weight: {:g}".format(
+        str(entry["session"]), str(entry["user"]), entry["running"], entry["demand"], entry["reserved"], entry["weight"]
+      ))
+  except daemon_control.MultipleDaemonsError as e:
+    printc.warning("Multiple sessions found:", script_name)
+    if isinstance(e.daemons, list) and len(e.daemons) > 0:
+      print(daemon_control.format_daemons_table(e.daemons))
+    printc.note("Use the -S/--session option to specify a session", script_name)
+    success = False
   except Exception as e:
     printc.error(str(e), script_name)
     success = False
@@ -639,7 +742,7 @@ def main(args=None):
   except AttributeError:
     args.nobanner = False
 
-  if args.command in ("monitor", "stop", "ls"):
+  if args.command in ("monitor", "stop", "ls", "autoscale", "slots"):
     args.nobanner = True
 
   # Display init dialog
@@ -665,6 +768,12 @@ def main(args=None):
     success = stop_daemon(args)
   elif args.command == "ls":
     success = list_daemons(args)
+  elif args.command == "resume":
+    success = resume_daemons(args)
+  elif args.command == "autoscale":
+    success = autoscale_daemon(args)
+  elif args.command == "slots":
+    success = host_slots(args)
   elif args.command == "fmax":
     success = run_fmax_synthesis(args)
   elif args.command in ("synth", "synthesis", "freq"):
@@ -201,6 +201,10 @@ class FmaxSynthesisFlow(SynthesisFlow):
         arguments["continue_on_error"] = run.options.continue_on_error
         arguments["forced_fmax_lower_bound"] = run.options.lower_bound
         arguments["forced_fmax_upper_bound"] = run.options.upper_bound
+        arguments["warm_start"] = run.options.warm_start
+        arguments["parallel_probes"] = run.options.parallel_probes
+        arguments["bracketing"] = run.options.bracketing
+        arguments["result_path"] = run.result_path
         return arguments
 
 
@@ -217,6 +221,7 @@ class CustomFreqSynthesisFlow(SynthesisFlow):
     def check_arguments(self, run):
         arguments = super(CustomFreqSynthesisFlow, self).check_arguments(run)
         arguments["custom_freq_list"] = list(run.options.frequencies)
+        arguments["sweep"] = run.options.sweep
         return arguments
 
 
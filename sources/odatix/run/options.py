@@ -88,10 +88,26 @@ class RunOptions(Settings):
 
     lower_bound = Setting(None, type="optional_int", doc="Lowest frequency of an fmax search, in MHz.")
     upper_bound = Setting(None, type="optional_int", doc="Highest frequency of an fmax search, in MHz.")
+    warm_start = Setting(
+        None, type="any",
+        doc="Start each fmax search from bounds predicted from previous results. The settings file's own choice when unset.",
+    )
+    parallel_probes = Setting(
+        None, type="any",
+        doc="Probe several frequencies of an fmax search at once when job slots are idle. The settings file's own choice when unset.",
+    )
+    bracketing = Setting(
+        None, type="any",
+        doc="Bracket each fmax search with low-effort syntheses first, when the tool declares them. The settings file's own choice when unset.",
+    )
     frequencies = Setting(
         factory=list, type="int_list",
         doc="Frequencies a custom frequency synthesis runs at, in MHz. The settings file's own when empty.",
     )
+    sweep = Setting(
+        None, type="any",
+        doc="Synthesize each configuration at all its frequencies in a single tool session, when the tool declares how. The settings file's own choice when unset.",
+    )
 
     ######################################
     # Place & route
@@ -61,7 +61,7 @@ class JobPlanner(object):
 
     #: A job a session left in one of these states is not being worked on by it
     #: any more: a run may take it over.
-    DAEMON_RESTARTABLE_STATUSES = ("failed", "killed", "canceled", "cancelled")
+    DAEMON_RESTARTABLE_STATUSES = ("failed", "oom", "killed", "canceled", "cancelled")
 
     #: Statuses of a job a session is done with: re-enqueueing over one of them
     #: is allowed when the flow has steps left to run (see daemon_decision).
@@ -157,12 +157,21 @@ class JobPlanner(object):
             if status == "":
                 status = "unknown"
 
-            self._daemon_jobs_by_tmp_dir.setdefault(normalized_tmp_dir, []).append(
-                {
-                    "status": status,
-                    "session_id": str(job.get("session_id", "")).strip(),
-                }
-            )
+            # A custom frequency sweep is one job working in the directory of
+            # each of its frequencies.
+            tmp_dirs = [normalized_tmp_dir]
+            for sweep_dir in job.get("sweep_dirs") or []:
+                normalized_sweep_dir = JobPlanner.normalize_tmp_dir(sweep_dir)
+                if normalized_sweep_dir not in ("", normalized_tmp_dir):
+                    tmp_dirs.append(normalized_sweep_dir)
+
+            for tmp_dir in tmp_dirs:
+                self._daemon_jobs_by_tmp_dir.setdefault(tmp_dir, []).append(
+                    {
+                        "status": status,
+                        "session_id": str(job.get("session_id", "")).strip(),
+                    }
+                )
         return self
 
     def daemon_decision(self, tmp_dir, steps_decision=None):
@@ -94,6 +94,11 @@ class FrequenciesSettings(Settings):
         alt_comment=" not used but settings are saved",
         doc="Range of frequencies to synthesize at.",
     )
+    sweep = Setting(
+        False, type="bool", style="yesno",
+        comment="overridden by --sweep (synthesize each configuration at all its frequencies in one tool session)",
+        doc="Whether each configuration is synthesized at all its frequencies in a single session of the tool.",
+    )
 
     @classmethod
     def from_dict(cls, data):
@@ -129,6 +134,26 @@ class FmaxBoundsSettings(Settings):
         comment="overridden by --to (empty: use default / architecture-specific bound)",
         doc="Highest frequency tried, in MHz.",
     )
+    warm_start = Setting(
+        False, type="bool", style="yesno",
+        comment="overridden by --warm-start (narrow each search around the Fmax previous results predict)",
+        doc="Whether each search starts from bounds predicted from previous results.",
+    )
+    warm_start_margin = Setting(
+        None, type="optional_int",
+        comment="in % of the predicted Fmax (empty: default margin)",
+        doc="Safety margin around the predicted Fmax, in percent of it.",
+    )
+    parallel_probes = Setting(
+        False, type="bool", style="yesno",
+        comment="overridden by --parallel-probes (probe several frequencies at once when job slots are idle)",
+        doc="Whether a search probes several frequencies at once when job slots are idle.",
+    )
+    bracketing = Setting(
+        False, type="bool", style="yesno",
+        comment="overridden by --bracketing (bracket each search with low-effort syntheses first)",
+        doc="Whether a search is bracketed with the tool's low-effort synthesis before the full-effort one.",
+    )
 
 
 ######################################
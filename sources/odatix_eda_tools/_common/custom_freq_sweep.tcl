@@ -0,0 +1,105 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+# Custom frequency synthesis of one configuration at several frequencies, in a
+# single session of the tool: the RTL is analyzed once, then synthesized at each
+# frequency of $sweep_paths, in the job directory that frequency would have had
+# on its own. Each directory keeps its own settings, reports and status files, so
+# nothing downstream tells a sweep from separate jobs.
+
+if {[catch {
+
+  set signature "<grey>\[custom_freq_sweep.tcl\]<end>"
+
+  ######################################
+  # Settings
+  ######################################
+  source scripts/settings.tcl
+  source scripts/init_script.tcl
+
+  # where the progress of the whole sweep goes: the settings of each frequency
+  # are sourced in turn and replace $statusfile
+  set sweep_statusfile $statusfile
+  set sweep_home [pwd]
+  set sweep_total [llength $sweep_paths]
+
+  if {$sweep_total == 0} {
+    error "$signature <red>no frequency to sweep<end>"
+  }
+
+  ######################################
+  # Analyze once
+  ######################################
+
+  report_progress 0 $sweep_statusfile "(1/$sweep_total)"
+  source $analyze_script
+
+  ######################################
+  # Synthesize at each frequency
+  ######################################
+
+  set sweep_index 0
+  set sweep_failed [list]
+  foreach sweep_path $sweep_paths {
+    incr sweep_index
+    report_progress [expr {100*($sweep_index-1)/$sweep_total}] $sweep_statusfile "($sweep_index/$sweep_total)"
+
+    # the first frequency is the one the session was opened in, already set up
+    cd $sweep_path
+    if {$sweep_index > 1} {
+      source [file join $sweep_path $local_script_path settings.tcl]
+      source $init_script
+    }
+
+    puts "<bold>"
+    puts "**************************************"
+    puts "  Synthesis at $target_frequency MHz ($sweep_index/$sweep_total)"
+    puts "**************************************"
+    puts "<end>"
+
+    if {[catch {source $synth_script} errmsg]} {
+      puts "$signature <red>error: synthesis at $target_frequency MHz failed<end>"
+      puts "$signature <cyan>error detail:<red> $errmsg<end>"
+      lappend sweep_failed $target_frequency
+    }
+  }
+  cd $sweep_home
+
+  # the frequencies that succeeded are still exported: the job only fails
+  # here if none did, and otherwise when their results are exported
+  if {[llength $sweep_failed] > 0} {
+    puts "$signature <bold><red>error: synthesis failed at [join $sweep_failed {, }] MHz<end>"
+    if {[llength $sweep_failed] == $sweep_total} {
+      exit -1
+    }
+  }
+  report_progress 100 $sweep_statusfile "($sweep_total/$sweep_total)"
+
+} gblerrmsg ]} {
+  puts "$signature <bold><red>error: unhandled tcl error, exiting<end>"
+  puts "$signature <cyan>note: if you did not edit the tcl script, this should not append, please report this with the information bellow<end>"
+  catch {
+    puts "$signature <cyan>tcl error detail:<red>"
+    puts "$gblerrmsg"
+  }
+  puts "<cyan>^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^<end>"
+  exit -1
+}
@@ -49,6 +49,37 @@ if {[catch {
     gets stdin
   }
 
+  # State of the search, written after every iteration so that an interrupted
+  # search can pick up where it stopped (see odatix.lib.fmax_search_state).
+  # Written to a temporary file first: a kill never leaves half a state.
+  proc write_search_state {statefile state} {
+    set f [open $statefile.tmp w]
+    foreach {key value} $state {
+      if {$key eq "search"} {
+        puts $f "$key: \"$value\""
+      } else {
+        puts $f "$key: $value"
+      }
+    }
+    close $f
+    file rename -force $statefile.tmp $statefile
+  }
+
+  proc read_search_state {statefile} {
+    set state [dict create]
+    if {![file exists $statefile]} {
+      return $state
+    }
+    set f [open $statefile r]
+    foreach line [split [read $f] "\n"] {
+      if {[regexp {^(\w+):\s*(.*?)\s*$} $line -> key value]} {
+        dict set state $key [string trim $value {"'}]
+      }
+    }
+    close $f
+    return $state
+  }
+
   proc run_synth_script {synth_script} {
     if {![file exists $synth_script]} {
       puts "<bold><red>error: Synthesis script $synth_script not found.<end>"
@@ -82,22 +113,95 @@ if {[catch {
   file mkdir $tmp_path/report_MET
   file mkdir $tmp_path/report_VIOLATED
 
-  # create logfile
-  # exec /bin/sh -c "mkdir -p $log_path"
-  file mkdir $log_path
-  set logfile_handler [open $logfile w]
-  puts $logfile_handler "Binary search for interval \[$lower_bound:$upper_bound\] MHz"
-  puts $logfile_handler ""
-  close $logfile_handler
+  # a flow can search several times (once per step): tell them apart
+  if {[info exists ::odatix_synth_depth]} {
+    set search_id $::odatix_synth_depth
+  } else {
+    set search_id ""
+  }
 
   set start_lower_bound $lower_bound
   set start_upper_bound $upper_bound
 
   set max_runs [expr {int(ceil((log(($start_upper_bound-$start_lower_bound)/$fmax_mindiff)/log(2))))}]
-  report_progress 0 $statusfile "(1/$max_runs)"
 
   set got_met 0
   set got_violated 0
+  set runs 0
+  set bracketed 0
+
+  # resume an interrupted search, if Odatix found one for the same bounds
+  set resumed 0
+  if {$fmax_resume == 1 && $fmax_probe_frequency == 0} {
+    set state [read_search_state $fmax_statefile]
+    if {[dict exists $state done] && [dict get $state done] == 0
+        && [dict exists $state search] && [dict get $state search] eq $search_id
+        && [dict get $state requested_lower_bound] == $fmax_lower_bound
+        && [dict get $state requested_upper_bound] == $fmax_upper_bound} {
+      set lower_bound       [dict get $state lower_bound]
+      set upper_bound       [dict get $state upper_bound]
+      set start_lower_bound [dict get $state start_lower_bound]
+      set start_upper_bound [dict get $state start_upper_bound]
+      set got_met           [dict get $state got_met]
+      set got_violated      [dict get $state got_violated]
+      set runs              [dict get $state runs]
+      set max_runs          [dict get $state max_runs]
+      set fmax_explore_step [dict get $state explore_step]
+      if {[dict exists $state bracketed]} {
+        set bracketed [dict get $state bracketed]
+      }
+      set resumed 1
+    }
+  }
+
+  # create logfile
+  # exec /bin/sh -c "mkdir -p $log_path"
+  file mkdir $log_path
+  if {$resumed == 1} {
+    # the iteration the interruption cut short never got its verdict
+    set interrupted 0
+    if {[file exists $logfile]} {
+      set logfile_handler [open $logfile r]
+      set interrupted [expr {[string index [read $logfile_handler] end] ni [list "" "\n"]}]
+      close $logfile_handler
+    }
+    set logfile_handler [open $logfile a]
+    if {$interrupted} {
+      puts $logfile_handler "INTERRUPTED"
+    }
+    puts $logfile_handler "Resuming binary search for interval \[$lower_bound:$upper_bound\] MHz after $runs runs"
+    close $logfile_handler
+    puts "$signature <cyan>Resuming the search for interval \[$lower_bound:$upper_bound\] MHz after $runs runs<end>"
+  } else {
+    set logfile_handler [open $logfile w]
+    puts $logfile_handler "Binary search for interval \[$lower_bound:$upper_bound\] MHz"
+    puts $logfile_handler ""
+    close $logfile_handler
+  }
+
+  report_progress [expr {round(100 * $runs / $max_runs)}] $statusfile "([expr {$runs + 1}]/$max_runs)"
+
+  proc search_state {done} {
+    global search_id fmax_lower_bound fmax_upper_bound lower_bound upper_bound start_lower_bound start_upper_bound
+    global got_met got_violated runs max_runs fmax_explore_step bracketed
+    return [list \
+      search $search_id \
+      requested_lower_bound $fmax_lower_bound \
+      requested_upper_bound $fmax_upper_bound \
+      lower_bound $lower_bound \
+      upper_bound $upper_bound \
+      start_lower_bound $start_lower_bound \
+      start_upper_bound $start_upper_bound \
+      got_met $got_met \
+      got_violated $got_violated \
+      runs $runs \
+      max_runs $max_runs \
+      explore_step $fmax_explore_step \
+      best_met [expr {$got_met == 1 ? $lower_bound : 0}] \
+      bracketed $bracketed \
+      done $done \
+    ]
+  }
 
   set fs_start_time [clock seconds]
 
@@ -109,7 +213,128 @@ if {[catch {
   #setenv DO_NOT_ANALYZE_RTL=1
   #export DO_NOT_ANALYZE_RTL=1
 
-  set runs 0
+  # probe mode: a single synthesis at the given frequency. Odatix runs several
+  # of these side by side, each one in its own copy of the job directory, when
+  # it has slots to spare (see odatix.lib.parallel_job_handler.fmax_probing):
+  # the verdict is written to the log in the same format as a search iteration,
+  # and the search itself is led from there.
+  if {$fmax_probe_frequency > 0} {
+    set cur_freq $fmax_probe_frequency
+    file mkdir $report_path
+
+    set logfile_handler [open $logfile a]
+    puts -nonewline $logfile_handler  "$cur_freq MHz: "
+    close $logfile_handler
+
+    update_freq $cur_freq $constraints_file
+    puts ""
+    puts "<bold><cyan>######################################<end>"
+    puts "<bold><cyan>   Probing synthesis at $cur_freq MHz <end>"
+    puts "<bold><cyan>######################################<end>"
+    puts ""
+
+    set synth_succeeded [run_synth_script $synth_script]
+
+    set frequency_handler [open $freq_rep w]
+    puts -nonewline $frequency_handler  "Target frequency:         $cur_freq"
+    close $frequency_handler
+
+    if {$synth_succeeded == 0} {
+      set verdict "FAILED"
+    } elseif {[is_slack_met $report_path $timing_rep]} {
+      set verdict "MET"
+    } elseif {[is_slack_inf $report_path $timing_rep]} {
+      set verdict "INFINITE"
+    } else {
+      set verdict "VIOLATED"
+    }
+
+    set logfile_handler [open $logfile a]
+    puts $logfile_handler  $verdict
+    close $logfile_handler
+
+    report_progress 100 $statusfile "(1/1)"
+    puts "$signature <bold>$cur_freq MHz: $verdict<end>"
+    exit
+  }
+
+  # bracketing pass: when the tool has a cheap, low-effort synthesis, bisect
+  # with it first and leave only the last few iterations near the boundary to
+  # full effort. Its verdicts go to a log of their own and its reports are not
+  # kept: whatever the search ends up with comes from full-effort syntheses.
+  set gallop_step [expr {$fmax_mindiff * (1 << ($fmax_full_effort_runs - 1))}]
+  set galloping 0
+  if {$fmax_bracketing == 1 && $resumed == 0} {
+    set bracket_lower $lower_bound
+    set bracket_upper $upper_bound
+    set bracket_runs 0
+    set bracket_max_runs [expr {max(0, $max_runs - $fmax_full_effort_runs)}]
+    set unconstrained 0
+
+    set bracketing_handler [open $fmax_bracketing_logfile w]
+    puts $bracketing_handler "Low-effort bracketing for interval \[$bracket_lower:$bracket_upper\] MHz"
+    puts $bracketing_handler ""
+    close $bracketing_handler
+
+    while {$bracket_upper - $bracket_lower > $gallop_step} {
+      incr bracket_runs
+      set cur_freq [expr {($bracket_upper + $bracket_lower) / 2}]
+
+      update_freq $cur_freq $constraints_file
+      puts ""
+      puts "<bold><cyan>######################################<end>"
+      puts "<bold><cyan>   Bracketing at $cur_freq MHz (low effort) <end>"
+      puts "<bold><cyan>######################################<end>"
+      puts ""
+
+      set fmax_effort low
+      set synth_succeeded [run_synth_script $fmax_bracketing_script]
+      set fmax_effort full
+
+      if {$synth_succeeded == 0} {
+        set verdict "FAILED"
+        set bracket_upper $cur_freq
+      } elseif {[is_slack_met $report_path $timing_rep]} {
+        set verdict "MET"
+        set bracket_lower $cur_freq
+      } elseif {[is_slack_inf $report_path $timing_rep]} {
+        set verdict "INFINITE"
+        set unconstrained 1
+      } else {
+        set verdict "VIOLATED"
+        set bracket_upper $cur_freq
+      }
+
+      set bracketing_handler [open $fmax_bracketing_logfile a]
+      puts $bracketing_handler "$cur_freq MHz: $verdict"
+      close $bracketing_handler
+      set bracket_total [expr {max($bracket_runs, $bracket_max_runs) + $fmax_full_effort_runs}]
+      report_progress [expr {round(100 * $bracket_runs / $bracket_total)}] $statusfile "($bracket_runs/$bracket_total)"
+
+      # nothing to bracket: let the full-effort search say so
+      if {$unconstrained} {
+        break
+      }
+    }
+
+    if {!$unconstrained} {
+      # a low-effort verdict is no measure of what full effort reaches: the
+      # full-effort search starts from the bracket widened on both sides, and
+      # gallops past it if none of its syntheses meets (or violates) timing
+      set lower_bound [expr {max($lower_bound, $bracket_lower - max(1, $gallop_step / 2))}]
+      set upper_bound [expr {min($upper_bound, $bracket_upper + max(1, $gallop_step / 2))}]
+      set bracketed 1
+      set max_runs [expr {$bracket_runs + int(ceil(log(max(2, ($upper_bound - $lower_bound) / $fmax_mindiff)) / log(2)))}]
+      set runs $bracket_runs
+
+      set logfile_handler [open $logfile a]
+      puts $logfile_handler "Bracketed in \[$bracket_lower:$bracket_upper\] MHz by $bracket_runs low-effort runs ([file tail $fmax_bracketing_logfile])"
+      puts $logfile_handler "Full-effort search for interval \[$lower_bound:$upper_bound\] MHz"
+      puts $logfile_handler ""
+      close $logfile_handler
+      puts "$signature <cyan>Bracketed in \[$bracket_lower:$bracket_upper\] MHz after $bracket_runs low-effort runs<end>"
+    }
+  }
 
   while 1 {
 
@@ -118,6 +343,11 @@ if {[catch {
     # compute current frequency
     set mean [expr {($upper_bound + $lower_bound) / 2}]
     set cur_freq $mean
+    if {$galloping == 1} {
+      set cur_freq [expr {min($upper_bound - 1, $lower_bound + $gallop_step)}]
+    } elseif {$galloping == -1} {
+      set cur_freq [expr {max($lower_bound + 1, $upper_bound - $gallop_step)}]
+    }
 
     set logfile_handler [open $logfile a]
     puts -nonewline $logfile_handler  "$cur_freq MHz: "
@@ -132,6 +362,7 @@ if {[catch {
     puts "<bold><cyan>######################################<end>"
     puts ""
 
+    set fmax_effort full
     set synth_succeeded [run_synth_script $synth_script]
 
     set frequency_handler [open $freq_rep w]
@@ -163,6 +394,7 @@ if {[catch {
           puts "$signature <cyan>Both the rtl description and the tool's synthesis choices could be at fault<end>"
           puts $logfile_handler "Path is unconstrained. Make sure there are registers at input and output of design.  Make sure you select the correct clock signal. Both the rtl description and the tool's synthesis choices could be at fault"
           close $logfile_handler
+          write_search_state $fmax_statefile [search_state 1]
           exit -2
         } else {
           set got_violated 1
@@ -183,20 +415,60 @@ if {[catch {
       close $logfile_handler
     }
 
+    # still on the same side of the boundary: take a bigger step
+    if {$galloping == 1 && $lower_bound == $cur_freq || $galloping == -1 && $upper_bound == $cur_freq} {
+      set gallop_step [expr {2 * $gallop_step}]
+    } else {
+      set galloping 0
+    }
+
     set diff [expr {$upper_bound - $lower_bound}]
 
-    # move bounds
+    # move bounds: when every frequency so far met (or violated) timing, the
+    # answer may be past the bound the search is closing in on
     if {$fmax_explore == 1} {
       if {$diff < $fmax_safezone && $runs > 2} {
         if {$got_violated == 0} {
-          set upper_bound [expr {$upper_bound + 2*$fmax_safezone}]
+          set upper_bound [expr {$upper_bound + $fmax_explore_step}]
+          if {$fmax_warm_start == 1} {
+            set upper_bound [expr {min($upper_bound, $fmax_configured_upper_bound)}]
+          }
           set start_upper_bound $upper_bound
+          set diff [expr {$upper_bound - $lower_bound}]
         }
-        if {$got_violated == 0} {
-          set lower_bound [expr {$lower_bound - 2*$fmax_safezone}]
+        if {$got_met == 0} {
+          set lower_bound [expr {max(1, $lower_bound - $fmax_explore_step)}]
+          if {$fmax_warm_start == 1} {
+            set lower_bound [expr {max($lower_bound, $fmax_configured_lower_bound)}]
+          }
           set start_lower_bound $lower_bound
-        } 
-      } 
+          set diff [expr {$upper_bound - $lower_bound}]
+        }
+        # the search got longer; a warm-started one takes bigger steps the
+        # further its answer is from the prediction
+        if {$diff >= $fmax_safezone} {
+          set max_runs [expr {$runs + int(ceil((log(($diff)/$fmax_mindiff)/log(2))))}]
+          if {$fmax_warm_start == 1} {
+            set fmax_explore_step [expr {2*$fmax_explore_step}]
+          }
+        }
+      }
+    }
+
+    # a bracketed search converging without a full-effort synthesis on one
+    # side of the boundary: the answer is past the bracket. Gallop towards it,
+    # doubling the step until the boundary is crossed (never past the bounds the
+    # job was given), then bisect as usual
+    if {$bracketed == 1 && $galloping == 0 && [expr abs($diff)] < [expr {$fmax_mindiff + 1}]} {
+      if {$got_violated == 0 && $upper_bound < $fmax_upper_bound} {
+        set galloping 1
+        set upper_bound $fmax_upper_bound
+      } elseif {$got_met == 0 && $lower_bound > $fmax_lower_bound} {
+        set galloping -1
+        set lower_bound $fmax_lower_bound
+      }
+      set diff [expr {$upper_bound - $lower_bound}]
+      set max_runs [expr {$runs + 2 * int(ceil(log(max(2, $diff / $fmax_mindiff)) / log(2)))}]
     }
 
     # exit condition
@@ -204,11 +476,14 @@ if {[catch {
       break
     }
 
+    write_search_state $fmax_statefile [search_state 0]
+
     set progress [expr {round(100 * $runs / $max_runs)}]
     report_progress $progress $statusfile "($runs/$max_runs)"
   }
 
   report_progress 100 $statusfile "($runs/$max_runs)"
+  write_search_state $fmax_statefile [search_state 1]
 
   set fs_stop_time [clock seconds]
   set fs_total_time [expr $fs_stop_time - $fs_start_time]
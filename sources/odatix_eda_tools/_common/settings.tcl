@@ -87,6 +87,8 @@ set design_analysis    $report_path/checkout.rep
 set unresolved_report  $report_path/unresolved.rep
 
 set logfile            $log_path/frequency_search.log
+set fmax_statefile     $log_path/fmax_search.yml
+set fmax_bracketing_logfile $log_path/fmax_bracketing.log
 set statusfile         $log_path/status.log
 set synth_statusfile   $log_path/synth_status.log
 set analysis_statusfile $log_path/analysis_status.log
@@ -97,6 +99,20 @@ set fmax_upper_bound   90
 set fmax_explore       0
 set fmax_mindiff       1
 set fmax_safezone      5
+set fmax_explore_step  [expr {2*$fmax_safezone}]
+# warm-started search (see odatix/lib/fmax_warm_start.py): its bounds are
+# narrowed around a prediction, its widening never leaves the configured ones
+# and its explore step doubles each time it widens
+set fmax_warm_start    0
+set fmax_configured_lower_bound 0
+set fmax_configured_upper_bound 0
+set fmax_probe_frequency 0
+set fmax_resume        0
+set fmax_bracketing    0
+set fmax_bracketing_script $synth_script
+set fmax_full_effort_runs 3
+
+set sweep_paths        [list]
 
 set continue_on_error  0
 set single_thread      1
@@ -120,6 +136,16 @@ proc report_progress {progress progressfile {comment ""}} {
     close $progressfile_handler
 }
 
+proc odatix_nb_threads {{default 0}} {
+    # How many threads the tool should start: the cores Odatix gave the job
+    # (ODATIX_NB_THREADS, see odatix.lib.parallel_job_handler.cpu_pinning), or
+    # `default` when it runs outside of Odatix.
+    if {[info exists ::env(ODATIX_NB_THREADS)] && [string is integer -strict $::env(ODATIX_NB_THREADS)]} {
+        return $::env(ODATIX_NB_THREADS)
+    }
+    return $default
+}
+
 proc odatix_step_done {step {signature ""}} {
     # Record that a step of the flow completed, in the file Odatix resumes from
     # ("log/steps.yml", see odatix.lib.job_steps).
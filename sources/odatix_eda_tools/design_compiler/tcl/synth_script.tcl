@@ -25,6 +25,11 @@ if {[catch {
     
     source scripts/settings.tcl
 
+    # As many threads as the job has cores
+    if {[odatix_nb_threads] > 0} {
+        catch {set_host_options -max_cores [odatix_nb_threads]}
+    }
+
     set basename ${top_level_module}
     set runname gates_dc
 
@@ -139,7 +144,12 @@ if {[catch {
     set_fix_multiple_port_nets -outputs -feedthroughs -constants
     #compile -map_effort medium -boundary_optimization
     #compile_ultra -area_high_effort_script -retime 
-    compile
+    # the bracketing pass of an fmax search only needs a rough verdict
+    if {[info exists ::fmax_effort] && $::fmax_effort eq "low"} {
+        compile -map_effort low
+    } else {
+        compile
+    }
     #compile_ultra -timing_high_effort_script -retime
 
     report_progress 90 $synth_statusfile
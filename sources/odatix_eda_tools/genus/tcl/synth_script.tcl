@@ -2,9 +2,18 @@
 # GENUS SYNTHESIS SCRIPT
 #################################################################################
 set effort high
+# the bracketing pass of an fmax search only needs a rough verdict
+if {[info exists ::fmax_effort] && $::fmax_effort eq "low"} {
+  set effort low
+}
 
 source scripts/settings.tcl
 #source scripts/is_slack_met.tcl
+
+# as many threads as the job has cores
+if {[odatix_nb_threads] > 0} {
+  catch {set_db max_cpus_per_server [odatix_nb_threads]}
+}
 report_progress 28 $synth_statusfile
 
 #################################################################################
@@ -207,6 +207,13 @@ proc odatix_write_rtl_resources {stage signature} {
 proc odatix_single_thread {signature} {
     global single_thread
     if {$single_thread != 1} {
+        # As many threads as the job has cores (Vivado caps synthesis at 8
+        # threads, the rest at 32).
+        set nb_threads [odatix_nb_threads]
+        if {$nb_threads > 0} {
+            catch {set_param synth.maxThreads [expr {min($nb_threads, 8)}]}
+            catch {set_param general.maxThreads [expr {min($nb_threads, 32)}]}
+        }
         return
     }
     if {[catch {
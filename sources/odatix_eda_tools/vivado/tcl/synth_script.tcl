@@ -54,6 +54,9 @@ if {[catch {
             puts "$signature <bold><red>error: failed setting vivado to single thread<end>"
             puts -nonewline "$signature tool says -> $errmsg"
         }
+    } elseif {[odatix_nb_threads] > 0} {
+        catch {set_param synth.maxThreads [expr {min([odatix_nb_threads], 8)}]}
+        catch {set_param general.maxThreads [expr {min([odatix_nb_threads], 32)}]}
     }
 
     report_progress 0 $synth_statusfile
@@ -30,6 +30,7 @@ import os
 import shutil
 import sys
 import textwrap
+import time
 
 import pytest
 
@@ -100,3 +101,56 @@ def make_generation_settings(**overrides):
     }
     data.update(overrides)
     return data
+
+
+# Fields of a job of the parallel job handler given to its constructor; the
+# other fields given to make_parallel_job are set on the job once built.
+_PARALLEL_JOB_ARGUMENTS = ("generate_command", "target", "status_file", "progress_file", "tmp_dir", "progress_mode")
+
+
+def make_parallel_job(name="job", command="true", directory=".", status="idle", log_size_limit=-1, **fields):
+    """
+    A job of the parallel job handler named `name` (its arch and display name),
+    working in `directory` (its tmp_dir as well, unless given). `fields` are
+    other arguments of ParallelJob (target, status_file, ...), or attributes
+    set on the job (resources, licenses, runtime_history, ...) when not None.
+    """
+    from odatix.lib.parallel_job_handler.job import ParallelJob
+
+    arguments = {
+        "generate_command": "",
+        "target": "xc7",
+        "status_file": "",
+        "progress_file": "",
+        "tmp_dir": directory,
+    }
+    for argument in _PARALLEL_JOB_ARGUMENTS:
+        if argument in fields:
+            arguments[argument] = fields.pop(argument)
+    job = ParallelJob(
+        process=None, command=command, directory=directory, generate_rtl=False, arch=name, display_name=name,
+        log_size_limit=log_size_limit, status=status, **arguments
+    )
+    job.progress = 0
+    for attribute, value in fields.items():
+        if value is not None:
+            setattr(job, attribute, value)
+    return job
+
+
+def make_fake_start_handler(jobs=(), nb_jobs=1, **options):
+    """
+    A ParallelJobHandler of `jobs` (`options` given to it) whose start_job only
+    marks a job running: nothing is actually run.
+    """
+    from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+
+    handler = ParallelJobHandler(list(jobs), nb_jobs=nb_jobs, **options)
+
+    def start_job(job):
+        job.status = "running"
+        job.start_time = time.time()
+        handler.running_job_list.append(job)
+
+    handler.start_job = start_job
+    return handler
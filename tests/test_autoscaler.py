@@ -0,0 +1,135 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Host-load-aware autoscaling of nb_jobs (odatix.lib.parallel_job_handler.autoscaler).
+"""
+
+import json
+
+import pytest
+
+from odatix.lib.parallel_job_handler import autoscaler
+from odatix.lib.parallel_job_handler.autoscaler import Autoscaler, HostSample
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+
+
+def sample(load1=4.0, cores=16, available=48.0, swap=0.0):
+    host = HostSample(load1=load1, cores=cores, memory_total_gb=64.0, memory_available_gb=available)
+    host.swap_pages_per_s = swap
+    return host
+
+
+class TestDecide:
+    @pytest.fixture
+    def scaler(self):
+        return Autoscaler(2, 8)
+
+    def test_raises_when_the_host_has_room_and_jobs_wait(self, scaler):
+        assert scaler.decide(4, sample(load1=4.0), queued=3, slots_full=True, now=0)[:2] == (autoscaler.ACTION_RAISE, 5)
+
+    def test_holds_when_no_job_waits_for_a_slot(self, scaler):
+        assert scaler.decide(4, sample(), queued=0, slots_full=True, now=0)[0] == autoscaler.ACTION_HOLD
+        assert scaler.decide(4, sample(), queued=3, slots_full=False, now=0)[0] == autoscaler.ACTION_HOLD
+
+    @pytest.mark.parametrize(
+        "host",
+        [sample(load1=20.0), sample(available=4.0), sample(swap=500.0)],
+        ids=["overloaded", "low memory", "swapping"],
+    )
+    def test_lowers_under_pressure(self, scaler, host):
+        assert scaler.decide(4, host, queued=3, slots_full=True, now=0)[:2] == (autoscaler.ACTION_LOWER, 3)
+
+    def test_stays_within_bounds(self, scaler):
+        assert scaler.decide(2, sample(swap=500.0), queued=3, slots_full=True, now=0)[:2] == (autoscaler.ACTION_HOLD, 2)
+        assert scaler.decide(8, sample(load1=1.0), queued=3, slots_full=True, now=0)[:2] == (autoscaler.ACTION_HOLD, 8)
+        # nb_jobs set by hand outside the bounds.
+        assert scaler.decide(12, sample(), queued=3, slots_full=True, now=0)[:2] == (autoscaler.ACTION_LOWER, 8)
+        assert scaler.decide(1, sample(), queued=3, slots_full=True, now=0)[:2] == (autoscaler.ACTION_RAISE, 2)
+
+    def test_load_waits_for_the_last_change_to_settle(self, scaler):
+        scaler._last_change = 100
+        assert scaler.decide(4, sample(load1=1.0), queued=3, slots_full=True, now=110)[0] == autoscaler.ACTION_HOLD
+        assert scaler.decide(4, sample(load1=20.0), queued=3, slots_full=True, now=110)[0] == autoscaler.ACTION_HOLD
+        # Swapping does not wait.
+        assert scaler.decide(4, sample(swap=500.0), queued=3, slots_full=True, now=110)[0] == autoscaler.ACTION_LOWER
+
+
+def test_sample_host_reads_proc(tmp_path):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text("MemTotal:       67108864 kB\nMemFree:  1000 kB\nMemAvailable:   33554432 kB\n")
+    vmstat = tmp_path / "vmstat"
+    vmstat.write_text("pswpin 100\npswpout 50\n")
+    first = autoscaler.sample_host(meminfo=str(meminfo), vmstat=str(vmstat))
+    assert (first.memory_total_gb, first.memory_available_gb) == (64.0, 32.0)
+    vmstat.write_text("pswpin 400\npswpout 150\n")
+    first.time -= 10
+    second = autoscaler.sample_host(previous=first, meminfo=str(meminfo), vmstat=str(vmstat))
+    assert second.swap_pages_per_s == pytest.approx(40, rel=0.05)
+
+
+class TestHandler:
+    def make_handler(self, tmp_path, host):
+        handler = ParallelJobHandler([], nb_jobs=4)
+        handler.autoscaler_log_path = str(tmp_path / "autoscaler.jsonl")
+        handler.configure_autoscaler(min_jobs=2, max_jobs=8)
+        handler.autoscaler.sampler = lambda previous: host
+        return handler
+
+    def test_scales_through_set_nb_jobs_and_logs(self, tmp_path):
+        handler = self.make_handler(tmp_path, sample(swap=500.0))
+        decision = handler.autoscaler.tick(handler, now=1000)
+        assert handler.nb_jobs == 3
+        assert decision["action"] == autoscaler.ACTION_LOWER
+        # Sampled once per interval.
+        assert handler.autoscaler.tick(handler, now=1001) is None
+        handler.autoscaler.tick(handler, now=1000 + handler.autoscaler.interval)
+        assert handler.nb_jobs == 2
+        with open(handler.autoscaler_log_path) as f:
+            lines = [json.loads(line) for line in f]
+        assert [line["target"] for line in lines] == [3, 2]
+        assert handler.snapshot(logs_job_id=-1)["handler"]["autoscaler"]["last_decision"]["target"] == 2
+
+    def test_holding_for_the_same_reason_is_logged_once(self, tmp_path):
+        handler = self.make_handler(tmp_path, sample())
+        for tick in range(3):
+            handler.autoscaler.tick(handler, now=1000 + tick * handler.autoscaler.interval)
+        with open(handler.autoscaler_log_path) as f:
+            assert len(f.readlines()) == 1
+
+    def test_configure(self, tmp_path):
+        handler = self.make_handler(tmp_path, sample())
+        assert handler.configure_autoscaler(max_jobs=12)["max_jobs"] == 12
+        with pytest.raises(ValueError):
+            handler.configure_autoscaler(min_jobs=20)
+        assert handler.configure_autoscaler(enabled=False) is None
+        assert handler.snapshot(logs_job_id=-1)["handler"]["autoscaler"] is None
+
+
+def test_autoscale_bounds_argument():
+    import argparse
+
+    from odatix.lib.parallel_job_handler.daemon_server import parse_autoscale_bounds
+
+    assert parse_autoscale_bounds("2:16") == (2, 16)
+    for value in ("16:2", "0:4", "4"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_autoscale_bounds(value)
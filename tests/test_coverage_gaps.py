@@ -59,6 +59,103 @@ def test_edit_pnr_config_file_quotes_source_metadata(tmp_path):
     assert "source.sdc\"" in content
 
 
+def test_edit_bracketing_config_file_leaves_the_other_bracketing_settings(tmp_path):
+    config = tmp_path / "settings.tcl"
+    config.write_text(
+        "set fmax_bracketing_logfile $log_path/fmax_bracketing.log\n"
+        "set fmax_bracketing    0\n"
+        "set fmax_bracketing_script $synth_script\n"
+        "set fmax_full_effort_runs 3\n"
+    )
+
+    prepare_work.edit_bracketing_config_file(str(config), {"script": "synth_fast.tcl", "full_effort_runs": 2})
+
+    content = config.read_text()
+    assert "set fmax_bracketing_logfile $log_path/fmax_bracketing.log" in content
+    assert "set fmax_bracketing    1" in content
+    assert "set fmax_bracketing_script $script_path/synth_fast.tcl" in content
+    assert "set fmax_full_effort_runs 2" in content
+
+
+def test_edit_sweep_config_file_lists_the_frequency_directories(tmp_path):
+    config = tmp_path / "settings.tcl"
+    config.write_text("set sweep_paths        [list]\n")
+
+    prepare_work.edit_sweep_config_file(str(config), [str(tmp_path / "100MHz"), str(tmp_path / "200MHz")])
+
+    expected = "[list {" + str(tmp_path / "100MHz") + "} {" + str(tmp_path / "200MHz") + "}]"
+    assert config.read_text() == "set sweep_paths        " + expected + "\n"
+
+
+def test_custom_freq_sweeps_group_frequencies_by_configuration(tmp_path):
+    from odatix.components.synthesis_common import group_custom_freq_sweeps, sweep_display_name
+
+    def instance(configuration, frequency):
+        return SimpleNamespace(
+            tmp_dir=str(tmp_path / "target" / "arch" / configuration / (str(frequency) + "MHz")),
+            arch_display_name="arch/" + configuration + " @ " + str(frequency) + " MHz",
+            target_frequency=frequency,
+        )
+
+    instances = [instance("08bits", 100), instance("16bits", 100), instance("08bits", 200)]
+    sweeps = group_custom_freq_sweeps(instances)
+
+    assert [[member.target_frequency for member in sweep] for sweep in sweeps] == [[100, 200], [100]]
+    assert sweep_display_name(sweeps[0]) == "arch/08bits @ 100, 200 MHz"
+
+
+def test_a_sweep_exports_one_result_per_frequency(tmp_path):
+    import odatix.components.export_results as export_results
+
+    configuration_dir = tmp_path / "work" / "dummy" / "target" / "arch" / "08bits"
+    job = SimpleNamespace(
+        tmp_dir=str(configuration_dir / "100MHz"),
+        sweep_dirs=[str(configuration_dir / "100MHz"), str(configuration_dir / "200MHz")],
+    )
+
+    configured = export_results.configure_synthesis_job_exports(
+        SimpleNamespace(job_list=[job]),
+        result_type="custom_freq_synthesis",
+        work_path=str(tmp_path / "work"),
+        tool="dummy",
+        output_dir=str(tmp_path / "results"),
+    )
+
+    assert configured == 1
+    assert job.post_run_export["frequency"] == "100MHz"
+    assert job.post_run_export["frequencies"] == ["100MHz", "200MHz"]
+
+
+def test_a_sweep_keeps_the_results_of_the_frequencies_that_succeeded(tmp_path, monkeypatch):
+    import odatix.components.export_results as export_results
+    import odatix.lib.results_schema as results_schema
+
+    def process_configuration(frequency, **kwargs):
+        if frequency == "200MHz":
+            return None
+        meta = {"target": "target", "architecture": "arch", "configuration": "08bits", "frequency": frequency}
+        return [results_schema.make_record(meta, {"Fmax": 1.0})]
+
+    monkeypatch.setattr(export_results, "_load_metrics_for_tool", lambda **kwargs: ({}, "metrics.yml"))
+    monkeypatch.setattr(export_results, "process_configuration", process_configuration)
+    config = {
+        "result_type": "custom_freq_synthesis",
+        "tool": "dummy",
+        "input_tool_path": str(tmp_path / "work" / "dummy"),
+        "output_dir": str(tmp_path / "results"),
+        "target": "target",
+        "architecture": "arch",
+        "configuration": "08bits",
+        "frequency": "100MHz",
+        "frequencies": ["100MHz", "200MHz"],
+    }
+
+    assert export_results.export_single_job_result(SimpleNamespace(), config) is False
+
+    results = results_schema.load_results_file(str(tmp_path / "results" / "results_dummy.yml"))
+    assert [record["meta"]["frequency"] for record in results.records] == ["100MHz"]
+
+
 def test_clean_removes_requested_files_and_refuses_dangerous_path(tmp_path, monkeypatch):
     monkeypatch.chdir(tmp_path)
     (tmp_path / "remove-me.txt").write_text("temporary")
@@ -0,0 +1,123 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Pinning of jobs to cores of their own (odatix.lib.parallel_job_handler.cpu_pinning).
+"""
+
+import sys
+import time
+
+import pytest
+
+from conftest import make_parallel_job
+from odatix.lib.parallel_job_handler import cpu_pinning
+from odatix.lib.parallel_job_handler.cpu_pinning import CpuPinning
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+
+
+class TestCpuSet:
+    def test_format_and_parse(self):
+        assert cpu_pinning.format_cpu_set([8, 0, 1, 2, 3, 10]) == "0-3,8,10"
+        assert cpu_pinning.parse_cpu_set("0-3, 8,10") == [0, 1, 2, 3, 8, 10]
+        for text in ("", "3-1", "a"):
+            with pytest.raises(ValueError):
+                cpu_pinning.parse_cpu_set(text)
+
+    def test_environment(self):
+        env = cpu_pinning.environment([4, 5], 2, base={})
+        assert env == {cpu_pinning.ENV_NB_THREADS: "2", cpu_pinning.ENV_CPU_SET: "4-5"}
+
+
+class TestCpuPinning:
+    def test_width(self):
+        pinning = CpuPinning(range(16))
+        assert pinning.width(4) == 4
+        assert pinning.width(32) == 1
+        # The cores a job declares win over its share.
+        assert pinning.width(4, cores=6) == 6
+        assert pinning.width(4, cores=64) == 16
+
+    def test_blocks_are_disjoint_and_contiguous(self):
+        pinning = CpuPinning(range(8))
+        first, second = pinning.acquire(3), pinning.acquire(3)
+        assert (first, second) == ([0, 1, 2], [3, 4, 5])
+        pinning.release(first)
+        # The smallest block wide enough: 6-7 rather than 0-2.
+        assert pinning.acquire(2) == [6, 7]
+        assert pinning.acquire(3) == [0, 1, 2]
+        assert pinning.acquire(3) is None
+
+    def test_fragmented_cores_are_taken_anyway(self):
+        pinning = CpuPinning(range(6))
+        pinning.take([1, 3])
+        assert pinning.acquire(3) == [0, 2, 4]
+        assert pinning.acquire(3) == [5]
+
+
+class TestHandler:
+    def make_handler(self, jobs, nb_jobs, cpus):
+        handler = ParallelJobHandler(jobs, nb_jobs=nb_jobs)
+        handler.configure_cpu_pinning(cpus=cpus)
+        handler.configure_runtime(resources={"cores": len(handler.cpu_pinning.cpus)})
+
+        def run_job(job):
+            job.status = "running"
+
+        handler.run_job = run_job
+        return handler
+
+    @pytest.mark.skipif(not cpu_pinning.supported(), reason="sched_setaffinity not available")
+    def test_running_jobs_hold_cores_of_their_own(self):
+        jobs = [make_parallel_job("a"), make_parallel_job("b", resources={"cores": 4}), make_parallel_job("c")]
+        handler = self.make_handler(jobs, nb_jobs=3, cpus="0-7")
+        handler._initialize_headless()
+        assert [job._cpu_set for job in jobs] == [[0, 1], [2, 3, 4, 5], [6, 7]]
+        assert handler.snapshot(logs_job_id=-1)["handler"]["cpu_pinning"] == {"cpus": "0-7", "total": 8, "taken": 8}
+
+        jobs[1].status = "success"
+        handler._retire_finished_job(jobs[1])
+        assert handler.cpu_pinning.free() == [2, 3, 4, 5]
+        # Enabling it again keeps what running jobs hold.
+        handler.configure_cpu_pinning()
+        assert handler.cpu_pinning.free() == [2, 3, 4, 5]
+
+    def test_disabled(self):
+        handler = ParallelJobHandler([], nb_jobs=2)
+        assert handler.configure_cpu_pinning(enabled=False) is None
+        assert handler.snapshot(logs_job_id=-1)["handler"]["cpu_pinning"] is None
+
+
+@pytest.mark.skipif(not cpu_pinning.supported() or sys.platform == "win32", reason="sched_setaffinity not available")
+def test_jobs_see_their_cores():
+    cpus = cpu_pinning.available_cpus()[:1]
+    job = make_parallel_job("job", command="echo threads=$" + cpu_pinning.ENV_NB_THREADS + " cpus=$" + cpu_pinning.ENV_CPU_SET)
+    handler = ParallelJobHandler([job], nb_jobs=1)
+    handler.configure_cpu_pinning(cpus=cpus)
+    handler._initialize_headless()
+    deadline = time.time() + 10
+    while job in handler.running_job_list and time.time() < deadline:
+        handler._tick()
+        time.sleep(0.01)
+    handler.read_process_output()
+    assert "threads=1 cpus={}".format(cpus[0]) in "\n".join(map(str, job.log_history))
+    assert handler.cpu_pinning.free() == cpus
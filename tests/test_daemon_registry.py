@@ -0,0 +1,133 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Registry of the daemons running on a host
+(odatix.lib.parallel_job_handler.daemon_registry), and how the sessions are
+listed from it.
+"""
+
+import json
+import os
+import stat
+import time
+
+import pytest
+
+import odatix.lib.parallel_job_handler.daemon_control as daemon_control
+from odatix.lib.parallel_job_handler import daemon_registry, shared_files
+from odatix.lib.parallel_job_handler.daemon_registry import DaemonRegistry, Heartbeat
+
+pytestmark = pytest.mark.skipif(not daemon_registry.supported(), reason="file locks not available")
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    directory = str(tmp_path / "registry")
+    monkeypatch.setattr(daemon_registry, "default_directory", lambda: directory)
+    daemon_control._forget_probes()
+    return DaemonRegistry()
+
+
+class TestRegistry:
+    def test_a_registered_daemon_is_listed_until_it_leaves(self, registry):
+        assert registry.entries() == []
+        registry.register({"pid": os.getpid(), "state_file": "state.json"})
+        assert [entry["state_file"] for entry in registry.entries()] == ["state.json"]
+        registry.unregister(os.getpid())
+        assert registry.entries() == []
+
+    def test_dead_and_silent_daemons_are_dropped(self, registry):
+        now = time.time()
+        registry.register({"pid": os.getpid()}, now=now - daemon_registry.STALE_AFTER - 1)
+        registry.register({"pid": 2 ** 22 + 1}, now=now)
+        assert registry.entries(now=now) == []
+        assert os.listdir(registry.directory) == [daemon_registry.LOCK_FILENAME]
+
+    def test_the_lock_is_shared_by_all_users(self, registry):
+        umask = os.umask(0o022)
+        try:
+            registry.register({"pid": os.getpid()})
+        finally:
+            os.umask(umask)
+        assert stat.S_IMODE(os.stat(os.path.join(registry.directory, daemon_registry.LOCK_FILENAME)).st_mode) == 0o666
+
+    def test_the_stale_entry_of_another_user_is_rewritten_in_place(self, registry, monkeypatch):
+        registry.register({"pid": os.getpid(), "state_file": "old.json"})
+
+        def replace(source, destination):
+            # What a sticky directory answers for the file of another user.
+            raise PermissionError(13, "Operation not permitted", destination)
+
+        monkeypatch.setattr(shared_files.os, "replace", replace)
+        registry.register({"pid": os.getpid(), "state_file": "new.json"})
+        assert [entry["state_file"] for entry in registry.entries()] == ["new.json"]
+        assert sorted(os.listdir(registry.directory)) == sorted([daemon_registry.LOCK_FILENAME, str(os.getpid()) + ".json"])
+
+    def test_heartbeat(self, registry):
+        heartbeat = Heartbeat(registry, {"pid": os.getpid()}, interval=0.05)
+        heartbeat.start()
+        first = registry.entries()[0]["heartbeat"]
+        time.sleep(0.2)
+        assert registry.entries()[0]["heartbeat"] > first
+        heartbeat.stop()
+        assert registry.entries() == []
+
+
+def test_sessions_are_listed_from_the_registry(registry, tmp_path, monkeypatch):
+    state_dir = tmp_path / "work" / daemon_control.DAEMON_STATE_DIR
+    state_dir.mkdir(parents=True)
+    # Two live processes stand for the daemons.
+    for index, (name, pid) in enumerate((("nightly", os.getpid()), ("smoke", os.getppid()))):
+        state_file = state_dir / "state.{}.json".format(name)
+        state = {"pid": pid, "host": "127.0.0.1", "port": 8000 + index, "session_name": name}
+        state_file.write_text(json.dumps(state))
+        registry.register(dict(state, state_file=str(state_file), workspace_root=str(tmp_path / "work")))
+
+    probes = []
+    monkeypatch.setattr(daemon_control, "daemon_is_alive", lambda state, timeout=0.6: probes.append(state["port"]) or True)
+    monkeypatch.setattr(daemon_control, "_iter_system_daemon_candidates", lambda: pytest.fail("scanned /proc"))
+
+    daemons = daemon_control.list_daemons()
+    assert sorted(daemon["session_name"] for daemon in daemons) == ["nightly", "smoke"]
+    assert sorted(probes) == [8000, 8001]
+    # The daemons that just answered are not probed again.
+    daemon_control.list_daemons()
+    assert len(probes) == 2
+    daemon_control._forget_probes()
+    daemon_control.list_daemons()
+    assert len(probes) == 4
+
+
+def test_daemons_missing_from_the_registry_are_listed_from_their_state_files(registry, tmp_path, monkeypatch):
+    state_dir = tmp_path / "work" / daemon_control.DAEMON_STATE_DIR
+    state_dir.mkdir(parents=True)
+    for index, (name, pid) in enumerate((("registered", os.getpid()), ("unregistered", os.getppid()))):
+        state_file = state_dir / "state.{}.json".format(name)
+        state = {"pid": pid, "host": "127.0.0.1", "port": 8000 + index, "session_name": name}
+        state_file.write_text(json.dumps(state))
+        if name == "registered":
+            registry.register(dict(state, state_file=str(state_file), workspace_root=str(tmp_path / "work")))
+
+    monkeypatch.setattr(daemon_control, "daemon_is_alive", lambda state, timeout=0.6: True)
+    daemons = daemon_control.list_daemons(workspace_root=str(tmp_path / "work"))
+    assert sorted(daemon["session_name"] for daemon in daemons) == ["registered", "unregistered"]
@@ -582,6 +582,160 @@ class TestFlowSteps:
         assert eda_tools.get_flow_command("mytool", None, "custom_freq_synthesis") == "one_shot"
 
 
+class TestFmaxBracketing:
+    def test_design_compiler_declares_a_low_effort_synthesis(self, user_tools_dir):
+        bracketing = eda_tools.fmax_bracketing_settings("design_compiler")
+        assert bracketing == {"script": None, "full_effort_runs": 3}
+
+    def test_vivado_declares_none(self, user_tools_dir):
+        assert eda_tools.fmax_bracketing_settings("vivado") is None
+
+    def test_a_flow_can_turn_it_off_or_change_it(self, user_tools_dir):
+        write_tool(
+            user_tools_dir,
+            "effort",
+            """\
+            default_metrics_file: metrics.yml
+            fmax_bracketing:
+              script: synth_fast.tcl
+            unix:
+              tool_test_command: true
+              fmax_synthesis_command: run_fmax
+            flows:
+              exact:
+                fmax_bracketing: No
+              quick:
+                fmax_bracketing:
+                  full_effort_runs: 5
+            """,
+        )
+        assert eda_tools.fmax_bracketing_settings("effort") == {"script": "synth_fast.tcl", "full_effort_runs": 3}
+        assert eda_tools.fmax_bracketing_settings("effort", "exact") is None
+        assert eda_tools.fmax_bracketing_settings("effort", "quick") == {"script": None, "full_effort_runs": 5}
+
+
+class TestCustomFreqSweep:
+    def test_design_compiler_declares_a_sweep_session(self, user_tools_dir):
+        command = eda_tools.get_custom_freq_sweep_command("design_compiler")
+        assert "'source scripts/custom_freq_sweep.tcl; quit'" in command
+
+    def test_vivado_declares_none(self, user_tools_dir):
+        assert eda_tools.get_custom_freq_sweep_command("vivado") is None
+
+    def test_a_flow_synthesizing_differently_does_not_inherit_it(self, user_tools_dir):
+        write_tool(
+            user_tools_dir,
+            "sweeper",
+            """\
+            default_metrics_file: metrics.yml
+            unix:
+              tool_test_command: true
+              custom_freq_synthesis_command: run_one
+              custom_freq_synthesis_sweep_command: run_all
+            flows:
+              verbose:
+                unix:
+                  tool_test_command: true
+              other_script:
+                unix:
+                  custom_freq_synthesis_command: run_other
+              stepped:
+                unix:
+                  custom_freq_synthesis_steps:
+                    - name: synthesis
+                      command: run_synthesis
+              other_sweep:
+                unix:
+                  custom_freq_synthesis_command: run_other
+                  custom_freq_synthesis_sweep_command: run_all_others
+            """,
+        )
+        assert eda_tools.get_custom_freq_sweep_command("sweeper") == "run_all"
+        assert eda_tools.get_custom_freq_sweep_command("sweeper", "verbose") == "run_all"
+        assert eda_tools.get_custom_freq_sweep_command("sweeper", "other_script") is None
+        assert eda_tools.get_custom_freq_sweep_command("sweeper", "stepped") is None
+        assert eda_tools.get_custom_freq_sweep_command("sweeper", "other_sweep") == "run_all_others"
+
+
+class TestFlowResources:
+    def test_a_flow_overrides_the_tool_resource_by_resource(self, user_tools_dir):
+        write_tool(
+            user_tools_dir,
+            "heavy",
+            """\
+            default_metrics_file: metrics.yml
+            resources:
+              cores: 2
+              memory_gb: 8
+            unix:
+              tool_test_command: true
+              fmax_synthesis_command: run
+            flows:
+              big:
+                resources:
+                  memory_gb: 32
+                  scratch_gb: 50
+              single_threaded:
+                resources:
+                  cores: 0
+            """,
+        )
+        assert eda_tools.get_flow_resources("heavy") == {"cores": 2, "memory_gb": 8}
+        assert eda_tools.get_flow_resources("heavy", "big") == {"cores": 2, "memory_gb": 32, "scratch_gb": 50}
+        assert eda_tools.get_flow_resources("heavy", "single_threaded") == {"memory_gb": 8}
+
+    def test_undeclared_costs_nothing(self, user_tools_dir):
+        assert eda_tools.get_flow_resources("vivado") == {}
+
+    def test_license_pools_are_inherited_and_overridden(self, user_tools_dir):
+        write_tool(
+            user_tools_dir,
+            "licensed",
+            """\
+            default_metrics_file: metrics.yml
+            licenses:
+              dc_shell: 4
+            unix:
+              tool_test_command: true
+              fmax_synthesis_command: run
+            flows:
+              ultra:
+                licenses:
+                  dc_ultra: 1
+              open:
+                licenses:
+                  dc_shell: 0
+            """,
+        )
+        assert eda_tools.get_flow_licenses("licensed") == {"dc_shell": 4}
+        assert eda_tools.get_flow_licenses("licensed", "ultra") == {"dc_shell": 4, "dc_ultra": 1}
+        assert eda_tools.get_flow_licenses("licensed", "open") == {}
+
+    def test_memory_limit_is_inherited_and_overridden(self, user_tools_dir):
+        write_tool(
+            user_tools_dir,
+            "hungry",
+            """\
+            default_metrics_file: metrics.yml
+            memory_limit_gb: 16
+            unix:
+              tool_test_command: true
+              fmax_synthesis_command: run
+            flows:
+              big:
+                memory_limit_gb: 48
+              unlimited:
+                memory_limit_gb: No
+              plain: {}
+            """,
+        )
+        assert eda_tools.get_flow_memory_limit("hungry") == 16
+        assert eda_tools.get_flow_memory_limit("hungry", "big") == 48
+        assert eda_tools.get_flow_memory_limit("hungry", "unlimited") is None
+        assert eda_tools.get_flow_memory_limit("hungry", "plain") == 16
+        assert eda_tools.get_flow_memory_limit("vivado") is None
+
+
 class TestStepIsNotADimension:
     def test_a_job_advancing_replaces_its_own_record(self):
         """
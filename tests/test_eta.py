@@ -0,0 +1,154 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Estimated time left of jobs and sessions, and their throughput
+(odatix.lib.parallel_job_handler.eta).
+"""
+
+import time
+
+import pytest
+
+from conftest import make_fake_start_handler, make_parallel_job
+from odatix.lib.parallel_job_handler import eta
+from odatix.lib.parallel_job_handler.runtime_history import RuntimeHistory, make_key
+
+
+def key(name, tool="vivado"):
+    return make_key("pnr", tool, "", "xc7", "Counter/" + name)
+
+
+def make_job(name, path, seconds=None, tool="vivado"):
+    job = make_parallel_job(name, runtime_history={"file": path, "key": key(name, tool=tool), "record": True})
+    if seconds is not None:
+        RuntimeHistory(path).record(key(name, tool=tool), seconds)
+    return job
+
+
+class TestEstimates:
+    def test_from_the_steps_left(self):
+        steps = ["synthesis", "pnr", "bitstream"]
+        expected = {"synthesis": 100, "pnr": 300, "bitstream": 50}
+        assert eta.remaining_from_steps(steps, 1, 100, expected) == 250
+        # A step of unknown runtime left, or all of them overrun.
+        assert eta.remaining_from_steps(steps, 1, 100, dict(expected, bitstream=None)) is None
+        assert eta.remaining_from_steps(steps, 1, 400, expected) is None
+
+    def test_from_the_history(self):
+        assert eta.remaining_from_history(60, 100) == 40
+        assert eta.remaining_from_history(120, 100) is None
+        assert eta.remaining_from_history(60, None) is None
+
+    def test_from_the_progress(self):
+        assert eta.remaining_from_progress(100, 25) == 300
+        assert eta.remaining_from_progress(100, eta.MIN_PROGRESS - 1) is None
+        assert eta.remaining_from_progress(100, 100) is None
+
+    def test_throughput(self):
+        now = time.time()
+        # 3 jobs in the 30 minutes since the session started.
+        assert eta.throughput_per_hour([now - 10, now - 20, now - 30], now - 1800, now) == pytest.approx(6)
+        # Only the last hour counts.
+        assert eta.throughput_per_hour([now - 7200, now - 10], now - 10000, now) == pytest.approx(1)
+        assert eta.throughput_per_hour([], None, now) == 0.0
+
+    @pytest.mark.parametrize(
+        "seconds, text",
+        [(45, "45s"), (750, "12m30s"), (11100, "3h05m"), (187200, "2d04h")],
+    )
+    def test_format_duration(self, seconds, text):
+        assert eta.format_duration(seconds) == text
+
+
+class TestHandler:
+    def test_running_job_eta(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        job = make_job("job", path, 100)
+        handler = make_fake_start_handler([job])
+        handler._initialize_headless()
+        job.start_time -= 40
+        snapshot = handler.snapshot(logs_job_id=-1)
+        assert snapshot["jobs"][0]["eta"] == pytest.approx(60, abs=2)
+        assert snapshot["jobs"][0]["eta_basis"] == eta.BASIS_HISTORY
+
+    def test_an_overrunning_job_falls_back_to_its_progress(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        job = make_job("job", path, 100)
+        handler = make_fake_start_handler([job])
+        handler._initialize_headless()
+        job.start_time -= 150
+        job.progress = 75
+        snapshot = handler.snapshot(logs_job_id=-1)
+        assert snapshot["jobs"][0]["eta"] == pytest.approx(50, abs=2)
+        assert snapshot["jobs"][0]["eta_basis"] == eta.BASIS_PROGRESS
+
+    def test_stepped_job_eta(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        job = make_job("job", path)
+        job.step_names = ["synthesis", "pnr", "bitstream"]
+        RuntimeHistory(path).record(key("job"), None, steps=[("synthesis", 100), ("pnr", 300), ("bitstream", 50)])
+        handler = make_fake_start_handler([job])
+        handler._initialize_headless()
+        job.current_step_index = 1
+        job.current_step_started_at = time.time() - 100
+        snapshot = handler.snapshot(logs_job_id=-1)
+        assert snapshot["jobs"][0]["eta"] == pytest.approx(250, abs=2)
+        assert snapshot["jobs"][0]["eta_basis"] == eta.BASIS_STEPS
+
+    def test_a_resumed_job_records_its_steps(self, tmp_path):
+        import odatix.lib.job_steps as job_steps
+
+        path = str(tmp_path / "history.json")
+        job = make_job("job", path)
+        job.runtime_history["record"] = False
+        job.step_names = ["synthesis", "pnr"]
+        job.step_tracking = {"tmp_dir": str(tmp_path / "job")}
+        handler = make_fake_start_handler([job])
+        handler._initialize_headless()
+        job.start_time -= 10
+        job_steps.record_completed_step(str(tmp_path / "job"), "pnr")
+        job.status, job.progress = "success", 100
+        handler._retire_finished_job(job)
+        history = RuntimeHistory(path)
+        assert history.predict(key("job")) is None
+        assert history.predict(key("job"), step="pnr").seconds == pytest.approx(10, abs=2)
+
+    def test_session_eta_and_throughput(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        jobs = [make_job(name, path, tool="design_compiler") for name in ("a", "b", "c")]
+        handler = make_fake_start_handler(jobs, nb_jobs=1)
+        handler._initialize_headless()
+        # Nothing is known of the jobs before one of them finishes.
+        assert handler.snapshot(logs_job_id=-1)["handler"]["eta"] is None
+
+        first = jobs[0]
+        first.start_time -= 60
+        first.status, first.progress = "success", 100
+        handler._retire_finished_job(first)
+        snapshot = handler.snapshot(logs_job_id=-1)["handler"]
+        # "b" is running with no estimate, "c" is expected to take as long as "a".
+        assert snapshot["eta"] is None
+        jobs[1].progress = 50
+        snapshot = handler.snapshot(logs_job_id=-1)["handler"]
+        assert snapshot["eta"] == pytest.approx(60, abs=2)
+        assert snapshot["throughput_per_hour"] == pytest.approx(60, rel=0.1)
+        assert handler.session_estimates()[0] == pytest.approx(60, abs=2)
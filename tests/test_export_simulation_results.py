@@ -117,6 +117,23 @@ class TestExportSimulationResults:
         )
         assert loaded.records == []
 
+    def test_records_get_what_the_run_took(self, workspace, tmp_path):
+        _write(os.path.join(workspace["run_dir"], "log", "resource_usage.yml"), "wall_seconds: 42.0\npeak_rss_mb: 512.0\n")
+        # A testbench checking itself, with nothing to extract but its run time.
+        bare_dir = tmp_path / "work" / "TB_Bare" / "Arch" / "cfg"
+        _write(str(bare_dir / "log" / "resource_usage.yml"), "wall_seconds: 7.0\n")
+        esr.export_simulation_results(
+            work_root=workspace["work_root"],
+            sim_path=workspace["sim_path"],
+            output_dir=workspace["results"],
+        )
+        loaded = results_schema.load_results_file(os.path.join(workspace["results"], esr.DEFAULT_OUTPUT_FILENAME))
+        by_run = {(r["meta"]["simulation"], r["meta"]["configuration"]): r["metrics"] for r in loaded.records}
+        assert by_run[("TB_Demo", "04bits")]["Run_Time"] == 42.0
+        assert by_run[("TB_Demo", "04bits")]["Peak_Memory"] == 512.0
+        assert "Run_Time" not in by_run[("TB_Demo", "08bits")]
+        assert by_run[("TB_Bare", "cfg")] == {"Run_Time": 7.0}
+
 
 ######################################
 # Per-job export (au fil de l'eau)
@@ -0,0 +1,195 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Parallel k-ary probing of fmax searches (odatix.lib.parallel_job_handler.fmax_probing).
+
+The search rules are those of find_fmax.tcl, k frequencies at a time; the
+handler sizes each round on the slots nobody is waiting for, and counts every
+probe against nb_jobs. The end-to-end test runs a fake tool honouring the probe
+mode of find_fmax.tcl.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+import odatix.lib.hard_settings as hard_settings
+import odatix.lib.parallel_job_handler.fmax_probing as fmax_probing
+from odatix.lib.parallel_job_handler.fmax_probing import FAILED, INFINITE, MET, VIOLATED, FmaxProbeSearch
+from conftest import make_parallel_job
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+
+FMAX = 437
+
+FAKE_TOOL = """
+import os, re, sys
+work = os.path.realpath(sys.argv[1])
+settings = open(os.path.join(work, "scripts", "settings.tcl")).read()
+frequency = int(re.search(r"set fmax_probe_frequency\\s+(\\d+)", settings).group(1))
+assert re.search(r"set tmp_path\\s+" + re.escape(work), settings)
+os.makedirs(os.path.join(work, "log"), exist_ok=True)
+os.makedirs(os.path.join(work, "report"), exist_ok=True)
+verdict = "MET" if frequency <= {fmax} else "VIOLATED"
+open(os.path.join(work, "report", "timing.rep"), "w").write(str(frequency))
+open(os.path.join(work, "log", "frequency_search.log"), "a").write("{{}} MHz: {{}}\\n".format(frequency, verdict))
+"""
+
+
+def search_until_done(search, fmax, k):
+    while not search.done:
+        for frequency in search.next_frequencies(k):
+            search.record(frequency, MET if frequency <= fmax else VIOLATED)
+        search.end_round()
+    return search
+
+
+class TestSearch:
+    def test_one_probe_is_a_bisection(self):
+        search = FmaxProbeSearch(100, 900)
+        assert search.next_frequencies(1) == [500]
+
+    def test_splits_the_interval_into_k_plus_one_parts(self):
+        search = FmaxProbeSearch(100, 900)
+        assert search.next_frequencies(3) == [300, 500, 700]
+
+    @pytest.mark.parametrize("k", [1, 2, 4])
+    def test_converges_like_a_bisection(self, k):
+        search = search_until_done(FmaxProbeSearch(100, 900), FMAX, k)
+        assert search.outcome() == (True, hard_settings.valid_frequency_search + ": 437 MHz")
+
+    def test_more_probes_take_fewer_rounds(self):
+        assert search_until_done(FmaxProbeSearch(1, 1000), FMAX, 4).rounds < search_until_done(FmaxProbeSearch(1, 1000), FMAX, 1).rounds
+
+    def test_stale_verdicts_move_no_bound(self):
+        search = FmaxProbeSearch(100, 900)
+        search.next_frequencies(3)
+        search.record(500, VIOLATED)
+        search.record(700, MET)
+        assert (search.lower_bound, search.upper_bound) == (100, 500)
+        assert search.is_stale(700)
+
+    def test_failed_counts_as_violated(self):
+        search = FmaxProbeSearch(100, 900)
+        search.record(500, FAILED)
+        assert search.upper_bound == 500 and search.got_violated
+
+    def test_infinite_ends_the_search(self):
+        search = FmaxProbeSearch(100, 900)
+        search.record(500, INFINITE)
+        assert search.done and not search.outcome()[0]
+
+    def test_explore_moves_the_upper_bound(self):
+        search = search_until_done(FmaxProbeSearch(100, 300, explore=True, explore_step=100), FMAX, 2)
+        assert search.lower_bound == FMAX
+
+    def test_explore_keeps_its_step_unless_warm_started(self):
+        search = search_until_done(FmaxProbeSearch(100, 110, explore=True, explore_step=10), FMAX, 1)
+        assert search.lower_bound == FMAX and search.explore_step == 10
+
+    def test_warm_started_explore_stays_within_the_configured_bounds(self):
+        search = FmaxProbeSearch(100, 110, explore=True, explore_step=10, configured_bounds=(50, 400))
+        search = search_until_done(search, FMAX, 1)
+        # The answer is past the configured bounds: the search stops at them.
+        assert (search.lower_bound, search.upper_bound) == (399, 400)
+        assert search.explore_step > 10
+
+    def test_without_explore_nothing_violated(self):
+        search = search_until_done(FmaxProbeSearch(100, 300), FMAX, 2)
+        assert search.outcome()[1].startswith("No timing violated")
+
+    def test_reads_the_job_settings(self, tmp_path):
+        config_file = tmp_path / "settings.tcl"
+        config_file.write_text(
+            "set fmax_lower_bound   50\nset fmax_upper_bound   400\nset fmax_explore 1\n"
+            "set fmax_safezone 5\nset fmax_explore_step  [expr {2*$fmax_safezone}]\n"
+        )
+        settings = fmax_probing.read_search_settings(str(config_file))
+        assert (settings["lower_bound"], settings["upper_bound"], settings["explore"]) == (50, 400, True)
+        assert settings["explore_step"] == 10
+        assert settings["configured_bounds"] is None
+        config_file.write_text(
+            "set fmax_warm_start 1\nset fmax_configured_lower_bound 20\nset fmax_configured_upper_bound 500\n"
+        )
+        assert fmax_probing.read_search_settings(str(config_file))["configured_bounds"] == (20, 500)
+
+
+def make_job(tmp_path, name="job", fake_tool=None):
+    work = tmp_path / name
+    (work / "scripts").mkdir(parents=True)
+    (work / "scripts" / "settings.tcl").write_text(
+        "set tmp_path           {}\n"
+        "set fmax_lower_bound   100\n"
+        "set fmax_upper_bound   900\n"
+        "set fmax_mindiff       1\n"
+        "set fmax_probe_frequency 0\n".format(work)
+    )
+    command = "echo" if fake_tool is None else '"{}" "{}" "{}"'.format(sys.executable, fake_tool, os.path.realpath(str(work)))
+    return make_parallel_job(
+        name, command=command, directory=str(tmp_path), target="target",
+        status_file=str(work / "log" / hard_settings.fmax_status_filename),
+        progress_file=str(work / "log" / hard_settings.synth_status_filename),
+        tmp_dir=str(work), progress_mode="fmax", fmax_probing={"max_probes": 3},
+    )
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="probes are stopped through their process group")
+class TestHandler:
+    def test_probe_count_follows_spare_slots(self, tmp_path):
+        first, second = make_job(tmp_path, "first"), make_job(tmp_path, "second")
+        handler = ParallelJobHandler([first], nb_jobs=4)
+        handler.running_job_list.append(first)
+        assert handler._probe_count(first) == 3  # capped by max_probes
+        handler.nb_jobs = 2
+        assert handler._probe_count(first) == 2
+        handler.queue_job(second)
+        assert handler._probe_count(first) == 1
+
+    def test_probes_count_against_nb_jobs(self, tmp_path):
+        job = make_job(tmp_path)
+        job._fmax_probes = [object(), object()]
+        handler = ParallelJobHandler([job], nb_jobs=3)
+        handler.running_job_list.append(job)
+        assert handler._running_units_unlocked() == 2
+
+    def test_search_end_to_end(self, tmp_path):
+        fake_tool = tmp_path / "fake_tool.py"
+        fake_tool.write_text(FAKE_TOOL.format(fmax=FMAX))
+        job = make_job(tmp_path, fake_tool=str(fake_tool))
+        handler = ParallelJobHandler([job], nb_jobs=4)
+        handler._initialize_headless()
+
+        most_units = 0
+        deadline = time.time() + 60
+        while job.status not in ("success", "failed") and time.time() < deadline:
+            handler._tick()
+            most_units = max(most_units, handler._running_units_unlocked())
+
+        assert job.status == "success", "\n".join(map(str, job.log_history))
+        assert most_units == 3
+        with open(os.path.join(job.tmp_dir, "log", hard_settings.frequency_search_filename)) as f:
+            assert hard_settings.valid_frequency_search + ": 437 MHz" in f.read()
+        with open(os.path.join(job.tmp_dir, "report", "timing.rep")) as f:
+            assert f.read() == "437"
+        with open(job.status_file) as f:
+            assert f.read().startswith(hard_settings.valid_status)
@@ -0,0 +1,114 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Persisted fmax search state (odatix.lib.fmax_search_state).
+
+A job whose directory holds an unfinished search for the bounds it is given
+again continues that search. These tests pin down when a state can be resumed,
+and that the probing search reads and writes the same state as find_fmax.tcl.
+"""
+
+import os
+
+import odatix.lib.fmax_search_state as fmax_search_state
+import odatix.lib.hard_settings as hard_settings
+from odatix.lib.parallel_job_handler.fmax_probing import MET, VIOLATED, FmaxProbeSearch
+
+
+def state(**overrides):
+    values = {
+        "search": "",
+        "requested_lower_bound": 1,
+        "requested_upper_bound": 1000,
+        "lower_bound": 375,
+        "upper_bound": 500,
+        "start_lower_bound": 1,
+        "start_upper_bound": 1000,
+        "got_met": 1,
+        "got_violated": 1,
+        "runs": 3,
+        "max_runs": 10,
+        "explore_step": 10,
+        "best_met": 375,
+        "done": 0,
+    }
+    values.update(overrides)
+    return values
+
+
+class TestStateFile:
+    def test_roundtrip(self, tmp_path):
+        fmax_search_state.write_state(str(tmp_path), state())
+        assert fmax_search_state.read_state(str(tmp_path)) == state()
+        assert os.path.isfile(os.path.join(str(tmp_path), hard_settings.work_log_path, hard_settings.fmax_search_state_filename))
+
+    def test_missing_file(self, tmp_path):
+        assert fmax_search_state.read_state(str(tmp_path)) is None
+        assert not fmax_search_state.is_resumable(str(tmp_path), 1, 1000)
+
+    def test_unreadable_file(self, tmp_path):
+        path = fmax_search_state.state_file(str(tmp_path))
+        os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write("runs: [\n")
+        assert fmax_search_state.read_state(str(tmp_path)) is None
+
+    def test_unfinished_search_is_resumable(self, tmp_path):
+        fmax_search_state.write_state(str(tmp_path), state())
+        assert fmax_search_state.is_resumable(str(tmp_path), 1, 1000)
+
+    def test_finished_search_is_not(self, tmp_path):
+        fmax_search_state.write_state(str(tmp_path), state(done=1))
+        assert not fmax_search_state.is_resumable(str(tmp_path), 1, 1000)
+
+    def test_other_bounds_start_over(self, tmp_path):
+        fmax_search_state.write_state(str(tmp_path), state())
+        assert not fmax_search_state.is_resumable(str(tmp_path), 50, 1000)
+
+    def test_search_without_runs_starts_over(self, tmp_path):
+        fmax_search_state.write_state(str(tmp_path), state(runs=0))
+        assert not fmax_search_state.is_resumable(str(tmp_path), 1, 1000)
+
+
+class TestProbingSearch:
+    def test_resumes_a_saved_search(self):
+        search = FmaxProbeSearch(1, 1000)
+        assert search.resume(state())
+        assert (search.lower_bound, search.upper_bound, search.runs) == (375, 500, 3)
+        assert search.next_frequencies(1) == [437]
+
+    def test_state_roundtrip(self):
+        search = FmaxProbeSearch(1, 1000)
+        for frequency in search.next_frequencies(3):
+            search.record(frequency, MET if frequency <= 437 else VIOLATED)
+        resumed = FmaxProbeSearch(1, 1000)
+        assert resumed.resume(search.state())
+        assert (resumed.lower_bound, resumed.upper_bound) == (search.lower_bound, search.upper_bound)
+
+    def test_ignores_a_search_of_another_step(self):
+        assert not FmaxProbeSearch(1, 1000).resume(state(search="pnr"))
+
+    def test_ignores_other_bounds(self):
+        search = FmaxProbeSearch(100, 900)
+        assert not search.resume(state())
+        assert (search.lower_bound, search.upper_bound) == (100, 900)
+
@@ -0,0 +1,149 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Warm-started fmax search bounds (odatix.lib.fmax_warm_start).
+
+A search starts from bounds narrowed around the Fmax previous results predict:
+the same configuration first, then its neighbours on the same target, then the
+same configuration on other targets, with a margin growing as the evidence gets
+weaker. These tests pin down which evidence wins and that the narrowed bounds
+never leave the requested ones.
+"""
+
+import odatix.lib.results_schema as results_schema
+from odatix.lib.fmax_warm_start import (
+    BASIS_CONFIGURATION,
+    BASIS_NEIGHBOURS,
+    BASIS_TARGETS,
+    FmaxWarmStart,
+    configuration_shape,
+    results_file,
+)
+
+TARGET = "fpga1"
+ARCH = "counter"
+
+
+def record(configuration, fmax, target=TARGET, architecture=ARCH, flow=None, step_index=None, type="fmax_synthesis"):
+    meta = {"type": type, "target": target, "architecture": architecture, "configuration": configuration}
+    if flow is not None:
+        meta["flow"] = flow
+    if step_index is not None:
+        meta["_step_index"] = step_index
+    return results_schema.make_record(meta, {"Fmax": fmax})
+
+
+class TestPrediction:
+    def test_nothing_known(self):
+        assert FmaxWarmStart([]).predict(TARGET, ARCH, "08bits") is None
+
+    def test_same_configuration_wins(self):
+        warm = FmaxWarmStart([record("08bits", 400), record("16bits", 300)])
+        prediction = warm.predict(TARGET, ARCH, "08bits")
+        assert prediction.fmax == 400
+        assert prediction.basis == BASIS_CONFIGURATION
+
+    def test_interpolates_between_neighbours(self):
+        warm = FmaxWarmStart([record("16bits", 400), record("32bits", 200), record("64bits", 100)])
+        prediction = warm.predict(TARGET, ARCH, "24bits")
+        assert prediction.basis == BASIS_NEIGHBOURS
+        assert 200 < prediction.fmax < 400
+        assert sorted(prediction.sources) == ["16bits", "32bits"]
+
+    def test_neighbours_need_the_same_shape(self):
+        warm = FmaxWarmStart([record("16bits+depth/4", 400)])
+        assert warm.predict(TARGET, ARCH, "24bits") is None
+
+    def test_neighbours_stay_on_the_same_target(self):
+        warm = FmaxWarmStart([record("16bits", 400, target="fpga2")])
+        assert warm.predict(TARGET, ARCH, "24bits") is None
+
+    def test_other_targets_as_last_resort(self):
+        warm = FmaxWarmStart([record("08bits", 300, target="fpga2"), record("08bits", 500, target="fpga3")])
+        prediction = warm.predict(TARGET, ARCH, "08bits")
+        assert prediction.basis == BASIS_TARGETS
+        assert prediction.fmax == 400
+
+    def test_only_fmax_searches_are_used(self):
+        warm = FmaxWarmStart([record("08bits", 400, type="custom_freq_synthesis")])
+        assert warm.predict(TARGET, ARCH, "08bits") is None
+
+    def test_first_step_and_own_flow_win(self):
+        warm = FmaxWarmStart(
+            [
+                record("08bits", 500, flow="other", step_index=0),
+                record("08bits", 300, flow="standard", step_index=1),
+                record("08bits", 350, flow="standard", step_index=0),
+            ],
+            flow="standard",
+        )
+        assert warm.predict(TARGET, ARCH, "08bits").fmax == 350
+
+    def test_configuration_shape(self):
+        assert configuration_shape("24bits+depth/8") == ("#bits+depth/#", (24.0, 8.0))
+
+
+class TestNarrow:
+    def test_narrows_around_the_prediction(self):
+        warm = FmaxWarmStart([record("08bits", 400)], margin=10)
+        lower, upper, prediction = warm.narrow(TARGET, ARCH, "08bits", 1, 1000)
+        assert (lower, upper) == (360, 440)
+        assert prediction.fmax == 400
+
+    def test_weaker_evidence_widens_the_margin(self):
+        warm = FmaxWarmStart([record("08bits", 400, target="fpga2")], margin=10)
+        lower, upper, _ = warm.narrow(TARGET, ARCH, "08bits", 1, 1000)
+        assert (lower, upper) == (280, 520)
+
+    def test_stays_inside_the_requested_bounds(self):
+        warm = FmaxWarmStart([record("08bits", 400)], margin=10)
+        lower, upper, _ = warm.narrow(TARGET, ARCH, "08bits", 380, 1000)
+        assert (lower, upper) == (380, 440)
+
+    def test_prediction_outside_the_bounds_is_ignored(self):
+        warm = FmaxWarmStart([record("08bits", 400)], margin=10)
+        assert warm.narrow(TARGET, ARCH, "08bits", 500, 900) == (500, 900, None)
+
+    def test_minimum_width(self):
+        warm = FmaxWarmStart([record("08bits", 100)], margin=1, min_width=20)
+        lower, upper, _ = warm.narrow(TARGET, ARCH, "08bits", 1, 1000)
+        assert (lower, upper) == (90, 110)
+
+    def test_unknown_job_keeps_its_bounds(self):
+        assert FmaxWarmStart([]).narrow(TARGET, ARCH, "08bits", 1, 1000) == (1, 1000, None)
+
+
+class TestResultsFile:
+    def test_reads_the_tool_results_file(self, tmp_path):
+        results_schema.dump_results_file(
+            results_file(str(tmp_path), "vivado"), {"Fmax": "MHz"}, [record("08bits", 400)]
+        )
+        warm = FmaxWarmStart.from_result_path(str(tmp_path), "vivado")
+        assert len(warm) == 1
+        assert warm.predict(TARGET, ARCH, "08bits").fmax == 400
+
+    def test_missing_file_knows_nothing(self, tmp_path):
+        assert len(FmaxWarmStart.from_result_path(str(tmp_path), "vivado")) == 0
+
+    def test_unreadable_file_knows_nothing(self, tmp_path):
+        (tmp_path / "results_vivado.yml").write_text("results: [\n")
+        assert len(FmaxWarmStart.from_result_path(str(tmp_path), "vivado")) == 0
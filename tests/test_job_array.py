@@ -0,0 +1,140 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Job arrays of sweeps sent to the daemon (odatix.lib.parallel_job_handler.job_array).
+"""
+
+from conftest import make_fake_start_handler, make_parallel_job
+from odatix.lib.parallel_job_handler import job_array
+from odatix.lib.parallel_job_handler.serialization import job_to_payload
+
+
+def make_job(bits, generate_command=""):
+    arch = "Counter/{:02d}bits".format(bits)
+    tmp_dir = "work/fmax/xc7/" + arch
+    command = {
+        0: [{"name": "synthesis", "command": "make -C {} synth ARCH={}".format(tmp_dir, arch)}],
+        1: [{"name": "pnr", "command": "make -C {} pnr".format(tmp_dir), "steps": ["place", "route"]}],
+    }
+    job = make_parallel_job(
+        arch, command=command, directory="work", status="not started", log_size_limit=200,
+        generate_command=generate_command, status_file=tmp_dir + "/log/status.log",
+        progress_file=tmp_dir + "/log/progress.log", tmp_dir=tmp_dir,
+    )
+    job.display_name = "xc7 " + arch
+    return job
+
+
+def payloads(jobs):
+    return [job_to_payload(job) for job in jobs]
+
+
+class TestPack:
+    def test_a_sweep_is_one_template_and_its_rows(self):
+        sweep = payloads([make_job(bits) for bits in range(4, 36)])
+        (array,) = job_array.pack_payloads(sweep)
+        assert array["name"] == "xc7 Counter"
+        assert job_array.array_size(array) == 32
+        assert "tmp_dir" in array["variables"] and "target" not in array["variables"]
+        assert array["overrides"] == {}
+        assert list(job_array.unpack(array)) == sweep
+
+    def test_what_the_template_does_not_give_back_is_kept_as_overrides(self):
+        sweep = payloads([make_job(4), make_job(8, generate_command="python gen.py 8"), make_job(16)])
+        (array,) = job_array.pack_payloads(sweep)
+        assert array["overrides"] == {"1": {"generate_command": "python gen.py 8"}}
+        assert list(job_array.unpack(array)) == sweep
+
+    def test_jobs_of_another_shape_start_another_array(self):
+        other = make_job(8)
+        other.command = "make all"
+        sweep = payloads([make_job(4), other, make_job(16)])
+        arrays = job_array.pack_payloads(sweep)
+        assert [job_array.array_size(array) for array in arrays] == [1, 1, 1]
+        assert [payload for array in arrays for payload in job_array.unpack(array)] == sweep
+
+
+def make_handler(nb_jobs):
+    handler = make_fake_start_handler(nb_jobs=nb_jobs)
+    handler._initialize_headless()
+    return handler
+
+
+class TestJobArrays:
+    def test_rows_are_expanded_one_job_at_a_time(self):
+        sweep = [make_job(bits) for bits in (4, 8, 16)]
+        (array,) = job_array.pack_payloads(payloads(sweep))
+        pending = job_array.JobArray(array)
+        job = pending.expand_next()
+        assert isinstance(job, job_array.ArrayJob)
+        assert job_to_payload(job) == payloads(sweep)[0]
+        assert (pending.next_row, pending.pending) == (1, 2)
+        # The row of a job dispatched is not held anymore.
+        assert pending.rows[0] is None
+        assert job_to_payload(pending.expand_next()) == payloads(sweep)[1]
+
+    def test_the_statuses_of_the_jobs_are_counted(self):
+        (array,) = job_array.pack_payloads(payloads([make_job(bits) for bits in (4, 8, 16)]))
+        pending = job_array.JobArray(array)
+        first = pending.expand_next()
+        pending.expand_next()
+        first.status = "running"
+        first.status = "success"
+        assert pending.summary() == {"name": "xc7 Counter", "size": 3, "pending": 1, "statuses": {"idle": 1, "success": 1}}
+
+    def test_pending_jobs_are_dispatched_as_slots_free_up(self):
+        (array,) = job_array.pack_payloads(payloads([make_job(bits) for bits in range(4, 14)]))
+        handler = make_handler(nb_jobs=2)
+        handler.add_job_array(job_array.JobArray(array))
+        # Only the jobs that got a slot are jobs of the handler.
+        assert [job.arch for job in handler.job_list] == ["Counter/04bits", "Counter/05bits"]
+        assert handler.job_queue.qsize() == 0
+        snapshot = handler.snapshot(logs_job_id=-1)
+        assert len(snapshot["jobs"]) == 2
+        assert snapshot["handler"]["pending_in_arrays"] == 8
+        assert snapshot["handler"]["job_arrays"] == [{"name": "xc7 Counter", "size": 10, "pending": 8, "statuses": {"running": 2}}]
+        handler.job_list[0].status = "success"
+        handler.retire_job(handler.job_list[0])
+        handler._fill_running_slots_from_queue_unlocked()
+        assert [job.arch for job in handler.running_job_list] == ["Counter/05bits", "Counter/06bits"]
+        (summary,) = handler.snapshot(logs_job_id=-1)["handler"]["job_arrays"]
+        assert summary["pending"] == 7 and summary["statuses"] == {"running": 2, "success": 1}
+
+    def test_an_array_waits_for_its_queued_job(self):
+        (array,) = job_array.pack_payloads(payloads([make_job(bits) for bits in range(4, 8)]))
+        handler = make_handler(nb_jobs=4)
+        handler.resource_budget.configure({"memory_gb": 16})
+        pending = job_array.JobArray(array)
+        pending.template["resources"] = {"memory_gb": 10}
+        handler.add_job_array(pending)
+        assert [job.status for job in handler.job_list] == ["running", "queued"]
+        assert pending.pending == 2
+
+    def test_the_chunks_of_a_batch_are_summarised_together(self):
+        sweep = payloads([make_job(bits) for bits in (10, 20, 32, 40)])
+        handler = make_handler(nb_jobs=1)
+        for chunk in (sweep[:2], sweep[2:]):
+            (array,) = job_array.pack_payloads(chunk)
+            handler.add_job_array(job_array.JobArray(array))
+        (summary,) = handler.snapshot(logs_job_id=-1)["handler"]["job_arrays"]
+        assert summary == {"name": "xc7 Counter", "size": 4, "pending": 3, "statuses": {"running": 1}}
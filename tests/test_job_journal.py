@@ -0,0 +1,225 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Write-ahead journal of the jobs of a daemon session, and their recovery when the
+session died (odatix.lib.parallel_job_handler.job_journal).
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import make_parallel_job
+import odatix.lib.job_steps as job_steps
+from odatix.lib.parallel_job_handler import daemon_control, job_array, job_journal
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+from odatix.lib.parallel_job_handler.serialization import job_to_payload
+
+pytestmark = pytest.mark.skipif(not job_journal.supported(), reason="SQLite not available")
+
+
+def make_stepped_job(name, tmp_dir):
+    command = {
+        0: [{"name": "synthesis", "steps": ["synthesis"], "command": "synth"}],
+        1: [{"name": "pnr + bitstream", "steps": ["pnr", "bitstream"], "command": "route"}],
+    }
+    job = make_parallel_job(name, command=command, tmp_dir=tmp_dir)
+    job.step_names = ["analysis", "synthesis", "pnr", "bitstream"]
+    job.resume_step_index = 1
+    job.step_tracking = {"tmp_dir": tmp_dir, "flow": "standard"}
+    return job
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = job_journal.open_journal(str(tmp_path / "journal.sqlite"))
+    yield journal
+    journal.close()
+
+
+class TestJournal:
+    def test_enqueues_and_transitions(self, journal):
+        first, second = make_parallel_job("first"), make_parallel_job("second")
+        journal.record_enqueue(first)
+        journal.record_enqueue(second)
+        first.status = "running"
+        assert journal.sync([first, second], {first: [1234]}) == 1
+        # Nothing changed since.
+        assert journal.sync([first, second], {first: [1234]}) == 0
+        second.status = "success"
+        journal.sync([first, second], {first: [1234]})
+
+        unfinished = journal.unfinished()
+        assert [(entry["payload"]["display_name"], entry["status"], entry["pids"]) for entry in unfinished] == [
+            ("first", "running", [1234])
+        ]
+        assert [status for _, status in journal.events(second.journal_id)] == ["queued", "success"]
+        # Written with the job, in the same transaction.
+        assert journal.events(first.journal_id)[0][1] == "queued"
+
+    def test_uses_wal(self, journal):
+        assert journal._read("PRAGMA journal_mode")[0][0] == "wal"
+
+    def test_survives_the_process_and_discards_on_a_graceful_stop(self, journal, tmp_path):
+        journal.record_enqueue(make_parallel_job("job"))
+        journal.set_meta(session_name="nightly", nb_jobs=8)
+        journal.close()
+        summary = job_journal.read_summary(journal.path)
+        assert summary == {"meta": {"session_name": "nightly", "nb_jobs": 8}, "unfinished": 1}
+
+        reopened = job_journal.open_journal(journal.path)
+        reopened.close(discard=True)
+        assert not os.path.exists(journal.path)
+        assert job_journal.read_summary(journal.path) is None
+
+    def test_writes_after_close_are_ignored(self, journal):
+        job = make_parallel_job("job")
+        journal.close()
+        assert journal.record_enqueue(job) is None
+        assert journal.sync([job], {}) == 0
+
+
+class TestRecovery:
+    def test_unfinished_jobs_are_queued_again(self, journal):
+        jobs = [make_parallel_job(name) for name in ("done", "running", "queued")]
+        for job in jobs:
+            journal.record_enqueue(job)
+        jobs[0].status, jobs[1].status = "success", "running"
+        journal.sync(jobs, {})
+
+        handler = ParallelJobHandler([], nb_jobs=1)
+        handler.journal = journal
+        recovered = job_journal.recover_jobs(journal, handler, same_boot=False)
+        assert [job.display_name for job in handler.job_list] == ["running", "queued"]
+        # Their rows are kept, the jobs that ended are forgotten.
+        assert [job.journal_id for job in recovered] == [jobs[1].journal_id, jobs[2].journal_id]
+        assert len(journal.unfinished()) == 2
+        assert journal.events(jobs[0].journal_id) == []
+
+    def test_stepped_jobs_resume_after_their_completed_steps(self, journal, tmp_path):
+        tmp_dir = str(tmp_path / "job")
+        job = make_stepped_job("job", tmp_dir)
+        journal.record_enqueue(job)
+        for name in ("analysis", "synthesis", "pnr"):
+            job_steps.record_completed_step(tmp_dir, name)
+
+        recovered = job_journal.recover_jobs(journal, ParallelJobHandler([], nb_jobs=1), same_boot=False)[0]
+        # "bitstream" is left to do, in the same process as "pnr".
+        assert list(recovered.command) == [1]
+        assert recovered.resume_step_index == 2
+
+        job_steps.record_completed_step(tmp_dir, "bitstream")
+        recovered = job_journal.recover_jobs(journal, ParallelJobHandler([], nb_jobs=1), same_boot=False)[0]
+        assert recovered.command == {}
+        assert recovered.resume_step_index == 4
+
+    def test_the_rows_of_a_job_array_not_dispatched_are_recovered(self, journal):
+        (array,) = job_array.pack_payloads(job_to_payload(make_parallel_job("sweep_{:02d}".format(index))) for index in range(5))
+        pending = job_array.JobArray(array)
+        journal.record_array(pending)
+        dispatched = [pending.expand_next() for _ in range(2)]
+        for job in dispatched:
+            journal.record_enqueue(job)
+        dispatched[0].status = "success"
+        journal.sync(dispatched, {})
+        assert job_journal.read_summary(journal.path)["unfinished"] == 4
+
+        handler = ParallelJobHandler([], nb_jobs=1)
+        job_journal.recover_jobs(journal, handler, same_boot=False)
+        assert [job.display_name for job in handler.job_list] == ["sweep_01"]
+        (recovered,) = handler.job_arrays
+        assert recovered.journal_id == pending.journal_id
+        assert [recovered.expand_next().display_name for _ in range(recovered.pending)] == ["sweep_02", "sweep_03", "sweep_04"]
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="no process groups")
+    def test_processes_left_running_are_terminated(self, journal):
+        orphan = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"], start_new_session=True)
+        try:
+            job = make_parallel_job("job")
+            journal.record_enqueue(job)
+            job.status = "running"
+            journal.sync([job], {job: [orphan.pid]})
+            job_journal.recover_jobs(journal, ParallelJobHandler([], nb_jobs=1), same_boot=True)
+            assert orphan.wait(timeout=10) is not None
+        finally:
+            if orphan.poll() is None:
+                orphan.kill()
+
+    @pytest.mark.skipif(job_journal.process_start_time(os.getpid()) is None, reason="no /proc")
+    def test_a_recycled_pid_is_left_alone(self):
+        process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"], start_new_session=True)
+        try:
+            start_time = job_journal.process_start_time(process.pid)
+            assert not job_journal._terminate_group(process.pid, start_time + 1)
+            assert process.poll() is None
+        finally:
+            process.kill()
+            process.wait()
+
+    def test_processes_are_left_alone_after_a_reboot(self, journal):
+        journal.set_meta(boot_id="another boot")
+        job = make_parallel_job("job")
+        journal.record_enqueue(job)
+        job.status = "running"
+        journal.sync([job], {job: [os.getpid()]})
+        # Our own pid, recycled after the reboot: it must not be touched.
+        assert len(job_journal.recover_jobs(journal, ParallelJobHandler([], nb_jobs=1))) == 1
+
+
+def test_the_handler_journals_its_jobs(journal):
+    job = make_parallel_job("job", command="true")
+    handler = ParallelJobHandler([], nb_jobs=1)
+    handler.journal = journal
+    handler.add_job(job)
+    assert job.journal_id is not None
+    handler._initialize_headless()
+    deadline = time.time() + 10
+    while job.status not in job_journal.FINISHED_STATUSES and time.time() < deadline:
+        handler._tick()
+        time.sleep(0.01)
+    handler._tick()
+    assert job.status == "success"
+    assert journal.unfinished() == []
+    assert [status for _, status in journal.events(job.journal_id)][-1] == "success"
+    assert handler.snapshot(logs_job_id=-1)["handler"]["journal"] == {"file": journal.path, "error": None}
+
+
+def test_sessions_that_died_are_recoverable(tmp_path):
+    paths = daemon_control.get_daemon_paths(str(tmp_path), session_name="nightly")
+    os.makedirs(paths["state_dir"])
+    journal = job_journal.open_journal(paths["journal_file"])
+    journal.set_meta(session_name="nightly", nb_jobs=6, logsize=100)
+    journal.record_enqueue(make_parallel_job("job"))
+    journal.close()
+
+    sessions = daemon_control.list_recoverable_sessions(str(tmp_path), active_daemons=[])
+    assert [(entry["session_name"], entry["unfinished"], entry["jobs"]) for entry in sessions] == [("nightly", 1, 6)]
+    # A running session of that name owns it.
+    assert daemon_control.list_recoverable_sessions(str(tmp_path), active_daemons=[{"session_name": "nightly"}]) == []
+    # New sessions do not take its name.
+    base = daemon_control._generate_default_session_name()
+    dead = [dict(sessions[0], session_name=base)]
+    assert daemon_control._unique_default_session_name(active_daemons=[], recoverable=dead) == base + ".2"
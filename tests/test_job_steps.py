@@ -73,6 +73,20 @@ class TestState:
             f.write("{{{ not yaml")
         assert job_steps.completed_step_names(job_dir) == []
 
+    def test_step_durations_are_timed_from_the_previous_step(self, job_dir):
+        import time
+        from datetime import datetime
+
+        def stamp(epoch):
+            return datetime.fromtimestamp(epoch).strftime(job_steps.TIMESTAMP_FORMAT)
+
+        start = int(time.time()) - 1000
+        job_steps.record_completed_step(job_dir, "synthesis", timestamp=stamp(start - 5000))
+        job_steps.record_completed_step(job_dir, "pnr", timestamp=stamp(start + 600))
+        job_steps.record_completed_step(job_dir, "bitstream", timestamp=stamp(start + 900))
+        # The synthesis was done by an earlier run.
+        assert job_steps.step_durations(job_dir, start) == [("pnr", 600), ("bitstream", 300)]
+
 
 class TestResume:
     def test_only_a_leading_run_of_steps_counts(self, job_dir):
@@ -121,3 +135,42 @@ class TestSelectSteps:
         assert len(selected) == len(STEPS)
         # Nothing is forced to re-run.
         assert rerun_index == len(STEPS)
+
+
+class TestStepSeconds:
+    def test_wall_times_are_added_to_the_completed_steps(self, job_dir):
+        job_steps.record_completed_step(job_dir, "synthesis")
+        job_steps.record_completed_step(job_dir, "pnr")
+        job_steps.record_step_seconds(job_dir, [("pnr", 300.04), ("bitstream", 10)])
+        assert job_steps.step_seconds(job_dir) == {"pnr": 300.0}
+        # Recording a step again keeps the wall time of the ones before it.
+        job_steps.record_completed_step(job_dir, "bitstream")
+        assert job_steps.step_seconds(job_dir) == {"pnr": 300.0}
+        job_steps.record_completed_step(job_dir, "pnr")
+        assert job_steps.step_seconds(job_dir) == {}
+
+    def test_every_step_record_gets_its_wall_time(self, tmp_path):
+        import odatix.components.export_results as export_results
+        import odatix.lib.fmax_search_state as fmax_search_state
+        from odatix.lib.parallel_job_handler import resource_usage
+
+        job_dir = tmp_path / "xc7" / "Counter" / "04bits"
+        (job_dir / "log").mkdir(parents=True)
+        (job_dir / "log" / "status.log").write_text(export_results.status_done + "\n")
+        for name in ("synthesis", "pnr"):
+            job_steps.record_completed_step(str(job_dir), name)
+        job_steps.record_step_seconds(str(job_dir), [("synthesis", 120), ("pnr", 300)])
+        fmax_search_state.write_state(str(job_dir), {"runs": 7})
+        resource_usage.write_usage(str(job_dir), wall_seconds=420)
+
+        units = {}
+        records = export_results.process_configuration(
+            str(tmp_path), "xc7", "Counter", "04bits", None, "fmax_synthesis", "fmax_synthesis",
+            units, {"fmax_synthesis": {}}, "metrics.yml", False, None,
+        )
+        # The synthesis measured nothing else: its record holds its time alone.
+        assert [record["metrics"] for record in records] == [
+            {"Step_Time": 120.0},
+            {"Step_Time": 300.0, "Run_Time": 420.0, "Fmax_Iterations": 7},
+        ]
+        assert units == {"Step_Time": "s", "Run_Time": "s"}
@@ -0,0 +1,142 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Trace of the lifecycle of the jobs of a session, in the Chrome trace format
+(odatix.lib.parallel_job_handler.job_trace).
+"""
+
+import json
+import time
+
+from conftest import make_parallel_job
+from odatix.lib.parallel_job_handler import job_trace
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+from odatix.lib.parallel_job_handler.runtime_history import make_key
+
+
+def make_job(name, directory=".", command="true"):
+    return make_parallel_job(
+        name, command=command, directory=directory,
+        runtime_history={"file": None, "key": make_key("pnr", "vivado", "", "xc7", name), "record": False},
+    )
+
+
+def read_events(path):
+    with open(path) as f:
+        return [event for event in json.load(f) if event["ph"] != "M"]
+
+
+def move(trace, job, status, now, task=None):
+    job.status = status
+    if task is not None:
+        job._current_task_name = task
+    trace.observe(job, now=now)
+
+
+def test_phases_are_spans_on_the_slot_of_their_job(tmp_path):
+    path = str(tmp_path / "trace.json")
+    trace = job_trace.JobTrace(path, now=1000.0)
+    first, second = make_job("a"), make_job("b")
+    move(trace, first, "queued", 1000.0)
+    move(trace, second, "queued", 1000.0)
+    move(trace, first, "running", 1001.0, task="synthesis")
+    move(trace, first, "running", 1001.0)
+    move(trace, first, "running", 1003.0, task="pnr")
+    move(trace, second, "starting", 1004.0)
+    move(trace, first, "exporting", 1006.0)
+    move(trace, first, "success", 1006.5)
+    trace.close(now=1010.0)
+
+    events = read_events(path)
+    spans = [(event["name"], event["tid"], event["ts"], event["dur"]) for event in events if event["ph"] == "X"]
+    assert spans == [
+        ("synthesis", 1, 1000000, 2000000),
+        ("pnr", 1, 3000000, 3000000),
+        ("exporting", 1, 6000000, 500000),
+        # Still generating when the session stopped, on a slot of its own.
+        ("generate", 2, 4000000, 6000000),
+    ]
+    assert [(event["name"], event["tid"]) for event in events if event.get("cat") == "retired"] == [
+        ("success", 1)
+    ]
+    queued = [(event["ph"], event["id"], event["ts"]) for event in events if event.get("cat") == "queue"]
+    assert queued == [("b", 0, 0), ("e", 0, 1000000), ("b", 1, 0), ("e", 1, 4000000)]
+    assert all(event["args"]["tool"] == "vivado" for event in events if event["ph"] == "X")
+
+
+def test_queue_spans_never_share_an_id(tmp_path):
+    path = str(tmp_path / "trace.json")
+    trace = job_trace.JobTrace(path, now=0.0)
+    jobs = [make_job(name) for name in "abc"]
+    move(trace, jobs[0], "running", 1.0)
+    move(trace, jobs[1], "queued", 1.0)
+    move(trace, jobs[0], "success", 2.0)
+    # Queued while b still is: its span must not take the id a let go of.
+    move(trace, jobs[2], "queued", 3.0)
+    move(trace, jobs[1], "running", 4.0)
+    move(trace, jobs[2], "running", 5.0)
+    trace.close(now=6.0)
+    queued = [(event["ph"], event["id"]) for event in read_events(path) if event.get("cat") == "queue"]
+    assert queued == [("b", 1), ("e", 1), ("b", 2), ("e", 2)]
+
+
+def test_slots_are_reused_once_free(tmp_path):
+    trace = job_trace.JobTrace(str(tmp_path / "trace.json"), now=0.0)
+    jobs = [make_job(name) for name in "abc"]
+    move(trace, jobs[0], "running", 1.0)
+    move(trace, jobs[1], "running", 1.0)
+    move(trace, jobs[0], "failed", 2.0)
+    move(trace, jobs[2], "running", 3.0)
+    # Out of memory and queued again: its slot goes back too.
+    move(trace, jobs[1], "queued", 4.0)
+    assert trace.to_dict()["slots"] == 2
+    assert trace._lanes == {jobs[2]: 1}
+
+
+def test_an_unclosed_trace_is_still_written_line_by_line(tmp_path):
+    path = tmp_path / "trace.json"
+    trace = job_trace.JobTrace(str(path), now=0.0)
+    job = make_job("a")
+    move(trace, job, "running", 1.0)
+    move(trace, job, "success", 2.0)
+    # Chrome and Perfetto load an array that is not closed, as a session that
+    # died leaves it.
+    events = json.loads(path.read_text() + "]")
+    assert [event["name"] for event in events if event["ph"] == "X"] == ["running"]
+
+
+def test_daemon_handler_traces_its_jobs(tmp_path):
+    jobs = [make_job(name, directory=str(tmp_path)) for name in "ab"]
+    handler = ParallelJobHandler(jobs, nb_jobs=1)
+    handler.trace = job_trace.JobTrace(str(tmp_path / "trace.json"))
+    handler._initialize_headless()
+    deadline = time.time() + 10
+    while len(handler.retired_job_list) < len(jobs) and time.time() < deadline:
+        handler._tick()
+        time.sleep(0.01)
+    handler.trace.close()
+
+    events = read_events(str(tmp_path / "trace.json"))
+    assert [(event["name"], event["tid"]) for event in events if event["ph"] == "X"] == [("running", 1), ("running", 1)]
+    assert [event["name"] for event in events if event.get("cat") == "retired"] == ["success", "success"]
+    assert handler.snapshot(logs_job_id=-1)["handler"]["trace"]["slots"] == 1
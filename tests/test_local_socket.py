@@ -0,0 +1,104 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Unix domain socket transport of the daemon API
+(odatix.lib.parallel_job_handler.local_socket).
+"""
+
+import http.server
+import json
+import socket
+import socketserver
+import threading
+import urllib.error
+
+import pytest
+
+from odatix.lib.parallel_job_handler import daemon_control, local_socket
+
+pytestmark = pytest.mark.skipif(not local_socket.supported(), reason="no Unix domain sockets")
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.peers.add(id(self.connection))
+        status = 404 if self.path == "/missing" else 200
+        body = json.dumps({"path": self.path}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / "api.sock")
+    srv = _Server(path, _Handler)
+    srv.peers = set()
+    threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True).start()
+    yield srv, path
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_base_urls_carry_the_socket_path(tmp_path):
+    path = str(tmp_path / "api.x.sock")
+    assert local_socket.socket_path(local_socket.base_url(path)) == path
+    assert local_socket.socket_path("http://127.0.0.1:8000") is None
+
+
+def test_requests_share_one_connection(server):
+    srv, path = server
+    url = local_socket.base_url(path)
+    assert daemon_control._api_request(url, "GET", "/status") == {"path": "/status"}
+    assert daemon_control._api_request(url, "GET", "/jobs") == {"path": "/jobs"}
+    assert len(srv.peers) == 1
+    with pytest.raises(urllib.error.HTTPError):
+        daemon_control._api_request(url, "GET", "/missing")
+
+
+def test_a_connection_closed_by_the_daemon_is_opened_again(server):
+    _, path = server
+    url = local_socket.base_url(path)
+    local_socket.request(url, "GET", "/a")
+    # The daemon dropped the connection kept open (it was restarted, or timed out).
+    local_socket._connection(path, 1.0).sock.shutdown(socket.SHUT_RDWR)
+    assert local_socket.request(url, "GET", "/b") == {"path": "/b"}
+
+
+def test_states_of_other_hosts_use_tcp(server):
+    _, path = server
+    state = {"host": "127.0.0.1", "port": 9, "socket": path, "socket_host": socket.gethostname()}
+    assert daemon_control._state_base_url(state) == local_socket.base_url(path)
+    assert daemon_control._state_base_url(dict(state, socket_host="elsewhere")) == "http://127.0.0.1:9"
+    assert daemon_control._state_base_url(dict(state, socket=path + ".gone")) == "http://127.0.0.1:9"
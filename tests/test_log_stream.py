@@ -0,0 +1,101 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Log streaming over the WebSocket API (odatix.lib.parallel_job_handler.log_stream).
+"""
+
+from conftest import make_parallel_job
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+from odatix.lib.parallel_job_handler.log_stream import LogSubscription, apply_log_message
+
+
+def make_job(log_size_limit=-1):
+    return make_parallel_job("a", status="running", log_size_limit=log_size_limit)
+
+
+def make_handler(log_size_limit=-1):
+    job = make_job(log_size_limit)
+    handler = ParallelJobHandler([job], nb_jobs=1, log_size_limit=log_size_limit)
+    return handler, job
+
+
+class TestLogSince:
+    def test_lines_keep_their_numbers_when_the_log_is_trimmed(self):
+        handler, job = make_handler(log_size_limit=3)
+        handler._append_job_log(job, "1\n2\n3\n4\n5\n")
+        assert job.log_history == ["3", "4", "5"]
+        log = handler.log_since(0, 1)
+        # Lines 0 and 1 were dropped: the log starts at line 2.
+        assert (log["from_seq"], log["next_seq"], log["lines"]) == (2, 5, ["3", "4", "5"])
+        assert handler.log_since(0, 4)["lines"] == ["5"]
+        assert handler.log_since(1) is None
+
+
+class TestSubscription:
+    def test_new_lines_are_sent_once(self):
+        handler, job = make_handler()
+        subscription = LogSubscription(0)
+        handler._append_job_log(job, "a\nb\n")
+        message = subscription.poll(handler)
+        assert (message["from_seq"], message["next_seq"], message["lines"]) == (0, 2, ["a", "b"])
+        assert subscription.poll(handler) is None
+        handler._append_job_log(job, "c\n")
+        assert subscription.poll(handler)["lines"] == ["c"]
+
+    def test_lines_rewritten_in_place_are_sent_again(self):
+        handler, job = make_handler()
+        subscription = LogSubscription(0)
+        handler._append_job_log(job, "start\n\r 10%")
+        subscription.poll(handler)
+        handler._append_job_log(job, "\r 50%")
+        message = subscription.poll(handler)
+        assert message["lines"] == []
+        assert message["rewrites"] == [{"seq": 1, "line": " 50%"}]
+
+    def test_a_subscriber_behind_the_trim_skips_the_dropped_lines(self):
+        handler, job = make_handler(log_size_limit=2)
+        subscription = LogSubscription(0, from_seq=1)
+        handler._append_job_log(job, "1\n2\n3\n4\n")
+        message = subscription.poll(handler)
+        assert (message["from_seq"], message["lines"]) == (2, ["3", "4"])
+
+
+class TestApplyLogMessage:
+    def test_keeps_a_copy_of_the_log(self):
+        job = make_job()
+        apply_log_message(job, {"from_seq": 0, "lines": ["a", "b"]})
+        apply_log_message(job, {"from_seq": 2, "lines": ["c"], "rewrites": [{"seq": 1, "line": "B"}]})
+        assert job.log_history == ["a", "B", "c"]
+
+    def test_trims_to_the_limit_and_follows_the_numbers(self):
+        job = make_job()
+        apply_log_message(job, {"from_seq": 0, "lines": ["1", "2", "3"]}, limit=2)
+        assert (job.log_history, job.log_seq) == (["2", "3"], 1)
+        apply_log_message(job, {"from_seq": 3, "lines": ["4"], "rewrites": [{"seq": 2, "line": "3!"}]}, limit=2)
+        assert (job.log_history, job.log_seq) == (["3!", "4"], 2)
+
+    def test_a_gap_starts_over(self):
+        job = make_job()
+        apply_log_message(job, {"from_seq": 0, "lines": ["1"]})
+        apply_log_message(job, {"from_seq": 10, "lines": ["11"]})
+        assert (job.log_history, job.log_seq) == (["11"], 10)
@@ -0,0 +1,219 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Per-job memory limits (odatix.lib.parallel_job_handler.memory_limits).
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+from conftest import make_parallel_job
+from odatix.lib.parallel_job_handler import memory_limits
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+from odatix.lib.parallel_job_handler.memory_limits import MemoryLimit
+from odatix.lib.parallel_job_handler.serialization import job_to_payload, payload_to_job
+
+
+class TestLimits:
+    @pytest.mark.parametrize("value, limit", [(16, 16.0), ("2.5", 2.5), (0, None), (False, None), ("a", None), (None, None)])
+    def test_normalize(self, value, limit):
+        assert memory_limits.normalize_limit(value) == limit
+
+    def test_raised_limit(self):
+        assert memory_limits.raised_limit(16) == 24
+        assert memory_limits.raised_limit(3) == 4.5
+        # Up to the memory of the host, and no further.
+        assert memory_limits.raised_limit(16, ceiling_gb=20) == 20
+        assert memory_limits.raised_limit(20, ceiling_gb=20) is None
+
+    def test_looks_like_oom(self):
+        # A SIGKILL is only the OOM killer when it killed something meanwhile.
+        assert memory_limits.looks_like_oom(-9, [], kernel_oom_kills=1)
+        assert not memory_limits.looks_like_oom(-9, [])
+        assert memory_limits.looks_like_oom(1, ["ERROR: [Common 17-69] Out of memory"])
+        assert not memory_limits.looks_like_oom(1, ["ERROR: timing not met"])
+        # What the handler wrote after a previous run is not the tool.
+        assert not memory_limits.looks_like_oom(1, [memory_limits.OOM_MESSAGE.format(4), "ERROR: [Synth 8-439] module not found"])
+        # Only the last lines count.
+        lines = ["std::bad_alloc"] + ["ok"] * memory_limits.OOM_LOG_LINES
+        assert not memory_limits.looks_like_oom(1, lines)
+
+
+class TestCgroup:
+    def make_cgroup(self, tmp_path, controllers="cpu memory"):
+        path = tmp_path / "session"
+        path.mkdir()
+        (path / "cgroup.subtree_control").write_text(controllers + "\n")
+        return path
+
+    def test_parent_from_the_environment(self, tmp_path):
+        path = self.make_cgroup(tmp_path)
+        assert memory_limits.cgroup_parent(environ={memory_limits.ENV_CGROUP: str(path)}) == str(path)
+
+    def test_parent_from_the_cgroup_of_the_session(self, tmp_path):
+        self.make_cgroup(tmp_path)
+        proc_cgroup = tmp_path / "cgroup"
+        proc_cgroup.write_text("0::/session\n")
+        assert memory_limits.cgroup_parent(environ={}, proc_cgroup=str(proc_cgroup), root=str(tmp_path)) == str(tmp_path / "session")
+
+    def test_the_cgroup_of_the_session_gets_a_leaf_for_its_processes(self, tmp_path):
+        path = self.make_cgroup(tmp_path, controllers="")
+        (path / "cgroup.controllers").write_text("cpu memory\n")
+        (path / "cgroup.procs").write_text("1234\n")
+        proc_cgroup = tmp_path / "cgroup"
+        proc_cgroup.write_text("0::/session\n")
+        assert memory_limits.cgroup_parent(environ={}, proc_cgroup=str(proc_cgroup), root=str(tmp_path)) == str(path)
+        assert (path / memory_limits.SESSION_CGROUP / "cgroup.procs").read_text() == "1234"
+        assert (path / "cgroup.subtree_control").read_text() == "+memory"
+
+    def test_no_parent_without_the_memory_controller(self, tmp_path):
+        path = self.make_cgroup(tmp_path, controllers="cpu")
+        assert memory_limits.cgroup_parent(environ={memory_limits.ENV_CGROUP: str(path)}) is None
+
+    def test_job_cgroup(self, tmp_path):
+        parent = self.make_cgroup(tmp_path)
+        limit = MemoryLimit(2, parent=str(parent))
+        assert limit.mode == memory_limits.MODE_CGROUP
+        with open(limit.cgroup + "/memory.max") as f:
+            assert f.read() == str(2 * 1024 ** 3)
+        with open(limit.cgroup + "/memory.events", "w") as f:
+            f.write("low 0\nhigh 0\nmax 3\noom 1\noom_kill 1\n")
+        assert limit.hit(1, [])
+        os.remove(limit.cgroup + "/memory.events")
+        for filename in ("memory.max", "memory.swap.max"):
+            os.remove(os.path.join(limit.cgroup, filename))
+        limit.release()
+        assert list(parent.iterdir()) == [parent / "cgroup.subtree_control"]
+
+    def test_falls_back_to_rlimit(self, tmp_path):
+        limit = MemoryLimit(2, parent=str(tmp_path / "missing"))
+        assert limit.mode == memory_limits.MODE_RLIMIT
+        assert limit.hit(1, ["MemoryError"])
+
+    def test_only_the_lines_printed_under_the_limit_are_searched(self, tmp_path):
+        limit = MemoryLimit(2, parent=str(tmp_path / "missing"), log_start=12)
+        log = ["ERROR: [Common 17-69] Out of memory"] * 2 + ["ERROR: [Synth 8-439] module not found"]
+        # Lines 10 and 11 are of the run before, line 12 of this one.
+        assert not limit.hit(1, log, log_dropped=10)
+        assert limit.hit(1, log, log_dropped=11)
+
+    def test_a_kill_under_rlimit_needs_the_oom_killer(self, tmp_path):
+        vmstat = tmp_path / "vmstat"
+        vmstat.write_text("oom_kill 3\n")
+        limit = MemoryLimit(2, vmstat=str(vmstat))
+        assert not limit.hit(-9, [])
+        vmstat.write_text("oom_kill 4\n")
+        assert limit.hit(-9, [])
+
+
+class TestHandler:
+    def make_handler(self, jobs):
+        handler = ParallelJobHandler(jobs, nb_jobs=1)
+        handler.configure_runtime(resources={"memory_gb": 8})
+        # Enforced with RLIMIT_AS, whatever the cgroups of the host.
+        handler._cgroup_parent_detected = True
+
+        def run_job(job):
+            job.status = "running"
+
+        handler.run_job = run_job
+        return handler
+
+    def test_a_job_out_of_memory_is_requeued_with_a_higher_limit(self):
+        job = make_parallel_job("job", memory_limit_gb=4)
+        handler = self.make_handler([job])
+        handler._initialize_headless()
+        job.status = memory_limits.STATUS_OOM
+        handler._retire_finished_job(job)
+        # Back in the queue, and started again right away: the host has 8 GB.
+        assert job.status == "running" and job._memory_limit.limit_gb == 6
+        assert job.resources == {"memory_gb": 6}
+        assert handler.snapshot(logs_job_id=-1)["jobs"][0]["memory_limit_gb"] == 6
+
+    def test_requeues_stop_at_the_memory_of_the_host(self):
+        job = make_parallel_job("job", memory_limit_gb=8)
+        handler = self.make_handler([job])
+        handler._initialize_headless()
+        job.status = memory_limits.STATUS_OOM
+        handler._retire_finished_job(job)
+        assert job.status == memory_limits.STATUS_OOM
+        assert "raise the memory limit" in job.log_history[-1]
+
+    def test_session_limit(self):
+        handler = ParallelJobHandler([], nb_jobs=1)
+        handler.configure_runtime(memory_limit_gb=12)
+        assert handler._memory_limit_gb(make_parallel_job("job")) == 12
+        assert handler._memory_limit_gb(make_parallel_job("job", memory_limit_gb=4)) == 4
+        handler.configure_runtime(memory_limit_gb=0)
+        assert handler.snapshot(logs_job_id=-1)["handler"]["memory_limit_gb"] is None
+
+
+@pytest.mark.skipif(not memory_limits.supported() or sys.platform == "win32", reason="setrlimit not available")
+def test_a_job_over_its_limit_ends_out_of_memory():
+    command = '"{}" -c "bytearray(64 * 1024 ** 3)"'.format(sys.executable)
+    job = make_parallel_job("job", command=command, memory_limit_gb=1)
+    handler = ParallelJobHandler([job], nb_jobs=1)
+    handler._cgroup_parent_detected = True
+    handler.configure_runtime(resources={"memory_gb": 1})
+    handler._initialize_headless()
+    deadline = time.time() + 20
+    while job in handler.running_job_list and time.time() < deadline:
+        handler._tick()
+        time.sleep(0.01)
+    assert job.status == memory_limits.STATUS_OOM
+    assert getattr(job, "_memory_limit", None) is None
+
+
+@pytest.mark.skipif(not memory_limits.supported() or sys.platform == "win32", reason="setrlimit not available")
+def test_a_requeued_job_failing_for_another_reason_is_not_requeued_again(tmp_path):
+    # Runs out of memory the first time, then fails on an error of its own.
+    script = tmp_path / "tool.py"
+    script.write_text(
+        "import os, sys\n"
+        "marker = sys.argv[1]\n"
+        "if os.path.exists(marker):\n"
+        "    print('ERROR: [Synth 8-439] module not found')\n"
+        "    sys.exit(1)\n"
+        "open(marker, 'w').close()\n"
+        "bytearray(64 * 1024 ** 3)\n"
+    )
+    command = '"{}" "{}" "{}"'.format(sys.executable, script, tmp_path / "marker")
+    job = make_parallel_job("job", command=command, memory_limit_gb=1)
+    handler = ParallelJobHandler([job], nb_jobs=1)
+    handler._cgroup_parent_detected = True
+    handler.configure_runtime(resources={"memory_gb": 4})
+    handler._initialize_headless()
+    deadline = time.time() + 20
+    while job.status != "failed" and time.time() < deadline:
+        handler._tick()
+        time.sleep(0.01)
+    assert job.status == "failed"
+    assert job._oom_requeues == 1 and job.memory_limit_gb == 1.5
+
+
+def test_memory_limit_survives_serialization():
+    assert payload_to_job(job_to_payload(make_parallel_job("job", memory_limit_gb=24))).memory_limit_gb == 24
+    assert not hasattr(payload_to_job(job_to_payload(make_parallel_job("job"))), "memory_limit_gb")
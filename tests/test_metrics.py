@@ -0,0 +1,109 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Health figures of a daemon, served by /metrics
+(odatix.lib.parallel_job_handler.metrics).
+"""
+
+import threading
+import time
+
+import pytest
+
+from conftest import make_parallel_job
+from odatix.lib.parallel_job_handler import metrics
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+from odatix.lib.parallel_job_handler.runtime_history import make_key
+
+
+def make_job(name, tool="vivado"):
+    return make_parallel_job(
+        name, status="queued", runtime_history={"file": None, "key": make_key("pnr", tool, "", "xc7", name), "record": False}
+    )
+
+
+def lines(text):
+    return [line for line in text.splitlines() if not line.startswith("#")]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    samples = histogram.samples("odatix_x", {"tool": "vivado"})
+    assert [(name, labels.get("le"), value) for name, labels, value in samples] == [
+        ("odatix_x_bucket", "1", 2),
+        ("odatix_x_bucket", "10", 3),
+        ("odatix_x_bucket", "+Inf", 4),
+        ("odatix_x_sum", None, 56.5),
+        ("odatix_x_count", None, 4),
+    ]
+
+
+def test_render_escapes_labels_and_types_every_family():
+    recorder = metrics.DaemonMetrics()
+    recorder.jobs_finished['say "hi"'] += 1
+    text = recorder.render({"queued": 3}, resident_memory=1024, now=recorder.started_at + 5)
+    assert 'odatix_jobs_finished_total{status="say \\"hi\\""} 1' in lines(text)
+    assert 'odatix_jobs{status="queued"} 3' in lines(text)
+    assert "odatix_resident_memory_bytes 1024" in lines(text)
+    assert "odatix_uptime_seconds 5" in lines(text)
+    assert "# TYPE odatix_lock_wait_seconds histogram" in text.splitlines()
+    # Without /proc, the memory is left out rather than reported as 0.
+    assert "resident_memory" not in recorder.render({}, resident_memory=None)
+
+
+def test_timed_lock_records_the_wait():
+    histogram = metrics.Histogram(metrics.LOCK_BUCKETS)
+    lock = metrics.TimedLock(threading.RLock(), histogram)
+    with lock:
+        # Reentrant, as the lock of the handler.
+        with lock:
+            pass
+    assert histogram.count == 2
+    assert lock.acquire(blocking=False)
+    lock.release()
+
+
+def test_handler_counts_its_jobs():
+    jobs = [make_job("a"), make_job("b", tool="design_compiler")]
+    handler = ParallelJobHandler(jobs, nb_jobs=2)
+    for job in jobs:
+        handler.metrics.job_started()
+        job.status = "running"
+        job.start_time = time.time() - 30
+        handler.running_job_list.append(job)
+    jobs[0].status = "success"
+    handler.retire_job(jobs[0])
+    with handler.metrics.phase("update_jobs"):
+        pass
+
+    text = lines(handler.metrics_text())
+    assert "odatix_jobs_started_total 2" in text
+    assert 'odatix_jobs_finished_total{status="success"} 1' in text
+    assert 'odatix_jobs{status="running"} 1' in text
+    assert 'odatix_job_wall_seconds_count{tool="vivado"} 1' in text
+    assert handler.metrics.job_seconds["vivado"].sum == pytest.approx(30, abs=1)
+    assert 'odatix_tick_phase_seconds_count{phase="update_jobs"} 1' in text
+    # metrics_text took the lock of the handler.
+    assert handler.metrics.lock_wait_seconds.count >= 1
@@ -152,4 +152,108 @@ def test_headless_handler_snapshot_log_controls_and_commands():
     handler.configure_runtime(nb_jobs=0, process_group=False, auto_exit=True, log_size_limit=25)
     assert (handler.nb_jobs, handler.process_group, handler.auto_exit, handler.log_size_limit) == (1, False, True, 25)
     with pytest.raises(IndexError):
-        handler.select_job(9)
\ No newline at end of file
+        handler.select_job(9)
+
+def test_snapshot_deltas_return_only_the_jobs_that_changed():
+    from odatix.lib.parallel_job_handler.serialization import merge_snapshot, snapshot_since_query
+
+    first, second = _job("first"), _job("second")
+    handler = handler_core.ParallelJobHandler([first, second], nb_jobs=2, format_yaml="")
+    full = handler.snapshot(logs_job_id=-1)
+    version, epoch = full["handler"]["state_version"], full["handler"]["state_epoch"]
+    assert full["delta"] is False and [job["version"] for job in full["jobs"]] == [1, 2]
+
+    assert handler.snapshot(logs_job_id=-1, since=version, epoch=epoch)["jobs"] == []
+    second.progress = 40
+    delta = handler.snapshot(logs_job_id=-1, since=version, epoch=epoch)
+    assert delta["delta"] is True
+    assert [(job["id"], job["version"]) for job in delta["jobs"]] == [(1, version + 1)]
+    assert delta["handler"]["job_count"] == 2
+
+    merged = merge_snapshot(full, delta)
+    assert merged["delta"] is False
+    assert [(job["display_name"], job["progress"]) for job in merged["jobs"]] == [("first", 0), ("second", 40)]
+    assert snapshot_since_query(merged) == "since={}&epoch={}".format(version + 1, epoch)
+
+    # Versions of another run of the daemon, or from the future: everything.
+    assert handler.snapshot(logs_job_id=-1, since=version, epoch="other")["delta"] is False
+    assert len(handler.snapshot(logs_job_id=-1, since=version + 100)["jobs"]) == 2
+
+    # A setting every job shows changes them all.
+    version = handler.snapshot(logs_job_id=-1)["handler"]["state_version"]
+    handler.configure_runtime(memory_limit_gb=8)
+    assert [job["id"] for job in handler.snapshot(logs_job_id=-1, since=version, epoch=epoch)["jobs"]] == [0, 1]
+
+
+def test_enqueue_chunks_are_idempotent_and_resumable():
+    handler = handler_core.ParallelJobHandler([], nb_jobs=1, format_yaml="")
+    make_job = lambda name: _job(name)
+
+    progress = handler.enqueue_chunk("batch", 0, 5, ["a", "b", "c"], make_job)
+    assert (progress["added"], progress["received"], progress["total"]) == (3, 3, 5)
+    assert handler.snapshot(logs_job_id=-1)["handler"]["enqueuing"][0]["received"] == 3
+    # The same chunk again (the client timed out waiting for the reply).
+    assert handler.enqueue_chunk("batch", 0, 5, ["a", "b", "c"], make_job)["added"] == 0
+    # A chunk overlapping what was received only adds the rest.
+    assert handler.enqueue_chunk("batch", 2, 5, ["c", "d", "e"], make_job)["added"] == 2
+    assert [job.display_name for job in handler.job_list] == ["a", "b", "c", "d", "e"]
+    assert handler.enqueue_progress("batch")["received"] == 5
+    assert handler.snapshot(logs_job_id=-1)["handler"]["enqueuing"] == []
+    with pytest.raises(ValueError):
+        handler.enqueue_chunk("other", 3, 5, ["d"], make_job)
+
+
+def test_large_batches_are_enqueued_in_chunks_resumed_after_a_failure(monkeypatch):
+    from odatix.lib.parallel_job_handler.job_array import JobArray
+
+    handler = handler_core.ParallelJobHandler([], nb_jobs=1, format_yaml="")
+    calls = []
+
+    def fake_request(base_url, method, path, payload=None, timeout=1.0):
+        calls.append((method, (payload or {}).get("batch", {}).get("offset")))
+        if method == "GET":
+            return handler.enqueue_progress(path.rsplit("/", 1)[1])
+        batch = payload["batch"]
+        progress = handler.enqueue_chunk(batch["id"], batch["offset"], batch["total"], payload["arrays"], JobArray)
+        if len(calls) == 2:
+            # Added, but the reply was lost.
+            raise OSError("timed out")
+        return progress
+
+    monkeypatch.setattr(daemon_control, "ENQUEUE_CHUNK_SIZE", 2)
+    monkeypatch.setattr(daemon_control, "_api_request", fake_request)
+    seen = []
+    response = daemon_control._enqueue_in_chunks("http://host:9", [_job(str(i)) for i in range(5)], {}, lambda sent, total: seen.append(sent))
+    # Nothing dispatched yet: the jobs are the rows of their arrays.
+    assert handler.job_list == [] and handler.snapshot(logs_job_id=-1)["handler"]["pending_in_arrays"] == 5
+    names = [job_array.expand_next().display_name for job_array in handler.job_arrays for _ in range(job_array.pending)]
+    assert names == ["0", "1", "2", "3", "4"]
+    assert calls == [("POST", 0), ("POST", 2), ("GET", None), ("POST", 4)]
+    assert seen == [2, 4, 5] and response["added"] == 5
+
+
+def test_retired_jobs_are_compacted_with_their_logs_on_disk(tmp_path):
+    jobs = [_job("job{}".format(index)) for index in range(5)]
+    handler = handler_core.ParallelJobHandler(jobs, nb_jobs=1, format_yaml="")
+    handler.retired_log_dir = str(tmp_path / "logs")
+    handler.retired_jobs_kept = 2
+    for index, job in enumerate(jobs):
+        job.log_history = ["run {}".format(index), "multi\nline", "done"]
+        job.process = SimpleNamespace(returncode=index % 2)
+        job.status = "success"
+        job.step_tracking = {"tmp_dir": "work"}
+        handler.running_job_list.append(job)
+        handler.retire_job(job)
+    handler._compact_retired_jobs_unlocked()
+
+    assert not hasattr(jobs[0], "__dict__")
+    compacted, kept = jobs[:3], jobs[3:]
+    assert all(job.log_file is not None and job.command is None and job.process is None for job in compacted)
+    assert not hasattr(compacted[0], "step_tracking")
+    assert [job.log_file for job in kept] == [None, None] and kept[0].command == "echo test"
+    assert [job.exit_code for job in jobs] == [0, 1, 0, 1, 0]
+    # Their logs read back the same, from the file.
+    assert handler.snapshot(logs_job_id=1, logs_offset=0, logs_limit=-1)["logs"]["lines"] == ["run 1", "multi\nline", "done"]
+    assert handler.log_since(2, from_seq=1)["lines"] == ["multi\nline", "done"]
+    jobs[0].log_history.append("note")
+    assert len(jobs[0].log_history) == 4 and list(jobs[0].log_history)[-1] == "note"
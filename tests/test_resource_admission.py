@@ -0,0 +1,174 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Resource-weighted admission of jobs (odatix.lib.parallel_job_handler.resources).
+
+A job declaring a cost starts only when it fits in what the running jobs leave
+of the budget, on top of having a free slot; jobs declaring nothing are admitted
+on slots alone. A job waiting for license tokens lets the jobs of other tools go
+ahead. start_job is replaced so nothing is actually run.
+"""
+
+from conftest import make_fake_start_handler, make_parallel_job
+from odatix.lib.parallel_job_handler.resources import ResourceBudget, normalize_cost
+from odatix.lib.parallel_job_handler.serialization import job_to_payload, payload_to_job
+
+
+def make_job(name, resources=None, licenses=None):
+    return make_parallel_job(name, resources=resources, licenses=licenses)
+
+
+def make_handler(jobs, nb_jobs=8, budget=None):
+    handler = make_fake_start_handler(jobs, nb_jobs=nb_jobs)
+    handler.resource_budget = ResourceBudget(detected=budget or {"cores": 8, "memory_gb": 32})
+    return handler
+
+
+def running(handler):
+    return [job.display_name for job in handler.running_job_list]
+
+
+class TestBudget:
+    def test_normalize_drops_what_is_not_an_amount(self):
+        assert normalize_cost({"cores": "4", "memory_gb": 2.5, "scratch_gb": 0, "disk": "big", "gpu": True}) == {
+            "cores": 4,
+            "memory_gb": 2.5,
+        }
+
+    def test_limits_override_and_restore_the_detected_budget(self):
+        budget = ResourceBudget(detected={"cores": 8, "memory_gb": 32})
+        budget.configure({"memory_gb": 16, "scratch_gb": 2})
+        assert budget.total == {"cores": 8, "memory_gb": 16, "scratch_gb": 2}
+        budget.configure({"memory_gb": None, "scratch_gb": None})
+        assert budget.total == {"cores": 8, "memory_gb": 32}
+
+    def test_a_resource_without_limit_is_not_counted(self):
+        budget = ResourceBudget(detected={"cores": 8})
+        assert budget.fits({"scratch_gb": 100}, {"scratch_gb": 1})
+
+    def test_an_oversized_job_fits_alone(self):
+        budget = ResourceBudget(detected={"memory_gb": 32})
+        assert not budget.fits({}, {"memory_gb": 64})
+        assert budget.fits({}, {"memory_gb": 64}, alone=True)
+
+
+class TestAdmission:
+    def test_memory_bounds_parallelism_below_nb_jobs(self):
+        jobs = [make_job("job" + str(i), {"cores": 1, "memory_gb": 12}) for i in range(4)]
+        handler = make_handler(jobs)
+        handler._initialize_headless()
+        assert running(handler) == ["job0", "job1"]
+        assert handler.job_queue.qsize() == 2
+
+    def test_undeclared_jobs_are_admitted_on_slots_alone(self):
+        jobs = [make_job("job" + str(i)) for i in range(4)]
+        handler = make_handler(jobs, nb_jobs=3)
+        handler._initialize_headless()
+        assert len(handler.running_job_list) == 3
+
+    def test_a_waiting_job_holds_the_queue(self):
+        big = make_job("big", {"memory_gb": 24})
+        small = make_job("small", {"memory_gb": 4})
+        first = make_job("first", {"memory_gb": 16})
+        handler = make_handler([first, big, small])
+        handler._initialize_headless()
+        assert running(handler) == ["first"]
+
+    def test_retiring_a_job_admits_the_next_one(self):
+        jobs = [make_job("job" + str(i), {"memory_gb": 20}) for i in range(2)]
+        handler = make_handler(jobs)
+        handler._initialize_headless()
+        handler.retire_job(jobs[0])
+        handler._fill_running_slots_from_queue_unlocked()
+        assert running(handler) == ["job1"]
+
+    def test_raising_a_limit_starts_queued_jobs(self):
+        jobs = [make_job("job" + str(i), {"scratch_gb": 1}) for i in range(3)]
+        handler = make_handler(jobs, budget={"cores": 8, "scratch_gb": 1})
+        handler._initialize_headless()
+        assert running(handler) == ["job0"]
+        handler.configure_runtime(resources={"scratch_gb": 2})
+        assert running(handler) == ["job0", "job1"]
+
+    def test_probes_count_against_the_budget(self):
+        job = make_job("search", {"memory_gb": 10})
+        job.fmax_probing = {"max_probes": 4}
+        handler = make_handler([job])
+        handler.running_job_list.append(job)
+        assert handler._probe_count(job) == 3
+
+    def test_snapshot_reports_budget_and_usage(self):
+        job = make_job("job", {"cores": 2})
+        handler = make_handler([job])
+        handler._initialize_headless()
+        snapshot = handler.snapshot(logs_job_id=-1)
+        assert snapshot["handler"]["resources"]["used"] == {"cores": 2}
+        assert snapshot["jobs"][0]["resources"] == {"cores": 2}
+
+
+class TestLicenses:
+    def test_jobs_wait_for_tokens_while_other_tools_go_ahead(self):
+        jobs = [make_job("dc" + str(i), licenses={"dc_shell": 2}) for i in range(3)] + [make_job("vivado")]
+        handler = make_handler(jobs)
+        handler._initialize_headless()
+        assert running(handler) == ["dc0", "dc1", "vivado"]
+        assert handler.snapshot(logs_job_id=-1)["handler"]["queued_on_license"] == 1
+        assert handler.licenses_status() == {"dc_shell": {"total": 2, "used": 2, "waiting": 1}}
+        assert handler.licenses_status() == handler.snapshot(logs_job_id=-1)["handler"]["licenses"]
+        assert handler.resources_status() == handler.snapshot(logs_job_id=-1)["handler"]["resources"]
+
+    def test_a_released_token_starts_the_next_job(self):
+        jobs = [make_job("dc" + str(i), licenses={"dc_shell": 1}) for i in range(2)]
+        handler = make_handler(jobs)
+        handler._initialize_headless()
+        handler.retire_job(jobs[0])
+        handler._fill_running_slots_from_queue_unlocked()
+        assert running(handler) == ["dc1"]
+
+    def test_a_new_job_of_another_tool_is_not_held(self):
+        handler = make_handler([make_job("dc0", licenses={"dc_shell": 1}), make_job("dc1", licenses={"dc_shell": 1})])
+        handler._initialize_headless()
+        handler.add_job(make_job("vivado"))
+        assert running(handler) == ["dc0", "vivado"]
+
+    def test_pool_size_set_at_runtime(self):
+        jobs = [make_job("dc" + str(i), licenses={"dc_shell": 1}) for i in range(3)]
+        handler = make_handler(jobs)
+        handler._initialize_headless()
+        handler.configure_runtime(licenses={"dc_shell": 3})
+        assert len(handler.running_job_list) == 3
+        pools = handler.snapshot(logs_job_id=-1)["handler"]["licenses"]
+        assert pools == {"dc_shell": {"total": 3, "used": 3, "waiting": 0}}
+
+    def test_probes_take_a_token_each(self):
+        job = make_job("search", licenses={"dc_shell": 2})
+        job.fmax_probing = {"max_probes": 4}
+        handler = make_handler([job])
+        handler.running_job_list.append(job)
+        assert handler._probe_count(job) == 2
+
+
+def test_resources_survive_serialization():
+    job = payload_to_job(job_to_payload(make_job("job", {"cores": 2, "scratch_gb": 1}, {"dc_shell": 4})))
+    assert job.resources == {"cores": 2, "scratch_gb": 1}
+    assert job.licenses == {"dc_shell": 4}
+    assert not hasattr(payload_to_job(job_to_payload(make_job("job"))), "resources")
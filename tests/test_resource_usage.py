@@ -0,0 +1,160 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Sampling of what the processes of jobs use
+(odatix.lib.parallel_job_handler.resource_usage).
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+from conftest import make_parallel_job
+from odatix.lib.parallel_job_handler import resource_usage
+from odatix.lib.parallel_job_handler.handler_core import ParallelJobHandler
+from odatix.lib.parallel_job_handler.resource_usage import ProcessSample, ResourceUsage
+
+MB = 1024 * 1024
+
+
+def write_process(proc_root, pid, ppid, rss_pages, ticks, io=None):
+    path = proc_root / str(pid)
+    path.mkdir()
+    # 52 fields; the command name holds a space and a parenthesis.
+    fields = ["S", str(ppid)] + ["0"] * 9 + [str(ticks), "0", "0", "0"] + ["0"] * 6 + [str(rss_pages)] + ["0"] * 30
+    (path / "stat").write_text("{} (my tool) ".format(pid) + " ".join(fields) + "\n")
+    if io is not None:
+        (path / "io").write_text("rchar: 1\nread_bytes: {}\nwrite_bytes: {}\n".format(*io))
+
+
+def test_process_tree_from_proc(tmp_path):
+    write_process(tmp_path, 10, 1, rss_pages=256, ticks=100, io=(4 * MB, 2 * MB))
+    write_process(tmp_path, 11, 10, rss_pages=512, ticks=50)
+    write_process(tmp_path, 12, 11, rss_pages=256, ticks=50)
+    write_process(tmp_path, 20, 1, rss_pages=1024, ticks=10)
+    processes = resource_usage.read_processes(str(tmp_path))
+    assert processes[10].ppid == 1
+    assert processes[10].read_bytes == 4 * MB
+    tree = resource_usage.process_tree(processes, 10)
+    assert sorted(sample.pid for sample in tree) == [10, 11, 12]
+    assert resource_usage.process_tree(processes, 99) == []
+
+
+class TestResourceUsage:
+    def test_peak_and_totals(self):
+        usage = ResourceUsage()
+        usage.add_sample({10: [ProcessSample(10, 1, 100 * MB, 2.0, MB, 0), ProcessSample(11, 10, 300 * MB, 5.0)]})
+        usage.add_sample({10: [ProcessSample(10, 1, 50 * MB, 9.0, 3 * MB, MB)]})
+        figures = usage.to_dict()
+        assert figures["peak_rss_mb"] == 400
+        assert (figures["cpu_seconds"], figures["read_mb"], figures["write_mb"]) == (9.0, 3.0, 1.0)
+        assert figures["samples"] == 2
+
+    def test_a_reaped_child_is_not_lost(self):
+        usage = ResourceUsage()
+        usage.add_sample({10: [ProcessSample(10, 1, 0, 1.0), ProcessSample(11, 10, 0, 5.0)]})
+        # The child is gone, and not yet in the cumulative time of its parent.
+        usage.add_sample({10: [ProcessSample(10, 1, 0, 2.0)]})
+        assert usage.totals()[0] == 6.0
+
+    def test_steps_add_up(self):
+        usage = ResourceUsage()
+        usage.add_sample({10: [ProcessSample(10, 1, 0, 30.0)]})
+        # The next step of the pipeline runs in a new process.
+        usage.add_sample({20: [ProcessSample(20, 1, 0, 12.0)]})
+        assert usage.totals()[0] == 42.0
+
+
+def test_usage_file_and_metrics(tmp_path):
+    usage = ResourceUsage()
+    usage.add_sample({10: [ProcessSample(10, 1, 100 * MB, 2.0)]})
+    # No log directory: nowhere to write to.
+    resource_usage.write_usage(str(tmp_path), usage)
+    assert resource_usage.read_usage(str(tmp_path)) is None
+    (tmp_path / "log").mkdir()
+    resource_usage.write_usage(str(tmp_path), usage)
+    metrics, units = resource_usage.usage_metrics(resource_usage.read_usage(str(tmp_path)))
+    assert metrics == {"Peak_Memory": 100.0, "CPU_Time": 2.0, "Disk_Read": 0.0, "Disk_Write": 0.0}
+    assert units["Peak_Memory"] == "MB"
+
+
+def test_workflow_records_get_the_usage_of_their_run(tmp_path):
+    from odatix.components.export_workflow_results import _extract_run_records
+
+    (tmp_path / "log").mkdir()
+    (tmp_path / "log" / "resource_usage.yml").write_text("peak_rss_mb: 512.0\ncpu_seconds: 60.0\n")
+    records, units = _extract_run_records(str(tmp_path), {})
+    assert records == [({}, {"Peak_Memory": 512.0, "CPU_Time": 60.0})]
+    assert units == {"Peak_Memory": "MB", "CPU_Time": "s"}
+
+
+@pytest.mark.skipif(not resource_usage.supported() or sys.platform == "win32", reason="/proc not available")
+def test_the_daemon_samples_its_running_jobs(tmp_path):
+    (tmp_path / "log").mkdir()
+    job = make_parallel_job("job", command='"{}" -c "import time; time.sleep(0.5)"'.format(sys.executable), tmp_dir=str(tmp_path))
+    handler = ParallelJobHandler([job], nb_jobs=1)
+    handler.resource_sampler.interval = 0.05
+    handler._initialize_headless()
+    deadline = time.time() + 10
+    while job in handler.running_job_list and time.time() < deadline:
+        handler._tick()
+        time.sleep(0.01)
+    assert job.resource_usage.samples >= 1
+    assert job.resource_usage.peak_rss_bytes > 0
+    assert handler.snapshot(logs_job_id=-1)["jobs"][0]["resource_usage"]["samples"] >= 1
+    assert os.path.isfile(resource_usage.usage_file(str(tmp_path)))
+
+
+def test_a_stepped_job_leaves_the_wall_time_of_its_steps(tmp_path):
+    import odatix.lib.job_steps as job_steps
+
+    (tmp_path / "log").mkdir()
+    job = make_parallel_job("job", tmp_dir=str(tmp_path))
+    job.step_names = ["synthesis", "pnr"]
+    job.step_tracking = {"tmp_dir": str(tmp_path)}
+    job.start_time = time.time() - 60
+    job_steps.record_completed_step(str(tmp_path), "synthesis")
+    handler = ParallelJobHandler([job], nb_jobs=1)
+    handler.running_job_list.append(job)
+    handler.retire_job(job)
+    assert job_steps.step_seconds(str(tmp_path))["synthesis"] == pytest.approx(60, abs=2)
+    assert resource_usage.read_usage(str(tmp_path))["wall_seconds"] == pytest.approx(60, abs=2)
+
+
+def test_every_frequency_of_a_sweep_gets_the_totals_of_the_sweep(tmp_path):
+    sweep_dirs = [str(tmp_path / frequency) for frequency in ("100MHz", "200MHz", "300MHz")]
+    for sweep_dir in sweep_dirs:
+        os.makedirs(os.path.join(sweep_dir, "log"))
+    job = make_parallel_job("job", tmp_dir=sweep_dirs[0])
+    job.sweep_dirs = sweep_dirs
+    job.start_time = time.time() - 90
+    handler = ParallelJobHandler([job], nb_jobs=1)
+    handler.running_job_list.append(job)
+    handler.retire_job(job)
+    for sweep_dir in sweep_dirs:
+        metrics, units = resource_usage.usage_metrics(resource_usage.read_usage(sweep_dir))
+        assert metrics["Run_Time"] == pytest.approx(90, abs=2)
+        assert metrics["Sweep_Size"] == 3
+        assert "Sweep_Size" not in units
@@ -0,0 +1,197 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Runtime history of jobs and the queue order it predicts
+(odatix.lib.parallel_job_handler.runtime_history).
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import make_fake_start_handler, make_parallel_job
+from odatix.lib.parallel_job_handler import runtime_history
+from odatix.lib.parallel_job_handler.runtime_history import RuntimeHistory, make_key
+from odatix.lib.parallel_job_handler.serialization import job_to_payload, payload_to_job
+
+
+def key(configuration, architecture="Counter", tool="vivado"):
+    return make_key("fmax_synthesis", tool, "", "xc7", architecture + "/" + configuration)
+
+
+@pytest.fixture
+def history(tmp_path):
+    return RuntimeHistory(str(tmp_path / "history.json"))
+
+
+class TestPrediction:
+    def test_same_job_is_the_mean_of_its_runs(self, history):
+        history.record(key("08bits"), 100)
+        history.record(key("08bits"), 200)
+        prediction = history.predict(key("08bits"))
+        assert (prediction.seconds, prediction.basis) == (150, runtime_history.BASIS_KEY)
+
+    def test_keeps_the_last_runs_only(self, history):
+        for seconds in range(10):
+            history.record(key("08bits"), seconds)
+        assert history.records()[0]["durations"] == [5, 6, 7, 8, 9]
+
+    def test_interpolates_from_the_closest_configurations(self, history):
+        history.record(key("08bits"), 100)
+        history.record(key("16bits"), 200)
+        history.record(key("64bits"), 1000)
+        prediction = history.predict(key("12bits"))
+        assert (prediction.seconds, prediction.basis) == (150, runtime_history.BASIS_NEIGHBOURS)
+
+    def test_falls_back_to_the_architecture_then_the_flow(self, history):
+        history.record(key("small"), 100)
+        assert history.predict(key("large")).basis == runtime_history.BASIS_ARCHITECTURE
+        assert history.predict(key("08bits", architecture="Other")).basis == runtime_history.BASIS_FLOW
+
+    def test_unknown(self, history):
+        assert history.predict(key("08bits")) is None
+        history.record(key("08bits"), 100)
+        assert history.predict(key("08bits", tool="design_compiler")) is None
+
+    def test_survives_another_writer(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        first, second = RuntimeHistory(path), RuntimeHistory(path)
+        first.record(key("08bits"), 100)
+        second.record(key("16bits"), 200)
+        first.record(key("32bits"), 300)
+        assert len(RuntimeHistory(path).records()) == 3
+
+    def test_concurrent_writers_lose_nothing(self, tmp_path):
+        path = str(tmp_path / "history.json")
+
+        def write(name):
+            history = RuntimeHistory(path)
+            for index in range(20):
+                history.record(key("{}_{:02d}bits".format(name, index)), index)
+
+        threads = [threading.Thread(target=write, args=(name,)) for name in "abcd"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(RuntimeHistory(path).records()) == 80
+        assert [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")] == []
+
+    def test_a_file_that_cannot_be_parsed_is_not_rewritten(self, tmp_path):
+        path = tmp_path / "history.json"
+        path.write_text('{"records": {"half')
+        history = RuntimeHistory(str(path))
+        assert history.predict(key("08bits")) is None
+        with pytest.raises(ValueError):
+            history.record(key("08bits"), 100)
+        assert path.read_text() == '{"records": {"half'
+
+
+def make_job(name, path, seconds=None, tool="vivado"):
+    job = make_parallel_job(name, runtime_history={"file": path, "key": key(name, tool=tool), "record": True})
+    if seconds is not None:
+        RuntimeHistory(path).record(key(name, tool=tool), seconds)
+    return job
+
+
+def queued(handler):
+    return [job.display_name for job in handler.job_queue.queue]
+
+
+class TestQueue:
+    @pytest.mark.parametrize(
+        "policy, order",
+        [
+            ("lpt", ["new", "long", "medium", "short"]),
+            ("spt", ["short", "medium", "long", "new"]),
+            ("fifo", ["short", "long", "new", "medium"]),
+        ],
+    )
+    def test_policies(self, tmp_path, policy, order):
+        path = str(tmp_path / "history.json")
+        jobs = [
+            make_job("first", path, 1),
+            make_job("short", path, 60),
+            make_job("long", path, 3600),
+            make_job("new", path, tool="design_compiler"),
+            make_job("medium", path, 600),
+        ]
+        handler = make_fake_start_handler(jobs, queue_policy=policy)
+        handler._initialize_headless()
+        assert queued(handler) == order
+
+    def test_changing_the_policy_reorders_the_queue(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        jobs = [make_job("first", path, 1), make_job("short", path, 60), make_job("long", path, 3600)]
+        handler = make_fake_start_handler(jobs, queue_policy="fifo")
+        handler._initialize_headless()
+        handler.configure_runtime(queue_policy="lpt")
+        assert queued(handler) == ["long", "short"]
+        with pytest.raises(ValueError):
+            handler.configure_runtime(queue_policy="random")
+
+    def test_jobs_added_later_go_in_policy_order(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        handler = make_fake_start_handler([make_job("first", path, 1)], queue_policy="spt")
+        handler._initialize_headless()
+        for name, seconds in [("long", 3600), ("short", 60), ("new", None), ("also_short", 60), ("medium", 600)]:
+            handler.add_job(make_job(name, path, seconds, tool="design_compiler" if seconds is None else "vivado"))
+        assert queued(handler) == ["short", "also_short", "medium", "long", "new"]
+
+    def test_a_successful_job_is_recorded(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        job = make_job("job", path)
+        handler = make_fake_start_handler([job])
+        handler._initialize_headless()
+        job.start_time -= 42
+        job.status, job.progress = "success", 100
+        handler._retire_finished_job(job)
+        assert RuntimeHistory(path).predict(key("job")).seconds == pytest.approx(42, abs=1)
+
+    def test_a_resumed_job_is_not_recorded(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        job = make_job("job", path)
+        job.runtime_history["record"] = False
+        handler = make_fake_start_handler([job])
+        handler._initialize_headless()
+        job.status, job.progress = "success", 100
+        handler._retire_finished_job(job)
+        assert RuntimeHistory(path).records() == []
+
+    def test_expected_completion(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        jobs = [make_job("a", path, 100), make_job("b", path, 100), make_job("c", path, 50)]
+        handler = make_fake_start_handler(jobs, nb_jobs=2)
+        handler._initialize_headless()
+        snapshot = handler.snapshot(logs_job_id=-1)
+        now = time.time()
+        assert snapshot["handler"]["expected_completion"] == pytest.approx(now + 150, abs=2)
+        assert [job["expected_runtime"] for job in snapshot["jobs"]] == [100, 100, 50]
+        handler.add_job(make_job("unknown", path, tool="design_compiler"))
+        assert handler.snapshot(logs_job_id=-1)["handler"]["expected_completion"] is None
+
+
+def test_runtime_history_survives_serialization(tmp_path):
+    job = payload_to_job(job_to_payload(make_job("job", str(tmp_path / "history.json"))))
+    assert job.runtime_history["key"] == key("job")
@@ -0,0 +1,143 @@
+# ********************************************************************** #
+#                                Odatix                                  #
+# ********************************************************************** #
+#
+# Copyright (C) 2022 Jonathan Saussereau
+#
+# This file is part of Odatix.
+# Odatix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Odatix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Odatix. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Job slots shared by all the sessions of a host
+(odatix.lib.parallel_job_handler.slot_broker).
+"""
+
+import os
+import stat
+import time
+
+import pytest
+
+from conftest import make_fake_start_handler, make_parallel_job
+from odatix.lib.parallel_job_handler import slot_broker
+from odatix.lib.parallel_job_handler.slot_broker import HostSlotBroker
+
+pytestmark = pytest.mark.skipif(not slot_broker.supported(), reason="file locks not available")
+
+
+def entry(running=0, demand=0, weight=1.0, reserved=0):
+    return {"running": running, "demand": demand, "weight": weight, "reserved": reserved}
+
+
+class TestShares:
+    def test_what_a_session_leaves_goes_to_the_others(self):
+        shares = slot_broker.fair_shares(32, {"a": 4, "b": 32, "c": 32}, {})
+        assert shares == pytest.approx({"a": 4, "b": 14, "c": 14})
+
+    def test_weights(self):
+        shares = slot_broker.fair_shares(30, {"a": 30, "b": 30}, {"a": 2.0})
+        assert shares == pytest.approx({"a": 20, "b": 10})
+
+    def test_fair_reservation(self):
+        entries = {"a": entry(demand=32), "b": entry(demand=32, reserved=32, running=32)}
+        # "b" got there first: "a" waits for it to give slots back...
+        assert slot_broker.reservation(32, slot_broker.POLICY_FAIR, entries, "a") == 0
+        # ...which it does as its jobs finish, down to its share.
+        entries["a"]["reserved"] = 0
+        entries["b"].update(running=20)
+        assert slot_broker.reservation(32, slot_broker.POLICY_FAIR, entries, "b") == 20
+        entries["b"].update(running=10, reserved=20)
+        assert slot_broker.reservation(32, slot_broker.POLICY_FAIR, entries, "b") == 16
+
+    def test_greedy_reservation(self):
+        entries = {"a": entry(demand=32), "b": entry(demand=32, reserved=10, running=10)}
+        assert slot_broker.reservation(32, slot_broker.POLICY_GREEDY, entries, "a") == 22
+
+
+class TestBroker:
+    def make(self, tmp_path, session, **kwargs):
+        return HostSlotBroker(session, directory=str(tmp_path), **kwargs)
+
+    def test_no_capacity_means_no_limit(self, tmp_path):
+        broker = self.make(tmp_path, "a")
+        assert broker.sync(running=0, demand=8) is None
+        broker.configure(capacity=4)
+        assert broker.sync(running=0, demand=8) == 4
+        assert broker.configure(disable=True) is None
+        assert broker.sync(running=4, demand=8) is None
+
+    def test_sessions_share_the_capacity(self, tmp_path):
+        first = self.make(tmp_path, "a")
+        second = self.make(tmp_path, "b")
+        first.configure(capacity=8, policy="fair")
+        assert first.sync(running=0, demand=8) == 8
+        assert first.sync(running=8, demand=8) == 8
+        # "b" waits for "a" to go back to its share.
+        assert second.sync(running=0, demand=8) == 0
+        assert first.sync(running=6, demand=8) == 6
+        assert first.sync(running=3, demand=8) == 4
+        assert second.sync(running=0, demand=8) == 4
+        status = first.status()
+        assert (status["capacity"], status["reserved"]) == (8, 8)
+        assert [s["session"] for s in status["sessions"]] == ["a", "b"]
+        # Slots of a session that leaves go back to the others.
+        second.release()
+        assert first.sync(running=3, demand=8) == 8
+
+    def test_stale_sessions_are_dropped(self, tmp_path):
+        first = self.make(tmp_path, "a")
+        first.configure(capacity=8)
+        now = time.time()
+        self.make(tmp_path, "gone", pid=2 ** 22 + 1).sync(running=4, demand=8, now=now)
+        self.make(tmp_path, "idle").sync(running=4, demand=8, now=now - slot_broker.STALE_AFTER - 1)
+        assert first.sync(running=0, demand=8, now=now) == 8
+
+    def test_the_files_of_the_registry_are_shared(self, tmp_path):
+        broker = self.make(tmp_path, "a")
+        umask = os.umask(0o022)
+        try:
+            broker.configure(capacity=8)
+            broker.sync(running=0, demand=8)
+        finally:
+            os.umask(umask)
+        assert stat.S_IMODE(os.stat(str(tmp_path / slot_broker.LOCK_FILENAME)).st_mode) == 0o666
+        assert os.listdir(str(tmp_path / slot_broker.SESSIONS_DIRNAME)) == ["a.json"]
+        broker.release()
+        assert os.listdir(str(tmp_path / slot_broker.SESSIONS_DIRNAME)) == []
+
+    def test_a_registry_out_of_reach_is_reported(self, tmp_path):
+        (tmp_path / "file").write_text("")
+        broker = HostSlotBroker("a", directory=str(tmp_path / "file" / "slots"))
+        assert broker.sync(running=0, demand=8) is None
+        assert broker.error is not None
+
+    def test_bad_configuration(self, tmp_path):
+        broker = self.make(tmp_path, "a")
+        with pytest.raises(ValueError):
+            broker.configure(policy="fair")
+        with pytest.raises(ValueError):
+            broker.configure(capacity=4, policy="random")
+
+
+def test_handler_runs_no_more_than_its_reservation(tmp_path):
+    handler = make_fake_start_handler([make_parallel_job(str(index)) for index in range(4)], nb_jobs=4)
+    other = HostSlotBroker("other", directory=str(tmp_path))
+    other.configure(capacity=5)
+    other.sync(running=3, demand=3)
+    handler.slot_broker = HostSlotBroker("mine", directory=str(tmp_path))
+    handler._initialize_headless()
+    assert len(handler.running_job_list) == 2
+    assert handler.snapshot(logs_job_id=-1)["handler"]["host_slots"]["reserved"] == 2